@@ -1,6 +1,8 @@
 import base64
 import os
 import random
+import signal
+import threading
 from pathlib import Path
 
 import typer
@@ -30,12 +32,7 @@ def main(
     pass
 
 
-@app.command()
-def serve(
-    host: str = "0.0.0.0",
-    port: int = 8080,
-):
-    os.environ["FROM_INIT_PY"] = "true"
+def load_secret_key():
     if os.getenv("WEBUI_SECRET_KEY") is None:
         typer.echo(
             "Loading WEBUI_SECRET_KEY from file, not provided as an environment variable."
@@ -46,6 +43,15 @@ def serve(
         typer.echo(f"Loading WEBUI_SECRET_KEY from {KEY_FILE}")
         os.environ["WEBUI_SECRET_KEY"] = KEY_FILE.read_text()
 
+
+@app.command()
+def serve(
+    host: str = "0.0.0.0",
+    port: int = 8080,
+):
+    os.environ["FROM_INIT_PY"] = "true"
+    load_secret_key()
+
     if os.getenv("USE_CUDA_DOCKER", "false") == "true":
         typer.echo(
             "CUDA is enabled, appending LD_LIBRARY_PATH to include torch/cudnn & cublas libraries."
@@ -84,6 +90,36 @@ def serve(
     )
 
 
+@app.command()
+def worker(concurrency: Optional[int] = None):
+    """Run the queued background jobs, e.g. file processing and knowledge reindexing"""
+    os.environ["FROM_INIT_PY"] = "true"
+    load_secret_key()
+
+    from open_webui.main import app as webui_app
+    from open_webui.utils.jobs import (
+        JOB_QUEUE,
+        JobWorker,
+        RedisJobQueue,
+        get_internal_request,
+    )
+
+    if not isinstance(JOB_QUEUE, RedisJobQueue):
+        typer.echo("Job workers need JOB_QUEUE_BACKEND=redis and REDIS_URL to be set")
+        raise typer.Exit(code=1)
+
+    job_worker = JobWorker(JOB_QUEUE, get_internal_request(webui_app), concurrency)
+    job_worker.start()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *args: stop.set())
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    stop.wait()
+
+    typer.echo("Stopping, waiting for the running jobs to finish")
+    job_worker.stop(timeout=30)
+
+
 @app.command()
 def dev(
     host: str = "0.0.0.0",
@@ -3,6 +3,9 @@ import logging
 import os
 import shutil
 import base64
+import threading
+import time
+import uuid
 import redis
 
 from datetime import datetime
@@ -21,6 +24,7 @@ from open_webui.env import (
     DATABASE_URL,
     ENV,
     REDIS_URL,
+    REDIS_CONFIG_REFRESH_INTERVAL,
     REDIS_KEY_PREFIX,
     REDIS_SENTINEL_HOSTS,
     REDIS_SENTINEL_PORT,
@@ -33,7 +37,7 @@ from open_webui.env import (
     log,
 )
 from open_webui.internal.db import Base, get_db
-from open_webui.utils.redis import get_redis_connection
+from open_webui.utils.redis import get_redis_connection, listen_channel
 
 
 class EndpointFilter(logging.Filter):
@@ -222,6 +226,17 @@ class PersistentConfig(Generic[T]):
 
 
 class AppConfig:
+    """
+    The config values of the app, read from memory. With Redis, every change
+    bumps the "{prefix}:config:version" key and is announced on the
+    "{prefix}:config:updates" channel. A worker reloads all the values in one
+    round trip when the version moved, checking it at most once every
+    REDIS_CONFIG_REFRESH_INTERVAL seconds, and right away on an announcement.
+    Changes are seen at once by the worker making them, and by the others
+    within REDIS_CONFIG_REFRESH_INTERVAL seconds even if the announcement is
+    missed.
+    """
+
     _redis: Union[redis.Redis, redis.cluster.RedisCluster] = None
     _redis_key_prefix: str
 
@@ -247,6 +262,12 @@ class AppConfig:
             )
 
         super().__setattr__("_state", {})
+        # Version of the values in Redis the state was last loaded from
+        super().__setattr__("_loaded", False)
+        super().__setattr__("_version", None)
+        super().__setattr__("_checked_at", 0.0)
+        super().__setattr__("_lock", threading.Lock())
+        super().__setattr__("_origin", str(uuid.uuid4()))
 
     def __setattr__(self, key, value):
         if isinstance(value, PersistentConfig):
@@ -258,17 +279,44 @@ class AppConfig:
             if self._redis:
                 redis_key = f"{self._redis_key_prefix}:config:{key}"
                 self._redis.set(redis_key, json.dumps(self._state[key].value))
+                self._redis.incr(f"{self._redis_key_prefix}:config:version")
+                self._redis.publish(
+                    f"{self._redis_key_prefix}:config:updates",
+                    json.dumps({"key": key, "origin": self._origin}),
+                )
 
     def __getattr__(self, key):
         if key not in self._state:
             raise AttributeError(f"Config key '{key}' not found")
 
-        # If Redis is available, check for an updated value
-        if self._redis:
-            redis_key = f"{self._redis_key_prefix}:config:{key}"
-            redis_value = self._redis.get(redis_key)
+        if (
+            self._redis
+            and time.time() - self._checked_at >= REDIS_CONFIG_REFRESH_INTERVAL
+        ):
+            self._refresh()
+
+        return self._state[key].value
+
+    def _refresh(self):
+        """Reload the values from Redis if they changed since the last load"""
+        # Readers in other threads keep the current values meanwhile
+        if not self._lock.acquire(blocking=False):
+            return
 
-            if redis_value is not None:
+        try:
+            super().__setattr__("_checked_at", time.time())
+            version = self._redis.get(f"{self._redis_key_prefix}:config:version")
+            if self._loaded and version == self._version:
+                return
+
+            keys = list(self._state.keys())
+            pipe = self._redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.get(f"{self._redis_key_prefix}:config:{key}")
+
+            for key, redis_value in zip(keys, pipe.execute()):
+                if redis_value is None:
+                    continue
                 try:
                     decoded_value = json.loads(redis_value)
 
@@ -280,7 +328,29 @@ class AppConfig:
                 except json.JSONDecodeError:
                     log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
 
-        return self._state[key].value
+            super().__setattr__("_loaded", True)
+            super().__setattr__("_version", version)
+        except Exception as e:
+            log.warning(f"Error refreshing the config from Redis: {e}")
+        finally:
+            self._lock.release()
+
+    async def listen(self, redis):
+        """Check the version on the next read when another worker changed a value"""
+        await listen_channel(
+            redis,
+            f"{self._redis_key_prefix}:config:updates",
+            self._handle,
+            on_subscribe=self._invalidate,
+        )
+
+    def _handle(self, data):
+        if json.loads(data).get("origin") != self._origin:
+            self._invalidate()
+
+    def _invalidate(self):
+        # Updates may have been missed while the subscription was down
+        super().__setattr__("_checked_at", 0.0)
 
 
 ####################################
@@ -903,6 +973,14 @@ AZURE_STORAGE_ENDPOINT = os.environ.get("AZURE_STORAGE_ENDPOINT", None)
 AZURE_STORAGE_CONTAINER_NAME = os.environ.get("AZURE_STORAGE_CONTAINER_NAME", None)
 AZURE_STORAGE_KEY = os.environ.get("AZURE_STORAGE_KEY", None)
 
+# Size in MB of the local copies of the S3, GCS and Azure objects kept in UPLOAD_DIR,
+# the least recently used copies are removed beyond it
+STORAGE_CACHE_MAX_SIZE_MB = os.environ.get("STORAGE_CACHE_MAX_SIZE_MB", "10240")
+try:
+    STORAGE_CACHE_MAX_SIZE_MB = int(STORAGE_CACHE_MAX_SIZE_MB)
+except ValueError:
+    STORAGE_CACHE_MAX_SIZE_MB = 10240
+
 ####################################
 # File Upload DIR
 ####################################
@@ -2442,6 +2520,11 @@ ENABLE_RAG_HYBRID_SEARCH = PersistentConfig(
     os.environ.get("ENABLE_RAG_HYBRID_SEARCH", "").lower() == "true",
 )
 
+# Keep a persistent BM25 index per collection for hybrid search instead of
+# fetching the whole collection from the vector database on every query
+ENABLE_RAG_BM25_INDEX = os.environ.get("ENABLE_RAG_BM25_INDEX", "").lower() == "true"
+RAG_BM25_INDEX_DIR = os.environ.get("RAG_BM25_INDEX_DIR", f"{DATA_DIR}/bm25_index")
+
 RAG_FULL_CONTEXT = PersistentConfig(
     "RAG_FULL_CONTEXT",
     "rag.full_context",
@@ -2536,6 +2619,35 @@ RAG_EMBEDDING_BATCH_SIZE = PersistentConfig(
     ),
 )
 
+# Number of embedding batches sent to the embedding API at the same time
+RAG_EMBEDDING_CONCURRENT_REQUESTS = int(
+    os.environ.get("RAG_EMBEDDING_CONCURRENT_REQUESTS", "4")
+)
+
+# Retries of an embedding batch on rate limits, server and connection errors
+RAG_EMBEDDING_MAX_RETRIES = int(os.environ.get("RAG_EMBEDDING_MAX_RETRIES", "5"))
+
+# Number of chunks split, embedded and inserted together when saving documents
+RAG_INGEST_BATCH_SIZE = int(os.environ.get("RAG_INGEST_BATCH_SIZE", "256"))
+
+# Number of batches buffered between the split, embed and insert stages
+RAG_INGEST_QUEUE_SIZE = int(os.environ.get("RAG_INGEST_QUEUE_SIZE", "2"))
+
+# Number of embeddings kept in memory by the embedding cache, 0 disables the cache
+RAG_EMBEDDING_CACHE_SIZE = int(os.environ.get("RAG_EMBEDDING_CACHE_SIZE", "4096"))
+
+# Optional second tier of the embedding cache shared across restarts: "disk" or "redis"
+RAG_EMBEDDING_CACHE_BACKEND = os.environ.get("RAG_EMBEDDING_CACHE_BACKEND", "").lower()
+RAG_EMBEDDING_CACHE_DIR = os.environ.get(
+    "RAG_EMBEDDING_CACHE_DIR", f"{CACHE_DIR}/embeddings"
+)
+
+RAG_EMBEDDING_CACHE_REDIS_TTL = os.environ.get("RAG_EMBEDDING_CACHE_REDIS_TTL", "")
+try:
+    RAG_EMBEDDING_CACHE_REDIS_TTL = int(RAG_EMBEDDING_CACHE_REDIS_TTL)
+except ValueError:
+    RAG_EMBEDDING_CACHE_REDIS_TTL = 7 * 24 * 60 * 60
+
 RAG_EMBEDDING_QUERY_PREFIX = os.environ.get("RAG_EMBEDDING_QUERY_PREFIX", None)
 
 RAG_EMBEDDING_CONTENT_PREFIX = os.environ.get("RAG_EMBEDDING_CONTENT_PREFIX", None)
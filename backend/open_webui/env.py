@@ -343,6 +343,17 @@ DATABASE_ENABLE_SQLITE_WAL = (
     os.environ.get("DATABASE_ENABLE_SQLITE_WAL", "False").lower() == "true"
 )
 
+# Worker threads running the database calls of async code, 0 uses the pool size
+DATABASE_EXECUTOR_MAX_WORKERS = os.environ.get("DATABASE_EXECUTOR_MAX_WORKERS", 0)
+
+if DATABASE_EXECUTOR_MAX_WORKERS == "":
+    DATABASE_EXECUTOR_MAX_WORKERS = 0
+else:
+    try:
+        DATABASE_EXECUTOR_MAX_WORKERS = int(DATABASE_EXECUTOR_MAX_WORKERS)
+    except Exception:
+        DATABASE_EXECUTOR_MAX_WORKERS = 0
+
 DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL = os.environ.get(
     "DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL", None
 )
@@ -354,6 +365,21 @@ if DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL is not None:
     except Exception:
         DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL = 0.0
 
+# Seconds between the writes of the last active times of the users, which are
+# buffered by the workers and written in a single batch
+DATABASE_USER_ACTIVE_STATUS_FLUSH_INTERVAL = os.environ.get(
+    "DATABASE_USER_ACTIVE_STATUS_FLUSH_INTERVAL", "10"
+)
+
+try:
+    DATABASE_USER_ACTIVE_STATUS_FLUSH_INTERVAL = float(
+        DATABASE_USER_ACTIVE_STATUS_FLUSH_INTERVAL
+    )
+    if DATABASE_USER_ACTIVE_STATUS_FLUSH_INTERVAL <= 0:
+        raise ValueError
+except Exception:
+    DATABASE_USER_ACTIVE_STATUS_FLUSH_INTERVAL = 10.0
+
 RESET_CONFIG_ON_START = (
     os.environ.get("RESET_CONFIG_ON_START", "False").lower() == "true"
 )
@@ -364,6 +390,51 @@ ENABLE_REALTIME_CHAT_SAVE = (
 
 ENABLE_QUERIES_CACHE = os.environ.get("ENABLE_QUERIES_CACHE", "False").lower() == "true"
 
+# Store realtime message updates as an append-only log keyed by (chat_id, message_id)
+# instead of rewriting the whole chat JSON, the log is folded into the chat on read
+ENABLE_CHAT_MESSAGE_DELTA_LOG = (
+    os.environ.get("ENABLE_CHAT_MESSAGE_DELTA_LOG", "False").lower() == "true"
+)
+
+# Number of pending message deltas per chat after which they are compacted into the chat
+CHAT_MESSAGE_DELTA_COMPACTION_THRESHOLD = os.environ.get(
+    "CHAT_MESSAGE_DELTA_COMPACTION_THRESHOLD", "200"
+)
+
+if CHAT_MESSAGE_DELTA_COMPACTION_THRESHOLD == "":
+    CHAT_MESSAGE_DELTA_COMPACTION_THRESHOLD = 200
+else:
+    try:
+        CHAT_MESSAGE_DELTA_COMPACTION_THRESHOLD = int(
+            CHAT_MESSAGE_DELTA_COMPACTION_THRESHOLD
+        )
+    except Exception:
+        CHAT_MESSAGE_DELTA_COMPACTION_THRESHOLD = 200
+
+# Seconds the groups and permissions of a user are cached for the access checks,
+# they are dropped on any change of the groups so this only bounds a missed change
+PRINCIPAL_CACHE_TTL = os.environ.get("PRINCIPAL_CACHE_TTL", "30")
+
+if PRINCIPAL_CACHE_TTL == "":
+    PRINCIPAL_CACHE_TTL = 30.0
+else:
+    try:
+        PRINCIPAL_CACHE_TTL = float(PRINCIPAL_CACHE_TTL)
+    except Exception:
+        PRINCIPAL_CACHE_TTL = 30.0
+
+# Seconds the user authenticated by a token or an API key is cached for, users
+# are dropped on any change of their row so this only bounds a missed change
+AUTH_USER_CACHE_TTL = os.environ.get("AUTH_USER_CACHE_TTL", "10")
+
+if AUTH_USER_CACHE_TTL == "":
+    AUTH_USER_CACHE_TTL = 10.0
+else:
+    try:
+        AUTH_USER_CACHE_TTL = float(AUTH_USER_CACHE_TTL)
+    except Exception:
+        AUTH_USER_CACHE_TTL = 10.0
+
 ####################################
 # REDIS
 ####################################
@@ -385,6 +456,65 @@ try:
 except ValueError:
     REDIS_SENTINEL_MAX_RETRY_COUNT = 2
 
+# Seconds a worker serves the config from memory before checking the config version
+# in Redis, the longest another worker's config change can go unseen when the
+# pub/sub notification of it is missed
+REDIS_CONFIG_REFRESH_INTERVAL = os.environ.get("REDIS_CONFIG_REFRESH_INTERVAL", "1")
+try:
+    REDIS_CONFIG_REFRESH_INTERVAL = float(REDIS_CONFIG_REFRESH_INTERVAL)
+except ValueError:
+    REDIS_CONFIG_REFRESH_INTERVAL = 1.0
+
+####################################
+# JOB QUEUE
+####################################
+
+# "redis" keeps the background jobs (file processing, knowledge reindexing) in Redis,
+# where they survive restarts and can be run by `open-webui worker` processes,
+# "local" keeps them in the memory of the web process that queued them
+JOB_QUEUE_BACKEND = os.environ.get(
+    "JOB_QUEUE_BACKEND", "redis" if REDIS_URL else "local"
+).lower()
+
+# Run the jobs in the web processes too, disable when dedicated workers are deployed
+ENABLE_JOB_WORKER = os.environ.get("ENABLE_JOB_WORKER", "True").lower() == "true"
+
+JOB_WORKER_CONCURRENCY = os.environ.get("JOB_WORKER_CONCURRENCY", "2")
+try:
+    JOB_WORKER_CONCURRENCY = int(JOB_WORKER_CONCURRENCY)
+    if JOB_WORKER_CONCURRENCY < 1:
+        JOB_WORKER_CONCURRENCY = 2
+except ValueError:
+    JOB_WORKER_CONCURRENCY = 2
+
+JOB_MAX_RETRIES = os.environ.get("JOB_MAX_RETRIES", "2")
+try:
+    JOB_MAX_RETRIES = max(int(JOB_MAX_RETRIES), 0)
+except ValueError:
+    JOB_MAX_RETRIES = 2
+
+# Seconds before the first retry of a failed job, doubled on each further attempt
+JOB_RETRY_DELAY = os.environ.get("JOB_RETRY_DELAY", "10")
+try:
+    JOB_RETRY_DELAY = float(JOB_RETRY_DELAY)
+except ValueError:
+    JOB_RETRY_DELAY = 10.0
+
+# Seconds a running job is kept without a heartbeat of its worker before it is
+# queued again, e.g. after the worker was restarted
+JOB_LEASE_TIMEOUT = os.environ.get("JOB_LEASE_TIMEOUT", "300")
+try:
+    JOB_LEASE_TIMEOUT = int(JOB_LEASE_TIMEOUT)
+except ValueError:
+    JOB_LEASE_TIMEOUT = 300
+
+# Seconds the finished jobs are kept for their status
+JOB_RESULT_TTL = os.environ.get("JOB_RESULT_TTL", "86400")
+try:
+    JOB_RESULT_TTL = int(JOB_RESULT_TTL)
+except ValueError:
+    JOB_RESULT_TTL = 86400
+
 ####################################
 # UVICORN WORKERS
 ####################################
@@ -530,6 +660,17 @@ else:
     except Exception:
         MODELS_CACHE_TTL = 1
 
+# Seconds between the listings of the models of each Ollama and OpenAI connection,
+# the model lists are served from the last listing meanwhile
+MODELS_DISCOVERY_INTERVAL = os.environ.get("MODELS_DISCOVERY_INTERVAL", "60")
+
+try:
+    MODELS_DISCOVERY_INTERVAL = float(MODELS_DISCOVERY_INTERVAL)
+    if MODELS_DISCOVERY_INTERVAL <= 0:
+        MODELS_DISCOVERY_INTERVAL = 60.0
+except Exception:
+    MODELS_DISCOVERY_INTERVAL = 60.0
+
 
 ####################################
 # CHAT
@@ -563,6 +704,30 @@ else:
         CHAT_RESPONSE_MAX_TOOL_CALL_RETRIES = 30
 
 
+# Realtime chat saves are coalesced per message and written behind the stream,
+# at most every CHAT_REALTIME_SAVE_INTERVAL seconds or once
+# CHAT_REALTIME_SAVE_MAX_BYTES of new content is pending
+CHAT_REALTIME_SAVE_INTERVAL = os.environ.get("CHAT_REALTIME_SAVE_INTERVAL", "1")
+
+if CHAT_REALTIME_SAVE_INTERVAL == "":
+    CHAT_REALTIME_SAVE_INTERVAL = 1.0
+else:
+    try:
+        CHAT_REALTIME_SAVE_INTERVAL = float(CHAT_REALTIME_SAVE_INTERVAL)
+    except Exception:
+        CHAT_REALTIME_SAVE_INTERVAL = 1.0
+
+CHAT_REALTIME_SAVE_MAX_BYTES = os.environ.get("CHAT_REALTIME_SAVE_MAX_BYTES", "16384")
+
+if CHAT_REALTIME_SAVE_MAX_BYTES == "":
+    CHAT_REALTIME_SAVE_MAX_BYTES = 16384
+else:
+    try:
+        CHAT_REALTIME_SAVE_MAX_BYTES = int(CHAT_REALTIME_SAVE_MAX_BYTES)
+    except Exception:
+        CHAT_REALTIME_SAVE_MAX_BYTES = 16384
+
+
 ####################################
 # WEBSOCKET SUPPORT
 ####################################
@@ -589,6 +754,14 @@ except ValueError:
 WEBSOCKET_SENTINEL_HOSTS = os.environ.get("WEBSOCKET_SENTINEL_HOSTS", "")
 WEBSOCKET_SENTINEL_PORT = os.environ.get("WEBSOCKET_SENTINEL_PORT", "26379")
 
+# Seconds the sessions of a user are cached locally when the pools are kept in Redis
+websocket_pool_cache_ttl = os.environ.get("WEBSOCKET_POOL_CACHE_TTL", "1")
+
+try:
+    WEBSOCKET_POOL_CACHE_TTL = float(websocket_pool_cache_ttl)
+except ValueError:
+    WEBSOCKET_POOL_CACHE_TTL = 1.0
+
 
 AIOHTTP_CLIENT_TIMEOUT = os.environ.get("AIOHTTP_CLIENT_TIMEOUT", "")
 
@@ -638,6 +811,69 @@ AIOHTTP_CLIENT_SESSION_TOOL_SERVER_SSL = (
     os.environ.get("AIOHTTP_CLIENT_SESSION_TOOL_SERVER_SSL", "True").lower() == "true"
 )
 
+# Connections kept open to each upstream (Ollama, OpenAI-compatible APIs) by the
+# shared client sessions
+AIOHTTP_CLIENT_POOL_SIZE = os.environ.get("AIOHTTP_CLIENT_POOL_SIZE", "100")
+
+try:
+    AIOHTTP_CLIENT_POOL_SIZE = int(AIOHTTP_CLIENT_POOL_SIZE)
+except Exception:
+    AIOHTTP_CLIENT_POOL_SIZE = 100
+
+# Seconds an idle upstream connection is kept open for reuse
+AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT = os.environ.get(
+    "AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT", "30"
+)
+
+try:
+    AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT = float(AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT)
+except Exception:
+    AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT = 30.0
+
+# Seconds the addresses of the upstream hosts are cached for
+AIOHTTP_CLIENT_DNS_CACHE_TTL = os.environ.get("AIOHTTP_CLIENT_DNS_CACHE_TTL", "300")
+
+try:
+    AIOHTTP_CLIENT_DNS_CACHE_TTL = int(AIOHTTP_CLIENT_DNS_CACHE_TTL)
+except Exception:
+    AIOHTTP_CLIENT_DNS_CACHE_TTL = 300
+
+# Failures in a row after which an Ollama node is skipped for
+# OLLAMA_CIRCUIT_BREAKER_COOLDOWN seconds
+OLLAMA_CIRCUIT_BREAKER_THRESHOLD = os.environ.get(
+    "OLLAMA_CIRCUIT_BREAKER_THRESHOLD", "3"
+)
+
+try:
+    OLLAMA_CIRCUIT_BREAKER_THRESHOLD = int(OLLAMA_CIRCUIT_BREAKER_THRESHOLD)
+except Exception:
+    OLLAMA_CIRCUIT_BREAKER_THRESHOLD = 3
+
+OLLAMA_CIRCUIT_BREAKER_COOLDOWN = os.environ.get(
+    "OLLAMA_CIRCUIT_BREAKER_COOLDOWN", "30"
+)
+
+try:
+    OLLAMA_CIRCUIT_BREAKER_COOLDOWN = float(OLLAMA_CIRCUIT_BREAKER_COOLDOWN)
+except Exception:
+    OLLAMA_CIRCUIT_BREAKER_COOLDOWN = 30.0
+
+# Other nodes a model request is sent to when a node fails before responding
+OLLAMA_ROUTING_MAX_RETRIES = os.environ.get("OLLAMA_ROUTING_MAX_RETRIES", "2")
+
+try:
+    OLLAMA_ROUTING_MAX_RETRIES = int(OLLAMA_ROUTING_MAX_RETRIES)
+except Exception:
+    OLLAMA_ROUTING_MAX_RETRIES = 2
+
+# Seconds the models loaded on the Ollama nodes (/api/ps) are reused for routing
+OLLAMA_LOADED_MODELS_TTL = os.environ.get("OLLAMA_LOADED_MODELS_TTL", "5")
+
+try:
+    OLLAMA_LOADED_MODELS_TTL = float(OLLAMA_LOADED_MODELS_TTL)
+except Exception:
+    OLLAMA_LOADED_MODELS_TTL = 5.0
+
 
 ####################################
 # SENTENCE TRANSFORMERS
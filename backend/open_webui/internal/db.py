@@ -1,6 +1,9 @@
 import os
 import json
+import asyncio
+import functools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from typing import Any, Optional
 
@@ -15,6 +18,7 @@ from open_webui.env import (
     DATABASE_POOL_SIZE,
     DATABASE_POOL_TIMEOUT,
     DATABASE_ENABLE_SQLITE_WAL,
+    DATABASE_EXECUTOR_MAX_WORKERS,
 )
 from peewee_migrate import Router
 from sqlalchemy import Dialect, create_engine, MetaData, event, types
@@ -162,3 +166,24 @@ def get_session():
 
 
 get_db = contextmanager(get_session)
+
+
+# Dedicated threads for the database calls of async code, sized to the connection
+# pool so they queue here instead of holding threads shared with other blocking work
+if DATABASE_EXECUTOR_MAX_WORKERS > 0:
+    db_executor_max_workers = DATABASE_EXECUTOR_MAX_WORKERS
+elif isinstance(DATABASE_POOL_SIZE, int) and DATABASE_POOL_SIZE > 0:
+    db_executor_max_workers = DATABASE_POOL_SIZE + DATABASE_POOL_MAX_OVERFLOW
+else:
+    db_executor_max_workers = 8
+
+DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=db_executor_max_workers, thread_name_prefix="db"
+)
+
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """Run a synchronous database call without blocking the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(
+        DB_EXECUTOR, functools.partial(func, *args, **kwargs)
+    )
@@ -62,6 +62,7 @@ from open_webui.utils.logger import start_logger
 from open_webui.socket.main import (
     app as socket_app,
     periodic_usage_pool_cleanup,
+    forward_file_events,
     get_event_emitter,
     get_models_in_use,
     get_active_user_ids,
@@ -100,6 +101,9 @@ from open_webui.routers.retrieval import (
     get_ef,
     get_rf,
 )
+from open_webui.retrieval.embeddings import EMBEDDING_CLIENT
+from open_webui.utils.http_client import UPSTREAM_SESSIONS
+from open_webui.utils.model_discovery import MODEL_DISCOVERY
 
 from open_webui.internal.db import Session, engine
 
@@ -447,6 +451,7 @@ from open_webui.env import (
     ENABLE_OTEL,
     EXTERNAL_PWA_MANIFEST_URL,
     AIOHTTP_CLIENT_SESSION_SSL,
+    ENABLE_JOB_WORKER,
 )
 
 
@@ -454,7 +459,8 @@ from open_webui.utils.models import (
     get_all_models,
     get_all_base_models,
     check_model_access,
-    get_filtered_models,
+    get_user_models,
+    update_model_catalog,
 )
 from open_webui.utils.chat import (
     generate_chat_completion as chat_completion_handler,
@@ -471,6 +477,7 @@ from open_webui.utils.auth import (
     decode_token,
     get_admin_user,
     get_verified_user,
+    LAST_ACTIVE_BUFFER,
 )
 from open_webui.utils.plugin import install_tool_and_function_dependencies
 from open_webui.utils.oauth import (
@@ -491,6 +498,14 @@ from open_webui.tasks import (
 )  # Import from tasks.py
 
 from open_webui.utils.redis import get_sentinels_from_env
+from open_webui.utils.invalidation import INVALIDATION_BUS
+from open_webui.utils.events import EVENT_BUS
+from open_webui.utils.jobs import (
+    JOB_QUEUE,
+    JobWorker,
+    LocalJobQueue,
+    get_internal_request,
+)
 
 
 from open_webui.constants import ERROR_MESSAGES
@@ -566,12 +581,29 @@ async def lifespan(app: FastAPI):
         app.state.redis_task_command_listener = asyncio.create_task(
             redis_task_command_listener(app)
         )
+        app.state.invalidation_listener = asyncio.create_task(
+            INVALIDATION_BUS.listen(app.state.redis)
+        )
+        app.state.event_bus_listener = asyncio.create_task(
+            EVENT_BUS.listen(app.state.redis)
+        )
+        app.state.config_listener = asyncio.create_task(
+            app.state.config.listen(app.state.redis)
+        )
+
+    # Jobs of the local queue are only run by the process that queued them
+    if ENABLE_JOB_WORKER or isinstance(JOB_QUEUE, LocalJobQueue):
+        app.state.job_worker = JobWorker(JOB_QUEUE, get_internal_request(app))
+        app.state.job_worker.start()
 
     if THREAD_POOL_SIZE and THREAD_POOL_SIZE > 0:
         limiter = anyio.to_thread.current_default_thread_limiter()
         limiter.total_tokens = THREAD_POOL_SIZE
 
     asyncio.create_task(periodic_usage_pool_cleanup())
+    app.state.file_events_forwarder = asyncio.create_task(forward_file_events())
+    app.state.model_discovery = asyncio.create_task(MODEL_DISCOVERY.run(app))
+    app.state.last_active_writer = asyncio.create_task(LAST_ACTIVE_BUFFER.run())
 
     if app.state.config.ENABLE_BASE_MODELS_CACHE:
         await get_all_models(
@@ -599,6 +631,30 @@ async def lifespan(app: FastAPI):
     if hasattr(app.state, "redis_task_command_listener"):
         app.state.redis_task_command_listener.cancel()
 
+    if hasattr(app.state, "invalidation_listener"):
+        app.state.invalidation_listener.cancel()
+
+    if hasattr(app.state, "event_bus_listener"):
+        app.state.event_bus_listener.cancel()
+
+    if hasattr(app.state, "config_listener"):
+        app.state.config_listener.cancel()
+
+    app.state.file_events_forwarder.cancel()
+    app.state.model_discovery.cancel()
+
+    # Writes the last active times recorded since the last batch
+    app.state.last_active_writer.cancel()
+    await asyncio.gather(app.state.last_active_writer, return_exceptions=True)
+
+    if hasattr(app.state, "job_worker"):
+        # With Redis, jobs still running past the timeout are queued again by
+        # the other workers once their lease expires
+        await asyncio.to_thread(app.state.job_worker.stop, 5)
+
+    EMBEDDING_CLIENT.close()
+    await UPSTREAM_SESSIONS.close()
+
 
 app = FastAPI(
     title="Open WebUI",
@@ -1310,42 +1366,8 @@ if audit_level != AuditLevel.NONE:
 async def get_models(
     request: Request, refresh: bool = False, user=Depends(get_verified_user)
 ):
-    all_models = await get_all_models(request, refresh=refresh, user=user)
-
-    models = []
-    for model in all_models:
-        # Filter out filter pipelines
-        if "pipeline" in model and model["pipeline"].get("type", None) == "filter":
-            continue
-
-        try:
-            model_tags = [
-                tag.get("name")
-                for tag in model.get("info", {}).get("meta", {}).get("tags", [])
-            ]
-            tags = [tag.get("name") for tag in model.get("tags", [])]
-
-            tags = list(set(model_tags + tags))
-            model["tags"] = [{"name": tag} for tag in tags]
-        except Exception as e:
-            log.debug(f"Error processing model tags: {e}")
-            model["tags"] = []
-            pass
-
-        models.append(model)
-
-    model_order_list = request.app.state.config.MODEL_ORDER_LIST
-    if model_order_list:
-        model_order_dict = {model_id: i for i, model_id in enumerate(model_order_list)}
-        # Sort models by order list priority, with fallback for those not in the list
-        models.sort(
-            key=lambda model: (
-                model_order_dict.get(model.get("id", ""), float("inf")),
-                (model.get("name", "") or ""),
-            )
-        )
-
-    models = get_filtered_models(models, user)
+    all_models = await update_model_catalog(request, refresh=refresh, user=user)
+    models = get_user_models(request, user) if all_models else []
 
     log.debug(
         f"/api/models returned filtered models accessible to the user: {json.dumps([model.get('id') for model in models])}"
@@ -1359,6 +1381,11 @@ async def get_base_models(request: Request, user=Depends(get_admin_user)):
     return {"data": models}
 
 
+@app.get("/api/models/discovery")
+async def get_models_discovery_status(user=Depends(get_admin_user)):
+    return {"data": MODEL_DISCOVERY.get_status()}
+
+
 ##################################
 # Embeddings
 ##################################
@@ -1881,7 +1908,10 @@ async def get_current_usage(user=Depends(get_verified_user)):
     This is an experimental endpoint and subject to change.
     """
     try:
-        return {"model_ids": get_models_in_use(), "user_ids": get_active_user_ids()}
+        return {
+            "model_ids": await get_models_in_use(),
+            "user_ids": await get_active_user_ids(),
+        }
     except Exception as e:
         log.error(f"Error getting usage statistics: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
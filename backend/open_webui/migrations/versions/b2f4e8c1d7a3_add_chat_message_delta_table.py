@@ -0,0 +1,45 @@
+"""Add chat_message_delta table
+
+Revision ID: b2f4e8c1d7a3
+Revises: a5c220713937
+Create Date: 2025-10-02 10:12:41.318544
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b2f4e8c1d7a3"
+down_revision: Union[str, None] = "a5c220713937"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Create chat_message_delta table, an append-only log of message updates
+    op.create_table(
+        "chat_message_delta",
+        sa.Column(
+            "id",
+            sa.BigInteger().with_variant(sa.Integer(), "sqlite"),
+            primary_key=True,
+            autoincrement=True,
+        ),
+        sa.Column("chat_id", sa.Text(), nullable=False),
+        sa.Column("message_id", sa.Text(), nullable=False),
+        sa.Column("type", sa.Text(), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+    )
+
+    op.create_index(
+        "chat_message_delta_chat_id_idx", "chat_message_delta", ["chat_id", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("chat_message_delta_chat_id_idx", table_name="chat_message_delta")
+    op.drop_table("chat_message_delta")
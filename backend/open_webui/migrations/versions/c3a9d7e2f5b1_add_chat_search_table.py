@@ -0,0 +1,207 @@
+"""Add chat_search table
+
+Revision ID: c3a9d7e2f5b1
+Revises: b2f4e8c1d7a3
+Create Date: 2025-10-06 14:27:09.615230
+
+"""
+
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import table, select
+
+log = logging.getLogger(__name__)
+
+# revision identifiers, used by Alembic.
+revision: str = "c3a9d7e2f5b1"
+down_revision: Union[str, None] = "b2f4e8c1d7a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MAX_CONTENT_LENGTH = 100_000
+BATCH_SIZE = 500
+
+
+def get_content_text(content) -> str:
+    if isinstance(content, str):
+        return content[:MAX_CONTENT_LENGTH]
+    if isinstance(content, list):
+        return "\n".join(
+            part.get("text", "")
+            for part in content
+            if isinstance(part, dict) and part.get("type") == "text"
+        )[:MAX_CONTENT_LENGTH]
+    return ""
+
+
+def get_chat_search_rows(chat_id: str, chat: dict, deltas: list) -> list[dict]:
+    rows = [
+        {
+            "chat_id": chat_id,
+            "message_id": "",
+            "title": chat.get("title", "New Chat"),
+            "content": "",
+        }
+    ]
+
+    messages = {**chat.get("history", {}).get("messages", {})}
+    if not messages:
+        messages = {
+            message.get("id", str(idx)): message
+            for idx, message in enumerate(chat.get("messages", []))
+            if isinstance(message, dict)
+        }
+
+    # Pending message deltas are not folded into the chat yet
+    for message_id, data in deltas:
+        messages[message_id] = {**(messages.get(message_id) or {}), **data}
+
+    for message_id, message in messages.items():
+        content = get_content_text((message or {}).get("content"))
+        if content:
+            rows.append(
+                {
+                    "chat_id": chat_id,
+                    "message_id": message_id,
+                    "title": None,
+                    "content": content,
+                }
+            )
+    return rows
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_search",
+        sa.Column(
+            "id",
+            sa.BigInteger().with_variant(sa.Integer(), "sqlite"),
+            primary_key=True,
+            autoincrement=True,
+        ),
+        sa.Column("chat_id", sa.Text(), nullable=False),
+        sa.Column("message_id", sa.Text(), nullable=False),
+        sa.Column("title", sa.Text(), nullable=True),
+        sa.Column("content", sa.Text(), nullable=True),
+    )
+    op.create_index(
+        "chat_search_chat_id_message_id_idx",
+        "chat_search",
+        ["chat_id", "message_id"],
+    )
+
+    conn = op.get_bind()
+    dialect_name = conn.dialect.name
+
+    if dialect_name == "sqlite":
+        try:
+            # External content FTS5 table, kept in sync with chat_search by triggers
+            op.execute(
+                "CREATE VIRTUAL TABLE chat_search_fts USING fts5("
+                "title, content, content='chat_search', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            # Rank by BM25 with matches in titles weighted over message content
+            op.execute(
+                "INSERT INTO chat_search_fts(chat_search_fts, rank) "
+                "VALUES ('rank', 'bm25(10.0, 1.0)')"
+            )
+            op.execute(
+                "CREATE TRIGGER chat_search_ai AFTER INSERT ON chat_search BEGIN "
+                "INSERT INTO chat_search_fts(rowid, title, content) "
+                "VALUES (new.id, new.title, new.content); "
+                "END"
+            )
+            op.execute(
+                "CREATE TRIGGER chat_search_ad AFTER DELETE ON chat_search BEGIN "
+                "INSERT INTO chat_search_fts(chat_search_fts, rowid, title, content) "
+                "VALUES ('delete', old.id, old.title, old.content); "
+                "END"
+            )
+            op.execute(
+                "CREATE TRIGGER chat_search_au AFTER UPDATE ON chat_search BEGIN "
+                "INSERT INTO chat_search_fts(chat_search_fts, rowid, title, content) "
+                "VALUES ('delete', old.id, old.title, old.content); "
+                "INSERT INTO chat_search_fts(rowid, title, content) "
+                "VALUES (new.id, new.title, new.content); "
+                "END"
+            )
+        except Exception as e:
+            log.warning(
+                f"SQLite FTS5 is not available, chat search falls back to LIKE: {e}"
+            )
+    elif dialect_name == "postgresql":
+        op.execute(
+            "ALTER TABLE chat_search ADD COLUMN tsv tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B')"
+            ") STORED"
+        )
+        op.execute("CREATE INDEX chat_search_tsv_idx ON chat_search USING GIN (tsv)")
+
+    # Backfill the index with the existing chats, shared copies are not searched
+    chat_table = table(
+        "chat",
+        sa.Column("id", sa.String()),
+        sa.Column("user_id", sa.String()),
+        sa.Column("chat", sa.JSON()),
+    )
+    delta_table = table(
+        "chat_message_delta",
+        sa.Column("id", sa.BigInteger()),
+        sa.Column("chat_id", sa.Text()),
+        sa.Column("message_id", sa.Text()),
+        sa.Column("type", sa.Text()),
+        sa.Column("data", sa.JSON()),
+    )
+    search_table = table(
+        "chat_search",
+        sa.Column("chat_id", sa.Text()),
+        sa.Column("message_id", sa.Text()),
+        sa.Column("title", sa.Text()),
+        sa.Column("content", sa.Text()),
+    )
+
+    chat_ids = [
+        row.id
+        for row in conn.execute(
+            select(chat_table.c.id).where(~chat_table.c.user_id.like("shared-%"))
+        )
+    ]
+    for i in range(0, len(chat_ids), BATCH_SIZE):
+        batch = chat_ids[i : i + BATCH_SIZE]
+
+        deltas = {}
+        for row in conn.execute(
+            select(delta_table.c.chat_id, delta_table.c.message_id, delta_table.c.data)
+            .where(delta_table.c.chat_id.in_(batch), delta_table.c.type == "message")
+            .order_by(delta_table.c.id)
+        ):
+            deltas.setdefault(row.chat_id, []).append((row.message_id, row.data))
+
+        rows = []
+        for row in conn.execute(
+            select(chat_table.c.id, chat_table.c.chat).where(chat_table.c.id.in_(batch))
+        ):
+            rows.extend(
+                get_chat_search_rows(row.id, row.chat or {}, deltas.get(row.id, []))
+            )
+
+        if rows:
+            conn.execute(search_table.insert(), rows)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS chat_search_ai")
+        op.execute("DROP TRIGGER IF EXISTS chat_search_ad")
+        op.execute("DROP TRIGGER IF EXISTS chat_search_au")
+        op.execute("DROP TABLE IF EXISTS chat_search_fts")
+
+    op.drop_index("chat_search_chat_id_message_id_idx", table_name="chat_search")
+    op.drop_table("chat_search")
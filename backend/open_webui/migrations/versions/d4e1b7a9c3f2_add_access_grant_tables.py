@@ -0,0 +1,149 @@
+"""Add access_grant and group_member tables
+
+Revision ID: d4e1b7a9c3f2
+Revises: c3a9d7e2f5b1
+Create Date: 2025-10-20 09:41:52.207113
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import table, select
+
+# revision identifiers, used by Alembic.
+revision: str = "d4e1b7a9c3f2"
+down_revision: Union[str, None] = "c3a9d7e2f5b1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 1000
+
+# resource type -> (table, id column)
+RESOURCE_TABLES = {
+    "knowledge": ("knowledge", "id"),
+    "model": ("model", "id"),
+    "tool": ("tool", "id"),
+    "prompt": ("prompt", "command"),
+    "note": ("note", "id"),
+}
+
+
+def get_access_grants(access_control) -> list[tuple[str, str, str]]:
+    if access_control is None:
+        return [("read", "public", "")]
+
+    grants = set()
+    for permission in ("read", "write"):
+        access = access_control.get(permission) or {}
+        for group_id in access.get("group_ids") or []:
+            grants.add((permission, "group", group_id))
+        for user_id in access.get("user_ids") or []:
+            grants.add((permission, "user", user_id))
+    return sorted(grants)
+
+
+def insert_rows(conn, target_table, rows: list[dict]):
+    for i in range(0, len(rows), BATCH_SIZE):
+        conn.execute(target_table.insert(), rows[i : i + BATCH_SIZE])
+
+
+def upgrade() -> None:
+    op.create_table(
+        "access_grant",
+        sa.Column(
+            "id",
+            sa.BigInteger().with_variant(sa.Integer(), "sqlite"),
+            primary_key=True,
+            autoincrement=True,
+        ),
+        sa.Column("resource_type", sa.Text(), nullable=False),
+        sa.Column("resource_id", sa.Text(), nullable=False),
+        sa.Column("permission", sa.Text(), nullable=False),
+        sa.Column("principal_type", sa.Text(), nullable=False),
+        sa.Column("principal_id", sa.Text(), nullable=False),
+    )
+    op.create_index(
+        "access_grant_principal_idx",
+        "access_grant",
+        ["resource_type", "permission", "principal_type", "principal_id"],
+    )
+    op.create_index(
+        "access_grant_resource_idx",
+        "access_grant",
+        ["resource_type", "resource_id"],
+    )
+
+    op.create_table(
+        "group_member",
+        sa.Column("group_id", sa.Text(), primary_key=True),
+        sa.Column("user_id", sa.Text(), primary_key=True),
+    )
+    op.create_index("group_member_user_id_idx", "group_member", ["user_id"])
+
+    conn = op.get_bind()
+
+    # Backfill the members of the existing groups
+    group_table = table(
+        "group",
+        sa.Column("id", sa.Text()),
+        sa.Column("user_ids", sa.JSON()),
+    )
+    member_table = table(
+        "group_member",
+        sa.Column("group_id", sa.Text()),
+        sa.Column("user_id", sa.Text()),
+    )
+    rows = []
+    for row in conn.execute(select(group_table.c.id, group_table.c.user_ids)):
+        user_ids = row.user_ids if isinstance(row.user_ids, list) else []
+        rows.extend(
+            {"group_id": row.id, "user_id": user_id}
+            for user_id in sorted(set(user_ids))
+        )
+    insert_rows(conn, member_table, rows)
+
+    # Backfill the grants of the existing resources
+    grant_table = table(
+        "access_grant",
+        sa.Column("resource_type", sa.Text()),
+        sa.Column("resource_id", sa.Text()),
+        sa.Column("permission", sa.Text()),
+        sa.Column("principal_type", sa.Text()),
+        sa.Column("principal_id", sa.Text()),
+    )
+    for resource_type, (table_name, id_column) in RESOURCE_TABLES.items():
+        resource_table = table(
+            table_name,
+            sa.Column(id_column, sa.Text()),
+            sa.Column("access_control", sa.JSON()),
+        )
+
+        rows = []
+        for row in conn.execute(
+            select(resource_table.c[id_column], resource_table.c.access_control)
+        ):
+            rows.extend(
+                {
+                    "resource_type": resource_type,
+                    "resource_id": row[0],
+                    "permission": permission,
+                    "principal_type": principal_type,
+                    "principal_id": principal_id,
+                }
+                for permission, principal_type, principal_id in get_access_grants(
+                    row[1]
+                )
+            )
+        insert_rows(conn, grant_table, rows)
+
+
+def downgrade() -> None:
+    op.drop_index("group_member_user_id_idx", table_name="group_member")
+    op.drop_table("group_member")
+
+    op.drop_index("access_grant_resource_idx", table_name="access_grant")
+    op.drop_index("access_grant_principal_idx", table_name="access_grant")
+    op.drop_table("access_grant")
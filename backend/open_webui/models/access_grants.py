@@ -0,0 +1,170 @@
+import logging
+from typing import Optional
+
+from open_webui.internal.db import Base
+from open_webui.env import SRC_LOG_LEVELS
+
+from sqlalchemy import BigInteger, Column, Index, Integer, Text, and_, or_, select
+from sqlalchemy.orm import Session
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+####################
+# Access Grant DB Schema
+####################
+
+
+class AccessGrant(Base):
+    """
+    One row per principal granted a permission by the access_control of a
+    knowledge base, model, tool, prompt or note, for the lists of what a user
+    can access to be resolved in SQL. Resources without access_control are
+    readable by everyone, which is a "public" grant.
+    """
+
+    __tablename__ = "access_grant"
+
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    resource_type = Column(Text, nullable=False)
+    resource_id = Column(Text, nullable=False)
+
+    permission = Column(Text, nullable=False)  # read or write
+    principal_type = Column(Text, nullable=False)  # user, group or public
+    principal_id = Column(Text, nullable=False)
+
+    __table_args__ = (
+        # WHERE resource_type = ... AND permission = ... AND principal_type = ...
+        # AND principal_id IN (...)
+        Index(
+            "access_grant_principal_idx",
+            "resource_type",
+            "permission",
+            "principal_type",
+            "principal_id",
+        ),
+        # WHERE resource_type = ... AND resource_id IN (...)
+        Index("access_grant_resource_idx", "resource_type", "resource_id"),
+    )
+
+
+class GroupMember(Base):
+    """The members of the groups, mirrored from group.user_ids to be looked up by user"""
+
+    __tablename__ = "group_member"
+
+    group_id = Column(Text, primary_key=True)
+    user_id = Column(Text, primary_key=True)
+
+    __table_args__ = (Index("group_member_user_id_idx", "user_id"),)
+
+
+def get_access_grants(access_control: Optional[dict]) -> list[tuple[str, str, str]]:
+    """(permission, principal_type, principal_id) granted by an access_control"""
+    if access_control is None:
+        return [("read", "public", "")]
+
+    grants = set()
+    for permission in ("read", "write"):
+        access = access_control.get(permission) or {}
+        for group_id in access.get("group_ids") or []:
+            grants.add((permission, "group", group_id))
+        for user_id in access.get("user_ids") or []:
+            grants.add((permission, "user", user_id))
+    return sorted(grants)
+
+
+class AccessGrantsTable:
+    def set_access_control(
+        self,
+        db: Session,
+        resource_type: str,
+        resource_id: str,
+        access_control: Optional[dict],
+    ) -> None:
+        """Replace the grants of a resource, in the caller's transaction"""
+        self.delete_by_resource_ids(db, resource_type, [resource_id])
+        db.add_all(
+            [
+                AccessGrant(
+                    resource_type=resource_type,
+                    resource_id=resource_id,
+                    permission=permission,
+                    principal_type=principal_type,
+                    principal_id=principal_id,
+                )
+                for permission, principal_type, principal_id in get_access_grants(
+                    access_control
+                )
+            ]
+        )
+
+    def delete_by_resource_ids(
+        self, db: Session, resource_type: str, resource_ids: Optional[list] = None
+    ) -> None:
+        """Delete the grants of the resources, or of all the resources of the type"""
+        query = db.query(AccessGrant).filter(AccessGrant.resource_type == resource_type)
+        if resource_ids is not None:
+            query = query.filter(AccessGrant.resource_id.in_(resource_ids))
+        query.delete(synchronize_session=False)
+
+    def set_group_members(
+        self, db: Session, group_id: str, user_ids: Optional[list[str]]
+    ) -> None:
+        """Replace the members of a group, in the caller's transaction"""
+        self.delete_group_members(db, [group_id])
+        db.add_all(
+            [
+                GroupMember(group_id=group_id, user_id=user_id)
+                for user_id in sorted(set(user_ids or []))
+            ]
+        )
+
+    def delete_group_members(
+        self, db: Session, group_ids: Optional[list[str]] = None
+    ) -> None:
+        """Delete the members of the groups, or of all of them"""
+        query = db.query(GroupMember)
+        if group_ids is not None:
+            query = query.filter(GroupMember.group_id.in_(group_ids))
+        query.delete(synchronize_session=False)
+
+    def get_group_ids_subquery(self, user_id: str):
+        return select(GroupMember.group_id).where(GroupMember.user_id == user_id)
+
+    def get_access_filter(
+        self,
+        resource_type: str,
+        id_column,
+        owner_column,
+        user_id: str,
+        permission: str = "write",
+    ):
+        """
+        Clause matching the resources a user owns or was granted the permission
+        on, directly, through one of their groups or publicly, the same as
+        has_access(user_id, permission, access_control) for the rest.
+        """
+        granted_ids = select(AccessGrant.resource_id).where(
+            AccessGrant.resource_type == resource_type,
+            AccessGrant.permission == permission,
+            or_(
+                and_(
+                    AccessGrant.principal_type == "user",
+                    AccessGrant.principal_id == user_id,
+                ),
+                and_(
+                    AccessGrant.principal_type == "group",
+                    AccessGrant.principal_id.in_(self.get_group_ids_subquery(user_id)),
+                ),
+                AccessGrant.principal_type == "public",
+            ),
+        )
+        return or_(owner_column == user_id, id_column.in_(granted_ids))
+
+
+AccessGrants = AccessGrantsTable()
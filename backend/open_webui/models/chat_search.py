@@ -0,0 +1,259 @@
+import logging
+import re
+from typing import Optional
+
+from open_webui.internal.db import Base
+from open_webui.env import SRC_LOG_LEVELS
+
+from sqlalchemy import BigInteger, Column, Float, Index, Integer, Text, text
+from sqlalchemy.orm import Session
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+# Longer message content is truncated in the index, Postgres caps a tsvector at 1MB
+CHAT_SEARCH_MAX_CONTENT_LENGTH = 100_000
+
+####################
+# Chat Search DB Schema
+####################
+
+
+class ChatSearchEntry(Base):
+    """
+    One row per chat title (message_id = "") and per message content, indexed by
+    the chat_search_fts FTS5 table on SQLite and the generated tsv column on Postgres.
+    """
+
+    __tablename__ = "chat_search"
+
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    chat_id = Column(Text, nullable=False)
+    message_id = Column(Text, nullable=False)
+
+    title = Column(Text, nullable=True)
+    content = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # WHERE chat_id = ... [AND message_id = ...]
+        Index("chat_search_chat_id_message_id_idx", "chat_id", "message_id"),
+    )
+
+
+def get_content_text(content) -> str:
+    """Text of a message content, which is either a string or a list of parts"""
+    if isinstance(content, str):
+        return content[:CHAT_SEARCH_MAX_CONTENT_LENGTH]
+
+    if isinstance(content, list):
+        return "\n".join(
+            part.get("text", "")
+            for part in content
+            if isinstance(part, dict) and part.get("type") == "text"
+        )[:CHAT_SEARCH_MAX_CONTENT_LENGTH]
+
+    return ""
+
+
+def get_chat_search_entries(chat: dict) -> list[tuple[str, Optional[str], str]]:
+    """(message_id, title, content) rows to index for a chat"""
+    entries = [("", chat.get("title", "New Chat"), "")]
+
+    messages = chat.get("history", {}).get("messages", {})
+    if not messages:
+        # Older chats only have the flat list of messages
+        messages = {
+            message.get("id", str(idx)): message
+            for idx, message in enumerate(chat.get("messages", []))
+            if isinstance(message, dict)
+        }
+
+    for message_id, message in messages.items():
+        content = get_content_text((message or {}).get("content"))
+        if content:
+            entries.append((message_id, None, content))
+
+    return entries
+
+
+class ChatSearchTable:
+    def _has_fts(self, db: Session) -> bool:
+        # The FTS5 table is missing when the SQLite build has no FTS5 support
+        if not hasattr(self, "_fts"):
+            self._fts = (
+                db.execute(
+                    text(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_search_fts'"
+                    )
+                ).first()
+                is not None
+            )
+        return self._fts
+
+    def index_chat(self, db: Session, chat_id: str, chat: dict) -> None:
+        """Replace the index entries of a chat, in the caller's transaction"""
+        db.query(ChatSearchEntry).filter_by(chat_id=chat_id).delete()
+        db.add_all(
+            [
+                ChatSearchEntry(
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    title=title,
+                    content=content,
+                )
+                for message_id, title, content in get_chat_search_entries(chat or {})
+            ]
+        )
+
+    def update_chat_index(
+        self, db: Session, chat_id: str, old_chat: dict, chat: dict
+    ) -> None:
+        """
+        Replace the index entries of the title and messages that changed between
+        two versions of a chat, in the caller's transaction
+        """
+        old_entries = {
+            message_id: (title, content)
+            for message_id, title, content in get_chat_search_entries(old_chat or {})
+        }
+        entries = {
+            message_id: (title, content)
+            for message_id, title, content in get_chat_search_entries(chat or {})
+        }
+
+        changed_ids = [
+            message_id
+            for message_id in old_entries.keys() | entries.keys()
+            if old_entries.get(message_id) != entries.get(message_id)
+        ]
+        if not changed_ids:
+            return
+
+        db.query(ChatSearchEntry).filter(
+            ChatSearchEntry.chat_id == chat_id,
+            ChatSearchEntry.message_id.in_(changed_ids),
+        ).delete(synchronize_session=False)
+        db.add_all(
+            [
+                ChatSearchEntry(
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    title=entries[message_id][0],
+                    content=entries[message_id][1],
+                )
+                for message_id in changed_ids
+                if message_id in entries
+            ]
+        )
+
+    def index_title(self, db: Session, chat_id: str, title: str) -> None:
+        """Replace the index entry of the title of a chat, in the caller's transaction"""
+        db.query(ChatSearchEntry).filter_by(chat_id=chat_id, message_id="").delete()
+        db.add(ChatSearchEntry(chat_id=chat_id, message_id="", title=title, content=""))
+
+    def index_message(
+        self, db: Session, chat_id: str, message_id: str, content
+    ) -> None:
+        """Replace the index entry of a single message, in the caller's transaction"""
+        db.query(ChatSearchEntry).filter_by(
+            chat_id=chat_id, message_id=message_id
+        ).delete()
+
+        content = get_content_text(content)
+        if content:
+            db.add(
+                ChatSearchEntry(chat_id=chat_id, message_id=message_id, content=content)
+            )
+
+    def delete_by_chat_ids(self, db: Session, chat_ids) -> None:
+        """Delete the index entries of the chats, chat_ids can be a list or a select"""
+        db.query(ChatSearchEntry).filter(ChatSearchEntry.chat_id.in_(chat_ids)).delete(
+            synchronize_session=False
+        )
+
+    def get_search_subquery(self, db: Session, search_text: str):
+        """
+        Subquery of (chat_id, rank) for the chats matching every word of search_text
+        as a prefix, in their title or any of their messages. A lower rank is a
+        better match.
+        """
+        words = re.findall(r"\w+", search_text.lower())
+        if not words:
+            return None
+
+        dialect_name = db.bind.dialect.name
+        if dialect_name == "sqlite" and self._has_fts(db):
+            # rank is the BM25 score with titles weighted over message content
+            select_sql = (
+                "SELECT chat_search.chat_id AS chat_id, "
+                "MIN(chat_search_fts.rank) AS rank "
+                "FROM chat_search_fts "
+                "JOIN chat_search ON chat_search.id = chat_search_fts.rowid "
+                "WHERE chat_search_fts MATCH :query"
+            )
+            word_sql = (
+                "SELECT chat_search.chat_id FROM chat_search_fts "
+                "JOIN chat_search ON chat_search.id = chat_search_fts.rowid "
+                "WHERE chat_search_fts MATCH :{param}"
+            )
+            params = {f"word_{idx}": f'"{word}"*' for idx, word in enumerate(words)}
+            params["query"] = " OR ".join(params.values())
+        elif dialect_name == "sqlite":
+            select_sql = (
+                "SELECT chat_search.chat_id AS chat_id, 0.0 AS rank "
+                "FROM chat_search WHERE ("
+                + " OR ".join(
+                    f"LOWER(title) LIKE :word_{idx} OR LOWER(content) LIKE :word_{idx}"
+                    for idx in range(len(words))
+                )
+                + ")"
+            )
+            word_sql = (
+                "SELECT chat_id FROM chat_search "
+                "WHERE LOWER(title) LIKE :{param} OR LOWER(content) LIKE :{param}"
+            )
+            params = {f"word_{idx}": f"%{word}%" for idx, word in enumerate(words)}
+        elif dialect_name == "postgresql":
+            select_sql = (
+                "SELECT chat_search.chat_id AS chat_id, "
+                "-MAX(ts_rank(tsv, query)) AS rank "
+                "FROM chat_search, to_tsquery('simple', :query) AS query "
+                "WHERE tsv @@ query"
+            )
+            word_sql = (
+                "SELECT chat_id FROM chat_search "
+                "WHERE tsv @@ to_tsquery('simple', :{param})"
+            )
+            params = {f"word_{idx}": f"{word}:*" for idx, word in enumerate(words)}
+            params["query"] = " | ".join(params.values())
+        else:
+            raise NotImplementedError(f"Unsupported dialect: {dialect_name}")
+
+        # The words may match in different messages of the chat
+        if len(words) > 1:
+            select_sql += "".join(
+                f" AND chat_search.chat_id IN ({word_sql.format(param=f'word_{idx}')})"
+                for idx in range(len(words))
+            )
+
+        query_sql = f"{select_sql} GROUP BY chat_search.chat_id"
+        return (
+            text(query_sql)
+            .bindparams(
+                **{
+                    key: value
+                    for key, value in params.items()
+                    if re.search(rf":{key}\b", query_sql)
+                }
+            )
+            .columns(chat_id=Text, rank=Float)
+            .subquery("chat_search_match")
+        )
+
+
+ChatSearch = ChatSearchTable()
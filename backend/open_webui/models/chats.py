@@ -1,19 +1,33 @@
 import logging
 import json
+import threading
 import time
 import uuid
 from typing import Optional
 
 from open_webui.internal.db import Base, get_db
+from open_webui.models.chat_search import ChatSearch
 from open_webui.models.tags import TagModel, Tag, Tags
 from open_webui.models.folders import Folders
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.env import (
+    CHAT_MESSAGE_DELTA_COMPACTION_THRESHOLD,
+    ENABLE_CHAT_MESSAGE_DELTA_LOG,
+    SRC_LOG_LEVELS,
+)
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON, Index
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Integer,
+    String,
+    Text,
+    JSON,
+    Index,
+)
 from sqlalchemy import or_, func, select, and_, text
 from sqlalchemy.sql import exists
-from sqlalchemy.sql.expression import bindparam
 
 ####################
 # Chat DB Schema
@@ -75,6 +89,42 @@ class ChatModel(BaseModel):
     folder_id: Optional[str] = None
 
 
+class ChatMessageDelta(Base):
+    __tablename__ = "chat_message_delta"
+
+    # Monotonic id, deltas are folded into the chat in id order
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    chat_id = Column(Text, nullable=False)
+    message_id = Column(Text, nullable=False)
+
+    # "message" merges data into the message, "status" appends data to its statusHistory
+    type = Column(Text, nullable=False)
+    data = Column(JSON, nullable=False)
+
+    created_at = Column(BigInteger)
+
+    __table_args__ = (
+        # WHERE chat_id = ... ORDER BY id
+        Index("chat_message_delta_chat_id_idx", "chat_id", "id"),
+    )
+
+
+class ChatMessageDeltaModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    chat_id: str
+    message_id: str
+    type: str
+    data: dict
+
+    created_at: int  # timestamp in epoch
+
+
 ####################
 # Forms
 ####################
@@ -123,6 +173,161 @@ class ChatTitleIdResponse(BaseModel):
 
 
 class ChatTable:
+    def __init__(self):
+        # Deltas pending per chat, for compaction without counting on every insert
+        self._delta_counts: dict[str, int] = {}
+        self._delta_counts_lock = threading.Lock()
+
+    def _apply_message_deltas(
+        self, chat: dict, deltas: list[ChatMessageDeltaModel]
+    ) -> dict:
+        if not deltas:
+            return chat
+
+        # Copy along the touched path only, the loaded row is left untouched
+        chat = {**chat}
+        history = {**chat.get("history", {})}
+        messages = {**history.get("messages", {})}
+
+        for delta in deltas:
+            if delta.type == "message":
+                messages[delta.message_id] = {
+                    **messages.get(delta.message_id, {}),
+                    **delta.data,
+                }
+                history["currentId"] = delta.message_id
+            elif delta.type == "status":
+                # The status may come before the message is first saved
+                message = {**messages.get(delta.message_id, {"id": delta.message_id})}
+                message["statusHistory"] = [
+                    *message.get("statusHistory", []),
+                    delta.data,
+                ]
+                messages[delta.message_id] = message
+
+        history["messages"] = messages
+        chat["history"] = history
+        return chat
+
+    def _get_message_deltas_by_chat_ids(
+        self, db, chat_ids: list[str]
+    ) -> dict[str, list[ChatMessageDeltaModel]]:
+        deltas = {}
+
+        # Batch the IN clause to stay below the bound parameter limits
+        for i in range(0, len(chat_ids), 500):
+            query = (
+                db.query(ChatMessageDelta)
+                .filter(ChatMessageDelta.chat_id.in_(chat_ids[i : i + 500]))
+                .order_by(ChatMessageDelta.id.asc())
+            )
+            for delta in query.all():
+                deltas.setdefault(delta.chat_id, []).append(
+                    ChatMessageDeltaModel.model_validate(delta)
+                )
+
+        return deltas
+
+    def _to_chat_models(self, db, chats) -> list[ChatModel]:
+        chats = list(chats)
+        deltas = (
+            self._get_message_deltas_by_chat_ids(db, [chat.id for chat in chats])
+            if ENABLE_CHAT_MESSAGE_DELTA_LOG
+            else {}
+        )
+
+        chat_models = []
+        for chat in chats:
+            chat_model = ChatModel.model_validate(chat)
+            if chat.id in deltas:
+                chat_model.chat = self._apply_message_deltas(
+                    chat_model.chat, deltas[chat.id]
+                )
+            chat_models.append(chat_model)
+
+        return chat_models
+
+    def _insert_message_delta(
+        self, id: str, message_id: str, type: str, data: dict
+    ) -> bool:
+        with get_db() as db:
+            # Touch the chat row without loading its JSON, this also checks it exists
+            updated = (
+                db.query(Chat).filter_by(id=id).update({"updated_at": int(time.time())})
+            )
+            if not updated:
+                return False
+
+            db.add(
+                ChatMessageDelta(
+                    chat_id=id,
+                    message_id=message_id,
+                    type=type,
+                    data=data,
+                    created_at=int(time.time()),
+                )
+            )
+            if type == "message" and "content" in data:
+                ChatSearch.index_message(db, id, message_id, data["content"])
+            db.commit()
+
+            with self._delta_counts_lock:
+                if id not in self._delta_counts:
+                    # Deltas left over from before this process, counted once
+                    self._delta_counts[id] = (
+                        db.query(ChatMessageDelta).filter_by(chat_id=id).count()
+                    )
+                else:
+                    self._delta_counts[id] += 1
+                count = self._delta_counts[id]
+
+        if count >= CHAT_MESSAGE_DELTA_COMPACTION_THRESHOLD:
+            self.compact_message_deltas_by_chat_id(id)
+
+        return True
+
+    def _reset_message_delta_count(self, id: str) -> None:
+        with self._delta_counts_lock:
+            self._delta_counts.pop(id, None)
+
+    def _delete_chat_data_by_chat_filter(self, db, *criteria) -> None:
+        # Message deltas and search index entries of the chats to be deleted
+        db.query(ChatMessageDelta).filter(
+            ChatMessageDelta.chat_id.in_(select(Chat.id).where(*criteria))
+        ).delete(synchronize_session=False)
+        ChatSearch.delete_by_chat_ids(db, select(Chat.id).where(*criteria))
+
+    def compact_message_deltas_by_chat_id(self, id: str) -> bool:
+        try:
+            with get_db() as db:
+                # Lock the chat row, a concurrent full write would otherwise be
+                # overwritten with the chat read here. Delta inserts touch the
+                # row first, so they wait for the deltas to be folded.
+                chat_item = (
+                    db.query(Chat).filter_by(id=id).with_for_update().one_or_none()
+                )
+                if chat_item is None:
+                    return False
+
+                deltas = self._get_message_deltas_by_chat_ids(db, [id]).get(id, [])
+                if not deltas:
+                    return True
+
+                chat_item.chat = self._apply_message_deltas(chat_item.chat, deltas)
+
+                # Only drop what was folded, deltas appended meanwhile are kept
+                db.query(ChatMessageDelta).filter(
+                    ChatMessageDelta.chat_id == id,
+                    ChatMessageDelta.id <= deltas[-1].id,
+                ).delete(synchronize_session=False)
+                db.commit()
+                self._reset_message_delta_count(id)
+
+                return True
+        except Exception as e:
+            log.exception(f"Error compacting message deltas for chat {id}: {e}")
+            return False
+
     def insert_new_chat(self, user_id: str, form_data: ChatForm) -> Optional[ChatModel]:
         with get_db() as db:
             id = str(uuid.uuid4())
@@ -144,6 +349,7 @@ class ChatTable:
 
             result = Chat(**chat.model_dump())
             db.add(result)
+            ChatSearch.index_chat(db, id, form_data.chat)
             db.commit()
             db.refresh(result)
             return ChatModel.model_validate(result) if result else None
@@ -181,19 +387,46 @@ class ChatTable:
 
             result = Chat(**chat.model_dump())
             db.add(result)
+            ChatSearch.index_chat(db, id, form_data.chat)
             db.commit()
             db.refresh(result)
             return ChatModel.model_validate(result) if result else None
 
-    def update_chat_by_id(self, id: str, chat: dict) -> Optional[ChatModel]:
+    def update_chat_by_id(
+        self, id: str, chat: dict, message_id: Optional[str] = None
+    ) -> Optional[ChatModel]:
+        """
+        Replace the data of a chat. message_id is the only message that changed,
+        if known, for the search index to be updated without comparing the
+        messages.
+        """
         try:
             with get_db() as db:
-                chat_item = db.get(Chat, id)
+                # Locked until the pending deltas are dropped, see compaction
+                chat_item = db.query(Chat).filter_by(id=id).with_for_update().one()
+                title = chat["title"] if "title" in chat else "New Chat"
+
+                if message_id is not None:
+                    message = (
+                        chat.get("history", {}).get("messages", {}).get(message_id)
+                    )
+                    ChatSearch.index_message(
+                        db, id, message_id, (message or {}).get("content")
+                    )
+                    if title != chat_item.title:
+                        ChatSearch.index_title(db, id, title)
+                else:
+                    ChatSearch.update_chat_index(db, id, chat_item.chat, chat)
+
                 chat_item.chat = chat
-                chat_item.title = chat["title"] if "title" in chat else "New Chat"
+                chat_item.title = title
                 chat_item.updated_at = int(time.time())
+
+                # The full chat supersedes any pending message deltas
+                db.query(ChatMessageDelta).filter_by(chat_id=id).delete()
                 db.commit()
                 db.refresh(chat_item)
+                self._reset_message_delta_count(id)
 
                 return ChatModel.model_validate(chat_item)
         except Exception:
@@ -246,6 +479,30 @@ class ChatTable:
     def get_message_by_id_and_message_id(
         self, id: str, message_id: str
     ) -> Optional[dict]:
+        if ENABLE_CHAT_MESSAGE_DELTA_LOG:
+            with get_db() as db:
+                # Extract the single message in the database instead of loading the chat
+                row = (
+                    db.query(Chat.chat[("history", "messages", message_id)])
+                    .filter(Chat.id == id)
+                    .first()
+                )
+                if row is None:
+                    return None
+
+                deltas = (
+                    db.query(ChatMessageDelta)
+                    .filter_by(chat_id=id, message_id=message_id)
+                    .order_by(ChatMessageDelta.id.asc())
+                    .all()
+                )
+                messages = {message_id: row[0]} if row[0] is not None else {}
+                chat = self._apply_message_deltas(
+                    {"history": {"messages": messages}},
+                    [ChatMessageDeltaModel.model_validate(delta) for delta in deltas],
+                )
+                return chat["history"]["messages"].get(message_id, {})
+
         chat = self.get_chat_by_id(id)
         if chat is None:
             return None
@@ -254,15 +511,18 @@ class ChatTable:
 
     def upsert_message_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, message: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
-
+    ) -> bool:
         # Sanitize message content for null characters before upserting
         if isinstance(message.get("content"), str):
             message["content"] = message["content"].replace("\x00", "")
 
+        if ENABLE_CHAT_MESSAGE_DELTA_LOG:
+            return self._insert_message_delta(id, message_id, "message", message)
+
+        chat = self.get_chat_by_id(id)
+        if chat is None:
+            return False
+
         chat = chat.chat
         history = chat.get("history", {})
 
@@ -277,14 +537,17 @@ class ChatTable:
         history["currentId"] = message_id
 
         chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+        return self.update_chat_by_id(id, chat, message_id=message_id) is not None
 
     def add_message_status_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, status: dict
-    ) -> Optional[ChatModel]:
+    ) -> bool:
+        if ENABLE_CHAT_MESSAGE_DELTA_LOG:
+            return self._insert_message_delta(id, message_id, "status", status)
+
         chat = self.get_chat_by_id(id)
         if chat is None:
-            return None
+            return False
 
         chat = chat.chat
         history = chat.get("history", {})
@@ -295,9 +558,11 @@ class ChatTable:
             history["messages"][message_id]["statusHistory"] = status_history
 
         chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+        return self.update_chat_by_id(id, chat, message_id=message_id) is not None
 
     def insert_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
+        self.compact_message_deltas_by_chat_id(chat_id)
+
         with get_db() as db:
             # Get the existing chat to share
             chat = db.get(Chat, chat_id)
@@ -333,6 +598,8 @@ class ChatTable:
             return shared_chat if (shared_result and result) else None
 
     def update_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
+        self.compact_message_deltas_by_chat_id(chat_id)
+
         try:
             with get_db() as db:
                 chat = db.get(Chat, chat_id)
@@ -384,7 +651,7 @@ class ChatTable:
                 chat.share_id = share_id
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -396,7 +663,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -408,7 +675,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -456,7 +723,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chat_list_by_user_id(
         self,
@@ -495,7 +762,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chat_title_id_list_by_user_id(
         self,
@@ -551,13 +818,13 @@ class ChatTable:
                 .order_by(Chat.updated_at.desc())
                 .all()
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chat_by_id(self, id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
                 chat = db.get(Chat, id)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -579,7 +846,7 @@ class ChatTable:
         try:
             with get_db() as db:
                 chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -590,7 +857,7 @@ class ChatTable:
                 # .limit(limit).offset(skip)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -599,7 +866,7 @@ class ChatTable:
                 .filter_by(user_id=user_id)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_pinned_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -608,7 +875,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, pinned=True, archived=False)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_archived_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -617,7 +884,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, archived=True)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_user_id_and_search_text(
         self,
@@ -628,7 +895,8 @@ class ChatTable:
         limit: int = 60,
     ) -> list[ChatModel]:
         """
-        Filters chats based on a search query using Python, allowing pagination using skip and limit.
+        Filters chats based on a search query, matching the words against the full-text
+        index of the chat titles and messages, allowing pagination using skip and limit.
         """
         search_text = search_text.replace("\u0000", "").lower().strip()
 
@@ -709,26 +977,18 @@ class ChatTable:
             if folder_ids:
                 query = query.filter(Chat.folder_id.in_(folder_ids))
 
-            query = query.order_by(Chat.updated_at.desc())
+            # Match the words against the full-text index, best ranked chats first
+            search_subquery = ChatSearch.get_search_subquery(db, search_text)
+            if search_subquery is not None:
+                query = query.join(
+                    search_subquery, search_subquery.c.chat_id == Chat.id
+                ).order_by(search_subquery.c.rank.asc(), Chat.updated_at.desc())
+            else:
+                query = query.order_by(Chat.updated_at.desc())
 
             # Check if the database dialect is either 'sqlite' or 'postgresql'
             dialect_name = db.bind.dialect.name
             if dialect_name == "sqlite":
-                # SQLite case: using JSON1 extension for JSON searching
-                sqlite_content_sql = (
-                    "EXISTS ("
-                    "    SELECT 1 "
-                    "    FROM json_each(Chat.chat, '$.messages') AS message "
-                    "    WHERE LOWER(message.value->>'content') LIKE '%' || :content_key || '%'"
-                    ")"
-                )
-                sqlite_content_clause = text(sqlite_content_sql)
-                query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")), sqlite_content_clause
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
-                )
-
                 # Check if there are any tags to filter, it should have all the tags
                 if "none" in tag_ids:
                     query = query.filter(
@@ -760,22 +1020,6 @@ class ChatTable:
                     )
 
             elif dialect_name == "postgresql":
-                # PostgreSQL relies on proper JSON query for search
-                postgres_content_sql = (
-                    "EXISTS ("
-                    "    SELECT 1 "
-                    "    FROM json_array_elements(Chat.chat->'messages') AS message "
-                    "    WHERE LOWER(message->>'content') LIKE '%' || :content_key || '%'"
-                    ")"
-                )
-                postgres_content_clause = text(postgres_content_sql)
-                query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")),
-                        postgres_content_clause,
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
-                )
-
                 # Check if there are any tags to filter, it should have all the tags
                 if "none" in tag_ids:
                     query = query.filter(
@@ -816,7 +1060,7 @@ class ChatTable:
             log.info(f"The number of chats: {len(all_chats)}")
 
             # Validate and return chats
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_folder_id_and_user_id(
         self, folder_id: str, user_id: str, skip: int = 0, limit: int = 60
@@ -834,7 +1078,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_folder_ids_and_user_id(
         self, folder_ids: list[str], user_id: str
@@ -849,7 +1093,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def update_chat_folder_id_by_id_and_user_id(
         self, id: str, user_id: str, folder_id: str
@@ -862,7 +1106,7 @@ class ChatTable:
                 chat.pinned = False
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -901,7 +1145,7 @@ class ChatTable:
 
             all_chats = query.all()
             log.debug(f"all_chats: {all_chats}")
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def add_chat_tag_by_id_and_user_id_and_tag_name(
         self, id: str, user_id: str, tag_name: str
@@ -922,7 +1166,7 @@ class ChatTable:
 
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -1008,8 +1252,11 @@ class ChatTable:
     def delete_chat_by_id(self, id: str) -> bool:
         try:
             with get_db() as db:
+                db.query(ChatMessageDelta).filter_by(chat_id=id).delete()
+                ChatSearch.delete_by_chat_ids(db, [id])
                 db.query(Chat).filter_by(id=id).delete()
                 db.commit()
+                self._reset_message_delta_count(id)
 
                 return True and self.delete_shared_chat_by_chat_id(id)
         except Exception:
@@ -1018,6 +1265,9 @@ class ChatTable:
     def delete_chat_by_id_and_user_id(self, id: str, user_id: str) -> bool:
         try:
             with get_db() as db:
+                self._delete_chat_data_by_chat_filter(
+                    db, Chat.id == id, Chat.user_id == user_id
+                )
                 db.query(Chat).filter_by(id=id, user_id=user_id).delete()
                 db.commit()
 
@@ -1030,6 +1280,7 @@ class ChatTable:
             with get_db() as db:
                 self.delete_shared_chats_by_user_id(user_id)
 
+                self._delete_chat_data_by_chat_filter(db, Chat.user_id == user_id)
                 db.query(Chat).filter_by(user_id=user_id).delete()
                 db.commit()
 
@@ -1042,6 +1293,9 @@ class ChatTable:
     ) -> bool:
         try:
             with get_db() as db:
+                self._delete_chat_data_by_chat_filter(
+                    db, Chat.user_id == user_id, Chat.folder_id == folder_id
+                )
                 db.query(Chat).filter_by(user_id=user_id, folder_id=folder_id).delete()
                 db.commit()
 
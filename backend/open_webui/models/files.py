@@ -4,6 +4,7 @@ from typing import Optional
 
 from open_webui.internal.db import Base, JSONField, get_db
 from open_webui.env import SRC_LOG_LEVELS
+from open_webui.utils.events import EVENT_BUS
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
@@ -216,7 +217,20 @@ class FilesTable:
                 file = db.query(File).filter_by(id=id).first()
                 file.data = {**(file.data if file.data else {}), **data}
                 db.commit()
-                return FileModel.model_validate(file)
+                file = FileModel.model_validate(file)
+
+                # Changes of the processing state, for the subscribers of the file
+                status = {
+                    key: data[key]
+                    for key in ("status", "progress", "error")
+                    if key in data
+                }
+                if status:
+                    EVENT_BUS.publish(
+                        f"file:{id}",
+                        {"type": "file", "user_id": file.user_id, "data": status},
+                    )
+                return file
             except Exception as e:
 
                 return None
@@ -4,6 +4,7 @@ from typing import Optional
 
 from open_webui.internal.db import Base, JSONField, get_db
 from open_webui.models.users import Users
+from open_webui.utils.invalidation import INVALIDATION_BUS
 from open_webui.env import SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Boolean, Column, String, Text, Index
@@ -119,6 +120,7 @@ class FunctionsTable:
                 db.add(result)
                 db.commit()
                 db.refresh(result)
+                INVALIDATION_BUS.invalidate("function", result.id)
                 if result:
                     return FunctionModel.model_validate(result)
                 else:
@@ -166,6 +168,7 @@ class FunctionsTable:
                         db.delete(func)
 
                 db.commit()
+                INVALIDATION_BUS.invalidate("function")
 
                 return [
                     FunctionModel.model_validate(func)
@@ -175,13 +178,26 @@ class FunctionsTable:
             log.exception(f"Error syncing functions for user {user_id}: {e}")
             return []
 
+    def _get_cached_function_by_id(
+        self, id: str
+    ) -> Optional[tuple[FunctionModel, dict]]:
+        # Read by every chat request, the cached row is dropped whenever it changes
+        def load():
+            try:
+                with get_db() as db:
+                    function = db.get(Function, id)
+                    return (
+                        FunctionModel.model_validate(function),
+                        function.valves if function.valves else {},
+                    )
+            except Exception:
+                return None
+
+        return INVALIDATION_BUS.get("function", id, load)
+
     def get_function_by_id(self, id: str) -> Optional[FunctionModel]:
-        try:
-            with get_db() as db:
-                function = db.get(Function, id)
-                return FunctionModel.model_validate(function)
-        except Exception:
-            return None
+        cached = self._get_cached_function_by_id(id)
+        return cached[0].model_copy() if cached else None
 
     def get_functions(
         self, active_only=False, include_valves=False
@@ -239,13 +255,11 @@ class FunctionsTable:
             ]
 
     def get_function_valves_by_id(self, id: str) -> Optional[dict]:
-        with get_db() as db:
-            try:
-                function = db.get(Function, id)
-                return function.valves if function.valves else {}
-            except Exception as e:
-                log.exception(f"Error getting function valves by id {id}: {e}")
-                return None
+        cached = self._get_cached_function_by_id(id)
+        if cached is None:
+            log.error(f"Error getting function valves by id {id}")
+            return None
+        return {**cached[1]}
 
     def update_function_valves_by_id(
         self, id: str, valves: dict
@@ -257,6 +271,7 @@ class FunctionsTable:
                 function.updated_at = int(time.time())
                 db.commit()
                 db.refresh(function)
+                INVALIDATION_BUS.invalidate("function", id)
                 return self.get_function_by_id(id)
             except Exception:
                 return None
@@ -277,6 +292,7 @@ class FunctionsTable:
                     function.updated_at = int(time.time())
                     db.commit()
                     db.refresh(function)
+                    INVALIDATION_BUS.invalidate("function", id)
                     return self.get_function_by_id(id)
                 else:
                     return None
@@ -337,6 +353,7 @@ class FunctionsTable:
                     }
                 )
                 db.commit()
+                INVALIDATION_BUS.invalidate("function", id)
                 return self.get_function_by_id(id)
             except Exception:
                 return None
@@ -351,6 +368,7 @@ class FunctionsTable:
                     }
                 )
                 db.commit()
+                INVALIDATION_BUS.invalidate("function")
                 return True
             except Exception:
                 return None
@@ -360,6 +378,7 @@ class FunctionsTable:
             try:
                 db.query(Function).filter_by(id=id).delete()
                 db.commit()
+                INVALIDATION_BUS.invalidate("function", id)
 
                 return True
             except Exception:
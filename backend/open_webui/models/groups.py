@@ -7,11 +7,13 @@ import uuid
 from open_webui.internal.db import Base, get_db
 from open_webui.env import SRC_LOG_LEVELS
 
+from open_webui.models.access_grants import AccessGrants
 from open_webui.models.files import FileMetadataResponse
+from open_webui.utils.invalidation import INVALIDATION_BUS
 
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON, func
+from sqlalchemy import BigInteger, Column, Text, JSON
 
 
 log = logging.getLogger(__name__)
@@ -109,7 +111,9 @@ class GroupTable:
             try:
                 result = Group(**group.model_dump())
                 db.add(result)
+                AccessGrants.set_group_members(db, group.id, group.user_ids)
                 db.commit()
+                INVALIDATION_BUS.invalidate("group")
                 db.refresh(result)
                 if result:
                     return GroupModel.model_validate(result)
@@ -131,12 +135,7 @@ class GroupTable:
             return [
                 GroupModel.model_validate(group)
                 for group in db.query(Group)
-                .filter(
-                    func.json_array_length(Group.user_ids) > 0
-                )  # Ensure array exists
-                .filter(
-                    Group.user_ids.cast(String).like(f'%"{user_id}"%')
-                )  # String-based check
+                .filter(Group.id.in_(AccessGrants.get_group_ids_subquery(user_id)))
                 .order_by(Group.updated_at.desc())
                 .all()
             ]
@@ -167,7 +166,10 @@ class GroupTable:
                         "updated_at": int(time.time()),
                     }
                 )
+                if form_data.user_ids is not None:
+                    AccessGrants.set_group_members(db, id, form_data.user_ids)
                 db.commit()
+                INVALIDATION_BUS.invalidate("group")
                 return self.get_group_by_id(id=id)
         except Exception as e:
             log.exception(e)
@@ -177,7 +179,9 @@ class GroupTable:
         try:
             with get_db() as db:
                 db.query(Group).filter_by(id=id).delete()
+                AccessGrants.delete_group_members(db, [id])
                 db.commit()
+                INVALIDATION_BUS.invalidate("group")
                 return True
         except Exception:
             return False
@@ -186,7 +190,9 @@ class GroupTable:
         with get_db() as db:
             try:
                 db.query(Group).delete()
+                AccessGrants.delete_group_members(db)
                 db.commit()
+                INVALIDATION_BUS.invalidate("group")
 
                 return True
             except Exception:
@@ -205,7 +211,9 @@ class GroupTable:
                             "updated_at": int(time.time()),
                         }
                     )
+                    AccessGrants.set_group_members(db, group.id, group.user_ids)
                     db.commit()
+                    INVALIDATION_BUS.invalidate("group")
 
                 return True
             except Exception:
@@ -261,6 +269,7 @@ class GroupTable:
                                 "updated_at": int(time.time()),
                             }
                         )
+                        AccessGrants.set_group_members(db, group.id, group.user_ids)
 
                 # Add user to new groups
                 for group in groups:
@@ -272,8 +281,10 @@ class GroupTable:
                                 "updated_at": int(time.time()),
                             }
                         )
+                        AccessGrants.set_group_members(db, group.id, group.user_ids)
 
                 db.commit()
+                INVALIDATION_BUS.invalidate("group")
                 return True
             except Exception as e:
                 log.exception(e)
@@ -300,7 +311,9 @@ class GroupTable:
 
                 group.user_ids = group_user_ids
                 group.updated_at = int(time.time())
+                AccessGrants.set_group_members(db, id, group_user_ids)
                 db.commit()
+                INVALIDATION_BUS.invalidate("group")
                 db.refresh(group)
                 return GroupModel.model_validate(group)
         except Exception as e:
@@ -329,8 +342,10 @@ class GroupTable:
 
                 group.user_ids = group_user_ids
                 group.updated_at = int(time.time())
+                AccessGrants.set_group_members(db, id, group_user_ids)
 
                 db.commit()
+                INVALIDATION_BUS.invalidate("group")
                 db.refresh(group)
                 return GroupModel.model_validate(group)
         except Exception as e:
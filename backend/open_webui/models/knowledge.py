@@ -7,8 +7,8 @@ import uuid
 from open_webui.internal.db import Base, get_db
 from open_webui.env import SRC_LOG_LEVELS
 
+from open_webui.models.access_grants import AccessGrants
 from open_webui.models.files import FileMetadataResponse
-from open_webui.models.groups import Groups
 from open_webui.models.users import Users, UserResponse
 
 
@@ -118,6 +118,9 @@ class KnowledgeTable:
             try:
                 result = Knowledge(**knowledge.model_dump())
                 db.add(result)
+                AccessGrants.set_access_control(
+                    db, "knowledge", knowledge.id, knowledge.access_control
+                )
                 db.commit()
                 db.refresh(result)
                 if result:
@@ -127,10 +130,13 @@ class KnowledgeTable:
             except Exception:
                 return None
 
-    def get_knowledge_bases(self) -> list[KnowledgeUserModel]:
+    def get_knowledge_bases(self, *filters) -> list[KnowledgeUserModel]:
         with get_db() as db:
             all_knowledge = (
-                db.query(Knowledge).order_by(Knowledge.updated_at.desc()).all()
+                db.query(Knowledge)
+                .filter(*filters)
+                .order_by(Knowledge.updated_at.desc())
+                .all()
             )
 
             user_ids = list(set(knowledge.user_id for knowledge in all_knowledge))
@@ -157,22 +163,16 @@ class KnowledgeTable:
             return False
         if knowledge.user_id == user_id:
             return True
-        user_group_ids = {group.id for group in Groups.get_groups_by_member_id(user_id)}
-        return has_access(user_id, permission, knowledge.access_control, user_group_ids)
+        return has_access(user_id, permission, knowledge.access_control)
 
     def get_knowledge_bases_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[KnowledgeUserModel]:
-        knowledge_bases = self.get_knowledge_bases()
-        user_group_ids = {group.id for group in Groups.get_groups_by_member_id(user_id)}
-        return [
-            knowledge_base
-            for knowledge_base in knowledge_bases
-            if knowledge_base.user_id == user_id
-            or has_access(
-                user_id, permission, knowledge_base.access_control, user_group_ids
+        return self.get_knowledge_bases(
+            AccessGrants.get_access_filter(
+                "knowledge", Knowledge.id, Knowledge.user_id, user_id, permission
             )
-        ]
+        )
 
     def get_knowledge_by_id(self, id: str) -> Optional[KnowledgeModel]:
         try:
@@ -194,6 +194,9 @@ class KnowledgeTable:
                         "updated_at": int(time.time()),
                     }
                 )
+                AccessGrants.set_access_control(
+                    db, "knowledge", id, form_data.access_control
+                )
                 db.commit()
                 return self.get_knowledge_by_id(id=id)
         except Exception as e:
@@ -222,6 +225,7 @@ class KnowledgeTable:
         try:
             with get_db() as db:
                 db.query(Knowledge).filter_by(id=id).delete()
+                AccessGrants.delete_by_resource_ids(db, "knowledge", [id])
                 db.commit()
                 return True
         except Exception:
@@ -231,6 +235,7 @@ class KnowledgeTable:
         with get_db() as db:
             try:
                 db.query(Knowledge).delete()
+                AccessGrants.delete_by_resource_ids(db, "knowledge")
                 db.commit()
 
                 return True
@@ -5,8 +5,9 @@ from typing import Optional
 from open_webui.internal.db import Base, JSONField, get_db
 from open_webui.env import SRC_LOG_LEVELS
 
-from open_webui.models.groups import Groups
+from open_webui.models.access_grants import AccessGrants
 from open_webui.models.users import Users, UserResponse
+from open_webui.utils.invalidation import INVALIDATION_BUS
 
 
 from pydantic import BaseModel, ConfigDict
@@ -16,9 +17,6 @@ from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy import BigInteger, Column, Text, JSON, Boolean
 
 
-from open_webui.utils.access_control import has_access
-
-
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
 
@@ -159,8 +157,12 @@ class ModelsTable:
             with get_db() as db:
                 result = Model(**model.model_dump())
                 db.add(result)
+                AccessGrants.set_access_control(
+                    db, "model", model.id, model.access_control
+                )
                 db.commit()
                 db.refresh(result)
+                INVALIDATION_BUS.invalidate("model", result.id)
 
                 if result:
                     return ModelModel.model_validate(result)
@@ -174,9 +176,11 @@ class ModelsTable:
         with get_db() as db:
             return [ModelModel.model_validate(model) for model in db.query(Model).all()]
 
-    def get_models(self) -> list[ModelUserResponse]:
+    def get_models(self, *filters) -> list[ModelUserResponse]:
         with get_db() as db:
-            all_models = db.query(Model).filter(Model.base_model_id != None).all()
+            all_models = (
+                db.query(Model).filter(Model.base_model_id != None, *filters).all()
+            )
 
             user_ids = list(set(model.user_id for model in all_models))
 
@@ -206,14 +210,11 @@ class ModelsTable:
     def get_models_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[ModelUserResponse]:
-        models = self.get_models()
-        user_group_ids = {group.id for group in Groups.get_groups_by_member_id(user_id)}
-        return [
-            model
-            for model in models
-            if model.user_id == user_id
-            or has_access(user_id, permission, model.access_control, user_group_ids)
-        ]
+        return self.get_models(
+            AccessGrants.get_access_filter(
+                "model", Model.id, Model.user_id, user_id, permission
+            )
+        )
 
     def get_model_by_id(self, id: str) -> Optional[ModelModel]:
         try:
@@ -235,6 +236,7 @@ class ModelsTable:
                     }
                 )
                 db.commit()
+                INVALIDATION_BUS.invalidate("model", id)
 
                 return self.get_model_by_id(id)
             except Exception:
@@ -249,7 +251,9 @@ class ModelsTable:
                     .filter_by(id=id)
                     .update(model.model_dump(exclude={"id"}))
                 )
+                AccessGrants.set_access_control(db, "model", id, model.access_control)
                 db.commit()
+                INVALIDATION_BUS.invalidate("model", id)
 
                 model = db.get(Model, id)
                 db.refresh(model)
@@ -262,7 +266,9 @@ class ModelsTable:
         try:
             with get_db() as db:
                 db.query(Model).filter_by(id=id).delete()
+                AccessGrants.delete_by_resource_ids(db, "model", [id])
                 db.commit()
+                INVALIDATION_BUS.invalidate("model", id)
 
                 return True
         except Exception:
@@ -272,7 +278,9 @@ class ModelsTable:
         try:
             with get_db() as db:
                 db.query(Model).delete()
+                AccessGrants.delete_by_resource_ids(db, "model")
                 db.commit()
+                INVALIDATION_BUS.invalidate("model")
 
                 return True
         except Exception:
@@ -307,13 +315,26 @@ class ModelsTable:
                             }
                         )
                         db.add(new_model)
+                    AccessGrants.set_access_control(
+                        db, "model", model.id, model.access_control
+                    )
 
                 # Remove models that are no longer present
                 for model in existing_models:
                     if model.id not in new_model_ids:
                         db.delete(model)
+                AccessGrants.delete_by_resource_ids(
+                    db,
+                    "model",
+                    [
+                        model.id
+                        for model in existing_models
+                        if model.id not in new_model_ids
+                    ],
+                )
 
                 db.commit()
+                INVALIDATION_BUS.invalidate("model")
 
                 return [
                     ModelModel.model_validate(model) for model in db.query(Model).all()
@@ -5,8 +5,7 @@ from typing import Optional
 from functools import lru_cache
 
 from open_webui.internal.db import Base, get_db
-from open_webui.models.groups import Groups
-from open_webui.utils.access_control import has_access
+from open_webui.models.access_grants import AccessGrants
 from open_webui.models.users import Users, UserResponse
 
 
@@ -95,6 +94,7 @@ class NoteTable:
             new_note = Note(**note.model_dump())
 
             db.add(new_note)
+            AccessGrants.set_access_control(db, "note", note.id, note.access_control)
             db.commit()
             return note
 
@@ -136,47 +136,22 @@ class NoteTable:
         limit: Optional[int] = None,
     ) -> list[NoteModel]:
         with get_db() as db:
-            user_groups = Groups.get_groups_by_member_id(user_id)
-            user_group_ids = {group.id for group in user_groups}
-
-            # Order newest-first. We stream to keep memory usage low.
             query = (
                 db.query(Note)
+                .filter(
+                    AccessGrants.get_access_filter(
+                        "note", Note.id, Note.user_id, user_id, permission
+                    )
+                )
                 .order_by(Note.updated_at.desc())
-                .execution_options(stream_results=True)
-                .yield_per(256)
             )
 
-            results: list[NoteModel] = []
-            n_skipped = 0
-
-            for note in query:
-                # Fast-pass #1: owner
-                if note.user_id == user_id:
-                    permitted = True
-                # Fast-pass #2: public/open
-                elif note.access_control is None:
-                    # Technically this should mean public access for both read and write, but we'll only do read for now
-                    # We might want to change this behavior later
-                    permitted = permission == "read"
-                else:
-                    permitted = has_access(
-                        user_id, permission, note.access_control, user_group_ids
-                    )
-
-                if not permitted:
-                    continue
-
-                # Apply skip AFTER permission filtering so it counts only accessible notes
-                if skip and n_skipped < skip:
-                    n_skipped += 1
-                    continue
-
-                results.append(NoteModel.model_validate(note))
-                if limit is not None and len(results) >= limit:
-                    break
+            if skip is not None:
+                query = query.offset(skip)
+            if limit is not None:
+                query = query.limit(limit)
 
-            return results
+            return [NoteModel.model_validate(note) for note in query.all()]
 
     def get_note_by_id(self, id: str) -> Optional[NoteModel]:
         with get_db() as db:
@@ -202,6 +177,9 @@ class NoteTable:
 
             if "access_control" in form_data:
                 note.access_control = form_data["access_control"]
+                AccessGrants.set_access_control(
+                    db, "note", id, form_data["access_control"]
+                )
 
             note.updated_at = int(time.time_ns())
 
@@ -211,6 +189,7 @@ class NoteTable:
     def delete_note_by_id(self, id: str):
         with get_db() as db:
             db.query(Note).filter(Note.id == id).delete()
+            AccessGrants.delete_by_resource_ids(db, "note", [id])
             db.commit()
             return True
 
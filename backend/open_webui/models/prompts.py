@@ -2,14 +2,12 @@ import time
 from typing import Optional
 
 from open_webui.internal.db import Base, get_db
-from open_webui.models.groups import Groups
+from open_webui.models.access_grants import AccessGrants
 from open_webui.models.users import Users, UserResponse
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
-from open_webui.utils.access_control import has_access
-
 ####################
 # Prompts DB Schema
 ####################
@@ -85,6 +83,9 @@ class PromptsTable:
             with get_db() as db:
                 result = Prompt(**prompt.model_dump())
                 db.add(result)
+                AccessGrants.set_access_control(
+                    db, "prompt", prompt.command, prompt.access_control
+                )
                 db.commit()
                 db.refresh(result)
                 if result:
@@ -102,9 +103,14 @@ class PromptsTable:
         except Exception:
             return None
 
-    def get_prompts(self) -> list[PromptUserResponse]:
+    def get_prompts(self, *filters) -> list[PromptUserResponse]:
         with get_db() as db:
-            all_prompts = db.query(Prompt).order_by(Prompt.timestamp.desc()).all()
+            all_prompts = (
+                db.query(Prompt)
+                .filter(*filters)
+                .order_by(Prompt.timestamp.desc())
+                .all()
+            )
 
             user_ids = list(set(prompt.user_id for prompt in all_prompts))
 
@@ -128,15 +134,11 @@ class PromptsTable:
     def get_prompts_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[PromptUserResponse]:
-        prompts = self.get_prompts()
-        user_group_ids = {group.id for group in Groups.get_groups_by_member_id(user_id)}
-
-        return [
-            prompt
-            for prompt in prompts
-            if prompt.user_id == user_id
-            or has_access(user_id, permission, prompt.access_control, user_group_ids)
-        ]
+        return self.get_prompts(
+            AccessGrants.get_access_filter(
+                "prompt", Prompt.command, Prompt.user_id, user_id, permission
+            )
+        )
 
     def update_prompt_by_command(
         self, command: str, form_data: PromptForm
@@ -148,6 +150,9 @@ class PromptsTable:
                 prompt.content = form_data.content
                 prompt.access_control = form_data.access_control
                 prompt.timestamp = int(time.time())
+                AccessGrants.set_access_control(
+                    db, "prompt", command, form_data.access_control
+                )
                 db.commit()
                 return PromptModel.model_validate(prompt)
         except Exception:
@@ -157,6 +162,7 @@ class PromptsTable:
         try:
             with get_db() as db:
                 db.query(Prompt).filter_by(command=command).delete()
+                AccessGrants.delete_by_resource_ids(db, "prompt", [command])
                 db.commit()
 
                 return True
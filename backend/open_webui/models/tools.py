@@ -3,14 +3,14 @@ import time
 from typing import Optional
 
 from open_webui.internal.db import Base, JSONField, get_db
+from open_webui.models.access_grants import AccessGrants
 from open_webui.models.users import Users, UserResponse
-from open_webui.models.groups import Groups
 
 from open_webui.env import SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
-from open_webui.utils.access_control import has_access
+from open_webui.utils.invalidation import INVALIDATION_BUS
 
 
 log = logging.getLogger(__name__)
@@ -128,8 +128,12 @@ class ToolsTable:
             try:
                 result = Tool(**tool.model_dump())
                 db.add(result)
+                AccessGrants.set_access_control(
+                    db, "tool", tool.id, tool.access_control
+                )
                 db.commit()
                 db.refresh(result)
+                INVALIDATION_BUS.invalidate("tool", result.id)
                 if result:
                     return ToolModel.model_validate(result)
                 else:
@@ -138,17 +142,30 @@ class ToolsTable:
                 log.exception(f"Error creating a new tool: {e}")
                 return None
 
+    def _get_cached_tool_by_id(self, id: str) -> Optional[tuple[ToolModel, dict]]:
+        # Read by every chat request, the cached row is dropped whenever it changes
+        def load():
+            try:
+                with get_db() as db:
+                    tool = db.get(Tool, id)
+                    return (
+                        ToolModel.model_validate(tool),
+                        tool.valves if tool.valves else {},
+                    )
+            except Exception:
+                return None
+
+        return INVALIDATION_BUS.get("tool", id, load)
+
     def get_tool_by_id(self, id: str) -> Optional[ToolModel]:
-        try:
-            with get_db() as db:
-                tool = db.get(Tool, id)
-                return ToolModel.model_validate(tool)
-        except Exception:
-            return None
+        cached = self._get_cached_tool_by_id(id)
+        return cached[0].model_copy() if cached else None
 
-    def get_tools(self) -> list[ToolUserModel]:
+    def get_tools(self, *filters) -> list[ToolUserModel]:
         with get_db() as db:
-            all_tools = db.query(Tool).order_by(Tool.updated_at.desc()).all()
+            all_tools = (
+                db.query(Tool).filter(*filters).order_by(Tool.updated_at.desc()).all()
+            )
 
             user_ids = list(set(tool.user_id for tool in all_tools))
 
@@ -171,24 +188,18 @@ class ToolsTable:
     def get_tools_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[ToolUserModel]:
-        tools = self.get_tools()
-        user_group_ids = {group.id for group in Groups.get_groups_by_member_id(user_id)}
-
-        return [
-            tool
-            for tool in tools
-            if tool.user_id == user_id
-            or has_access(user_id, permission, tool.access_control, user_group_ids)
-        ]
+        return self.get_tools(
+            AccessGrants.get_access_filter(
+                "tool", Tool.id, Tool.user_id, user_id, permission
+            )
+        )
 
     def get_tool_valves_by_id(self, id: str) -> Optional[dict]:
-        try:
-            with get_db() as db:
-                tool = db.get(Tool, id)
-                return tool.valves if tool.valves else {}
-        except Exception as e:
-            log.exception(f"Error getting tool valves by id {id}")
+        cached = self._get_cached_tool_by_id(id)
+        if cached is None:
+            log.error(f"Error getting tool valves by id {id}")
             return None
+        return {**cached[1]}
 
     def update_tool_valves_by_id(self, id: str, valves: dict) -> Optional[ToolValves]:
         try:
@@ -197,6 +208,7 @@ class ToolsTable:
                     {"valves": valves, "updated_at": int(time.time())}
                 )
                 db.commit()
+                INVALIDATION_BUS.invalidate("tool", id)
                 return self.get_tool_by_id(id)
         except Exception:
             return None
@@ -252,7 +264,12 @@ class ToolsTable:
                 db.query(Tool).filter_by(id=id).update(
                     {**updated, "updated_at": int(time.time())}
                 )
+                if "access_control" in updated:
+                    AccessGrants.set_access_control(
+                        db, "tool", id, updated["access_control"]
+                    )
                 db.commit()
+                INVALIDATION_BUS.invalidate("tool", id)
 
                 tool = db.query(Tool).get(id)
                 db.refresh(tool)
@@ -264,7 +281,9 @@ class ToolsTable:
         try:
             with get_db() as db:
                 db.query(Tool).filter_by(id=id).delete()
+                AccessGrants.delete_by_resource_ids(db, "tool", [id])
                 db.commit()
+                INVALIDATION_BUS.invalidate("tool", id)
 
                 return True
         except Exception:
@@ -8,11 +8,12 @@ from open_webui.env import DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL
 from open_webui.models.chats import Chats
 from open_webui.models.groups import Groups
 from open_webui.utils.misc import throttle
+from open_webui.utils.invalidation import INVALIDATION_BUS
 
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, Date
-from sqlalchemy import or_
+from sqlalchemy import bindparam, or_
 
 import datetime
 
@@ -327,6 +328,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"role": role})
                 db.commit()
+                INVALIDATION_BUS.invalidate("user", id)
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
         except Exception:
@@ -341,6 +343,7 @@ class UsersTable:
                     {"profile_image_url": profile_image_url}
                 )
                 db.commit()
+                INVALIDATION_BUS.invalidate("user", id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -361,6 +364,25 @@ class UsersTable:
         except Exception:
             return None
 
+    def update_users_last_active(self, last_active: dict[str, int]) -> None:
+        """Write the last active times of users by id, in a single batch"""
+        if not last_active:
+            return
+
+        with get_db() as db:
+            # Executed as one statement for all the users, the deleted ones
+            # matching no row
+            db.execute(
+                User.__table__.update()
+                .where(User.__table__.c.id == bindparam("_id"))
+                .values(last_active_at=bindparam("_last_active_at")),
+                [
+                    {"_id": id, "_last_active_at": last_active_at}
+                    for id, last_active_at in last_active.items()
+                ],
+            )
+            db.commit()
+
     def update_user_oauth_sub_by_id(
         self, id: str, oauth_sub: str
     ) -> Optional[UserModel]:
@@ -368,6 +390,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"oauth_sub": oauth_sub})
                 db.commit()
+                INVALIDATION_BUS.invalidate("user", id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -379,6 +402,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update(updated)
                 db.commit()
+                INVALIDATION_BUS.invalidate("user", id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -399,6 +423,7 @@ class UsersTable:
 
                 db.query(User).filter_by(id=id).update({"settings": user_settings})
                 db.commit()
+                INVALIDATION_BUS.invalidate("user", id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -417,6 +442,7 @@ class UsersTable:
                     # Delete User
                     db.query(User).filter_by(id=id).delete()
                     db.commit()
+                INVALIDATION_BUS.invalidate("user", id)
 
                 return True
             else:
@@ -429,6 +455,7 @@ class UsersTable:
             with get_db() as db:
                 result = db.query(User).filter_by(id=id).update({"api_key": api_key})
                 db.commit()
+                INVALIDATION_BUS.invalidate("user", id)
                 return True if result == 1 else False
         except Exception:
             return False
@@ -0,0 +1,470 @@
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import shutil
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from typing import Optional
+
+import numpy as np
+from filelock import FileLock
+from langchain_core.documents import Document
+
+from open_webui.config import RAG_BM25_INDEX_DIR
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# Okapi BM25 parameters, the same defaults as rank_bm25.BM25Okapi
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Segments are merged once a collection has more of them, or once this
+# fraction of its documents is deleted
+MAX_SEGMENTS = 8
+MAX_DELETED_RATIO = 0.25
+
+MAX_CACHED_SEGMENTS = 256
+
+
+def tokenize(text: str) -> list[str]:
+    # Same as the default preprocessing of langchain's BM25Retriever
+    return text.split()
+
+
+class BM25Segment:
+    """
+    Immutable, memory-mapped part of a collection index. Only the deleted
+    mask of a segment is ever rewritten.
+
+    Files of a segment directory:
+        vocab.json          sorted list of terms
+        offsets.npy         int64, postings of term i are [offsets[i], offsets[i + 1])
+        postings.npy        int32, document number of each posting
+        tfs.npy             int32, term frequency of each posting
+        doc_lens.npy        int32, number of tokens of each document
+        docs.bin            one json object {id, text, metadata} per document
+        doc_offsets.npy     int64, document i is docs.bin[doc_offsets[i]:doc_offsets[i + 1]]
+        deleted.npy         bool, tombstones of deleted documents
+        meta.json           {"count": int, "file_ids": list}
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(os.path.join(path, "vocab.json"), "r") as f:
+            self.vocab = {term: idx for idx, term in enumerate(json.load(f))}
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.postings = np.load(os.path.join(path, "postings.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+        self.doc_lens = np.load(os.path.join(path, "doc_lens.npy"), mmap_mode="r")
+        self.doc_offsets = np.load(os.path.join(path, "doc_offsets.npy"), mmap_mode="r")
+
+        self._docs_file = open(os.path.join(path, "docs.bin"), "rb")
+        self._docs = (
+            mmap.mmap(self._docs_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if os.path.getsize(os.path.join(path, "docs.bin")) > 0
+            else b""
+        )
+
+        self._ids = None
+        self._deleted = None
+        self._deleted_mtime = None
+
+    @property
+    def count(self) -> int:
+        return len(self.doc_lens)
+
+    @property
+    def deleted(self) -> np.ndarray:
+        deleted_path = os.path.join(self.path, "deleted.npy")
+        mtime = os.stat(deleted_path).st_mtime_ns
+        if self._deleted is None or mtime != self._deleted_mtime:
+            self._deleted = np.load(deleted_path)
+            self._deleted_mtime = mtime
+        return self._deleted
+
+    @property
+    def ids(self) -> dict[str, int]:
+        if self._ids is None:
+            self._ids = {self.get_doc(idx)["id"]: idx for idx in range(self.count)}
+        return self._ids
+
+    def get_doc(self, idx: int) -> dict:
+        return json.loads(
+            self._docs[int(self.doc_offsets[idx]) : int(self.doc_offsets[idx + 1])]
+        )
+
+    def get_term_postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        idx = self.vocab.get(term)
+        if idx is None:
+            return self.postings[0:0], self.tfs[0:0]
+
+        start, end = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        return self.postings[start:end], self.tfs[start:end]
+
+    def close(self):
+        if isinstance(self._docs, mmap.mmap):
+            self._docs.close()
+        self._docs_file.close()
+
+    @staticmethod
+    def write(path: str, items: list[dict]):
+        postings_by_term: dict[str, list[tuple[int, int]]] = {}
+        doc_lens = []
+        doc_offsets = [0]
+        file_ids = set()
+
+        os.makedirs(path)
+        with open(os.path.join(path, "docs.bin"), "wb") as f:
+            for idx, item in enumerate(items):
+                tokens = tokenize(item["text"])
+                doc_lens.append(len(tokens))
+                for term, tf in Counter(tokens).items():
+                    postings_by_term.setdefault(term, []).append((idx, tf))
+
+                metadata = item.get("metadata") or {}
+                if isinstance(metadata, dict) and metadata.get("file_id"):
+                    file_ids.add(metadata["file_id"])
+
+                data = json.dumps(
+                    {"id": item["id"], "text": item["text"], "metadata": metadata},
+                    ensure_ascii=False,
+                    default=str,
+                ).encode("utf-8")
+                f.write(data)
+                doc_offsets.append(doc_offsets[-1] + len(data))
+
+        vocab = sorted(postings_by_term.keys())
+        offsets = [0]
+        postings = []
+        tfs = []
+        for term in vocab:
+            for idx, tf in postings_by_term[term]:
+                postings.append(idx)
+                tfs.append(tf)
+            offsets.append(len(postings))
+
+        with open(os.path.join(path, "vocab.json"), "w") as f:
+            json.dump(vocab, f, ensure_ascii=False)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"count": len(items), "file_ids": sorted(file_ids)}, f)
+
+        np.save(os.path.join(path, "offsets.npy"), np.asarray(offsets, np.int64))
+        np.save(os.path.join(path, "postings.npy"), np.asarray(postings, np.int32))
+        np.save(os.path.join(path, "tfs.npy"), np.asarray(tfs, np.int32))
+        np.save(os.path.join(path, "doc_lens.npy"), np.asarray(doc_lens, np.int32))
+        np.save(
+            os.path.join(path, "doc_offsets.npy"), np.asarray(doc_offsets, np.int64)
+        )
+        np.save(os.path.join(path, "deleted.npy"), np.zeros(len(items), np.bool_))
+
+
+class BM25Index:
+    """
+    Persistent BM25 index per vector DB collection, used by hybrid search instead
+    of building an in-memory BM25 retriever from the whole collection per query.
+
+    Every insert adds an immutable segment, deletes only mark tombstones and
+    segments are merged once there are too many of them or too many deleted
+    documents. Writers of a collection are serialized with a file lock so the
+    index directory can be shared by several workers.
+
+    The idf uses the non-negative Lucene form log(1 + (N - n + 0.5) / (n + 0.5))
+    so that the score of a document does not depend on the whole vocabulary.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._segments: OrderedDict[str, BM25Segment] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_collection_path(self, collection_name: str) -> str:
+        key = hashlib.sha256(collection_name.encode()).hexdigest()
+        return os.path.join(self.root, key)
+
+    def _get_file_lock(self, collection_name: str) -> FileLock:
+        os.makedirs(self.root, exist_ok=True)
+        return FileLock(f"{self._get_collection_path(collection_name)}.lock")
+
+    def _read_manifest(self, path: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(path, "manifest.json"), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, path: str, manifest: dict):
+        tmp_path = os.path.join(path, f"manifest.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(path, "manifest.json"))
+
+    def _get_segment(self, path: str) -> BM25Segment:
+        with self._lock:
+            segment = self._segments.get(path)
+            if segment is not None:
+                self._segments.move_to_end(path)
+                return segment
+
+        segment = BM25Segment(path)
+
+        with self._lock:
+            self._segments[path] = segment
+            while len(self._segments) > MAX_CACHED_SEGMENTS:
+                _, evicted = self._segments.popitem(last=False)
+                evicted.close()
+        return segment
+
+    def _get_segments(self, collection_name: str) -> Optional[list[BM25Segment]]:
+        path = self._get_collection_path(collection_name)
+        manifest = self._read_manifest(path)
+        if manifest is None:
+            return None
+
+        return [
+            self._get_segment(os.path.join(path, name)) for name in manifest["segments"]
+        ]
+
+    def _evict_segments(self, paths: list[str]):
+        with self._lock:
+            for path in paths:
+                segment = self._segments.pop(path, None)
+                if segment is not None:
+                    segment.close()
+
+    def has_collection(self, collection_name: str) -> bool:
+        return os.path.exists(
+            os.path.join(self._get_collection_path(collection_name), "manifest.json")
+        )
+
+    def create(self, collection_name: str, items: list[dict], overwrite: bool = False):
+        """
+        Build the index of a collection from all of its items ({id, text, metadata}).
+        An existing index is kept unless `overwrite` is set.
+        """
+        path = self._get_collection_path(collection_name)
+
+        with self._get_file_lock(collection_name):
+            manifest = self._read_manifest(path)
+            if manifest is not None and not overwrite:
+                return
+
+            old_names = manifest["segments"] if manifest is not None else []
+            os.makedirs(path, exist_ok=True)
+
+            name = f"seg-{uuid.uuid4().hex}"
+            BM25Segment.write(os.path.join(path, name), items)
+            self._write_manifest(path, {"segments": [name]})
+
+            self._remove_segments(path, old_names)
+
+    def insert(self, collection_name: str, items: list[dict]):
+        """
+        Add items to the index of a collection, collections without an index are
+        skipped as their index is built from the whole collection on first use.
+        """
+        if not items:
+            return
+
+        path = self._get_collection_path(collection_name)
+
+        with self._get_file_lock(collection_name):
+            manifest = self._read_manifest(path)
+            if manifest is None:
+                return
+
+            name = f"seg-{uuid.uuid4().hex}"
+            BM25Segment.write(os.path.join(path, name), items)
+            manifest["segments"].append(name)
+
+            self._write_manifest(path, manifest)
+            self._compact(collection_name, manifest)
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ):
+        if not ids and not filter:
+            return self.delete_collection(collection_name)
+
+        path = self._get_collection_path(collection_name)
+
+        with self._get_file_lock(collection_name):
+            manifest = self._read_manifest(path)
+            if manifest is None:
+                return
+
+            for segment in self._get_segments(collection_name):
+                if ids:
+                    matches = [segment.ids[id] for id in ids if id in segment.ids]
+                else:
+                    # Most deletes are by file, skip segments without the file
+                    if "file_id" in filter and filter["file_id"] not in set(
+                        segment.meta.get("file_ids", [])
+                    ):
+                        continue
+
+                    matches = []
+                    for idx in range(segment.count):
+                        metadata = segment.get_doc(idx).get("metadata") or {}
+                        if all(metadata.get(k) == v for k, v in filter.items()):
+                            matches.append(idx)
+
+                if matches:
+                    deleted = segment.deleted.copy()
+                    deleted[matches] = True
+
+                    tmp_path = os.path.join(
+                        segment.path, f"deleted.{uuid.uuid4().hex}.npy"
+                    )
+                    np.save(tmp_path, deleted)
+                    os.replace(tmp_path, os.path.join(segment.path, "deleted.npy"))
+
+            self._compact(collection_name, manifest)
+
+    def delete_collection(self, collection_name: str):
+        path = self._get_collection_path(collection_name)
+
+        with self._get_file_lock(collection_name):
+            manifest = self._read_manifest(path)
+            if manifest is None:
+                return
+
+            self._evict_segments(
+                [os.path.join(path, name) for name in manifest["segments"]]
+            )
+            shutil.rmtree(path, ignore_errors=True)
+
+    def reset(self):
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _compact(self, collection_name: str, manifest: dict):
+        # Called with the file lock of the collection held
+        path = self._get_collection_path(collection_name)
+        segments = self._get_segments(collection_name)
+
+        total = sum(segment.count for segment in segments)
+        deleted = sum(int(segment.deleted.sum()) for segment in segments)
+        if len(segments) <= MAX_SEGMENTS and (
+            total == 0 or deleted / total <= MAX_DELETED_RATIO
+        ):
+            return
+
+        log.debug(
+            f"compacting bm25 index of {collection_name}: {len(segments)} segments, {deleted}/{total} deleted"
+        )
+
+        items = []
+        for segment in segments:
+            mask = segment.deleted
+            for idx in range(segment.count):
+                if not mask[idx]:
+                    items.append(segment.get_doc(idx))
+
+        name = f"seg-{uuid.uuid4().hex}"
+        BM25Segment.write(os.path.join(path, name), items)
+
+        old_names = manifest["segments"]
+        manifest["segments"] = [name]
+        self._write_manifest(path, manifest)
+
+        self._remove_segments(path, old_names)
+
+    def _remove_segments(self, path: str, names: list[str]):
+        self._evict_segments([os.path.join(path, name) for name in names])
+        for name in names:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    def search(
+        self, collection_name: str, query: str, k: int
+    ) -> Optional[list[Document]]:
+        """
+        Return the top k documents of the collection for the query, or None if
+        the collection has no index.
+        """
+        try:
+            segments = self._get_segments(collection_name)
+        except FileNotFoundError:
+            # A concurrent compaction removed a segment, read the new manifest
+            segments = self._get_segments(collection_name)
+        if segments is None:
+            return None
+
+        masks = [segment.deleted for segment in segments]
+
+        doc_count = 0
+        total_len = 0
+        for segment, mask in zip(segments, masks):
+            doc_count += int(segment.count - mask.sum())
+            total_len += int(segment.doc_lens[~mask].sum())
+
+        if doc_count == 0:
+            return []
+
+        avgdl = total_len / doc_count
+        tokens = tokenize(query)
+
+        idfs = {}
+        for term in set(tokens):
+            df = 0
+            for segment, mask in zip(segments, masks):
+                postings, _ = segment.get_term_postings(term)
+                df += int(len(postings) - mask[postings].sum())
+            idfs[term] = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+        candidates = []
+        for segment_idx, (segment, mask) in enumerate(zip(segments, masks)):
+            if segment.count == 0:
+                continue
+
+            scores = np.zeros(segment.count, dtype=np.float32)
+            length_norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.doc_lens / avgdl)
+
+            for term in tokens:
+                postings, tfs = segment.get_term_postings(term)
+                if len(postings) == 0:
+                    continue
+
+                scores[postings] += (
+                    idfs[term] * (tfs * (BM25_K1 + 1)) / (tfs + length_norm[postings])
+                )
+
+            scores[mask] = -np.inf
+
+            top = min(k, segment.count)
+            top_idx = np.argpartition(-scores, top - 1)[:top]
+            candidates.extend(
+                (float(scores[idx]), segment_idx, int(idx))
+                for idx in top_idx
+                if scores[idx] != -np.inf
+            )
+
+        candidates.sort(key=lambda x: x[0], reverse=True)
+
+        documents = []
+        for score, segment_idx, idx in candidates[:k]:
+            doc = segments[segment_idx].get_doc(idx)
+            documents.append(
+                Document(page_content=doc["text"], metadata=doc["metadata"])
+            )
+        return documents
+
+
+BM25_INDEX = BM25Index(RAG_BM25_INDEX_DIR)
@@ -0,0 +1,207 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from open_webui.config import (
+    RAG_EMBEDDING_CACHE_SIZE,
+    RAG_EMBEDDING_CACHE_BACKEND,
+    RAG_EMBEDDING_CACHE_DIR,
+    RAG_EMBEDDING_CACHE_REDIS_TTL,
+)
+from open_webui.env import (
+    REDIS_URL,
+    REDIS_CLUSTER,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    SRC_LOG_LEVELS,
+)
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# Process wide counters, exported through the OpenTelemetry metrics setup
+EMBEDDING_CACHE_STATS = {
+    "hits": 0,
+    "misses": 0,
+    "hits_by_tier": {},
+}
+
+
+def get_embedding_cache_stats() -> dict:
+    return {
+        **EMBEDDING_CACHE_STATS,
+        "hits_by_tier": {**EMBEDDING_CACHE_STATS["hits_by_tier"]},
+    }
+
+
+class DiskEmbeddingStore:
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(path, "cache.db"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding (key TEXT PRIMARY KEY, value BLOB)"
+        )
+
+    def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        rows = []
+        with self._lock:
+            # Stay below the sqlite limit of query parameters
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                rows.extend(
+                    self._conn.execute(
+                        f"SELECT key, value FROM embedding WHERE key IN ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                )
+        return dict(rows)
+
+    def set_many(self, values: dict[str, bytes]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding (key, value) VALUES (?, ?)",
+                values.items(),
+            )
+
+
+class RedisEmbeddingStore:
+    def __init__(self):
+        self._redis = get_redis_connection(
+            redis_url=REDIS_URL,
+            redis_sentinels=get_sentinels_from_env(
+                REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+            ),
+            redis_cluster=REDIS_CLUSTER,
+            decode_responses=False,
+        )
+
+    def _get_redis_key(self, key: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:embedding:{key}"
+
+    def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        values = self._redis.mget([self._get_redis_key(key) for key in keys])
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, values: dict[str, bytes]):
+        pipe = self._redis.pipeline()
+        for key, value in values.items():
+            pipe.set(self._get_redis_key(key), value, ex=RAG_EMBEDDING_CACHE_REDIS_TTL)
+        pipe.execute()
+
+
+class EmbeddingCache:
+    """
+    Content addressed cache of embeddings, keyed on the engine, model, prefix and
+    the sha256 of the text, so identical chunks are embedded once no matter which
+    file, knowledge base or query they come from.
+
+    Embeddings are kept as float32 in an in-memory LRU, backed by an optional
+    shared tier (sqlite file or Redis) that survives restarts.
+    """
+
+    def __init__(self, size: int, backend: str = ""):
+        self.size = size
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._store = None
+        if size > 0 and backend == "disk":
+            self._store = DiskEmbeddingStore(RAG_EMBEDDING_CACHE_DIR)
+        elif size > 0 and backend == "redis":
+            self._store = RedisEmbeddingStore()
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    @staticmethod
+    def get_key(engine: str, model: str, prefix: Optional[str], text: str) -> str:
+        key = hashlib.sha256(
+            f"{engine}\0{model}\0{prefix or ''}".encode("utf-8")
+        ).hexdigest()[:16]
+        return f"{key}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def get_many(self, keys: list[str]) -> list[Optional[list[float]]]:
+        results: list[Optional[np.ndarray]] = [None] * len(keys)
+
+        with self._lock:
+            for idx, key in enumerate(keys):
+                embedding = self._cache.get(key)
+                if embedding is not None:
+                    self._cache.move_to_end(key)
+                    results[idx] = embedding
+        memory_hits = sum(1 for embedding in results if embedding is not None)
+
+        store_hits = 0
+        missing = [
+            keys[idx] for idx, embedding in enumerate(results) if embedding is None
+        ]
+        if missing and self._store is not None:
+            try:
+                values = self._store.get_many(missing)
+            except Exception as e:
+                log.warning(f"Error reading the embedding cache: {e}")
+                values = {}
+
+            if values:
+                found = {
+                    key: np.frombuffer(value, dtype=np.float32)
+                    for key, value in values.items()
+                }
+                self._set_memory(found)
+                for idx, key in enumerate(keys):
+                    if results[idx] is None and key in found:
+                        results[idx] = found[key]
+                        store_hits += 1
+
+        EMBEDDING_CACHE_STATS["hits"] += memory_hits + store_hits
+        EMBEDDING_CACHE_STATS["misses"] += len(keys) - memory_hits - store_hits
+        for tier, count in [("memory", memory_hits), ("store", store_hits)]:
+            if count:
+                EMBEDDING_CACHE_STATS["hits_by_tier"][tier] = (
+                    EMBEDDING_CACHE_STATS["hits_by_tier"].get(tier, 0) + count
+                )
+
+        return [
+            embedding.tolist() if embedding is not None else None
+            for embedding in results
+        ]
+
+    def set_many(self, embeddings: dict[str, list[float]]):
+        values = {
+            key: np.asarray(embedding, dtype=np.float32)
+            for key, embedding in embeddings.items()
+        }
+        self._set_memory(values)
+
+        if self._store is not None:
+            try:
+                self._store.set_many(
+                    {key: value.tobytes() for key, value in values.items()}
+                )
+            except Exception as e:
+                log.warning(f"Error writing the embedding cache: {e}")
+
+    def _set_memory(self, values: dict[str, np.ndarray]):
+        with self._lock:
+            for key, value in values.items():
+                self._cache[key] = value
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+
+
+EMBEDDING_CACHE = EmbeddingCache(RAG_EMBEDDING_CACHE_SIZE, RAG_EMBEDDING_CACHE_BACKEND)
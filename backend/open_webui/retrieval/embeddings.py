@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Coroutine, Optional
+
+import aiohttp
+
+from open_webui.config import RAG_EMBEDDING_MAX_RETRIES
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.utils.http_client import create_session
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 30.0
+
+
+# Process wide counters, exported through the OpenTelemetry metrics setup
+EMBEDDING_REQUEST_STATS = {
+    "batches": 0,
+    "batches_by_status": {},
+    "retries": 0,
+    "latency_seconds_total": 0.0,
+    "latency_seconds_max": 0.0,
+}
+
+
+def get_embedding_request_stats() -> dict:
+    return {
+        **EMBEDDING_REQUEST_STATS,
+        "batches_by_status": {**EMBEDDING_REQUEST_STATS["batches_by_status"]},
+    }
+
+
+class EmbeddingClient:
+    """
+    Pooled HTTP client for the embedding APIs.
+
+    The embedding functions are synchronous and called from worker threads as
+    well as from the event loop, so the client runs its own event loop in a
+    daemon thread with a single aiohttp session. Requests of every caller share
+    its connection pool and the batches of a call are sent concurrently.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="embedding-client",
+                    daemon=True,
+                ).start()
+            return self._loop
+
+    def run(self, coro: Coroutine) -> Any:
+        """Run a coroutine on the client loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result()
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Only called on the client loop
+        if self._session is None or self._session.closed:
+            self._session = create_session()
+        return self._session
+
+    async def post(self, url: str, headers: dict, json_data: dict) -> dict:
+        """
+        POST an embedding request, retrying with exponential backoff on rate
+        limits, server errors and connection errors.
+        """
+        start = time.monotonic()
+        status = "error"
+        try:
+            for attempt in range(RAG_EMBEDDING_MAX_RETRIES + 1):
+                retry_after = None
+                try:
+                    async with self._get_session().post(
+                        url, headers=headers, json=json_data
+                    ) as r:
+                        status = str(r.status)
+                        if (
+                            r.status not in RETRY_STATUS_CODES
+                            or attempt == RAG_EMBEDDING_MAX_RETRIES
+                        ):
+                            r.raise_for_status()
+                            return await r.json(content_type=None)
+
+                        retry_after = r.headers.get("Retry-After")
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    status = "error"
+                    if attempt == RAG_EMBEDDING_MAX_RETRIES:
+                        raise e
+
+                try:
+                    delay = float(retry_after)
+                except (TypeError, ValueError):
+                    delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2**attempt)
+                    delay = delay * (0.5 + random.random() / 2)
+
+                log.debug(f"Retrying embedding request to {url} in {delay:.2f}s")
+                EMBEDDING_REQUEST_STATS["retries"] += 1
+                await asyncio.sleep(delay)
+        finally:
+            latency = time.monotonic() - start
+            log.debug(
+                f"Embedding request to {url}: status {status} in {latency * 1000:.0f}ms"
+            )
+
+            EMBEDDING_REQUEST_STATS["batches"] += 1
+            EMBEDDING_REQUEST_STATS["batches_by_status"][status] = (
+                EMBEDDING_REQUEST_STATS["batches_by_status"].get(status, 0) + 1
+            )
+            EMBEDDING_REQUEST_STATS["latency_seconds_total"] += latency
+            EMBEDDING_REQUEST_STATS["latency_seconds_max"] = max(
+                EMBEDDING_REQUEST_STATS["latency_seconds_max"], latency
+            )
+
+
+EMBEDDING_CLIENT = EmbeddingClient()
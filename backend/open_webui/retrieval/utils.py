@@ -1,20 +1,24 @@
+import asyncio
 import logging
 import os
-from typing import Optional, Union
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, Optional, Union
 
-import requests
-import hashlib
 from concurrent.futures import ThreadPoolExecutor
-import time
 
+import numpy as np
 from urllib.parse import quote
 from huggingface_hub import snapshot_download
 from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
 from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 
-from open_webui.config import VECTOR_DB
+from open_webui.config import VECTOR_DB, ENABLE_RAG_BM25_INDEX
 from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
+from open_webui.retrieval.bm25 import BM25_INDEX
+from open_webui.retrieval.embeddings import EMBEDDING_CLIENT
+from open_webui.retrieval.embedding_cache import EMBEDDING_CACHE
 
 from open_webui.models.users import UserModel
 from open_webui.models.files import Files
@@ -37,6 +41,7 @@ from open_webui.config import (
     RAG_EMBEDDING_QUERY_PREFIX,
     RAG_EMBEDDING_CONTENT_PREFIX,
     RAG_EMBEDDING_PREFIX_FIELD_NAME,
+    RAG_EMBEDDING_CONCURRENT_REQUESTS,
 )
 
 log = logging.getLogger(__name__)
@@ -81,6 +86,19 @@ class VectorSearchRetriever(BaseRetriever):
         return results
 
 
+class BM25IndexRetriever(BaseRetriever):
+    collection_name: Any
+    top_k: int
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        return BM25_INDEX.search(self.collection_name, query, self.top_k) or []
+
+
 def query_doc(
     collection_name: str, query_embedding: list[float], k: int, user: UserModel = None
 ):
@@ -115,6 +133,36 @@ def get_doc(collection_name: str, user: UserModel = None):
         raise e
 
 
+def get_collection_result_for_hybrid_search(
+    collection_name: str,
+) -> Optional[GetResult]:
+    """
+    Fetch the documents of a collection for the BM25 retriever, nothing is fetched
+    for collections with a BM25 index. The index of a collection is built from
+    the fetched documents on its first hybrid search.
+    """
+    if ENABLE_RAG_BM25_INDEX and BM25_INDEX.has_collection(collection_name):
+        return None
+
+    result = VECTOR_DB_CLIENT.get(collection_name=collection_name)
+
+    if ENABLE_RAG_BM25_INDEX and result and result.documents and result.documents[0]:
+        try:
+            BM25_INDEX.create(
+                collection_name,
+                [
+                    {"id": id, "text": text, "metadata": metadata}
+                    for id, text, metadata in zip(
+                        result.ids[0], result.documents[0], result.metadatas[0]
+                    )
+                ],
+            )
+        except Exception as e:
+            log.exception(f"Error building bm25 index of {collection_name}: {e}")
+
+    return result
+
+
 def query_doc_with_hybrid_search(
     collection_name: str,
     collection_result: GetResult,
@@ -127,7 +175,11 @@ def query_doc_with_hybrid_search(
     hybrid_bm25_weight: float,
 ) -> dict:
     try:
-        if (
+        use_bm25_index = ENABLE_RAG_BM25_INDEX and BM25_INDEX.has_collection(
+            collection_name
+        )
+
+        if not use_bm25_index and (
             not collection_result
             or not hasattr(collection_result, "documents")
             or not collection_result.documents
@@ -139,11 +191,16 @@ def query_doc_with_hybrid_search(
 
         log.debug(f"query_doc_with_hybrid_search:doc {collection_name}")
 
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=collection_result.documents[0],
-            metadatas=collection_result.metadatas[0],
-        )
-        bm25_retriever.k = k
+        if use_bm25_index:
+            bm25_retriever = BM25IndexRetriever(
+                collection_name=collection_name, top_k=k
+            )
+        else:
+            bm25_retriever = BM25Retriever.from_texts(
+                texts=collection_result.documents[0],
+                metadatas=collection_result.metadatas[0],
+            )
+            bm25_retriever.k = k
 
         vector_search_retriever = VectorSearchRetriever(
             collection_name=collection_name,
@@ -227,43 +284,68 @@ def merge_get_results(get_results: list[dict]) -> dict:
     return result
 
 
+def get_top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores in descending order, ties keep their
+    original order like a stable sort of the whole array would.
+    """
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    if k < len(scores):
+        # Only the scores at or above the k-th highest need to be sorted
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(len(scores))
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
+
+
 def merge_and_sort_query_results(query_results: list[dict], k: int) -> dict:
-    # Initialize lists to store combined data
-    combined = dict()  # To store documents with unique document hashes
+    distances = []
+    documents = []
+    metadatas = []
+
+    # Duplicate chunks are found by the content hash stored with them at ingest,
+    # or by their id for the chunks stored before it was
+    positions = {}
 
     for data in query_results:
-        distances = data["distances"][0]
-        documents = data["documents"][0]
-        metadatas = data["metadatas"][0]
-
-        for distance, document, metadata in zip(distances, documents, metadatas):
-            if isinstance(document, str):
-                doc_hash = hashlib.sha256(
-                    document.encode()
-                ).hexdigest()  # Compute a hash for uniqueness
-
-                if doc_hash not in combined.keys():
-                    combined[doc_hash] = (distance, document, metadata)
-                    continue  # if doc is new, no further comparison is needed
-
-                # if doc is alredy in, but new distance is better, update
-                if distance > combined[doc_hash][0]:
-                    combined[doc_hash] = (distance, document, metadata)
-
-    combined = list(combined.values())
-    # Sort the list based on distances
-    combined.sort(key=lambda x: x[0], reverse=True)
-
-    # Slice to keep only the top k elements
-    sorted_distances, sorted_documents, sorted_metadatas = (
-        zip(*combined[:k]) if combined else ([], [], [])
-    )
+        # Collections without documents return empty outer lists
+        if not data["distances"]:
+            continue
+
+        ids = data["ids"][0] if data.get("ids") else None
+        for idx, (distance, document, metadata) in enumerate(
+            zip(data["distances"][0], data["documents"][0], data["metadatas"][0])
+        ):
+            if not isinstance(document, str):
+                continue
+
+            key = (metadata or {}).get("chunk_hash")
+            if key is None:
+                # Only the old chunks of hybrid search results have neither
+                key = ids[idx] if ids else document
+
+            position = positions.get(key)
+            if position is None:
+                positions[key] = len(documents)
+                distances.append(distance)
+                documents.append(document)
+                metadatas.append(metadata)
+            elif distance > distances[position]:
+                # if doc is already in, but new distance is better, update
+                distances[position] = distance
+                metadatas[position] = metadata
+
+    top_k = get_top_k_indices(np.asarray(distances, dtype=np.float64), k)
 
-    # Create and return the output dictionary
     return {
-        "distances": [list(sorted_distances)],
-        "documents": [list(sorted_documents)],
-        "metadatas": [list(sorted_metadatas)],
+        "distances": [[distances[idx] for idx in top_k]],
+        "documents": [[documents[idx] for idx in top_k]],
+        "metadatas": [[metadatas[idx] for idx in top_k]],
     }
 
 
@@ -356,12 +438,11 @@ def query_collection_with_hybrid_search(
             log.debug(
                 f"query_collection_with_hybrid_search:VECTOR_DB_CLIENT.get:collection {collection_name}"
             )
-            collection_results[collection_name] = VECTOR_DB_CLIENT.get(
-                collection_name=collection_name
+            collection_results[collection_name] = (
+                get_collection_result_for_hybrid_search(collection_name)
             )
         except Exception as e:
             log.exception(f"Failed to fetch collection {collection_name}: {e}")
-            collection_results[collection_name] = None
 
     log.info(
         f"Starting hybrid search for {len(queries)} queries in {len(collection_names)} collections..."
@@ -386,11 +467,17 @@ def query_collection_with_hybrid_search(
             return None, e
 
     # Prepare tasks for all collections and queries
-    # Avoid running any tasks for collections that failed to fetch data (have assigned None)
+    # Avoid running any tasks for collections that failed to fetch data (have
+    # no result, which collections with a BM25 index don't need)
     tasks = [
         (cn, q)
         for cn in collection_names
-        if collection_results[cn] is not None
+        if collection_results.get(cn) is not None
+        or (
+            cn in collection_results
+            and ENABLE_RAG_BM25_INDEX
+            and BM25_INDEX.has_collection(cn)
+        )
         for q in queries
     ]
 
@@ -412,6 +499,82 @@ def query_collection_with_hybrid_search(
     return merge_and_sort_query_results(results, k=k)
 
 
+def iter_pipeline(
+    source: Iterable, stages: list[Callable], maxsize: int = 1
+) -> Iterator:
+    """
+    Iterate over the items of source passed through the stages in order. The
+    source and every stage run in their own thread connected by queues of maxsize
+    items, so a slow stage applies backpressure instead of buffering everything.
+    An error in any stage is raised to the caller and stops the pipeline.
+    """
+    stop = threading.Event()
+    done = object()
+    queues = [queue.Queue(maxsize) for _ in range(len(stages) + 1)]
+
+    def put(q: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q: queue.Queue):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return done, None
+
+    def produce():
+        try:
+            for item in source:
+                if not put(queues[0], (item, None)):
+                    return
+            put(queues[0], (done, None))
+        except Exception as e:
+            put(queues[0], (done, e))
+
+    def process(stage: Callable, input_queue: queue.Queue, output_queue: queue.Queue):
+        while True:
+            item, error = get(input_queue)
+            if item is done:
+                put(output_queue, (done, error))
+                return
+
+            try:
+                result = stage(item)
+            except Exception as e:
+                put(output_queue, (done, e))
+                return
+
+            if not put(output_queue, (result, None)):
+                return
+
+    threads = [threading.Thread(target=produce, daemon=True)] + [
+        threading.Thread(
+            target=process, args=(stage, queues[idx], queues[idx + 1]), daemon=True
+        )
+        for idx, stage in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item, error = queues[-1].get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
 def get_embedding_function(
     embedding_engine,
     embedding_model,
@@ -422,11 +585,11 @@ def get_embedding_function(
     azure_api_version=None,
 ):
     if embedding_engine == "":
-        return lambda query, prefix=None, user=None: embedding_function.encode(
+        func = lambda query, prefix=None, user=None: embedding_function.encode(
             query, **({"prompt": prefix} if prefix else {})
         ).tolist()
     elif embedding_engine in ["ollama", "openai", "azure_openai"]:
-        func = lambda query, prefix=None, user=None: generate_embeddings(
+        generate_func = lambda query, prefix=None, user=None: generate_embeddings(
             engine=embedding_engine,
             model=embedding_model,
             text=query,
@@ -437,28 +600,71 @@ def get_embedding_function(
             azure_api_version=azure_api_version,
         )
 
-        def generate_multiple(query, prefix, user, func):
+        async def generate_multiple(query, prefix, user, func):
             if isinstance(query, list):
-                embeddings = []
-                for i in range(0, len(query), embedding_batch_size):
-                    batch_embeddings = func(
-                        query[i : i + embedding_batch_size],
-                        prefix=prefix,
-                        user=user,
-                    )
+                semaphore = asyncio.Semaphore(RAG_EMBEDDING_CONCURRENT_REQUESTS)
+
+                async def generate_batch(batch):
+                    async with semaphore:
+                        return await func(batch, prefix=prefix, user=user)
 
+                batches = await asyncio.gather(
+                    *[
+                        generate_batch(query[i : i + embedding_batch_size])
+                        for i in range(0, len(query), embedding_batch_size)
+                    ]
+                )
+
+                embeddings = []
+                for batch_embeddings in batches:
                     if isinstance(batch_embeddings, list):
                         embeddings.extend(batch_embeddings)
                 return embeddings
             else:
-                return func(query, prefix, user)
+                return await func(query, prefix, user)
 
-        return lambda query, prefix=None, user=None: generate_multiple(
-            query, prefix, user, func
+        func = lambda query, prefix=None, user=None: EMBEDDING_CLIENT.run(
+            generate_multiple(query, prefix, user, generate_func)
         )
     else:
         raise ValueError(f"Unknown embedding engine: {embedding_engine}")
 
+    if not EMBEDDING_CACHE.enabled:
+        return func
+
+    def generate_cached(query, prefix=None, user=None):
+        texts = query if isinstance(query, list) else [query]
+        keys = [
+            EMBEDDING_CACHE.get_key(embedding_engine, embedding_model, prefix, text)
+            for text in texts
+        ]
+        embeddings = EMBEDDING_CACHE.get_many(keys)
+
+        # Embed every missing text once, even if it is repeated
+        missing = {}
+        for idx, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(keys[idx], texts[idx])
+
+        if missing:
+            generated = func(list(missing.values()), prefix=prefix, user=user)
+            if not isinstance(generated, list) or len(generated) != len(missing):
+                # Only part of the texts were embedded, which could not be
+                # matched to their texts by the callers
+                log.warning("Embeddings missing in the response, skipping the cache")
+                return None
+
+            generated = dict(zip(missing.keys(), generated))
+            EMBEDDING_CACHE.set_many(generated)
+            embeddings = [
+                embedding if embedding is not None else generated[key]
+                for key, embedding in zip(keys, embeddings)
+            ]
+
+        return embeddings if isinstance(query, list) else embeddings[0]
+
+    return generate_cached
+
 
 def get_reranking_function(reranking_engine, reranking_model, reranking_function):
     if reranking_function is None:
@@ -781,7 +987,7 @@ def get_model_path(model: str, update_model: bool = False):
         return model
 
 
-def generate_openai_batch_embeddings(
+async def generate_openai_batch_embeddings(
     model: str,
     texts: list[str],
     url: str = "https://api.openai.com/v1",
@@ -797,7 +1003,7 @@ def generate_openai_batch_embeddings(
         if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
             json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
 
-        r = requests.post(
+        data = await EMBEDDING_CLIENT.post(
             f"{url}/embeddings",
             headers={
                 "Content-Type": "application/json",
@@ -813,10 +1019,8 @@ def generate_openai_batch_embeddings(
                     else {}
                 ),
             },
-            json=json_data,
+            json_data=json_data,
         )
-        r.raise_for_status()
-        data = r.json()
         if "data" in data:
             return [elem["embedding"] for elem in data["data"]]
         else:
@@ -826,7 +1030,7 @@ def generate_openai_batch_embeddings(
         return None
 
 
-def generate_azure_openai_batch_embeddings(
+async def generate_azure_openai_batch_embeddings(
     model: str,
     texts: list[str],
     url: str,
@@ -845,42 +1049,34 @@ def generate_azure_openai_batch_embeddings(
 
         url = f"{url}/openai/deployments/{model}/embeddings?api-version={version}"
 
-        for _ in range(5):
-            r = requests.post(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    "api-key": key,
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                json=json_data,
-            )
-            if r.status_code == 429:
-                retry = float(r.headers.get("Retry-After", "1"))
-                time.sleep(retry)
-                continue
-            r.raise_for_status()
-            data = r.json()
-            if "data" in data:
-                return [elem["embedding"] for elem in data["data"]]
-            else:
-                raise Exception("Something went wrong :/")
-        return None
+        data = await EMBEDDING_CLIENT.post(
+            url,
+            headers={
+                "Content-Type": "application/json",
+                "api-key": key,
+                **(
+                    {
+                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
+                        "X-OpenWebUI-User-Id": user.id,
+                        "X-OpenWebUI-User-Email": user.email,
+                        "X-OpenWebUI-User-Role": user.role,
+                    }
+                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                    else {}
+                ),
+            },
+            json_data=json_data,
+        )
+        if "data" in data:
+            return [elem["embedding"] for elem in data["data"]]
+        else:
+            raise Exception("Something went wrong :/")
     except Exception as e:
         log.exception(f"Error generating azure openai batch embeddings: {e}")
         return None
 
 
-def generate_ollama_batch_embeddings(
+async def generate_ollama_batch_embeddings(
     model: str,
     texts: list[str],
     url: str,
@@ -896,7 +1092,7 @@ def generate_ollama_batch_embeddings(
         if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
             json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
 
-        r = requests.post(
+        data = await EMBEDDING_CLIENT.post(
             f"{url}/api/embed",
             headers={
                 "Content-Type": "application/json",
@@ -912,10 +1108,8 @@ def generate_ollama_batch_embeddings(
                     else {}
                 ),
             },
-            json=json_data,
+            json_data=json_data,
         )
-        r.raise_for_status()
-        data = r.json()
 
         if "embeddings" in data:
             return data["embeddings"]
@@ -926,7 +1120,7 @@ def generate_ollama_batch_embeddings(
         return None
 
 
-def generate_embeddings(
+async def generate_embeddings(
     engine: str,
     model: str,
     text: Union[str, list[str]],
@@ -944,7 +1138,7 @@ def generate_embeddings(
             text = f"{prefix}{text}"
 
     if engine == "ollama":
-        embeddings = generate_ollama_batch_embeddings(
+        embeddings = await generate_ollama_batch_embeddings(
             **{
                 "model": model,
                 "texts": text if isinstance(text, list) else [text],
@@ -956,13 +1150,13 @@ def generate_embeddings(
         )
         return embeddings[0] if isinstance(text, str) else embeddings
     elif engine == "openai":
-        embeddings = generate_openai_batch_embeddings(
+        embeddings = await generate_openai_batch_embeddings(
             model, text if isinstance(text, list) else [text], url, key, prefix, user
         )
         return embeddings[0] if isinstance(text, str) else embeddings
     elif engine == "azure_openai":
         azure_api_version = kwargs.get("azure_api_version", "")
-        embeddings = generate_azure_openai_batch_embeddings(
+        embeddings = await generate_azure_openai_batch_embeddings(
             model,
             text if isinstance(text, list) else [text],
             url,
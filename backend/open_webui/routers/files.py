@@ -2,6 +2,7 @@ import logging
 import os
 import uuid
 import json
+import time
 from fnmatch import fnmatch
 from pathlib import Path
 from typing import Optional
@@ -9,7 +10,6 @@ from urllib.parse import quote
 import asyncio
 
 from fastapi import (
-    BackgroundTasks,
     APIRouter,
     Depends,
     File,
@@ -25,6 +25,7 @@ from fastapi.responses import FileResponse, StreamingResponse
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.env import SRC_LOG_LEVELS
 from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
+from open_webui.retrieval.bm25 import BM25_INDEX
 
 from open_webui.models.users import Users
 from open_webui.models.files import (
@@ -40,6 +41,14 @@ from open_webui.routers.retrieval import ProcessFileForm, process_file
 from open_webui.routers.audio import transcribe
 from open_webui.storage.provider import Storage
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.events import EVENT_BUS
+from open_webui.utils.jobs import (
+    ACTIVE_JOB_STATUSES,
+    JOB_PRIORITY_HIGH,
+    JOB_QUEUE,
+    get_job_status,
+    register_job_handler,
+)
 from pydantic import BaseModel
 
 log = logging.getLogger(__name__)
@@ -85,41 +94,49 @@ def has_access_to_file(
 ############################
 
 
-def process_uploaded_file(request, file, file_path, file_item, file_metadata, user):
-    try:
-        if file.content_type:
-            stt_supported_content_types = getattr(
-                request.app.state.config, "STT_SUPPORTED_CONTENT_TYPES", []
-            )
+def process_uploaded_file_content(
+    request, content_type, file_path, file_item, file_metadata, user
+):
+    if content_type:
+        stt_supported_content_types = getattr(
+            request.app.state.config, "STT_SUPPORTED_CONTENT_TYPES", []
+        )
 
-            if any(
-                fnmatch(file.content_type, content_type)
-                for content_type in (
-                    stt_supported_content_types
-                    if stt_supported_content_types
-                    and any(t.strip() for t in stt_supported_content_types)
-                    else ["audio/*", "video/webm"]
-                )
-            ):
-                file_path = Storage.get_file(file_path)
-                result = transcribe(request, file_path, file_metadata)
+        if any(
+            fnmatch(content_type, pattern)
+            for pattern in (
+                stt_supported_content_types
+                if stt_supported_content_types
+                and any(t.strip() for t in stt_supported_content_types)
+                else ["audio/*", "video/webm"]
+            )
+        ):
+            file_path = Storage.get_file(file_path)
+            result = transcribe(request, file_path, file_metadata)
 
-                process_file(
-                    request,
-                    ProcessFileForm(
-                        file_id=file_item.id, content=result.get("text", "")
-                    ),
-                    user=user,
-                )
-            elif (not file.content_type.startswith(("image/", "video/"))) or (
-                request.app.state.config.CONTENT_EXTRACTION_ENGINE == "external"
-            ):
-                process_file(request, ProcessFileForm(file_id=file_item.id), user=user)
-        else:
-            log.info(
-                f"File type {file.content_type} is not provided, but trying to process anyway"
+            process_file(
+                request,
+                ProcessFileForm(file_id=file_item.id, content=result.get("text", "")),
+                user=user,
             )
+        elif (not content_type.startswith(("image/", "video/"))) or (
+            request.app.state.config.CONTENT_EXTRACTION_ENGINE == "external"
+        ):
             process_file(request, ProcessFileForm(file_id=file_item.id), user=user)
+    else:
+        log.info(
+            f"File type {content_type} is not provided, but trying to process anyway"
+        )
+        process_file(request, ProcessFileForm(file_id=file_item.id), user=user)
+
+
+def process_uploaded_file(
+    request, content_type, file_path, file_item, file_metadata, user
+):
+    try:
+        process_uploaded_file_content(
+            request, content_type, file_path, file_item, file_metadata, user
+        )
     except Exception as e:
         log.error(f"Error processing file: {file_item.id}")
         Files.update_file_data_by_id(
@@ -131,10 +148,39 @@ def process_uploaded_file(request, file, file_path, file_item, file_metadata, us
         )
 
 
+def process_file_job(request, job):
+    file_item = Files.get_file_by_id(job.payload["file_id"])
+    user = Users.get_user_by_id(job.payload["user_id"])
+    if file_item is None or user is None:
+        log.info(f"Skipping the processing of deleted file {job.payload['file_id']}")
+        return
+
+    if job.attempts > 1:
+        # The failed attempt marked the file as failed
+        Files.update_file_data_by_id(file_item.id, {"status": "pending"})
+
+    process_uploaded_file_content(
+        request,
+        file_item.meta.get("content_type"),
+        file_item.path,
+        file_item,
+        job.payload.get("metadata", {}),
+        user,
+    )
+
+
+def on_process_file_job_failed(request, job):
+    Files.update_file_data_by_id(
+        job.payload["file_id"], {"status": "failed", "error": job.error}
+    )
+
+
+register_job_handler("process_file", process_file_job, on_process_file_job_failed)
+
+
 @router.post("/", response_model=FileModelResponse)
 def upload_file(
     request: Request,
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     metadata: Optional[dict | str] = Form(None),
     process: bool = Query(True),
@@ -148,7 +194,6 @@ def upload_file(
         process=process,
         process_in_background=process_in_background,
         user=user,
-        background_tasks=background_tasks,
     )
 
 
@@ -159,7 +204,6 @@ def upload_file_handler(
     process: bool = Query(True),
     process_in_background: bool = Query(True),
     user=Depends(get_verified_user),
-    background_tasks: Optional[BackgroundTasks] = None,
 ):
     log.info(f"file.content_type: {file.content_type}")
 
@@ -198,7 +242,7 @@ def upload_file_handler(
         id = str(uuid.uuid4())
         name = filename
         filename = f"{id}_{filename}"
-        contents, file_path = Storage.upload_file(
+        file_info, file_path = Storage.upload_file(
             file.file,
             filename,
             {
@@ -222,7 +266,7 @@ def upload_file_handler(
                     "meta": {
                         "name": name,
                         "content_type": file.content_type,
-                        "size": len(contents),
+                        "size": file_info["size"],
                         "data": file_metadata,
                     },
                 }
@@ -230,21 +274,22 @@ def upload_file_handler(
         )
 
         if process:
-            if background_tasks and process_in_background:
-                background_tasks.add_task(
-                    process_uploaded_file,
-                    request,
-                    file,
-                    file_path,
-                    file_item,
-                    file_metadata,
-                    user,
+            if process_in_background:
+                JOB_QUEUE.enqueue(
+                    "process_file",
+                    {
+                        "file_id": file_item.id,
+                        "user_id": user.id,
+                        "metadata": file_metadata,
+                    },
+                    item_id=f"file:{file_item.id}",
+                    priority=JOB_PRIORITY_HIGH,
                 )
                 return {"status": True, **file_item.model_dump()}
             else:
                 process_uploaded_file(
                     request,
-                    file,
+                    file.content_type,
                     file_path,
                     file_item,
                     file_metadata,
@@ -342,6 +387,7 @@ async def delete_all_files(user=Depends(get_admin_user)):
         try:
             Storage.delete_all_files()
             VECTOR_DB_CLIENT.reset()
+            BM25_INDEX.reset()
         except Exception as e:
             log.exception(e)
             log.error("Error deleting files")
@@ -385,6 +431,13 @@ async def get_file_by_id(id: str, user=Depends(get_verified_user)):
         )
 
 
+def get_file_process_status_by_job(status, job: Optional[dict]):
+    # A failed attempt marks the file as failed until its job retries it
+    if job and job["status"] in ACTIVE_JOB_STATUSES:
+        return "pending"
+    return status
+
+
 @router.get("/{id}/process/status")
 async def get_file_process_status(
     id: str, stream: bool = Query(False), user=Depends(get_verified_user)
@@ -404,37 +457,84 @@ async def get_file_process_status(
     ):
         if stream:
             MAX_FILE_PROCESSING_DURATION = 3600 * 2
+            KEEP_ALIVE_INTERVAL = 15
+
+            def get_job(file_id):
+                job = JOB_QUEUE.get_item_job(f"file:{file_id}")
+                return get_job_status(job) if job else None
 
             async def event_stream(file_item):
-                if file_item:
-                    for _ in range(MAX_FILE_PROCESSING_DURATION):
-                        file_item = Files.get_file_by_id(file_item.id)
-                        if file_item:
-                            data = file_item.model_dump().get("data", {})
-                            status = data.get("status")
-
-                            if status:
-                                event = {"status": status}
-                                if status == "failed":
-                                    event["error"] = data.get("error")
-
-                                yield f"data: {json.dumps(event)}\n\n"
-                                if status in ("completed", "failed"):
-                                    break
-                            else:
+                if not file_item:
+                    yield f"data: {json.dumps({'status': 'not_found'})}\n\n"
+                    return
+
+                # Changes are pushed by the processing, the file is only read
+                # once subscribed so that none of them is missed
+                with EVENT_BUS.subscribe(f"file:{file_item.id}") as queue:
+                    file_item = Files.get_file_by_id(file_item.id)
+                    if not file_item:
+                        return
+
+                    data = file_item.data or {}
+                    job = get_job(file_item.id)
+
+                    deadline = time.monotonic() + MAX_FILE_PROCESSING_DURATION
+                    changed = True
+                    while time.monotonic() < deadline:
+                        if changed:
+                            status = get_file_process_status_by_job(
+                                data.get("status"), job
+                            )
+                            if not status:
                                 # Legacy
                                 break
 
-                        await asyncio.sleep(0.5)
-                else:
-                    yield f"data: {json.dumps({'status': 'not_found'})}\n\n"
+                            event = {"status": status}
+                            if status == "failed":
+                                event["error"] = data.get("error")
+                            elif status == "pending" and data.get("progress"):
+                                event["progress"] = data.get("progress")
+                            if job:
+                                event["job"] = job
+
+                            yield f"data: {json.dumps(event)}\n\n"
+                            if status in ("completed", "failed"):
+                                break
+
+                        try:
+                            _, message = await asyncio.wait_for(
+                                queue.get(), timeout=KEEP_ALIVE_INTERVAL
+                            )
+                        except asyncio.TimeoutError:
+                            changed = False
+                            yield ": keep-alive\n\n"
+                            continue
+
+                        changed = True
+                        if message["type"] == "file":
+                            data = {**data, **message["data"]}
+                        elif message["type"] == "job":
+                            job = message["job"]
+                        elif message["type"] == "resync":
+                            # Events may have been missed while the bus was
+                            # disconnected from Redis
+                            file_item = Files.get_file_by_id(file_item.id)
+                            data = (file_item.data or {}) if file_item else {}
+                            job = get_job(file_item.id) if file_item else None
 
             return StreamingResponse(
                 event_stream(file),
                 media_type="text/event-stream",
             )
         else:
-            return {"status": file.data.get("status", "pending")}
+            job = JOB_QUEUE.get_item_job(f"file:{file.id}")
+            job = get_job_status(job) if job else None
+            return {
+                "status": get_file_process_status_by_job(
+                    file.data.get("status", "pending"), job
+                ),
+                **({"job": job} if job else {}),
+            }
     else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -722,6 +822,7 @@ async def delete_file_by_id(id: str, user=Depends(get_verified_user)):
             try:
                 Storage.delete_file(file.path)
                 VECTOR_DB_CLIENT.delete(collection_name=f"file-{id}")
+                BM25_INDEX.delete_collection(f"file-{id}")
             except Exception as e:
                 log.exception(e)
                 log.error("Error deleting files")
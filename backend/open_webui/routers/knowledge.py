@@ -10,25 +10,33 @@ from open_webui.models.knowledge import (
     KnowledgeUserResponse,
 )
 from open_webui.models.files import Files, FileModel, FileMetadataResponse
+from open_webui.models.users import Users
 from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
+from open_webui.retrieval.bm25 import BM25_INDEX
 from open_webui.routers.retrieval import (
     process_file,
     ProcessFileForm,
     process_files_batch,
     BatchProcessFilesForm,
+    get_file_index_marker,
 )
 from open_webui.storage.provider import Storage
 
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.utils.auth import get_verified_user
 from open_webui.utils.access_control import has_access, has_permission
+from open_webui.utils.jobs import (
+    JOB_PRIORITY_LOW,
+    JOB_QUEUE,
+    JOB_SKIPPED,
+    register_job_handler,
+)
 
 
 from open_webui.env import SRC_LOG_LEVELS
 from open_webui.config import BYPASS_ADMIN_ACCESS_CONTROL
 from open_webui.models.models import Models, ModelForm
 
-
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
 
@@ -39,99 +47,73 @@ router = APIRouter()
 ############################
 
 
-@router.get("/", response_model=list[KnowledgeUserResponse])
-async def get_knowledge(user=Depends(get_verified_user)):
-    knowledge_bases = []
-
-    if user.role == "admin" and BYPASS_ADMIN_ACCESS_CONTROL:
-        knowledge_bases = Knowledges.get_knowledge_bases()
-    else:
-        knowledge_bases = Knowledges.get_knowledge_bases_by_user_id(user.id, "read")
+def get_knowledge_bases_with_files(knowledge_bases) -> list[KnowledgeUserResponse]:
+    """Attach their files to the knowledge bases, read in a single query"""
+    file_ids = {
+        file_id
+        for knowledge_base in knowledge_bases
+        if knowledge_base.data
+        for file_id in knowledge_base.data.get("file_ids", [])
+    }
+    # Ordered by most recently updated first
+    files = Files.get_file_metadatas_by_ids(list(file_ids)) if file_ids else []
+    files_by_id = {file.id: file for file in files}
+    file_order = {file.id: idx for idx, file in enumerate(files)}
 
-    # Get files for each knowledge base
     knowledge_with_files = []
     for knowledge_base in knowledge_bases:
-        files = []
+        knowledge_files = []
         if knowledge_base.data:
-            files = Files.get_file_metadatas_by_ids(
-                knowledge_base.data.get("file_ids", [])
-            )
-
-            # Check if all files exist
-            if len(files) != len(knowledge_base.data.get("file_ids", [])):
-                missing_files = list(
-                    set(knowledge_base.data.get("file_ids", []))
-                    - set([file.id for file in files])
+            knowledge_file_ids = set(knowledge_base.data.get("file_ids", []))
+            knowledge_files = [
+                files_by_id[file_id]
+                for file_id in sorted(
+                    knowledge_file_ids & files_by_id.keys(), key=file_order.get
                 )
-                if missing_files:
-                    data = knowledge_base.data or {}
-                    file_ids = data.get("file_ids", [])
-
-                    for missing_file in missing_files:
-                        file_ids.remove(missing_file)
-
-                    data["file_ids"] = file_ids
-                    Knowledges.update_knowledge_data_by_id(
-                        id=knowledge_base.id, data=data
-                    )
-
-                    files = Files.get_file_metadatas_by_ids(file_ids)
+            ]
+
+            # Drop the files that no longer exist
+            missing_files = knowledge_file_ids - files_by_id.keys()
+            if missing_files:
+                data = knowledge_base.data or {}
+                data["file_ids"] = [
+                    file_id
+                    for file_id in data.get("file_ids", [])
+                    if file_id not in missing_files
+                ]
+                Knowledges.update_knowledge_data_by_id(id=knowledge_base.id, data=data)
 
         knowledge_with_files.append(
             KnowledgeUserResponse(
                 **knowledge_base.model_dump(),
-                files=files,
+                files=knowledge_files,
             )
         )
-
     return knowledge_with_files
 
 
-@router.get("/list", response_model=list[KnowledgeUserResponse])
-async def get_knowledge_list(user=Depends(get_verified_user)):
+@router.get("/", response_model=list[KnowledgeUserResponse])
+async def get_knowledge(user=Depends(get_verified_user)):
     knowledge_bases = []
 
     if user.role == "admin" and BYPASS_ADMIN_ACCESS_CONTROL:
         knowledge_bases = Knowledges.get_knowledge_bases()
     else:
-        knowledge_bases = Knowledges.get_knowledge_bases_by_user_id(user.id, "write")
-
-    # Get files for each knowledge base
-    knowledge_with_files = []
-    for knowledge_base in knowledge_bases:
-        files = []
-        if knowledge_base.data:
-            files = Files.get_file_metadatas_by_ids(
-                knowledge_base.data.get("file_ids", [])
-            )
+        knowledge_bases = Knowledges.get_knowledge_bases_by_user_id(user.id, "read")
 
-            # Check if all files exist
-            if len(files) != len(knowledge_base.data.get("file_ids", [])):
-                missing_files = list(
-                    set(knowledge_base.data.get("file_ids", []))
-                    - set([file.id for file in files])
-                )
-                if missing_files:
-                    data = knowledge_base.data or {}
-                    file_ids = data.get("file_ids", [])
+    return get_knowledge_bases_with_files(knowledge_bases)
 
-                    for missing_file in missing_files:
-                        file_ids.remove(missing_file)
 
-                    data["file_ids"] = file_ids
-                    Knowledges.update_knowledge_data_by_id(
-                        id=knowledge_base.id, data=data
-                    )
+@router.get("/list", response_model=list[KnowledgeUserResponse])
+async def get_knowledge_list(user=Depends(get_verified_user)):
+    knowledge_bases = []
 
-                    files = Files.get_file_metadatas_by_ids(file_ids)
+    if user.role == "admin" and BYPASS_ADMIN_ACCESS_CONTROL:
+        knowledge_bases = Knowledges.get_knowledge_bases()
+    else:
+        knowledge_bases = Knowledges.get_knowledge_bases_by_user_id(user.id, "write")
 
-        knowledge_with_files.append(
-            KnowledgeUserResponse(
-                **knowledge_base.model_dump(),
-                files=files,
-            )
-        )
-    return knowledge_with_files
+    return get_knowledge_bases_with_files(knowledge_bases)
 
 
 ############################
@@ -180,7 +162,14 @@ async def create_new_knowledge(
 
 
 @router.post("/reindex", response_model=bool)
-async def reindex_knowledge_files(request: Request, user=Depends(get_verified_user)):
+async def reindex_knowledge_files(
+    request: Request, force: bool = Query(False), user=Depends(get_verified_user)
+):
+    """
+    Reindex the files of all the knowledge bases. Files already indexed with
+    their current content and the current embedding model are skipped, unless
+    force is set, which rebuilds the collections from scratch.
+    """
     if user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -189,8 +178,9 @@ async def reindex_knowledge_files(request: Request, user=Depends(get_verified_us
 
     knowledge_bases = Knowledges.get_knowledge_bases()
 
-    log.info(f"Starting reindexing for {len(knowledge_bases)} knowledge bases")
+    log.info(f"Queueing reindexing for {len(knowledge_bases)} knowledge bases")
 
+    batch_id = JOB_QUEUE.create_batch(REINDEX_BATCH_NAME)
     deleted_knowledge_bases = []
 
     for knowledge_base in knowledge_bases:
@@ -208,53 +198,118 @@ async def reindex_knowledge_files(request: Request, user=Depends(get_verified_us
                 )
             continue
 
-        try:
-            file_ids = knowledge_base.data.get("file_ids", [])
-            files = Files.get_files_by_ids(file_ids)
-            try:
-                if VECTOR_DB_CLIENT.has_collection(collection_name=knowledge_base.id):
-                    VECTOR_DB_CLIENT.delete_collection(
-                        collection_name=knowledge_base.id
-                    )
-            except Exception as e:
-                log.error(f"Error deleting collection {knowledge_base.id}: {str(e)}")
-                continue  # Skip, don't raise
-
-            failed_files = []
-            for file in files:
-                try:
-                    process_file(
-                        request,
-                        ProcessFileForm(
-                            file_id=file.id, collection_name=knowledge_base.id
-                        ),
-                        user=user,
-                    )
-                except Exception as e:
-                    log.error(
-                        f"Error processing file {file.filename} (ID: {file.id}): {str(e)}"
-                    )
-                    failed_files.append({"file_id": file.id, "error": str(e)})
-                    continue
-
-        except Exception as e:
-            log.error(f"Error processing knowledge base {knowledge_base.id}: {str(e)}")
-            # Don't raise, just continue
-            continue
-
-        if failed_files:
-            log.warning(
-                f"Failed to process {len(failed_files)} files in knowledge base {knowledge_base.id}"
-            )
-            for failed in failed_files:
-                log.warning(f"File ID: {failed['file_id']}, Error: {failed['error']}")
+        JOB_QUEUE.enqueue(
+            "reindex_knowledge",
+            {
+                "knowledge_id": knowledge_base.id,
+                "user_id": user.id,
+                "batch_id": batch_id,
+                "force": force,
+            },
+            item_id=f"knowledge:{knowledge_base.id}",
+            priority=JOB_PRIORITY_LOW,
+        )
 
     log.info(
-        f"Reindexing completed. Deleted {len(deleted_knowledge_bases)} invalid knowledge bases: {deleted_knowledge_bases}"
+        f"Reindexing queued. Deleted {len(deleted_knowledge_bases)} invalid knowledge bases: {deleted_knowledge_bases}"
     )
     return True
 
 
+REINDEX_BATCH_NAME = "reindex_knowledge"
+
+
+def reindex_knowledge_job(request, job):
+    """Queue the reindexing of the files of a knowledge base"""
+    knowledge_base = Knowledges.get_knowledge_by_id(id=job.payload["knowledge_id"])
+    if knowledge_base is None or not knowledge_base.data:
+        return
+
+    if job.payload.get("force"):
+        if VECTOR_DB_CLIENT.has_collection(collection_name=knowledge_base.id):
+            VECTOR_DB_CLIENT.delete_collection(collection_name=knowledge_base.id)
+        BM25_INDEX.delete_collection(knowledge_base.id)
+
+    # One job per file, for the workers to share the files of large knowledge bases
+    for file_id in knowledge_base.data.get("file_ids", []):
+        JOB_QUEUE.enqueue(
+            "reindex_knowledge_file",
+            {**job.payload, "file_id": file_id},
+            item_id=f"file:{file_id}",
+            priority=JOB_PRIORITY_LOW,
+            batch_id=job.payload.get("batch_id"),
+        )
+
+
+def is_file_indexed(request, collection_name: str, file: FileModel) -> bool:
+    """
+    Whether all the chunks of the file were saved to the collection from its
+    current content and embedding model
+    """
+    if not file.hash:
+        return False
+
+    marker = (file.meta or {}).get("indexed", {}).get(collection_name)
+    if marker != get_file_index_marker(request, file.hash):
+        return False
+
+    # The collection may have been dropped since
+    result = VECTOR_DB_CLIENT.query(
+        collection_name=collection_name, filter={"file_id": file.id}, limit=1
+    )
+    return bool(result and result.ids and result.ids[0])
+
+
+def reindex_knowledge_file_job(request, job):
+    file = Files.get_file_by_id(job.payload["file_id"])
+    user = Users.get_user_by_id(job.payload["user_id"])
+    if file is None or user is None:
+        return JOB_SKIPPED
+
+    collection_name = job.payload["knowledge_id"]
+    if not job.payload.get("force"):
+        if is_file_indexed(request, collection_name, file):
+            return JOB_SKIPPED
+
+        # Drop what is left of the file, outdated or from an interrupted run
+        VECTOR_DB_CLIENT.delete(
+            collection_name=collection_name, filter={"file_id": file.id}
+        )
+        BM25_INDEX.delete(collection_name, filter={"file_id": file.id})
+
+    process_file(
+        request,
+        ProcessFileForm(file_id=file.id, collection_name=collection_name),
+        user=user,
+    )
+
+
+@router.get("/reindex/status")
+async def get_reindex_knowledge_status(user=Depends(get_verified_user)):
+    """Progress of the last reindexing, with its throughput in files per second"""
+    if user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=ERROR_MESSAGES.UNAUTHORIZED,
+        )
+
+    batch = JOB_QUEUE.get_batch(REINDEX_BATCH_NAME)
+    if batch is None:
+        return None
+
+    # Up to the last file processed, so it holds once the reindexing is over
+    processed = batch["completed"] + batch["skipped"] + batch["failed"]
+    elapsed = batch["updated_at"] - batch["created_at"]
+    return {
+        **batch,
+        "files_per_second": round(processed / elapsed, 2) if elapsed > 0 else None,
+    }
+
+
+register_job_handler("reindex_knowledge", reindex_knowledge_job)
+register_job_handler("reindex_knowledge_file", reindex_knowledge_file_job)
+
+
 ############################
 # GetKnowledgeById
 ############################
@@ -477,6 +532,7 @@ def update_file_from_knowledge_by_id(
     VECTOR_DB_CLIENT.delete(
         collection_name=knowledge.id, filter={"file_id": form_data.file_id}
     )
+    BM25_INDEX.delete(knowledge.id, filter={"file_id": form_data.file_id})
 
     # Add content to the vector database
     try:
@@ -549,6 +605,7 @@ def remove_file_from_knowledge_by_id(
         VECTOR_DB_CLIENT.delete(
             collection_name=knowledge.id, filter={"file_id": form_data.file_id}
         )
+        BM25_INDEX.delete(knowledge.id, filter={"file_id": form_data.file_id})
     except Exception as e:
         log.debug("This was most likely caused by bypassing embedding processing")
         log.debug(e)
@@ -560,6 +617,7 @@ def remove_file_from_knowledge_by_id(
             file_collection = f"file-{form_data.file_id}"
             if VECTOR_DB_CLIENT.has_collection(collection_name=file_collection):
                 VECTOR_DB_CLIENT.delete_collection(collection_name=file_collection)
+            BM25_INDEX.delete_collection(file_collection)
         except Exception as e:
             log.debug("This was most likely caused by bypassing embedding processing")
             log.debug(e)
@@ -658,6 +716,7 @@ async def delete_knowledge_by_id(id: str, user=Depends(get_verified_user)):
     # Clean up vector DB
     try:
         VECTOR_DB_CLIENT.delete_collection(collection_name=id)
+        BM25_INDEX.delete_collection(id)
     except Exception as e:
         log.debug(e)
         pass
@@ -691,6 +750,7 @@ async def reset_knowledge_by_id(id: str, user=Depends(get_verified_user)):
 
     try:
         VECTOR_DB_CLIENT.delete_collection(collection_name=id)
+        BM25_INDEX.delete_collection(id)
     except Exception as e:
         log.debug(e)
         pass
@@ -1,12 +1,7 @@
-# TODO: Implement a more intelligent load balancing mechanism for distributing requests among multiple backend instances.
-# Current implementation uses a simple round-robin approach (random.choice). Consider incorporating algorithms like weighted round-robin,
-# least connections, or least response time for better resource utilization and performance optimization.
-
 import asyncio
 import json
 import logging
 import os
-import random
 import re
 import time
 from datetime import datetime
@@ -37,7 +32,7 @@ from fastapi import (
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, ConfigDict, validator
-from starlette.background import BackgroundTask
+from starlette.background import BackgroundTask, BackgroundTasks
 
 
 from open_webui.models.models import Models
@@ -51,6 +46,9 @@ from open_webui.utils.payload import (
 )
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_access
+from open_webui.utils.balancer import MODEL_AFFINITY_TTL, UpstreamBalancer
+from open_webui.utils.http_client import UPSTREAM_SESSIONS, cleanup_response
+from open_webui.utils.model_discovery import MODEL_DISCOVERY
 
 
 from open_webui.config import (
@@ -61,15 +59,26 @@ from open_webui.env import (
     SRC_LOG_LEVELS,
     MODELS_CACHE_TTL,
     AIOHTTP_CLIENT_SESSION_SSL,
-    AIOHTTP_CLIENT_TIMEOUT,
     AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST,
     BYPASS_MODEL_ACCESS_CONTROL,
+    OLLAMA_CIRCUIT_BREAKER_COOLDOWN,
+    OLLAMA_CIRCUIT_BREAKER_THRESHOLD,
+    OLLAMA_LOADED_MODELS_TTL,
+    OLLAMA_ROUTING_MAX_RETRIES,
 )
 from open_webui.constants import ERROR_MESSAGES
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 
+# Picks the node of the requests for a model served by several Ollama nodes
+OLLAMA_BALANCER = UpstreamBalancer(
+    OLLAMA_CIRCUIT_BREAKER_THRESHOLD, OLLAMA_CIRCUIT_BREAKER_COOLDOWN
+)
+
+# Last /api/ps of the nodes, see get_recent_loaded_models
+OLLAMA_LOADED_MODELS = {"data": None, "fetched_at": 0.0, "task": None}
+
 
 ##########################################
 #
@@ -81,40 +90,46 @@ log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    **({"Authorization": f"Bearer {key}"} if key else {}),
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                ssl=AIOHTTP_CLIENT_SESSION_SSL,
-            ) as response:
-                return await response.json()
+        async with UPSTREAM_SESSIONS.get(url).get(
+            url,
+            headers={
+                "Content-Type": "application/json",
+                **({"Authorization": f"Bearer {key}"} if key else {}),
+                **(
+                    {
+                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
+                        "X-OpenWebUI-User-Id": user.id,
+                        "X-OpenWebUI-User-Email": user.email,
+                        "X-OpenWebUI-User-Role": user.role,
+                    }
+                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                    else {}
+                ),
+            },
+            ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=timeout,
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
         return None
 
 
-async def cleanup_response(
-    response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
+async def send_models_request(
+    request: Request, url: str, key: Optional[str] = None, user: UserModel = None
 ):
-    if response:
-        response.close()
-    if session:
-        await session.close()
+    """A model list of a connection, from the last listing of MODEL_DISCOVERY"""
+    # The lists can differ by user when the user is forwarded to the connection
+    if ENABLE_FORWARD_USER_INFO_HEADERS and user:
+        return await send_get_request(url, key, user=user)
+
+    return await MODEL_DISCOVERY.get(
+        getattr(request.app.state, "redis", None),
+        url,
+        key,
+        lambda: send_get_request(url, key),
+    )
 
 
 async def send_post_request(
@@ -128,12 +143,9 @@ async def send_post_request(
 ):
 
     r = None
+    streaming = False
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
-
-        r = await session.post(
+        r = await UPSTREAM_SESSIONS.get(url).post(
             url,
             data=payload,
             headers={
@@ -161,7 +173,7 @@ async def send_post_request(
         if r.ok is False:
             try:
                 res = await r.json()
-                await cleanup_response(r, session)
+                await cleanup_response(r)
                 if "error" in res:
                     raise HTTPException(status_code=r.status, detail=res["error"])
             except HTTPException as e:
@@ -180,13 +192,12 @@ async def send_post_request(
             if content_type:
                 response_headers["Content-Type"] = content_type
 
+            streaming = True
             return StreamingResponse(
                 r.content,
                 status_code=r.status,
                 headers=response_headers,
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             res = await r.json()
@@ -202,8 +213,8 @@ async def send_post_request(
             detail=detail if e else "Open WebUI: Server Connection Error",
         )
     finally:
-        if not stream:
-            await cleanup_response(r, session)
+        if not streaming:
+            await cleanup_response(r)
 
 
 def get_api_key(idx, url, configs):
@@ -352,7 +363,9 @@ async def get_all_models(request: Request, user: UserModel = None):
             if (str(idx) not in request.app.state.config.OLLAMA_API_CONFIGS) and (
                 url not in request.app.state.config.OLLAMA_API_CONFIGS  # Legacy support
             ):
-                request_tasks.append(send_get_request(f"{url}/api/tags", user=user))
+                request_tasks.append(
+                    send_models_request(request, f"{url}/api/tags", user=user)
+                )
             else:
                 api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
                     str(idx),
@@ -366,7 +379,7 @@ async def get_all_models(request: Request, user: UserModel = None):
 
                 if enable:
                     request_tasks.append(
-                        send_get_request(f"{url}/api/tags", key, user=user)
+                        send_models_request(request, f"{url}/api/tags", key, user=user)
                     )
                 else:
                     request_tasks.append(asyncio.ensure_future(asyncio.sleep(0, None)))
@@ -417,7 +430,7 @@ async def get_all_models(request: Request, user: UserModel = None):
         }
 
         try:
-            loaded_models = await get_ollama_loaded_models(request, user=user)
+            loaded_models = await get_recent_loaded_models(request, user)
             expires_map = {
                 m["model"]: m["expires_at"]
                 for m in loaded_models["models"]
@@ -517,13 +530,53 @@ async def get_ollama_loaded_models(request: Request, user=Depends(get_admin_user
     """
     List models that are currently loaded into Ollama memory, and which node they are loaded on.
     """
+    return await get_loaded_models(request, user, send_get_request)
+
+
+async def get_recent_loaded_models(request: Request, user: UserModel) -> dict:
+    """
+    The models loaded on the nodes, fetched again from /api/ps once older than
+    OLLAMA_LOADED_MODELS_TTL seconds. They change with every request Ollama
+    loads a model for, so they aren't served from MODEL_DISCOVERY, whose lists
+    can be a whole MODELS_DISCOVERY_INTERVAL old.
+    """
+    if time.time() - OLLAMA_LOADED_MODELS["fetched_at"] >= OLLAMA_LOADED_MODELS_TTL:
+        task = OLLAMA_LOADED_MODELS["task"]
+        if task is None or task.done():
+            task = OLLAMA_LOADED_MODELS["task"] = asyncio.ensure_future(
+                refresh_loaded_models(request, user)
+            )
+        # Concurrent requests share the same fetch
+        await asyncio.shield(task)
+
+    return OLLAMA_LOADED_MODELS["data"]
+
+
+async def refresh_loaded_models(request: Request, user: UserModel):
+    loaded_models = await get_loaded_models(request, user, send_get_request)
+
+    # Requests for a model go preferably to the nodes it is loaded on
+    urls = request.app.state.config.OLLAMA_BASE_URLS
+    loaded_until = time.time() + MODEL_AFFINITY_TTL
+    OLLAMA_BALANCER.set_loaded(
+        {
+            m["model"]: {urls[idx]: loaded_until for idx in m.get("urls", [])}
+            for m in loaded_models["models"]
+        }
+    )
+
+    OLLAMA_LOADED_MODELS["data"] = loaded_models
+    OLLAMA_LOADED_MODELS["fetched_at"] = time.time()
+
+
+async def get_loaded_models(request: Request, user: UserModel, send_request):
     if request.app.state.config.ENABLE_OLLAMA_API:
         request_tasks = []
         for idx, url in enumerate(request.app.state.config.OLLAMA_BASE_URLS):
             if (str(idx) not in request.app.state.config.OLLAMA_API_CONFIGS) and (
                 url not in request.app.state.config.OLLAMA_API_CONFIGS  # Legacy support
             ):
-                request_tasks.append(send_get_request(f"{url}/api/ps", user=user))
+                request_tasks.append(send_request(f"{url}/api/ps", user=user))
             else:
                 api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
                     str(idx),
@@ -536,9 +589,7 @@ async def get_ollama_loaded_models(request: Request, user=Depends(get_admin_user
                 key = api_config.get("key", None)
 
                 if enable:
-                    request_tasks.append(
-                        send_get_request(f"{url}/api/ps", key, user=user)
-                    )
+                    request_tasks.append(send_request(f"{url}/api/ps", key, user=user))
                 else:
                     request_tasks.append(asyncio.ensure_future(asyncio.sleep(0, None)))
 
@@ -967,50 +1018,16 @@ async def show_model_info(
             detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
         )
 
-    url_idx = random.choice(models[model]["urls"])
-
-    url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
-    key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
-
-    try:
-        r = requests.request(
-            method="POST",
-            url=f"{url}/api/show",
-            headers={
-                "Content-Type": "application/json",
-                **({"Authorization": f"Bearer {key}"} if key else {}),
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-            data=json.dumps(form_data).encode(),
-        )
-        r.raise_for_status()
-
-        return r.json()
-    except Exception as e:
-        log.exception(e)
-
-        detail = None
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    detail = f"Ollama: {res['error']}"
-            except Exception:
-                detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=detail if detail else "Open WebUI: Server Connection Error",
-        )
+    return await send_model_request(
+        request,
+        model,
+        None,
+        "/api/show",
+        form_data,
+        stream=False,
+        user=user,
+        loads_model=False,
+    )
 
 
 class GenerateEmbedForm(BaseModel):
@@ -1031,74 +1048,30 @@ async def embed(
 ):
     log.info(f"generate_ollama_batch_embeddings {form_data}")
 
+    model = form_data.model
+
+    if ":" not in model:
+        model = f"{model}:latest"
+
     if url_idx is None:
         await get_all_models(request, user=user)
         models = request.app.state.OLLAMA_MODELS
 
-        model = form_data.model
-
-        if ":" not in model:
-            model = f"{model}:latest"
-
-        if model in models:
-            url_idx = random.choice(models[model]["urls"])
-        else:
+        if model not in models:
             raise HTTPException(
                 status_code=400,
                 detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.model),
             )
 
-    url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
-    api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
-        str(url_idx),
-        request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
+    return await send_model_request(
+        request,
+        model,
+        url_idx,
+        "/api/embed",
+        form_data.model_dump(exclude_none=True),
+        stream=False,
+        user=user,
     )
-    key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
-
-    prefix_id = api_config.get("prefix_id", None)
-    if prefix_id:
-        form_data.model = form_data.model.replace(f"{prefix_id}.", "")
-
-    try:
-        r = requests.request(
-            method="POST",
-            url=f"{url}/api/embed",
-            headers={
-                "Content-Type": "application/json",
-                **({"Authorization": f"Bearer {key}"} if key else {}),
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-            data=form_data.model_dump_json(exclude_none=True).encode(),
-        )
-        r.raise_for_status()
-
-        data = r.json()
-        return data
-    except Exception as e:
-        log.exception(e)
-
-        detail = None
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    detail = f"Ollama: {res['error']}"
-            except Exception:
-                detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=detail if detail else "Open WebUI: Server Connection Error",
-        )
 
 
 class GenerateEmbeddingsForm(BaseModel):
@@ -1118,74 +1091,30 @@ async def embeddings(
 ):
     log.info(f"generate_ollama_embeddings {form_data}")
 
+    model = form_data.model
+
+    if ":" not in model:
+        model = f"{model}:latest"
+
     if url_idx is None:
         await get_all_models(request, user=user)
         models = request.app.state.OLLAMA_MODELS
 
-        model = form_data.model
-
-        if ":" not in model:
-            model = f"{model}:latest"
-
-        if model in models:
-            url_idx = random.choice(models[model]["urls"])
-        else:
+        if model not in models:
             raise HTTPException(
                 status_code=400,
                 detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.model),
             )
 
-    url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
-    api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
-        str(url_idx),
-        request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
+    return await send_model_request(
+        request,
+        model,
+        url_idx,
+        "/api/embeddings",
+        form_data.model_dump(exclude_none=True),
+        stream=False,
+        user=user,
     )
-    key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
-
-    prefix_id = api_config.get("prefix_id", None)
-    if prefix_id:
-        form_data.model = form_data.model.replace(f"{prefix_id}.", "")
-
-    try:
-        r = requests.request(
-            method="POST",
-            url=f"{url}/api/embeddings",
-            headers={
-                "Content-Type": "application/json",
-                **({"Authorization": f"Bearer {key}"} if key else {}),
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-            data=form_data.model_dump_json(exclude_none=True).encode(),
-        )
-        r.raise_for_status()
-
-        data = r.json()
-        return data
-    except Exception as e:
-        log.exception(e)
-
-        detail = None
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    detail = f"Ollama: {res['error']}"
-            except Exception:
-                detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=detail if detail else "Open WebUI: Server Connection Error",
-        )
 
 
 class GenerateCompletionForm(BaseModel):
@@ -1211,37 +1140,27 @@ async def generate_completion(
     url_idx: Optional[int] = None,
     user=Depends(get_verified_user),
 ):
+    model = form_data.model
+
+    if ":" not in model:
+        model = f"{model}:latest"
+
     if url_idx is None:
         await get_all_models(request, user=user)
         models = request.app.state.OLLAMA_MODELS
 
-        model = form_data.model
-
-        if ":" not in model:
-            model = f"{model}:latest"
-
-        if model in models:
-            url_idx = random.choice(models[model]["urls"])
-        else:
+        if model not in models:
             raise HTTPException(
                 status_code=400,
                 detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.model),
             )
 
-    url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
-    api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
-        str(url_idx),
-        request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
-    )
-
-    prefix_id = api_config.get("prefix_id", None)
-    if prefix_id:
-        form_data.model = form_data.model.replace(f"{prefix_id}.", "")
-
-    return await send_post_request(
-        url=f"{url}/api/generate",
-        payload=form_data.model_dump_json(exclude_none=True).encode(),
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
+    return await send_model_request(
+        request,
+        model,
+        url_idx,
+        "/api/generate",
+        form_data.model_dump(exclude_none=True),
         user=user,
     )
 
@@ -1280,7 +1199,22 @@ class GenerateChatCompletionForm(BaseModel):
     )
 
 
-async def get_ollama_url(request: Request, model: str, url_idx: Optional[int] = None):
+def get_ollama_url_idx(request: Request, model: str, exclude=()) -> Optional[int]:
+    """The node for a request for the model, None when all of them are excluded"""
+    urls = request.app.state.config.OLLAMA_BASE_URLS
+    url_indices = request.app.state.OLLAMA_MODELS[model].get("urls", [])
+
+    url = OLLAMA_BALANCER.choose(
+        [urls[idx] for idx in url_indices], model, exclude=exclude
+    )
+    if url is None:
+        return None
+    return next(idx for idx in url_indices if urls[idx] == url)
+
+
+async def get_ollama_url(
+    request: Request, model: str, url_idx: Optional[int] = None, exclude=()
+):
     if url_idx is None:
         models = request.app.state.OLLAMA_MODELS
         if model not in models:
@@ -1288,11 +1222,91 @@ async def get_ollama_url(request: Request, model: str, url_idx: Optional[int] =
                 status_code=400,
                 detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
             )
-        url_idx = random.choice(models[model].get("urls", []))
+        url_idx = get_ollama_url_idx(request, model, exclude=exclude)
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     return url, url_idx
 
 
+async def send_model_request(
+    request: Request,
+    model: str,
+    url_idx: Optional[int],
+    path: str,
+    payload: dict,
+    stream: bool = True,
+    content_type: Optional[str] = None,
+    user: UserModel = None,
+    metadata: Optional[dict] = None,
+    loads_model: bool = True,
+):
+    """
+    Send a request for a model to the node picked by OLLAMA_BALANCER, and to
+    another one of its nodes when it fails before responding, unless url_idx
+    pins the node. loads_model is False for the requests that don't load the
+    model on the node, e.g. /api/show.
+    """
+    tried = []
+    while True:
+        url, node_idx = await get_ollama_url(request, model, url_idx, exclude=tried)
+        api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
+            str(node_idx),
+            request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
+        )
+
+        node_payload = {**payload}
+        prefix_id = api_config.get("prefix_id", None)
+        if prefix_id:
+            node_payload["model"] = node_payload["model"].replace(f"{prefix_id}.", "")
+
+        start = OLLAMA_BALANCER.acquire(url)
+        try:
+            response = await send_post_request(
+                url=f"{url}{path}",
+                payload=json.dumps(node_payload),
+                stream=stream,
+                key=get_api_key(
+                    node_idx, url, request.app.state.config.OLLAMA_API_CONFIGS
+                ),
+                content_type=content_type,
+                user=user,
+                metadata=metadata,
+            )
+        except HTTPException as e:
+            OLLAMA_BALANCER.release(url)
+            # Errors of the request itself are not the node's
+            if e.status_code < 500:
+                raise e
+
+            OLLAMA_BALANCER.record(url, start, ok=False)
+            tried.append(url)
+            if url_idx is not None or len(tried) > OLLAMA_ROUTING_MAX_RETRIES:
+                raise e
+
+            urls = request.app.state.config.OLLAMA_BASE_URLS
+            if not {
+                urls[idx] for idx in request.app.state.OLLAMA_MODELS[model]["urls"]
+            } - set(tried):
+                raise e
+
+            log.warning(f"{url} failed for {model}: {e.detail}, trying another node")
+            continue
+
+        OLLAMA_BALANCER.record(
+            url, start, ok=True, model=model if loads_model else None
+        )
+        if isinstance(response, StreamingResponse):
+            # The node is busy until the end of the stream
+            response.background = BackgroundTasks(
+                [
+                    *([response.background] if response.background else []),
+                    BackgroundTask(OLLAMA_BALANCER.release, url),
+                ]
+            )
+        else:
+            OLLAMA_BALANCER.release(url)
+        return response
+
+
 @router.post("/api/chat")
 @router.post("/api/chat/{url_idx}")
 async def generate_chat_completion(
@@ -1358,21 +1372,13 @@ async def generate_chat_completion(
     if ":" not in payload["model"]:
         payload["model"] = f"{payload['model']}:latest"
 
-    url, url_idx = await get_ollama_url(request, payload["model"], url_idx)
-    api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
-        str(url_idx),
-        request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
-    )
-
-    prefix_id = api_config.get("prefix_id", None)
-    if prefix_id:
-        payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
-
-    return await send_post_request(
-        url=f"{url}/api/chat",
-        payload=json.dumps(payload),
+    return await send_model_request(
+        request,
+        payload["model"],
+        url_idx,
+        "/api/chat",
+        payload,
         stream=form_data.stream,
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         content_type="application/x-ndjson",
         user=user,
         metadata=metadata,
@@ -1464,22 +1470,13 @@ async def generate_openai_completion(
     if ":" not in payload["model"]:
         payload["model"] = f"{payload['model']}:latest"
 
-    url, url_idx = await get_ollama_url(request, payload["model"], url_idx)
-    api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
-        str(url_idx),
-        request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
-    )
-
-    prefix_id = api_config.get("prefix_id", None)
-
-    if prefix_id:
-        payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
-
-    return await send_post_request(
-        url=f"{url}/v1/completions",
-        payload=json.dumps(payload),
+    return await send_model_request(
+        request,
+        payload["model"],
+        url_idx,
+        "/v1/completions",
+        payload,
         stream=payload.get("stream", False),
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
         metadata=metadata,
     )
@@ -1547,21 +1544,13 @@ async def generate_openai_chat_completion(
     if ":" not in payload["model"]:
         payload["model"] = f"{payload['model']}:latest"
 
-    url, url_idx = await get_ollama_url(request, payload["model"], url_idx)
-    api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
-        str(url_idx),
-        request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
-    )
-
-    prefix_id = api_config.get("prefix_id", None)
-    if prefix_id:
-        payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
-
-    return await send_post_request(
-        url=f"{url}/v1/chat/completions",
-        payload=json.dumps(payload),
+    return await send_model_request(
+        request,
+        payload["model"],
+        url_idx,
+        "/v1/chat/completions",
+        payload,
         stream=payload.get("stream", False),
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
         metadata=metadata,
     )
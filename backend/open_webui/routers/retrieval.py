@@ -6,9 +6,10 @@ import shutil
 import asyncio
 
 import uuid
+import itertools
 from datetime import datetime
 from pathlib import Path
-from typing import Iterator, List, Optional, Sequence, Union
+from typing import Callable, Iterator, List, Optional, Sequence, Union
 
 from fastapi import (
     Depends,
@@ -75,9 +76,12 @@ from open_webui.retrieval.utils import (
     get_model_path,
     query_collection,
     query_collection_with_hybrid_search,
+    get_collection_result_for_hybrid_search,
+    iter_pipeline,
     query_doc,
     query_doc_with_hybrid_search,
 )
+from open_webui.retrieval.bm25 import BM25_INDEX
 from open_webui.retrieval.vector.utils import filter_metadata
 from open_webui.utils.misc import (
     calculate_sha256_string,
@@ -94,6 +98,9 @@ from open_webui.config import (
     DEFAULT_LOCALE,
     RAG_EMBEDDING_CONTENT_PREFIX,
     RAG_EMBEDDING_QUERY_PREFIX,
+    ENABLE_RAG_BM25_INDEX,
+    RAG_INGEST_BATCH_SIZE,
+    RAG_INGEST_QUEUE_SIZE,
 )
 from open_webui.env import (
     SRC_LOG_LEVELS,
@@ -1210,6 +1217,7 @@ def save_docs_to_vector_db(
     split: bool = True,
     add: bool = False,
     user=None,
+    on_progress: Optional[Callable[[dict], None]] = None,
 ) -> bool:
     def _get_docs_info(docs: list[Document]) -> str:
         docs_info = set()
@@ -1244,6 +1252,9 @@ def save_docs_to_vector_db(
                 log.info(f"Document with hash {metadata['hash']} already exists")
                 raise ValueError(ERROR_MESSAGES.DUPLICATE_CONTENT)
 
+    # Documents are split, embedded and inserted in batches of RAG_INGEST_BATCH_SIZE
+    # chunks, the stages run in their own threads with bounded queues in between
+    # so memory stays flat and chunks are searchable as soon as they are inserted
     if split:
         if request.app.state.config.TEXT_SPLITTER in ["", "character"]:
             text_splitter = RecursiveCharacterTextSplitter(
@@ -1251,7 +1262,7 @@ def save_docs_to_vector_db(
                 chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
                 add_start_index=True,
             )
-            docs = text_splitter.split_documents(docs)
+            split_doc = lambda doc: text_splitter.split_documents([doc])
         elif request.app.state.config.TEXT_SPLITTER == "token":
             log.info(
                 f"Using token text splitter: {request.app.state.config.TIKTOKEN_ENCODING_NAME}"
@@ -1264,7 +1275,7 @@ def save_docs_to_vector_db(
                 chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
                 add_start_index=True,
             )
-            docs = text_splitter.split_documents(docs)
+            split_doc = lambda doc: text_splitter.split_documents([doc])
         elif request.app.state.config.TEXT_SPLITTER == "markdown_header":
             log.info("Using markdown header text splitter")
 
@@ -1282,18 +1293,18 @@ def save_docs_to_vector_db(
                 headers_to_split_on=headers_to_split_on,
                 strip_headers=False,  # Keep headers in content for context
             )
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=request.app.state.config.CHUNK_SIZE,
+                chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
+                add_start_index=True,
+            )
 
-            md_split_docs = []
-            for doc in docs:
+            def split_doc(doc):
                 md_header_splits = markdown_splitter.split_text(doc.page_content)
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=request.app.state.config.CHUNK_SIZE,
-                    chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                    add_start_index=True,
-                )
                 md_header_splits = text_splitter.split_documents(md_header_splits)
 
                 # Convert back to Document objects, preserving original metadata
+                md_split_docs = []
                 for split_chunk in md_header_splits:
                     headings_list = []
                     # Extract header values in order based on headers_to_split_on
@@ -1309,33 +1320,37 @@ def save_docs_to_vector_db(
                             metadata={**doc.metadata, "headings": headings_list},
                         )
                     )
+                return md_split_docs
 
-            docs = md_split_docs
         else:
             raise ValueError(ERROR_MESSAGES.DEFAULT("Invalid text splitter"))
+    else:
+        split_doc = lambda doc: [doc]
 
-    if len(docs) == 0:
+    def split_batches():
+        batch = []
+        for doc in docs:
+            for chunk in split_doc(doc):
+                batch.append(chunk)
+                if len(batch) >= RAG_INGEST_BATCH_SIZE:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    batches = split_batches()
+    first_batch = next(batches, None)
+    if first_batch is None:
         raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
 
-    texts = [doc.page_content for doc in docs]
-    metadatas = [
-        {
-            **doc.metadata,
-            **(metadata if metadata else {}),
-            "embedding_config": {
-                "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
-                "model": request.app.state.config.RAG_EMBEDDING_MODEL,
-            },
-        }
-        for doc in docs
-    ]
-
+    inserted_ids = []
     try:
         if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name):
             log.info(f"collection {collection_name} already exists")
 
             if overwrite:
                 VECTOR_DB_CLIENT.delete_collection(collection_name=collection_name)
+                BM25_INDEX.delete_collection(collection_name)
                 log.info(f"deleting existing collection {collection_name}")
             elif add is False:
                 log.info(
@@ -1374,36 +1389,101 @@ def save_docs_to_vector_db(
             ),
         )
 
-        embeddings = embedding_function(
-            list(map(lambda x: x.replace("\n", " "), texts)),
-            prefix=RAG_EMBEDDING_CONTENT_PREFIX,
-            user=user,
-        )
-        log.info(f"embeddings generated {len(embeddings)} for {len(texts)} items")
-
-        items = [
-            {
-                "id": str(uuid.uuid4()),
-                "text": text,
-                "vector": embeddings[idx],
-                "metadata": metadatas[idx],
-            }
-            for idx, text in enumerate(texts)
-        ]
+        def embed_batch(batch: list[Document]) -> list[dict]:
+            texts = [doc.page_content for doc in batch]
+            embeddings = embedding_function(
+                list(map(lambda x: x.replace("\n", " "), texts)),
+                prefix=RAG_EMBEDDING_CONTENT_PREFIX,
+                user=user,
+            )
+            if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+                raise ValueError(
+                    f"Embeddings generated for {len(embeddings or [])} of {len(texts)} items"
+                )
+            log.debug(f"embeddings generated {len(embeddings)} for {len(texts)} items")
+
+            return [
+                {
+                    "id": str(uuid.uuid4()),
+                    "text": text,
+                    "vector": embeddings[idx],
+                    "metadata": {
+                        **batch[idx].metadata,
+                        **(metadata if metadata else {}),
+                        # Identifies the chunk across collections when merging results
+                        "chunk_hash": calculate_sha256_string(text),
+                        "embedding_config": {
+                            "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
+                            "model": request.app.state.config.RAG_EMBEDDING_MODEL,
+                        },
+                    },
+                }
+                for idx, text in enumerate(texts)
+            ]
 
-        log.info(f"adding to collection {collection_name}")
-        VECTOR_DB_CLIENT.insert(
-            collection_name=collection_name,
-            items=items,
-        )
+        for batch_idx, items in enumerate(
+            iter_pipeline(
+                itertools.chain([first_batch], batches),
+                [embed_batch],
+                RAG_INGEST_QUEUE_SIZE,
+            )
+        ):
+            VECTOR_DB_CLIENT.insert(
+                collection_name=collection_name,
+                items=items,
+            )
+
+            if ENABLE_RAG_BM25_INDEX:
+                # Collections without an index get one on their first hybrid search
+                BM25_INDEX.insert(
+                    collection_name,
+                    [
+                        {
+                            "id": item["id"],
+                            "text": item["text"],
+                            "metadata": item["metadata"],
+                        }
+                        for item in items
+                    ],
+                )
+
+            inserted_ids.extend(item["id"] for item in items)
+            log.info(
+                f"added batch {batch_idx + 1} of {len(items)} items to collection {collection_name}"
+            )
+            if on_progress:
+                on_progress({"batch": batch_idx + 1, "items": len(inserted_ids)})
 
-        log.info(f"added {len(items)} items to collection {collection_name}")
+        log.info(f"added {len(inserted_ids)} items to collection {collection_name}")
         return True
     except Exception as e:
         log.exception(e)
+
+        # Do not leave a partially ingested document behind
+        if inserted_ids:
+            try:
+                VECTOR_DB_CLIENT.delete(
+                    collection_name=collection_name, ids=inserted_ids
+                )
+                BM25_INDEX.delete(collection_name, ids=inserted_ids)
+            except Exception as delete_error:
+                log.exception(f"Error removing partially added items: {delete_error}")
         raise e
 
 
+def get_file_index_marker(request: Request, hash: Optional[str]) -> dict:
+    """
+    Recorded in the "indexed" meta of a file by collection name once all of its
+    chunks are saved, for the reindexing to skip the files indexed from their
+    current content and embedding model
+    """
+    return {
+        "hash": hash,
+        "embedding_engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
+        "embedding_model": request.app.state.config.RAG_EMBEDDING_MODEL,
+    }
+
+
 class ProcessFileForm(BaseModel):
     file_id: str
     content: Optional[str] = None
@@ -1438,6 +1518,7 @@ def process_file(
                     VECTOR_DB_CLIENT.delete_collection(
                         collection_name=f"file-{file.id}"
                     )
+                    BM25_INDEX.delete_collection(f"file-{file.id}")
                 except:
                     # Audio file upload pipeline
                     pass
@@ -1577,6 +1658,15 @@ def process_file(
                     "content": text_content,
                 }
             else:
+                # Until all the chunks are saved, which may be interrupted
+                indexed = {
+                    name: marker
+                    for name, marker in (file.meta or {}).get("indexed", {}).items()
+                    if name != collection_name
+                }
+                if indexed != (file.meta or {}).get("indexed", {}):
+                    Files.update_file_metadata_by_id(file.id, {"indexed": indexed})
+
                 try:
                     result = save_docs_to_vector_db(
                         request,
@@ -1589,6 +1679,9 @@ def process_file(
                         },
                         add=(True if form_data.collection_name else False),
                         user=user,
+                        on_progress=lambda progress: Files.update_file_data_by_id(
+                            file.id, {"progress": progress}
+                        ),
                     )
                     log.info(f"added {len(docs)} items to collection {collection_name}")
 
@@ -1597,6 +1690,12 @@ def process_file(
                             file.id,
                             {
                                 "collection_name": collection_name,
+                                "indexed": {
+                                    **indexed,
+                                    collection_name: get_file_index_marker(
+                                        request, hash
+                                    ),
+                                },
                             },
                         )
 
@@ -2186,8 +2285,8 @@ def query_doc_handler(
             form_data.hybrid is None or form_data.hybrid
         ):
             collection_results = {}
-            collection_results[form_data.collection_name] = VECTOR_DB_CLIENT.get(
-                collection_name=form_data.collection_name
+            collection_results[form_data.collection_name] = (
+                get_collection_result_for_hybrid_search(form_data.collection_name)
             )
             return query_doc_with_hybrid_search(
                 collection_name=form_data.collection_name,
@@ -2327,6 +2426,7 @@ def delete_entries_from_collection(form_data: DeleteForm, user=Depends(get_admin
                 collection_name=form_data.collection_name,
                 metadata={"hash": hash},
             )
+            BM25_INDEX.delete(form_data.collection_name, filter={"hash": hash})
             return {"status": True}
         else:
             return {"status": False}
@@ -2338,6 +2438,7 @@ def delete_entries_from_collection(form_data: DeleteForm, user=Depends(get_admin
 @router.post("/reset/db")
 def reset_vector_db(user=Depends(get_admin_user)):
     VECTOR_DB_CLIENT.reset()
+    BM25_INDEX.reset()
     Knowledges.delete_all_knowledge()
 
 
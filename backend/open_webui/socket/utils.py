@@ -1,4 +1,5 @@
 import json
+import time
 import uuid
 from open_webui.utils.redis import get_redis_connection
 from open_webui.env import REDIS_KEY_PREFIX
@@ -46,66 +47,241 @@ class RedisLock:
             self.redis.delete(self.lock_name)
 
 
-class RedisDict:
-    def __init__(self, name, redis_url, redis_sentinels=[], redis_cluster=False):
-        self.name = name
-        self.redis = get_redis_connection(
-            redis_url,
-            redis_sentinels,
-            redis_cluster=redis_cluster,
-            decode_responses=True,
-        )
+class LocalCache:
+    """Short lived local copies of values read from Redis"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._values = {}
+
+    def get(self, key):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    def set(self, key, value):
+        if self.ttl > 0:
+            self._values[key] = (time.monotonic() + self.ttl, value)
+
+    def delete(self, key):
+        self._values.pop(key, None)
+
+
+class SessionPool:
+    """Users of the connected socket sessions, by session id"""
+
+    def __init__(
+        self,
+        redis=None,
+        redis_key: str = f"{REDIS_KEY_PREFIX}:session_pool",
+        cache_ttl: float = 0,
+    ):
+        self._sessions = {}
+        self._redis = redis
+        self._redis_key = redis_key
+        self._cache = LocalCache(cache_ttl)
+
+    async def set(self, sid: str, user: dict):
+        if self._redis:
+            await self._redis.hset(self._redis_key, sid, json.dumps(user))
+            self._cache.set(sid, user)
+        else:
+            self._sessions[sid] = user
+
+    async def get(self, sid: str) -> Optional[dict]:
+        if self._redis:
+            user = self._cache.get(sid)
+            if user is None:
+                value = await self._redis.hget(self._redis_key, sid)
+                if value is None:
+                    return None
+
+                user = json.loads(value)
+                self._cache.set(sid, user)
+            return user
+        else:
+            return self._sessions.get(sid)
+
+    async def get_many(self, sids: list[str]) -> list[Optional[dict]]:
+        if self._redis:
+            if not sids:
+                return []
+            values = await self._redis.hmget(self._redis_key, sids)
+            return [json.loads(value) if value else None for value in values]
+        else:
+            return [self._sessions.get(sid) for sid in sids]
+
+    async def delete(self, sid: str) -> Optional[dict]:
+        """Remove a session and return its user"""
+        if self._redis:
+            self._cache.delete(sid)
+
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.hget(self._redis_key, sid)
+            pipe.hdel(self._redis_key, sid)
+            value, _ = await pipe.execute()
+            return json.loads(value) if value else None
+        else:
+            return self._sessions.pop(sid, None)
+
+
+class UserPool:
+    """
+    Socket sessions of the connected users, a set of session ids per user in
+    Redis along with the set of connected user ids.
+    """
 
-    def __setitem__(self, key, value):
-        serialized_value = json.dumps(value)
-        self.redis.hset(self.name, key, serialized_value)
+    def __init__(
+        self,
+        redis=None,
+        redis_key_prefix: str = f"{REDIS_KEY_PREFIX}:user_pool",
+        cache_ttl: float = 0,
+        sync_redis=None,
+    ):
+        self._users = {}
+        self._redis = redis
+        self._sync_redis = sync_redis
+        self._redis_key_prefix = redis_key_prefix
+        self._redis_users_key = f"{redis_key_prefix}:users"
+        self._cache = LocalCache(cache_ttl)
+
+    def _get_user_key(self, user_id: str) -> str:
+        return f"{self._redis_key_prefix}:user:{user_id}"
+
+    async def add(self, user_id: str, sid: str):
+        if self._redis:
+            self._cache.delete(user_id)
+
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.sadd(self._get_user_key(user_id), sid)
+            pipe.sadd(self._redis_users_key, user_id)
+            await pipe.execute()
+        else:
+            self._users.setdefault(user_id, set()).add(sid)
+
+    async def remove(self, user_id: str, sid: str):
+        if self._redis:
+            self._cache.delete(user_id)
+
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.srem(self._get_user_key(user_id), sid)
+            pipe.scard(self._get_user_key(user_id))
+            _, remaining = await pipe.execute()
+
+            if remaining == 0:
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.srem(self._redis_users_key, user_id)
+                pipe.scard(self._get_user_key(user_id))
+                _, remaining = await pipe.execute()
+
+                # The user connected again meanwhile
+                if remaining > 0:
+                    await self._redis.sadd(self._redis_users_key, user_id)
+        else:
+            sids = self._users.get(user_id)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._users[user_id]
+
+    async def get_session_ids(self, user_id: str) -> set[str]:
+        if self._redis:
+            sids = self._cache.get(user_id)
+            if sids is None:
+                sids = set(await self._redis.smembers(self._get_user_key(user_id)))
+                self._cache.set(user_id, sids)
+            return sids
+        else:
+            return set(self._users.get(user_id, set()))
 
-    def __getitem__(self, key):
-        value = self.redis.hget(self.name, key)
-        if value is None:
-            raise KeyError(key)
-        return json.loads(value)
+    async def get_user_ids(self) -> list[str]:
+        if self._redis:
+            return list(await self._redis.smembers(self._redis_users_key))
+        else:
+            return list(self._users.keys())
 
-    def __delitem__(self, key):
-        result = self.redis.hdel(self.name, key)
-        if result == 0:
-            raise KeyError(key)
+    async def contains(self, user_id: str) -> bool:
+        return len(await self.get_session_ids(user_id)) > 0
 
-    def __contains__(self, key):
-        return self.redis.hexists(self.name, key)
+    def count(self) -> int:
+        """Number of connected users, for callers outside of the event loop"""
+        if self._redis:
+            return self._sync_redis.scard(self._redis_users_key)
+        else:
+            return len(self._users)
 
-    def __len__(self):
-        return self.redis.hlen(self.name)
 
-    def keys(self):
-        return self.redis.hkeys(self.name)
+class UsagePool:
+    """Last usage time of the models by socket session, per model"""
 
-    def values(self):
-        return [json.loads(v) for v in self.redis.hvals(self.name)]
+    def __init__(
+        self,
+        redis=None,
+        redis_key_prefix: str = f"{REDIS_KEY_PREFIX}:usage_pool",
+    ):
+        self._usage = {}
+        self._redis = redis
+        self._redis_key_prefix = redis_key_prefix
+        self._redis_models_key = f"{redis_key_prefix}:models"
 
-    def items(self):
-        return [(k, json.loads(v)) for k, v in self.redis.hgetall(self.name).items()]
+    def _get_model_key(self, model_id: str) -> str:
+        return f"{self._redis_key_prefix}:model:{model_id}"
 
-    def get(self, key, default=None):
-        try:
-            return self[key]
-        except KeyError:
-            return default
+    async def update(self, model_id: str, sid: str, updated_at: int):
+        if self._redis:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.hset(self._get_model_key(model_id), sid, updated_at)
+            pipe.sadd(self._redis_models_key, model_id)
+            await pipe.execute()
+        else:
+            self._usage.setdefault(model_id, {})[sid] = updated_at
 
-    def clear(self):
-        self.redis.delete(self.name)
+    async def get_model_ids(self) -> list[str]:
+        if self._redis:
+            return list(await self._redis.smembers(self._redis_models_key))
+        else:
+            return list(self._usage.keys())
 
-    def update(self, other=None, **kwargs):
-        if other is not None:
-            for k, v in other.items() if hasattr(other, "items") else other:
-                self[k] = v
-        for k, v in kwargs.items():
-            self[k] = v
+    async def remove_expired(self, expires_before: int):
+        """Remove the usage of sessions not updated since expires_before"""
+        model_ids = await self.get_model_ids()
 
-    def setdefault(self, key, default=None):
-        if key not in self:
-            self[key] = default
-        return self[key]
+        if self._redis:
+            pipe = self._redis.pipeline(transaction=False)
+            for model_id in model_ids:
+                pipe.hgetall(self._get_model_key(model_id))
+            usages = await pipe.execute()
+
+            pipe = self._redis.pipeline(transaction=False)
+            for model_id, usage in zip(model_ids, usages):
+                expired_sids = [
+                    sid
+                    for sid, updated_at in usage.items()
+                    if int(updated_at) < expires_before
+                ]
+                if expired_sids:
+                    pipe.hdel(self._get_model_key(model_id), *expired_sids)
+                if len(expired_sids) == len(usage):
+                    pipe.srem(self._redis_models_key, model_id)
+            await pipe.execute()
+        else:
+            for model_id in model_ids:
+                usage = self._usage[model_id]
+                for sid in [
+                    sid
+                    for sid, updated_at in usage.items()
+                    if updated_at < expires_before
+                ]:
+                    del usage[sid]
+
+                if not usage:
+                    del self._usage[model_id]
 
 
 class YdocManager:
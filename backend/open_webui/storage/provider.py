@@ -1,12 +1,18 @@
 import os
 import shutil
 import json
+import hashlib
 import logging
 import re
+import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Tuple, Dict
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable, Optional, Tuple, Dict
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 from botocore.exceptions import ClientError
 from open_webui.config import (
@@ -24,6 +30,7 @@ from open_webui.config import (
     AZURE_STORAGE_ENDPOINT,
     AZURE_STORAGE_CONTAINER_NAME,
     AZURE_STORAGE_KEY,
+    STORAGE_CACHE_MAX_SIZE_MB,
     STORAGE_PROVIDER,
     UPLOAD_DIR,
 )
@@ -40,6 +47,171 @@ log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MAIN"])
 
 
+# Uploads are streamed through buffers of these sizes, never read whole in memory
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Parts of the S3 multipart uploads, S3 requires at least 5MB
+S3_MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+# Chunks of the GCS resumable uploads, a multiple of 256KB
+GCS_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# Blocks of the Azure block blob uploads
+AZURE_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def write_file(file: BinaryIO, file_path: str) -> Dict[str, Any]:
+    """
+    Copy a file in chunks to file_path, returns its size and SHA-256 hash.
+    Raises ValueError for an empty file.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(file_path, "wb") as f:
+        while chunk := file.read(UPLOAD_CHUNK_SIZE):
+            f.write(chunk)
+            sha256.update(chunk)
+            size += len(chunk)
+
+    if not size:
+        os.remove(file_path)
+        raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+    return {"size": size, "hash": sha256.hexdigest()}
+
+
+class StorageCache:
+    """
+    The local copies of remote objects in UPLOAD_DIR, by object key with the
+    version (ETag or generation) of the object they were downloaded from. A
+    copy is reused for as long as the object is unchanged, concurrent
+    downloads of an object are done once and the least recently used copies
+    are removed beyond max_size bytes.
+
+    The copies found in the directory on startup count towards max_size and are
+    removed first. The limit is per process: the copies other workers make
+    after startup are not counted, so with several workers it is best-effort.
+    """
+
+    # Copies returned less than that many seconds ago are not removed, their
+    # caller may not have opened them yet
+    EVICTION_GRACE_PERIOD = 60
+
+    def __init__(self, max_size: int, directory: Optional[str] = None):
+        self.max_size = max_size
+        # key -> {"version", "path", "size", "accessed_at"}, least recently used first
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Downloads of the keys hashing to the same lock are serialized
+        self._download_locks = [threading.Lock() for _ in range(64)]
+
+        if directory:
+            self._load(directory)
+
+    def _load(self, directory: str) -> None:
+        """Count the copies left in the directory by a previous run"""
+        try:
+            files = []
+            for entry in os.scandir(directory):
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(".part"):
+                    # Interrupted download
+                    os.remove(entry.path)
+                    continue
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        except Exception as e:
+            log.warning(f"Error listing the local copies in {directory}: {e}")
+            return
+
+        with self._lock:
+            # Their versions are unknown, keyed by path until replaced
+            for _, path, size in sorted(files):
+                self._entries[path] = {
+                    "version": None,
+                    "path": path,
+                    "size": size,
+                    "accessed_at": 0.0,
+                }
+                self._size += size
+            self._evict()
+
+    def get(
+        self,
+        key: str,
+        version: str,
+        local_file_path: str,
+        download: Callable[[str], None],
+    ) -> str:
+        """The local copy of an object, download(path) fetches it when missing"""
+        with self._download_locks[hash(key) % len(self._download_locks)]:
+            with self._lock:
+                entry = self._entries.get(key)
+                if (
+                    entry
+                    and entry["version"] == version
+                    and os.path.isfile(entry["path"])
+                ):
+                    entry["accessed_at"] = time.time()
+                    self._entries.move_to_end(key)
+                    return entry["path"]
+
+            # Downloaded next to the copy, readers never see a partial file
+            temp_file_path = f"{local_file_path}.{uuid.uuid4().hex}.part"
+            try:
+                download(temp_file_path)
+                os.replace(temp_file_path, local_file_path)
+            finally:
+                if os.path.exists(temp_file_path):
+                    os.remove(temp_file_path)
+
+            self.put(key, version, local_file_path)
+            return local_file_path
+
+    def put(self, key: str, version: str, local_file_path: str) -> None:
+        """Record the local copy of an object, e.g. the one kept on upload"""
+        size = os.path.getsize(local_file_path)
+        with self._lock:
+            for previous_key in (key, local_file_path):
+                entry = self._entries.pop(previous_key, None)
+                if entry:
+                    self._size -= entry["size"]
+            self._entries[key] = {
+                "version": version,
+                "path": local_file_path,
+                "size": size,
+                "accessed_at": time.time(),
+            }
+            self._size += size
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove the least recently used copies beyond max_size, with the lock held"""
+        now = time.time()
+        while self._size > self.max_size and self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry["accessed_at"] < self.EVICTION_GRACE_PERIOD:
+                # So are all the more recently used ones
+                break
+
+            del self._entries[key]
+            self._size -= entry["size"]
+            try:
+                if os.path.isfile(entry["path"]):
+                    os.remove(entry["path"])
+            except OSError as e:
+                log.warning(f"Error removing the local copy {entry['path']}: {e}")
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._size -= entry["size"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
 class StorageProvider(ABC):
     @abstractmethod
     def get_file(self, file_path: str) -> str:
@@ -48,7 +220,8 @@ class StorageProvider(ABC):
     @abstractmethod
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[Dict[str, Any], str]:
+        """Store a file, returns its size and hash with the path it is stored at"""
         pass
 
     @abstractmethod
@@ -64,14 +237,10 @@ class LocalStorageProvider(StorageProvider):
     @staticmethod
     def upload_file(
         file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
-        contents = file.read()
-        if not contents:
-            raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+    ) -> Tuple[Dict[str, Any], str]:
         file_path = f"{UPLOAD_DIR}/{filename}"
-        with open(file_path, "wb") as f:
-            f.write(contents)
-        return contents, file_path
+        file_info = write_file(file, file_path)
+        return file_info, file_path
 
     @staticmethod
     def get_file(file_path: str) -> str:
@@ -140,6 +309,13 @@ class S3StorageProvider(StorageProvider):
         self.bucket_name = S3_BUCKET_NAME
         self.key_prefix = S3_KEY_PREFIX if S3_KEY_PREFIX else ""
 
+        # Larger files are sent as multipart uploads, read from disk part by part
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=S3_MULTIPART_CHUNK_SIZE,
+        )
+        self.cache = StorageCache(STORAGE_CACHE_MAX_SIZE_MB * 1024 * 1024, UPLOAD_DIR)
+
     @staticmethod
     def sanitize_tag_value(s: str) -> str:
         """Only include S3 allowed characters."""
@@ -147,12 +323,14 @@ class S3StorageProvider(StorageProvider):
 
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[Dict[str, Any], str]:
         """Handles uploading of the file to S3 storage."""
-        _, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        file_info, file_path = LocalStorageProvider.upload_file(file, filename, tags)
         s3_key = os.path.join(self.key_prefix, filename)
         try:
-            self.s3_client.upload_file(file_path, self.bucket_name, s3_key)
+            self.s3_client.upload_file(
+                file_path, self.bucket_name, s3_key, Config=self.transfer_config
+            )
             if S3_ENABLE_TAGGING and tags:
                 sanitized_tags = {
                     self.sanitize_tag_value(k): self.sanitize_tag_value(v)
@@ -168,10 +346,12 @@ class S3StorageProvider(StorageProvider):
                     Key=s3_key,
                     Tagging=tagging,
                 )
-            return (
-                open(file_path, "rb").read(),
-                f"s3://{self.bucket_name}/{s3_key}",
-            )
+
+            etag = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)[
+                "ETag"
+            ]
+            self.cache.put(s3_key, etag, file_path)
+            return file_info, f"s3://{self.bucket_name}/{s3_key}"
         except ClientError as e:
             raise RuntimeError(f"Error uploading file to S3: {e}")
 
@@ -179,9 +359,17 @@ class S3StorageProvider(StorageProvider):
         """Handles downloading of the file from S3 storage."""
         try:
             s3_key = self._extract_s3_key(file_path)
-            local_file_path = self._get_local_file_path(s3_key)
-            self.s3_client.download_file(self.bucket_name, s3_key, local_file_path)
-            return local_file_path
+            etag = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)[
+                "ETag"
+            ]
+            return self.cache.get(
+                s3_key,
+                etag,
+                self._get_local_file_path(s3_key),
+                lambda path: self.s3_client.download_file(
+                    self.bucket_name, s3_key, path, Config=self.transfer_config
+                ),
+            )
         except ClientError as e:
             raise RuntimeError(f"Error downloading file from S3: {e}")
 
@@ -190,6 +378,7 @@ class S3StorageProvider(StorageProvider):
         try:
             s3_key = self._extract_s3_key(file_path)
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=s3_key)
+            self.cache.remove(s3_key)
         except ClientError as e:
             raise RuntimeError(f"Error deleting file from S3: {e}")
 
@@ -213,6 +402,7 @@ class S3StorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting all files from S3: {e}")
 
         # Always delete from local storage
+        self.cache.clear()
         LocalStorageProvider.delete_all_files()
 
     # The s3 key is the name assigned to an object. It excludes the bucket name, but includes the internal path and the file name.
@@ -237,16 +427,19 @@ class GCSStorageProvider(StorageProvider):
             # if running on a Compute Engine instance, credentials would be from Google Metadata server
             self.gcs_client = storage.Client()
         self.bucket = self.gcs_client.bucket(GCS_BUCKET_NAME)
+        self.cache = StorageCache(STORAGE_CACHE_MAX_SIZE_MB * 1024 * 1024, UPLOAD_DIR)
 
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[Dict[str, Any], str]:
         """Handles uploading of the file to GCS storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        file_info, file_path = LocalStorageProvider.upload_file(file, filename, tags)
         try:
-            blob = self.bucket.blob(filename)
+            # A resumable upload, sent chunk by chunk
+            blob = self.bucket.blob(filename, chunk_size=GCS_UPLOAD_CHUNK_SIZE)
             blob.upload_from_filename(file_path)
-            return contents, "gs://" + self.bucket_name + "/" + filename
+            self.cache.put(filename, str(blob.generation), file_path)
+            return file_info, "gs://" + self.bucket_name + "/" + filename
         except GoogleCloudError as e:
             raise RuntimeError(f"Error uploading file to GCS: {e}")
 
@@ -254,11 +447,16 @@ class GCSStorageProvider(StorageProvider):
         """Handles downloading of the file from GCS storage."""
         try:
             filename = file_path.removeprefix("gs://").split("/")[1]
-            local_file_path = f"{UPLOAD_DIR}/{filename}"
             blob = self.bucket.get_blob(filename)
-            blob.download_to_filename(local_file_path)
-
-            return local_file_path
+            if blob is None:
+                raise NotFound(f"{file_path} not found")
+
+            return self.cache.get(
+                filename,
+                str(blob.generation),
+                f"{UPLOAD_DIR}/{filename}",
+                blob.download_to_filename,
+            )
         except NotFound as e:
             raise RuntimeError(f"Error downloading file from GCS: {e}")
 
@@ -268,6 +466,7 @@ class GCSStorageProvider(StorageProvider):
             filename = file_path.removeprefix("gs://").split("/")[1]
             blob = self.bucket.get_blob(filename)
             blob.delete()
+            self.cache.remove(filename)
         except NotFound as e:
             raise RuntimeError(f"Error deleting file from GCS: {e}")
 
@@ -286,6 +485,7 @@ class GCSStorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting all files from GCS: {e}")
 
         # Always delete from local storage
+        self.cache.clear()
         LocalStorageProvider.delete_all_files()
 
 
@@ -298,27 +498,39 @@ class AzureStorageProvider(StorageProvider):
         if storage_key:
             # Configure using the Azure Storage Account Endpoint and Key
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=storage_key
+                account_url=self.endpoint,
+                credential=storage_key,
+                max_block_size=AZURE_BLOCK_SIZE,
+                max_single_put_size=AZURE_BLOCK_SIZE,
             )
         else:
             # Configure using the Azure Storage Account Endpoint and DefaultAzureCredential
             # If the key is not configured, then the DefaultAzureCredential will be used to support Managed Identity authentication
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=DefaultAzureCredential()
+                account_url=self.endpoint,
+                credential=DefaultAzureCredential(),
+                max_block_size=AZURE_BLOCK_SIZE,
+                max_single_put_size=AZURE_BLOCK_SIZE,
             )
         self.container_client = self.blob_service_client.get_container_client(
             self.container_name
         )
+        self.cache = StorageCache(STORAGE_CACHE_MAX_SIZE_MB * 1024 * 1024, UPLOAD_DIR)
 
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[Dict[str, Any], str]:
         """Handles uploading of the file to Azure Blob Storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        file_info, file_path = LocalStorageProvider.upload_file(file, filename, tags)
         try:
             blob_client = self.container_client.get_blob_client(filename)
-            blob_client.upload_blob(contents, overwrite=True)
-            return contents, f"{self.endpoint}/{self.container_name}/{filename}"
+            # Staged block by block from the file, then committed
+            with open(file_path, "rb") as f:
+                result = blob_client.upload_blob(
+                    f, length=file_info["size"], overwrite=True
+                )
+            self.cache.put(filename, result["etag"], file_path)
+            return file_info, f"{self.endpoint}/{self.container_name}/{filename}"
         except Exception as e:
             raise RuntimeError(f"Error uploading file to Azure Blob Storage: {e}")
 
@@ -326,11 +538,18 @@ class AzureStorageProvider(StorageProvider):
         """Handles downloading of the file from Azure Blob Storage."""
         try:
             filename = file_path.split("/")[-1]
-            local_file_path = f"{UPLOAD_DIR}/{filename}"
             blob_client = self.container_client.get_blob_client(filename)
-            with open(local_file_path, "wb") as download_file:
-                download_file.write(blob_client.download_blob().readall())
-            return local_file_path
+
+            def download(path: str):
+                with open(path, "wb") as download_file:
+                    blob_client.download_blob().readinto(download_file)
+
+            return self.cache.get(
+                filename,
+                blob_client.get_blob_properties().etag,
+                f"{UPLOAD_DIR}/{filename}",
+                download,
+            )
         except ResourceNotFoundError as e:
             raise RuntimeError(f"Error downloading file from Azure Blob Storage: {e}")
 
@@ -340,6 +559,7 @@ class AzureStorageProvider(StorageProvider):
             filename = file_path.split("/")[-1]
             blob_client = self.container_client.get_blob_client(filename)
             blob_client.delete_blob()
+            self.cache.remove(filename)
         except ResourceNotFoundError as e:
             raise RuntimeError(f"Error deleting file from Azure Blob Storage: {e}")
 
@@ -356,6 +576,7 @@ class AzureStorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting all files from Azure Blob Storage: {e}")
 
         # Always delete from local storage
+        self.cache.clear()
         LocalStorageProvider.delete_all_files()
 
 
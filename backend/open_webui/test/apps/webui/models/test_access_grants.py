@@ -0,0 +1,215 @@
+import importlib.util
+import itertools
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+# Importing the config runs the migrations of the test database
+import open_webui.config  # noqa: F401
+from open_webui.internal.db import get_db
+from open_webui.models.access_grants import (
+    AccessGrant,
+    AccessGrants,
+    GroupMember,
+    get_access_grants,
+)
+from open_webui.models.knowledge import Knowledge
+from open_webui.utils.access_control import has_access
+
+ACCESS_CONTROLS = [
+    # Public
+    None,
+    # Private
+    {},
+    {"read": {"group_ids": ["g1"], "user_ids": []}},
+    {
+        "read": {"group_ids": [], "user_ids": ["u2"]},
+        "write": {"group_ids": ["g2"], "user_ids": []},
+    },
+    {"write": {"group_ids": [], "user_ids": ["u1"]}},
+    {
+        "read": {"group_ids": ["g1", "g2"], "user_ids": ["u3"]},
+        "write": {"group_ids": ["g1"], "user_ids": ["u3"]},
+    },
+]
+
+USER_GROUP_IDS = {
+    "owner": set(),
+    "u1": {"g1"},
+    "u2": {"g2"},
+    "u3": set(),
+    "u4": {"g1", "g2"},
+}
+
+
+@pytest.fixture
+def knowledge_bases():
+    ids = [f"test-access-{i}" for i in range(len(ACCESS_CONTROLS))]
+    with get_db() as db:
+        for id, access_control in zip(ids, ACCESS_CONTROLS):
+            db.add(
+                Knowledge(
+                    id=id,
+                    user_id="owner",
+                    name=id,
+                    description="",
+                    access_control=access_control,
+                    created_at=0,
+                    updated_at=0,
+                )
+            )
+            AccessGrants.set_access_control(db, "knowledge", id, access_control)
+        for group_id in ["g1", "g2"]:
+            AccessGrants.set_group_members(
+                db,
+                group_id,
+                [
+                    user_id
+                    for user_id, group_ids in USER_GROUP_IDS.items()
+                    if group_id in group_ids
+                ],
+            )
+        db.commit()
+
+    yield ids
+
+    with get_db() as db:
+        db.query(Knowledge).filter(Knowledge.id.in_(ids)).delete()
+        AccessGrants.delete_by_resource_ids(db, "knowledge", ids)
+        AccessGrants.delete_group_members(db, ["g1", "g2"])
+        db.commit()
+
+
+@pytest.mark.parametrize(
+    "user_id,permission",
+    list(itertools.product(USER_GROUP_IDS, ["read", "write"])),
+)
+def test_access_filter_matches_has_access(knowledge_bases, user_id, permission):
+    with get_db() as db:
+        ids = {
+            id
+            for (id,) in db.query(Knowledge.id).filter(
+                Knowledge.id.in_(knowledge_bases),
+                AccessGrants.get_access_filter(
+                    "knowledge", Knowledge.id, Knowledge.user_id, user_id, permission
+                ),
+            )
+        }
+
+    expected = {
+        id
+        for id, access_control in zip(knowledge_bases, ACCESS_CONTROLS)
+        if user_id == "owner"
+        or has_access(
+            user_id,
+            type=permission,
+            access_control=access_control,
+            user_group_ids=USER_GROUP_IDS[user_id],
+        )
+    }
+    assert ids == expected
+
+
+def test_set_access_control_replaces_grants(knowledge_bases):
+    id = knowledge_bases[0]
+    with get_db() as db:
+        AccessGrants.set_access_control(
+            db, "knowledge", id, {"write": {"user_ids": ["u1"]}}
+        )
+        db.commit()
+        grants = db.query(AccessGrant).filter_by(resource_id=id).all()
+
+    assert [(g.permission, g.principal_type, g.principal_id) for g in grants] == [
+        ("write", "user", "u1")
+    ]
+
+
+def load_migration():
+    path = next(
+        Path(open_webui.config.OPEN_WEBUI_DIR / "migrations" / "versions").glob(
+            "d4e1b7a9c3f2_*.py"
+        )
+    )
+    spec = importlib.util.spec_from_file_location("migration", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration
+
+
+def test_migration_grants_match_model():
+    migration = load_migration()
+    for access_control in ACCESS_CONTROLS:
+        assert migration.get_access_grants(access_control) == get_access_grants(
+            access_control
+        )
+
+
+def test_migration_backfill():
+    migration = load_migration()
+    engine = sa.create_engine("sqlite://")
+    metadata = sa.MetaData()
+    sa.Table(
+        "group",
+        metadata,
+        sa.Column("id", sa.Text, primary_key=True),
+        sa.Column("user_ids", sa.JSON),
+    )
+    for table_name, id_column in migration.RESOURCE_TABLES.values():
+        sa.Table(
+            table_name,
+            metadata,
+            sa.Column(id_column, sa.Text, primary_key=True),
+            sa.Column("access_control", sa.JSON),
+        )
+
+    with engine.begin() as conn:
+        metadata.create_all(conn)
+        conn.execute(
+            metadata.tables["group"].insert(),
+            [
+                {"id": "g1", "user_ids": ["u1", "u4", "u1"]},
+                {"id": "g2", "user_ids": None},
+            ],
+        )
+        conn.execute(
+            metadata.tables["knowledge"].insert(),
+            [
+                {"id": f"k{i}", "access_control": access_control}
+                for i, access_control in enumerate(ACCESS_CONTROLS)
+            ],
+        )
+        conn.execute(
+            metadata.tables["prompt"].insert(),
+            [{"command": "/hello", "access_control": None}],
+        )
+
+        with Operations.context(MigrationContext.configure(conn)):
+            migration.upgrade()
+
+        members = conn.execute(
+            sa.select(GroupMember.group_id, GroupMember.user_id).order_by(
+                GroupMember.group_id, GroupMember.user_id
+            )
+        ).all()
+        grants = conn.execute(
+            sa.select(
+                AccessGrant.resource_type,
+                AccessGrant.resource_id,
+                AccessGrant.permission,
+                AccessGrant.principal_type,
+                AccessGrant.principal_id,
+            )
+        ).all()
+
+    assert members == [("g1", "u1"), ("g1", "u4")]
+    assert sorted(grants) == sorted(
+        [
+            ("knowledge", f"k{i}", *grant)
+            for i, access_control in enumerate(ACCESS_CONTROLS)
+            for grant in get_access_grants(access_control)
+        ]
+        + [("prompt", "/hello", "read", "public", "")]
+    )
@@ -0,0 +1,99 @@
+import pytest
+
+# Importing the config runs the migrations of the test database
+import open_webui.config  # noqa: F401
+from open_webui.internal.db import get_db
+from open_webui.models.chat_search import ChatSearchEntry, get_chat_search_entries
+from open_webui.models.chats import ChatForm, Chats
+
+USER_ID = "search-user"
+
+
+def get_chat(title, *contents):
+    return {
+        "title": title,
+        "history": {
+            "messages": {
+                f"m{idx}": {"id": f"m{idx}", "content": content}
+                for idx, content in enumerate(contents)
+            }
+        },
+    }
+
+
+@pytest.fixture
+def chats():
+    chats = [
+        Chats.insert_new_chat(USER_ID, ChatForm(chat=chat))
+        for chat in [
+            get_chat("Travel plans", "Where to go in Portugal?", "Try Lisbon"),
+            get_chat("Recipes", "How do I bake bread?"),
+            get_chat("Python help", "Sorting a list", "Use sorted()"),
+        ]
+    ]
+    yield [chat.id for chat in chats]
+    Chats.delete_chats_by_user_id(USER_ID)
+
+
+def search(text):
+    return [
+        chat.title for chat in Chats.get_chats_by_user_id_and_search_text(USER_ID, text)
+    ]
+
+
+def get_entries(chat_id):
+    with get_db() as db:
+        return {
+            (entry.message_id, entry.title, entry.content)
+            for entry in db.query(ChatSearchEntry).filter_by(chat_id=chat_id)
+        }
+
+
+def test_search_titles_and_messages(chats):
+    assert search("recipes") == ["Recipes"]
+    assert search("bread") == ["Recipes"]
+    # Words match as prefixes, in different messages of a chat
+    assert search("lisb portugal") == ["Travel plans"]
+    assert search("sort python") == ["Python help"]
+    assert search("bread lisbon") == []
+    assert sorted(search("")) == ["Python help", "Recipes", "Travel plans"]
+
+
+def test_updates_reindex_the_changed_messages(chats):
+    chat_id = chats[1]
+    Chats.update_chat_by_id(
+        chat_id, get_chat("Baking", "How do I bake bread?", "Use sourdough")
+    )
+
+    assert get_entries(chat_id) == {
+        ("", "Baking", ""),
+        ("m0", None, "How do I bake bread?"),
+        ("m1", None, "Use sourdough"),
+    }
+    assert search("sourdough") == ["Baking"]
+    assert search("recipes") == []
+
+    chat = get_chat("Baking", "How do I bake bread?", "Use rye")
+    Chats.update_chat_by_id(chat_id, chat, message_id="m1")
+    assert search("rye") == ["Baking"]
+    assert search("sourdough") == []
+
+
+def test_deleted_chats_are_not_indexed(chats):
+    Chats.delete_chat_by_id(chats[0])
+
+    assert get_entries(chats[0]) == set()
+    assert search("lisbon") == []
+
+
+def test_search_entries_of_older_chats():
+    chat = {
+        "title": "Old",
+        "messages": [{"content": "a"}, {"content": [{"type": "text", "text": "b"}]}],
+    }
+
+    assert get_chat_search_entries(chat) == [
+        ("", "Old", ""),
+        ("0", None, "a"),
+        ("1", None, "b"),
+    ]
@@ -0,0 +1,125 @@
+import pytest
+
+# Importing the config runs the migrations of the test database
+import open_webui.config  # noqa: F401
+from open_webui.internal.db import get_db
+from open_webui.models import chats
+from open_webui.models.chats import ChatForm, ChatMessageDelta, Chats
+
+
+@pytest.fixture
+def delta_log(monkeypatch):
+    monkeypatch.setattr(chats, "ENABLE_CHAT_MESSAGE_DELTA_LOG", True)
+    monkeypatch.setattr(chats, "CHAT_MESSAGE_DELTA_COMPACTION_THRESHOLD", 1000)
+
+    chat = Chats.insert_new_chat(
+        "user-1",
+        ChatForm(
+            chat={
+                "title": "Chat",
+                "history": {
+                    "messages": {"m1": {"id": "m1", "content": "hello"}},
+                    "currentId": "m1",
+                },
+            }
+        ),
+    )
+    yield chat.id
+    Chats.delete_chat_by_id(chat.id)
+
+
+def count_deltas(chat_id):
+    with get_db() as db:
+        return db.query(ChatMessageDelta).filter_by(chat_id=chat_id).count()
+
+
+def test_message_deltas_replay(delta_log):
+    chat_id = delta_log
+    Chats.upsert_message_to_chat_by_id_and_message_id(
+        chat_id, "m2", {"id": "m2", "content": "wor"}
+    )
+    Chats.upsert_message_to_chat_by_id_and_message_id(
+        chat_id, "m2", {"content": "world"}
+    )
+    Chats.add_message_status_to_chat_by_id_and_message_id(
+        chat_id, "m2", {"action": "web_search"}
+    )
+    # A status of a message that is not saved yet
+    Chats.add_message_status_to_chat_by_id_and_message_id(
+        chat_id, "m3", {"action": "queued"}
+    )
+
+    assert count_deltas(chat_id) == 4
+    history = Chats.get_chat_by_id(chat_id).chat["history"]
+    assert history["currentId"] == "m2"
+    assert history["messages"]["m1"] == {"id": "m1", "content": "hello"}
+    assert history["messages"]["m2"] == {
+        "id": "m2",
+        "content": "world",
+        "statusHistory": [{"action": "web_search"}],
+    }
+    assert history["messages"]["m3"] == {
+        "id": "m3",
+        "statusHistory": [{"action": "queued"}],
+    }
+    assert Chats.get_message_by_id_and_message_id(chat_id, "m2") == (
+        history["messages"]["m2"]
+    )
+
+
+def test_message_deltas_compaction(delta_log, monkeypatch):
+    chat_id = delta_log
+    monkeypatch.setattr(chats, "CHAT_MESSAGE_DELTA_COMPACTION_THRESHOLD", 3)
+
+    for i in range(2):
+        Chats.upsert_message_to_chat_by_id_and_message_id(
+            chat_id, "m2", {"id": "m2", "content": "x" * (i + 1)}
+        )
+    assert count_deltas(chat_id) == 2
+
+    # The third delta reaches the threshold and folds all of them into the chat
+    Chats.add_message_status_to_chat_by_id_and_message_id(
+        chat_id, "m2", {"action": "done"}
+    )
+    assert count_deltas(chat_id) == 0
+
+    with get_db() as db:
+        stored = db.get(chats.Chat, chat_id).chat
+    assert stored["history"]["messages"]["m2"] == {
+        "id": "m2",
+        "content": "xx",
+        "statusHistory": [{"action": "done"}],
+    }
+
+    # The counter starts over after the compaction
+    Chats.upsert_message_to_chat_by_id_and_message_id(chat_id, "m2", {"content": "xxx"})
+    assert count_deltas(chat_id) == 1
+
+
+def test_full_update_supersedes_deltas(delta_log):
+    chat_id = delta_log
+    Chats.upsert_message_to_chat_by_id_and_message_id(
+        chat_id, "m2", {"id": "m2", "content": "world"}
+    )
+
+    chat = Chats.get_chat_by_id(chat_id).chat
+    chat["title"] = "Renamed"
+    Chats.update_chat_by_id(chat_id, chat)
+
+    assert count_deltas(chat_id) == 0
+    chat = Chats.get_chat_by_id(chat_id)
+    assert chat.title == "Renamed"
+    assert chat.chat["history"]["messages"]["m2"]["content"] == "world"
+
+
+def test_delta_log_disabled(delta_log, monkeypatch):
+    chat_id = delta_log
+    monkeypatch.setattr(chats, "ENABLE_CHAT_MESSAGE_DELTA_LOG", False)
+
+    Chats.upsert_message_to_chat_by_id_and_message_id(
+        chat_id, "m2", {"id": "m2", "content": "world"}
+    )
+
+    assert count_deltas(chat_id) == 0
+    history = Chats.get_chat_by_id(chat_id).chat["history"]
+    assert history["messages"]["m2"] == {"id": "m2", "content": "world"}
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from open_webui.retrieval import embedding_cache, utils
+from open_webui.retrieval.embedding_cache import EmbeddingCache
+
+
+class FakeModel:
+    def __init__(self, drop=0):
+        self.calls = []
+        self.drop = drop
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        embeddings = [[float(len(text)), float(ord(text[0]))] for text in texts]
+        return np.array(embeddings[: len(embeddings) - self.drop])
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = EmbeddingCache(8)
+    monkeypatch.setattr(utils, "EMBEDDING_CACHE", cache)
+    return cache
+
+
+def get_function(model):
+    return utils.get_embedding_function("", "model", model, None, None, 8)
+
+
+def test_missing_texts_are_embedded_once(cache):
+    model = FakeModel()
+    embed = get_function(model)
+
+    assert embed(["a", "bb", "a"]) == [[1.0, 97.0], [2.0, 98.0], [1.0, 97.0]]
+    assert embed(["bb", "ccc"]) == [[2.0, 98.0], [3.0, 99.0]]
+    assert embed("ccc") == [3.0, 99.0]
+    assert model.calls == [["a", "bb"], ["ccc"]]
+
+
+def test_keys_depend_on_the_model_and_prefix(cache):
+    key = EmbeddingCache.get_key("", "model", None, "a")
+
+    assert key == EmbeddingCache.get_key("", "model", "", "a")
+    assert key != EmbeddingCache.get_key("", "other", None, "a")
+    assert key != EmbeddingCache.get_key("", "model", "query: ", "a")
+    assert key != EmbeddingCache.get_key("ollama", "model", None, "a")
+    assert key != EmbeddingCache.get_key("", "model", None, "b")
+
+
+def test_partial_responses_are_not_cached(cache):
+    embed = get_function(FakeModel(drop=1))
+
+    assert embed(["a", "bb"]) is None
+    assert cache.get_many(
+        [EmbeddingCache.get_key("", "model", None, text) for text in ["a", "bb"]]
+    ) == [None, None]
+
+
+def test_least_recent_embeddings_are_evicted():
+    cache = EmbeddingCache(2)
+
+    cache.set_many({"a": [1.0], "b": [2.0]})
+    assert cache.get_many(["a"]) == [[1.0]]
+    cache.set_many({"c": [3.0]})
+
+    assert cache.get_many(["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+def test_disk_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(embedding_cache, "RAG_EMBEDDING_CACHE_DIR", str(tmp_path))
+
+    EmbeddingCache(2, "disk").set_many({"a": [0.5, 1.5]})
+
+    # A new process reads the embeddings back from the file
+    cache = EmbeddingCache(2, "disk")
+    assert cache.get_many(["a", "b"]) == [[0.5, 1.5], None]
+    assert cache._cache["a"].dtype == np.float32
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+
+import aiohttp
+import pytest
+
+from open_webui.retrieval import embeddings
+from open_webui.retrieval.embeddings import EmbeddingClient
+
+
+class FakeResponse:
+    def __init__(self, status, data=None, headers=None):
+        self.status = status
+        self.data = data
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(None, (), status=self.status)
+
+    async def json(self, content_type=None):
+        return self.data
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def post(self, url, headers=None, json=None):
+        self.requests.append((url, json))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    delays = []
+    sleep = asyncio.sleep
+
+    async def record(delay):
+        delays.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(embeddings.asyncio, "sleep", record)
+    monkeypatch.setattr(embeddings, "RAG_EMBEDDING_MAX_RETRIES", 2)
+    return delays
+
+
+def get_client(*responses):
+    client = EmbeddingClient()
+    session = FakeSession(responses)
+    client._get_session = lambda: session
+    return client, session
+
+
+@pytest.mark.asyncio
+async def test_retries_rate_limits_and_server_errors(delays):
+    client, session = get_client(
+        FakeResponse(429, headers={"Retry-After": "3"}),
+        FakeResponse(503),
+        FakeResponse(200, {"data": [[0.1]]}),
+    )
+
+    assert await client.post("http://e", {}, {"input": ["a"]}) == {"data": [[0.1]]}
+    assert len(session.requests) == 3
+    # Retry-After is followed, otherwise the backoff is jittered
+    assert delays[0] == 3.0
+    assert 0.5 <= delays[1] <= 1.0
+
+
+@pytest.mark.asyncio
+async def test_retries_connection_errors(delays):
+    client, session = get_client(
+        aiohttp.ClientConnectionError("reset"),
+        FakeResponse(200, {"data": [[0.1]]}),
+    )
+
+    assert await client.post("http://e", {}, {}) == {"data": [[0.1]]}
+    assert len(delays) == 1
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_the_retries(delays):
+    client, session = get_client(
+        FakeResponse(503), FakeResponse(503), FakeResponse(503)
+    )
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        await client.post("http://e", {}, {})
+    assert len(session.requests) == 3
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(delays):
+    client, session = get_client(FakeResponse(400), FakeResponse(200, {}))
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        await client.post("http://e", {}, {})
+    assert len(session.requests) == 1
+    assert delays == []
+
+
+def test_run_from_threads():
+    client = EmbeddingClient()
+    loops = []
+    results = []
+
+    async def work(i):
+        loops.append(asyncio.get_running_loop())
+        await asyncio.sleep(0)
+        return i
+
+    threads = [
+        threading.Thread(target=lambda i=i: results.append(client.run(work(i))))
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # All the callers share the loop, and so the session, of the client
+    assert sorted(results) == [0, 1, 2, 3]
+    assert len(set(loops)) == 1
+    client.close()
+    assert client._loop is None
@@ -0,0 +1,118 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from open_webui.retrieval import utils
+
+
+def test_merge_and_sort_query_results():
+    result = utils.merge_and_sort_query_results(
+        [
+            {"documents": [], "metadatas": [], "distances": []},
+            {
+                "documents": [["a", "b"]],
+                "metadatas": [[{"i": 0}, {"i": 1}]],
+                "distances": [[0.2, 0.9]],
+            },
+        ],
+        k=5,
+    )
+    assert result == {
+        "distances": [[0.9, 0.2]],
+        "documents": [["b", "a"]],
+        "metadatas": [[{"i": 1}, {"i": 0}]],
+    }
+
+
+def test_merge_and_sort_query_results_duplicates():
+    result = utils.merge_and_sort_query_results(
+        [
+            {
+                "ids": [["1", "2", "3"]],
+                "documents": [["a", "b", "b"]],
+                "metadatas": [[{"chunk_hash": "ha"}, {"i": 2}, {"i": 3}]],
+                "distances": [[0.5, 0.4, 0.3]],
+            },
+            {
+                "ids": [["4", "2"]],
+                "documents": [["a", "b"]],
+                "metadatas": [[{"chunk_hash": "ha", "i": 4}, {"i": 5}]],
+                "distances": [[0.8, 0.1]],
+            },
+        ],
+        k=5,
+    )
+
+    # Same hash or same id is the same chunk, the best distance wins. Equal
+    # text alone is not, different chunks may have the same content.
+    assert result == {
+        "distances": [[0.8, 0.4, 0.3]],
+        "documents": [["a", "b", "b"]],
+        "metadatas": [[{"chunk_hash": "ha", "i": 4}, {"i": 2}, {"i": 3}]],
+    }
+
+
+def test_hybrid_search_missing_collection(monkeypatch):
+    vector_db_client = MagicMock()
+    # The get() of most vector databases returns None for a missing collection
+    vector_db_client.get.return_value = None
+    monkeypatch.setattr(utils, "VECTOR_DB_CLIENT", vector_db_client)
+    monkeypatch.setattr(utils, "ENABLE_RAG_BM25_INDEX", False)
+    query_doc = MagicMock()
+    monkeypatch.setattr(utils, "query_doc_with_hybrid_search", query_doc)
+
+    result = utils.query_collection_with_hybrid_search(
+        collection_names=["missing"],
+        queries=["query"],
+        embedding_function=None,
+        k=5,
+        reranking_function=None,
+        k_reranker=5,
+        r=0.0,
+        hybrid_bm25_weight=0.5,
+    )
+
+    query_doc.assert_not_called()
+    assert result == {"distances": [[]], "documents": [[]], "metadatas": [[]]}
+
+
+def test_iter_pipeline():
+    result = utils.iter_pipeline(range(5), [lambda x: x + 1, lambda x: x * 10])
+    assert list(result) == [10, 20, 30, 40, 50]
+
+
+def test_iter_pipeline_backpressure():
+    produced = []
+
+    def source():
+        for item in range(100):
+            produced.append(item)
+            yield item
+
+    result = utils.iter_pipeline(source(), [lambda x: x])
+    assert next(result) == 0
+    time.sleep(0.2)
+    # Only a few items are buffered between the stages
+    assert len(produced) <= 5
+    result.close()
+
+
+def test_iter_pipeline_errors():
+    def fail(item):
+        if item == 2:
+            raise ValueError("stage failed")
+        return item
+
+    result = utils.iter_pipeline(range(5), [fail])
+    assert next(result) == 0
+    assert next(result) == 1
+    with pytest.raises(ValueError, match="stage failed"):
+        next(result)
+
+    def source():
+        yield 1
+        raise RuntimeError("source failed")
+
+    with pytest.raises(RuntimeError, match="source failed"):
+        list(utils.iter_pipeline(source(), [lambda x: x]))
@@ -1,3 +1,4 @@
+import hashlib
 import io
 import os
 import boto3
@@ -66,13 +67,29 @@ class TestLocalStorageProvider:
 
     def test_upload_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        contents, file_path = self.Storage.upload_file(self.file_bytesio, self.filename)
+        file_info, file_path = self.Storage.upload_file(
+            self.file_bytesio, self.filename
+        )
         assert (upload_dir / self.filename).exists()
         assert (upload_dir / self.filename).read_bytes() == self.file_content
-        assert contents == self.file_content
+        assert file_info == {
+            "size": len(self.file_content),
+            "hash": hashlib.sha256(self.file_content).hexdigest(),
+        }
         assert file_path == str(upload_dir / self.filename)
         with pytest.raises(ValueError):
-            self.Storage.upload_file(self.file_bytesio_empty, self.filename)
+            self.Storage.upload_file(self.file_bytesio_empty, self.filename_extra)
+        assert not (upload_dir / self.filename_extra).exists()
+
+    def test_upload_file_in_chunks(self, monkeypatch, tmp_path):
+        upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        monkeypatch.setattr(provider, "UPLOAD_CHUNK_SIZE", 4)
+        file = MagicMock(wraps=io.BytesIO(self.file_content))
+
+        file_info, _ = self.Storage.upload_file(file, self.filename)
+        assert all(call.args == (4,) for call in file.read.call_args_list)
+        assert (upload_dir / self.filename).read_bytes() == self.file_content
+        assert file_info["hash"] == hashlib.sha256(self.file_content).hexdigest()
 
     def test_get_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
@@ -97,6 +114,47 @@ class TestLocalStorageProvider:
         assert not (upload_dir / self.filename_extra).exists()
 
 
+def test_storage_cache_eviction(monkeypatch, tmp_path):
+    monkeypatch.setattr(provider.StorageCache, "EVICTION_GRACE_PERIOD", 0)
+    cache = provider.StorageCache(max_size=10)
+    for name in ("a", "b", "c"):
+        (tmp_path / name).write_bytes(b"12345")
+        cache.put(name, "1", str(tmp_path / name))
+    # The least recently used copy is removed beyond max_size
+    assert not (tmp_path / "a").exists()
+    assert (tmp_path / "b").exists() and (tmp_path / "c").exists()
+
+    download = MagicMock(side_effect=lambda path: open(path, "wb").write(b"12345"))
+    assert cache.get("b", "1", str(tmp_path / "b"), download) == str(tmp_path / "b")
+    assert download.call_count == 0
+    cache.get("c", "2", str(tmp_path / "c"), download)
+    assert download.call_count == 1
+
+
+def test_storage_cache_eviction_grace_period(tmp_path):
+    cache = provider.StorageCache(max_size=5)
+    for name in ("a", "b"):
+        (tmp_path / name).write_bytes(b"12345")
+        cache.put(name, "1", str(tmp_path / name))
+    # Copies just returned may still be opened by their caller
+    assert (tmp_path / "a").exists() and (tmp_path / "b").exists()
+
+
+def test_storage_cache_load(monkeypatch, tmp_path):
+    monkeypatch.setattr(provider.StorageCache, "EVICTION_GRACE_PERIOD", 0)
+    (tmp_path / "old").write_bytes(b"12345")
+    (tmp_path / "new.part").write_bytes(b"12345")
+    cache = provider.StorageCache(max_size=10, directory=str(tmp_path))
+    # Interrupted downloads are removed
+    assert not (tmp_path / "new.part").exists()
+    # The copies of a previous run count towards max_size
+    for name in ("a", "b"):
+        (tmp_path / name).write_bytes(b"12345")
+        cache.put(name, "1", str(tmp_path / name))
+    assert not (tmp_path / "old").exists()
+    assert (tmp_path / "a").exists() and (tmp_path / "b").exists()
+
+
 @mock_aws
 class TestS3StorageProvider:
 
@@ -116,7 +174,7 @@ class TestS3StorageProvider:
         with pytest.raises(Exception):
             self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
         self.s3_client.create_bucket(Bucket=self.Storage.bucket_name)
-        contents, s3_file_path = self.Storage.upload_file(
+        file_info, s3_file_path = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
         )
         object = self.s3_client.Object(self.Storage.bucket_name, self.filename)
@@ -124,7 +182,7 @@ class TestS3StorageProvider:
         # local checks
         assert (upload_dir / self.filename).exists()
         assert (upload_dir / self.filename).read_bytes() == self.file_content
-        assert contents == self.file_content
+        assert file_info["size"] == len(self.file_content)
         assert s3_file_path == "s3://" + self.Storage.bucket_name + "/" + self.filename
         with pytest.raises(ValueError):
             self.Storage.upload_file(self.file_bytesio_empty, self.filename)
@@ -132,17 +190,39 @@ class TestS3StorageProvider:
     def test_get_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
         self.s3_client.create_bucket(Bucket=self.Storage.bucket_name)
-        contents, s3_file_path = self.Storage.upload_file(
+        _, s3_file_path = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
         )
         file_path = self.Storage.get_file(s3_file_path)
         assert file_path == str(upload_dir / self.filename)
         assert (upload_dir / self.filename).exists()
 
+    def test_get_file_cached(self, monkeypatch, tmp_path):
+        upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        self.s3_client.create_bucket(Bucket=self.Storage.bucket_name)
+        _, s3_file_path = self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.filename
+        )
+        download_file = MagicMock(wraps=self.Storage.s3_client.download_file)
+        monkeypatch.setattr(self.Storage.s3_client, "download_file", download_file)
+        # The copy kept on upload is reused
+        self.Storage.get_file(s3_file_path)
+        assert download_file.call_count == 0
+        # Until the object changes
+        self.s3_client.Object(self.Storage.bucket_name, self.filename).put(
+            Body=b"new content"
+        )
+        file_path = self.Storage.get_file(s3_file_path)
+        assert file_path == str(upload_dir / self.filename)
+        assert download_file.call_count == 1
+        assert (upload_dir / self.filename).read_bytes() == b"new content"
+        self.Storage.get_file(s3_file_path)
+        assert download_file.call_count == 1
+
     def test_delete_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
         self.s3_client.create_bucket(Bucket=self.Storage.bucket_name)
-        contents, s3_file_path = self.Storage.upload_file(
+        _, s3_file_path = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
         )
         assert (upload_dir / self.filename).exists()
@@ -229,7 +309,7 @@ class TestGCSStorageProvider:
         with pytest.raises(Exception):
             self.Storage.bucket = monkeypatch(self.Storage, "bucket", None)
             self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
-        contents, gcs_file_path = self.Storage.upload_file(
+        file_info, gcs_file_path = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
         )
         object = self.Storage.bucket.get_blob(self.filename)
@@ -237,7 +317,7 @@ class TestGCSStorageProvider:
         # local checks
         assert (upload_dir / self.filename).exists()
         assert (upload_dir / self.filename).read_bytes() == self.file_content
-        assert contents == self.file_content
+        assert file_info["size"] == len(self.file_content)
         assert gcs_file_path == "gs://" + self.Storage.bucket_name + "/" + self.filename
         # test error if file is empty
         with pytest.raises(ValueError):
@@ -245,7 +325,7 @@ class TestGCSStorageProvider:
 
     def test_get_file(self, monkeypatch, tmp_path, setup):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        contents, gcs_file_path = self.Storage.upload_file(
+        _, gcs_file_path = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
         )
         file_path = self.Storage.get_file(gcs_file_path)
@@ -254,7 +334,7 @@ class TestGCSStorageProvider:
 
     def test_delete_file(self, monkeypatch, tmp_path, setup):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        contents, gcs_file_path = self.Storage.upload_file(
+        _, gcs_file_path = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
         )
         # ensure that local directory has the uploaded file as well
@@ -348,16 +428,18 @@ class TestAzureStorageProvider:
         # Reset side effect and create container
         self.Storage.container_client.get_blob_client.side_effect = None
         self.Storage.create_container()
-        contents, azure_file_path = self.Storage.upload_file(
+        file_info, azure_file_path = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
         )
 
         # Assertions
         self.Storage.container_client.get_blob_client.assert_called_with(self.filename)
-        self.Storage.container_client.get_blob_client().upload_blob.assert_called_once_with(
-            self.file_content, overwrite=True
+        self.Storage.container_client.get_blob_client().upload_blob.assert_called_once()
+        _, kwargs = (
+            self.Storage.container_client.get_blob_client().upload_blob.call_args
         )
-        assert contents == self.file_content
+        assert kwargs == {"length": len(self.file_content), "overwrite": True}
+        assert file_info["size"] == len(self.file_content)
         assert (
             azure_file_path
             == f"https://myaccount.blob.core.windows.net/{self.Storage.container_name}/{self.filename}"
@@ -375,7 +457,7 @@ class TestAzureStorageProvider:
         # Mock upload behavior
         self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
         # Mock blob download behavior
-        self.Storage.container_client.get_blob_client().download_blob().readall.return_value = (
+        self.Storage.container_client.get_blob_client().download_blob().readinto.side_effect = lambda f: f.write(
             self.file_content
         )
 
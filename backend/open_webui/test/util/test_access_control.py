@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+import pytest
+
+from open_webui.utils import access_control
+from open_webui.utils.access_control import (
+    PRINCIPAL_CACHE,
+    PrincipalCache,
+    get_permissions,
+    get_user_group_ids,
+)
+from open_webui.utils.invalidation import INVALIDATION_BUS
+
+
+@pytest.fixture
+def groups(monkeypatch):
+    groups = {"u": [SimpleNamespace(id="g1", permissions={"chat": {"edit": True}})]}
+    loads = []
+
+    def get_groups_by_member_id(user_id):
+        loads.append(user_id)
+        return list(groups.get(user_id, []))
+
+    monkeypatch.setattr(
+        access_control.Groups, "get_groups_by_member_id", get_groups_by_member_id
+    )
+    PRINCIPAL_CACHE.clear()
+    yield groups, loads
+    PRINCIPAL_CACHE.clear()
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(access_control.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(access_control, "PRINCIPAL_CACHE_TTL", 10)
+    return now
+
+
+def test_groups_are_loaded_once(groups):
+    groups, loads = groups
+
+    assert get_user_group_ids("u") == {"g1"}
+    assert get_user_group_ids("u") == {"g1"}
+    assert get_user_group_ids("v") == set()
+    assert loads == ["u", "v"]
+
+
+def test_group_changes_drop_the_entries(groups):
+    groups, loads = groups
+    assert get_user_group_ids("u") == {"g1"}
+
+    groups["u"].append(SimpleNamespace(id="g2", permissions={}))
+    INVALIDATION_BUS.invalidate("group", "g2", publish=False)
+
+    assert get_user_group_ids("u") == {"g1", "g2"}
+    assert loads == ["u", "u"]
+
+
+def test_entries_expire(groups, now):
+    groups, loads = groups
+    assert get_user_group_ids("u") == {"g1"}
+
+    now[0] += 9
+    assert get_user_group_ids("u") == {"g1"}
+    assert loads == ["u"]
+
+    now[0] += 1
+    assert get_user_group_ids("u") == {"g1"}
+    assert loads == ["u", "u"]
+
+
+def test_permissions_are_copies(groups):
+    default_permissions = {"chat": {"edit": False, "delete": False}}
+
+    permissions = get_permissions("u", default_permissions)
+    assert permissions == {"chat": {"edit": True, "delete": False}}
+
+    permissions["chat"]["delete"] = True
+    assert get_permissions("u", default_permissions) == {
+        "chat": {"edit": True, "delete": False}
+    }
+
+    # Other default permissions are merged separately
+    assert get_permissions("u", {"chat": {"edit": False, "share": True}}) == {
+        "chat": {"edit": True, "share": True}
+    }
+
+
+def test_least_recent_entries_are_evicted(monkeypatch):
+    monkeypatch.setattr(PrincipalCache, "MAX_SIZE", 2)
+    cache = PrincipalCache()
+    loads = []
+
+    def load(key):
+        def load():
+            loads.append(key)
+            return key
+
+        return load
+
+    cache.get(("a",), load("a"))
+    cache.get(("b",), load("b"))
+    cache.get(("a",), load("a"))
+    cache.get(("c",), load("c"))
+    cache.get(("a",), load("a"))
+    cache.get(("b",), load("b"))
+    assert loads == ["a", "b", "c", "b"]
@@ -0,0 +1,180 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import HTTPException
+
+from open_webui.utils import balancer
+from open_webui.utils.balancer import UpstreamBalancer
+
+
+def test_choose_lowest_latency():
+    upstream = UpstreamBalancer()
+    for node, latency in [("a", 2.0), ("b", 0.5)]:
+        start = upstream.acquire(node)
+        upstream.record(node, start - latency, ok=True)
+        upstream.release(node)
+
+    assert upstream.choose(["a", "b"]) == "b"
+    assert upstream.choose(["a", "b"], exclude=["b"]) == "a"
+    assert upstream.choose(["a", "b"], exclude=["a", "b"]) is None
+
+
+def test_choose_by_requests_in_flight():
+    upstream = UpstreamBalancer()
+    for node in ["a", "b"]:
+        upstream.record(node, upstream.acquire(node) - 1.0, ok=True)
+        upstream.release(node)
+
+    # 1s times 3 requests in flight costs more than 1s times 1
+    upstream.acquire("a")
+    upstream.acquire("a")
+    assert upstream.choose(["a", "b"]) == "b"
+
+    upstream.release("a")
+    upstream.release("a")
+    upstream.acquire("b")
+    assert upstream.choose(["a", "b"]) == "a"
+
+
+def test_choose_loaded_model():
+    upstream = UpstreamBalancer()
+    upstream.set_loaded({"llama3:8b": {"b": time.time() + 60}})
+
+    # Without timings, the node the model is loaded on wins
+    assert upstream.choose(["a", "b"], "llama3:8b") == "b"
+    assert upstream.choose(["a", "b"], "llama3:8b", exclude=["b"]) == "a"
+
+    # Once the model expired on "b", the faster node wins
+    upstream.set_loaded({"llama3:8b": {"b": time.time() - 1}})
+    for node, latency in [("a", 0.1), ("b", 1.0)]:
+        upstream.record(node, upstream.acquire(node) - latency, ok=True)
+        upstream.release(node)
+    assert upstream.choose(["a", "b"], "llama3:8b") == "a"
+
+
+def test_circuit_breaker(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(balancer.time, "time", lambda: now[0])
+    upstream = UpstreamBalancer(failure_threshold=2, cooldown=30)
+    upstream.set_loaded({"m": {"a": now[0] + 600}})
+
+    upstream.record("a", upstream.acquire("a"), ok=False)
+    upstream.release("a")
+    assert upstream.choose(["a", "b"], "m") == "a"
+
+    # Open after the second failure in a row, "a" is skipped for the cooldown
+    upstream.record("a", upstream.acquire("a"), ok=False)
+    upstream.release("a")
+    assert upstream.choose(["a", "b"], "m") == "b"
+    now[0] += 29
+    assert upstream.choose(["a", "b"], "m") == "b"
+
+    # With every node open, one of them still gets the request
+    assert upstream.choose(["a"], "m") == "a"
+
+    # Half-open after the cooldown, a single trial request goes to "a"
+    now[0] += 2
+    assert upstream.choose(["a", "b"], "m") == "a"
+    assert upstream.choose(["a", "b"], "m") == "b"
+
+    # A successful trial closes it again
+    upstream.record("a", upstream.acquire("a"), ok=True)
+    upstream.release("a")
+    assert upstream.choose(["a", "b"], "m") == "a"
+    assert upstream.choose(["a", "b"], "m") == "a"
+
+
+def test_circuit_breaker_failed_trial(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(balancer.time, "time", lambda: now[0])
+    upstream = UpstreamBalancer(failure_threshold=1, cooldown=30)
+    upstream.set_loaded({"m": {"a": now[0] + 600}})
+
+    upstream.record("a", upstream.acquire("a"), ok=False)
+    now[0] += 31
+    assert upstream.choose(["a", "b"], "m") == "a"
+
+    # The trial fails, the node opens for another cooldown
+    upstream.record("a", upstream.acquire("a"), ok=False)
+    now[0] += 29
+    assert upstream.choose(["a", "b"], "m") == "b"
+
+
+def get_request():
+    config = SimpleNamespace(
+        OLLAMA_BASE_URLS=["http://a", "http://b"],
+        OLLAMA_API_CONFIGS={},
+    )
+    state = SimpleNamespace(
+        config=config, OLLAMA_MODELS={"llama3:8b": {"urls": [0, 1]}}
+    )
+    return SimpleNamespace(app=SimpleNamespace(state=state))
+
+
+@pytest.mark.asyncio
+async def test_ollama_send_model_request(monkeypatch):
+    from open_webui.routers import ollama
+
+    upstream = UpstreamBalancer()
+    upstream.set_loaded({"llama3:8b": {"http://a": time.time() + 60}})
+    monkeypatch.setattr(ollama, "OLLAMA_BALANCER", upstream)
+
+    calls = []
+
+    async def send_post_request(url, payload, **kwargs):
+        calls.append(url)
+        # Requests in flight are counted until the response
+        assert upstream._nodes[url.rsplit("/api", 1)[0]].outstanding == 1
+        if url.startswith("http://a"):
+            raise HTTPException(status_code=502, detail="Bad gateway")
+        return {"embeddings": [[0.0]]}
+
+    monkeypatch.setattr(ollama, "send_post_request", send_post_request)
+
+    response = await ollama.send_model_request(
+        get_request(),
+        "llama3:8b",
+        None,
+        "/api/embed",
+        {"model": "llama3:8b", "input": "hi"},
+        stream=False,
+    )
+
+    # The failed node is recorded and the request goes to the other one
+    assert response == {"embeddings": [[0.0]]}
+    assert calls == ["http://a/api/embed", "http://b/api/embed"]
+    assert upstream._nodes["http://a"].failures == 1
+    assert upstream._nodes["http://a"].outstanding == 0
+    assert upstream._nodes["http://b"].outstanding == 0
+    assert upstream._nodes["http://b"].latency is not None
+
+
+@pytest.mark.asyncio
+async def test_ollama_embed_uses_balancer(monkeypatch):
+    from open_webui.routers import ollama
+
+    monkeypatch.setattr(ollama, "get_all_models", AsyncMock())
+    send_model_request = AsyncMock(return_value={"embeddings": []})
+    monkeypatch.setattr(ollama, "send_model_request", send_model_request)
+
+    request = get_request()
+    await ollama.embed(
+        request, ollama.GenerateEmbedForm(model="llama3:8b", input="hi"), user=None
+    )
+    await ollama.embeddings(
+        request,
+        ollama.GenerateEmbeddingsForm(model="llama3:8b", prompt="hi"),
+        user=None,
+    )
+    await ollama.show_model_info(
+        request, ollama.ModelNameForm(model="llama3:8b"), user=None
+    )
+
+    assert [call.args[3] for call in send_model_request.call_args_list] == [
+        "/api/embed",
+        "/api/embeddings",
+        "/api/show",
+    ]
+    assert send_model_request.call_args_list[2].kwargs["loads_model"] is False
@@ -0,0 +1,123 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from open_webui.utils import chat_save
+
+
+@pytest.fixture
+def chats(monkeypatch):
+    chats = MagicMock()
+    monkeypatch.setattr(chat_save, "Chats", chats)
+    return chats
+
+
+def test_apply_chat_message_events(chats):
+    chats.get_message_by_id_and_message_id.return_value = {"content": "a"}
+
+    chat_save.apply_chat_message_events(
+        "chat",
+        "message",
+        [
+            {"type": "message", "data": {"content": "b"}},
+            {"type": "status", "data": {"action": "search"}},
+            {"type": "message", "data": {"content": "c"}},
+            {"type": "source", "data": {"name": "doc"}},
+        ],
+    )
+
+    # A single read and write of the message for the whole batch
+    chats.get_message_by_id_and_message_id.assert_called_once()
+    chats.upsert_message_to_chat_by_id_and_message_id.assert_called_once_with(
+        "chat", "message", {"content": "abc", "sources": [{"name": "doc"}]}
+    )
+    chats.add_message_status_to_chat_by_id_and_message_id.assert_called_once_with(
+        "chat", "message", {"action": "search"}
+    )
+
+
+def test_apply_chat_message_events_missing_message(chats):
+    chats.get_message_by_id_and_message_id.return_value = None
+
+    chat_save.apply_chat_message_events(
+        "chat",
+        "message",
+        [
+            {"type": "message", "data": {"content": "lost"}},
+            {"type": "replace", "data": {"content": "a"}},
+            {"type": "message", "data": {"content": "b"}},
+            {"type": "status", "data": {"action": "done"}},
+        ],
+    )
+
+    # The events after the missing message are still applied
+    chats.upsert_message_to_chat_by_id_and_message_id.assert_called_once_with(
+        "chat", "message", {"content": "ab"}
+    )
+    chats.add_message_status_to_chat_by_id_and_message_id.assert_called_once_with(
+        "chat", "message", {"action": "done"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_chat_message_save_buffer_coalesces(chats):
+    buffer = chat_save.ChatMessageSaveBuffer(
+        "chat", "message", interval=60, max_bytes=1000
+    )
+
+    content = ""
+    for token in ["a", "b", "c"]:
+        content += token
+        buffer.update(lambda content=content: {"content": content}, len(token))
+    await asyncio.sleep(0)
+
+    # Nothing written before the interval or a boundary
+    chats.upsert_message_to_chat_by_id_and_message_id.assert_not_called()
+
+    await buffer.flush("boundary")
+    await buffer.close()
+
+    # Only the latest data is written, closing with nothing pending is a no-op
+    chats.upsert_message_to_chat_by_id_and_message_id.assert_called_once_with(
+        "chat", "message", {"content": "abc"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_chat_message_save_buffer_max_bytes(chats):
+    buffer = chat_save.ChatMessageSaveBuffer(
+        "chat", "message", interval=60, max_bytes=2
+    )
+
+    buffer.update(lambda: {"content": "ab"}, 2)
+    for _ in range(10):
+        if chats.upsert_message_to_chat_by_id_and_message_id.called:
+            break
+        await asyncio.sleep(0.01)
+
+    chats.upsert_message_to_chat_by_id_and_message_id.assert_called_once_with(
+        "chat", "message", {"content": "ab"}
+    )
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_chat_message_save_buffer_retries(chats):
+    chats.upsert_message_to_chat_by_id_and_message_id.side_effect = RuntimeError
+    dropped = chat_save.CHAT_SAVE_BUFFER_STATS["dropped"]
+    buffer = chat_save.ChatMessageSaveBuffer(
+        "chat", "message", interval=60, max_bytes=1000
+    )
+
+    buffer.update(lambda: {"content": "a"}, 1)
+    for _ in range(chat_save.ChatMessageSaveBuffer.MAX_WRITE_ATTEMPTS + 2):
+        await buffer.flush()
+
+    # The failed data is kept for the next writes, then dropped
+    assert (
+        chats.upsert_message_to_chat_by_id_and_message_id.call_count
+        == chat_save.ChatMessageSaveBuffer.MAX_WRITE_ATTEMPTS
+    )
+    assert chat_save.CHAT_SAVE_BUFFER_STATS["dropped"] == dropped + 1
+    await buffer.close()
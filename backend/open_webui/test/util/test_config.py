@@ -0,0 +1,143 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from open_webui import config
+from open_webui.config import AppConfig, PersistentConfig
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.gets = 0
+        self.published = []
+
+    def get(self, key):
+        self.gets += 1
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1)
+
+    def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.keys = []
+
+            def get(self, key):
+                self.keys.append(key)
+
+            def execute(self):
+                return [redis.get(key) for key in self.keys]
+
+        return Pipeline()
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(config.time, "time", lambda: now[0])
+    monkeypatch.setattr(config, "REDIS_CONFIG_REFRESH_INTERVAL", 5)
+    return now
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(config, "get_redis_connection", lambda *args, **kw: redis)
+    return redis
+
+
+def get_app_config():
+    app_config = AppConfig(redis_url="redis://localhost", redis_key_prefix="test")
+    app_config.TEST_A = PersistentConfig("TEST_A", "test.a", 1)
+    app_config.TEST_B = PersistentConfig("TEST_B", "test.b", "b")
+    return app_config
+
+
+def test_reads_are_served_from_memory(now, redis):
+    app_config = get_app_config()
+    redis.values["test:config:TEST_A"] = json.dumps(2)
+
+    assert app_config.TEST_A == 2
+    gets = redis.gets
+    assert app_config.TEST_A == 2
+    assert app_config.TEST_B == "b"
+    assert redis.gets == gets
+
+    # Only the version is read until it moves
+    now[0] += 5
+    assert app_config.TEST_A == 2
+    assert redis.gets == gets + 1
+
+    redis.values["test:config:TEST_B"] = json.dumps("c")
+    redis.incr("test:config:version")
+    assert app_config.TEST_B == "b"
+    now[0] += 5
+    assert app_config.TEST_B == "c"
+
+
+def test_updates_are_announced(now, redis):
+    app_config = get_app_config()
+    app_config.TEST_A = 3
+
+    assert app_config.TEST_A == 3
+    assert redis.values["test:config:TEST_A"] == "3"
+    assert redis.values["test:config:version"] == "1"
+    assert redis.published == [
+        ("test:config:updates", {"key": "TEST_A", "origin": app_config._origin})
+    ]
+
+
+def test_announcements_of_other_workers(now, redis):
+    app_config = get_app_config()
+    value = app_config.TEST_A
+
+    redis.values["test:config:TEST_A"] = json.dumps(4)
+    redis.incr("test:config:version")
+
+    app_config._handle(json.dumps({"key": "TEST_A", "origin": app_config._origin}))
+    assert app_config.TEST_A == value
+
+    app_config._handle(json.dumps({"key": "TEST_A", "origin": "other"}))
+    assert app_config.TEST_A == 4
+
+
+@pytest.mark.asyncio
+async def test_subscribing_checks_the_version(now, redis):
+    app_config = get_app_config()
+    assert app_config.TEST_A is not None
+    subscribed = asyncio.Event()
+
+    class PubSub:
+        async def subscribe(self, channel):
+            assert channel == "test:config:updates"
+
+        async def listen(self):
+            subscribed.set()
+            await asyncio.Event().wait()
+            yield
+
+        async def aclose(self):
+            pass
+
+    task = asyncio.create_task(app_config.listen(SimpleNamespace(pubsub=PubSub)))
+    await subscribed.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # Updates may have been missed before the subscription
+    gets = redis.gets
+    assert app_config.TEST_B is not None
+    assert redis.gets == gets + 1
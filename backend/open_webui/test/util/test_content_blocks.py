@@ -0,0 +1,130 @@
+import time
+
+import open_webui.utils.content_blocks as content_blocks_module
+from open_webui.utils.content_blocks import (
+    ContentBlockSerializer,
+    serialize_content_blocks,
+)
+
+
+def stream_content_blocks():
+    """Yield the content blocks after every change of a simulated response"""
+    content_blocks = [{"type": "text", "content": ""}]
+
+    for word in ["Let", " me", " think"]:
+        content_blocks[-1]["content"] = content_blocks[-1]["content"] + word
+        yield content_blocks
+
+    reasoning_block = {
+        "type": "reasoning",
+        "start_tag": "<think>",
+        "end_tag": "</think>",
+        "attributes": {"type": "reasoning_content"},
+        "content": "",
+        "started_at": time.time(),
+    }
+    content_blocks.append(reasoning_block)
+    for line in ["first\n", "> second\n", "third"]:
+        reasoning_block["content"] += line
+        yield content_blocks
+
+    reasoning_block["ended_at"] = reasoning_block["started_at"] + 3
+    reasoning_block["duration"] = 3
+    content_blocks.append({"type": "text", "content": ""})
+    yield content_blocks
+
+    tool_calls_block = {
+        "type": "tool_calls",
+        "content": [
+            {
+                "id": "call_1",
+                "function": {"name": "search", "arguments": '{"q": "<a&b>"}'},
+            }
+        ],
+    }
+    content_blocks.append(tool_calls_block)
+    yield content_blocks
+
+    tool_calls_block["results"] = [
+        {"tool_call_id": "call_1", "content": 'result "quoted"', "files": ["f"]}
+    ]
+    yield content_blocks
+
+    content_blocks.append({"type": "text", "content": ""})
+    for word in ["Here", " is", " code", "\n```"]:
+        content_blocks[-1]["content"] = content_blocks[-1]["content"] + word
+        yield content_blocks
+
+    content_blocks.append(
+        {
+            "type": "code_interpreter",
+            "attributes": {"type": "code", "lang": "python"},
+            "content": "print(1)",
+        }
+    )
+    yield content_blocks
+
+    content_blocks[-1]["output"] = {"stdout": "1\n"}
+    content_blocks.append({"type": "text", "content": "  "})
+    yield content_blocks
+
+    # Clean up of the empty last text block at the end of the stream
+    content_blocks.pop()
+    yield content_blocks
+
+
+def test_content_block_serializer_matches_full_serialization():
+    for raw in [False, True]:
+        serializer = ContentBlockSerializer(raw=raw)
+        for content_blocks in stream_content_blocks():
+            assert serializer(content_blocks) == serialize_content_blocks(
+                content_blocks, raw
+            )
+
+
+def test_content_block_serializer_empty():
+    serializer = ContentBlockSerializer()
+    assert serializer([]) == ""
+    assert serializer([{"type": "text", "content": " hi "}]) == "hi"
+
+
+def test_content_block_serializer_is_linear(monkeypatch):
+    rendered = []
+    serialize_content_block = content_blocks_module.serialize_content_block
+
+    def counting_serialize_content_block(content, block, raw=False):
+        rendered.append(block)
+        return serialize_content_block(content, block, raw)
+
+    monkeypatch.setattr(
+        content_blocks_module,
+        "serialize_content_block",
+        counting_serialize_content_block,
+    )
+
+    serializer = ContentBlockSerializer()
+    blocks = []
+    for i in range(200):
+        blocks.append({"type": "text", "content": f"block {i}"})
+        rendered.clear()
+        serializer(blocks)
+
+        # The newly closed block and the open one, whatever the number of blocks
+        assert len(rendered) <= 2
+
+    assert serializer(blocks) == serialize_content_blocks(blocks)
+
+
+def test_content_block_serializer_reassigned_value():
+    serializer = ContentBlockSerializer()
+    tool_calls_block = {
+        "type": "tool_calls",
+        "content": [{"id": "call_1", "function": {"name": "search"}}],
+    }
+    blocks = [tool_calls_block, {"type": "text", "content": "done"}]
+    assert 'done="false"' in serializer(blocks)
+
+    # Setting a top level value of a closed block renders it again
+    tool_calls_block["results"] = [{"tool_call_id": "call_1", "content": "ok"}]
+    assert serializer(blocks) == serialize_content_blocks(blocks)
+    assert 'done="true"' in serializer(blocks)
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import pytest
+
+from open_webui.utils.events import EVENT_BUS_CHANNEL, EventBus
+
+
+class FakeRedis:
+    def __init__(self):
+        self.subscriptions = []
+
+    def pubsub(self):
+        redis = self
+
+        class PubSub:
+            async def subscribe(self, channel):
+                redis.subscriptions.append(channel)
+
+            async def listen(self):
+                await asyncio.Event().wait()
+                yield
+
+            async def aclose(self):
+                pass
+
+        return PubSub()
+
+
+@pytest.mark.asyncio
+async def test_publish_to_subscribers():
+    bus = EventBus()
+    event = {"type": "status", "status": "completed"}
+
+    with bus.subscribe("file:a") as queue, bus.subscribe("file:b") as other:
+        with bus.subscribe() as all_topics:
+            bus.publish("file:a", event)
+            await asyncio.sleep(0)
+
+            assert queue.get_nowait() == ("file:a", event)
+            assert all_topics.get_nowait() == ("file:a", event)
+            assert other.empty()
+
+    assert bus._subscribers == {}
+
+
+@pytest.mark.asyncio
+async def test_dispatch_events_of_other_processes():
+    bus = EventBus()
+    event = {"type": "status", "status": "completed"}
+
+    with bus.subscribe("file:a") as queue:
+        bus._handle(
+            json.dumps({"topic": "file:a", "event": event, "origin": bus._origin})
+        )
+        bus._handle(json.dumps({"topic": "file:a", "event": event, "origin": "x"}))
+        await asyncio.sleep(0)
+
+        assert queue.get_nowait() == ("file:a", event)
+        assert queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_resync_on_subscribe():
+    bus = EventBus()
+    redis = FakeRedis()
+
+    with bus.subscribe("file:a") as queue, bus.subscribe() as all_topics:
+        task = asyncio.create_task(bus.listen(redis))
+        while not redis.subscriptions:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert redis.subscriptions == [EVENT_BUS_CHANNEL]
+        # The subscribers of a topic are told to read its state again
+        assert queue.get_nowait() == ("file:a", {"type": "resync"})
+        assert all_topics.get_nowait() == ("file:a", {"type": "resync"})
+        assert queue.empty() and all_topics.empty()
@@ -0,0 +1,39 @@
+import aiohttp
+import pytest
+
+from open_webui.utils.http_client import UpstreamSessions, create_session
+
+
+@pytest.mark.asyncio
+async def test_sessions_by_origin():
+    sessions = UpstreamSessions()
+
+    session = sessions.get("http://localhost:11434/api/chat")
+    assert sessions.get("http://localhost:11434/api/tags") is session
+    assert sessions.get("http://localhost:8080/v1/models") is not session
+    assert sessions.get("https://localhost:11434/api/chat") is not session
+
+    await sessions.close()
+    assert session.closed
+    assert sessions._sessions == {}
+
+
+@pytest.mark.asyncio
+async def test_closed_sessions_are_replaced():
+    sessions = UpstreamSessions()
+
+    session = sessions.get("http://localhost:11434")
+    await session.close()
+    assert sessions.get("http://localhost:11434") is not session
+
+    await sessions.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_sessions_keep_no_cookies():
+    session = create_session()
+
+    assert isinstance(session.cookie_jar, aiohttp.DummyCookieJar)
+    assert session.connector.limit > 0
+
+    await session.close()
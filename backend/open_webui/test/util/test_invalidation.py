@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+import pytest
+
+from open_webui.utils import redis as redis_utils
+from open_webui.utils.invalidation import INVALIDATION_CHANNEL, InvalidationBus
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def subscribe(self, channel):
+        self.redis.subscriptions.append(channel)
+
+    async def listen(self):
+        messages = self.redis.messages.pop(0) if self.redis.messages else None
+        if messages is None:
+            # Keep the last subscription until cancelled
+            await asyncio.Event().wait()
+        for message in messages:
+            yield {"type": "message", "data": message}
+        raise ConnectionError("Connection lost")
+
+    async def aclose(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self, *messages):
+        # The messages received by each subscription before it is lost
+        self.messages = list(messages)
+        self.subscriptions = []
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    sleep = asyncio.sleep
+    monkeypatch.setattr(redis_utils.asyncio, "sleep", lambda delay: sleep(0))
+
+
+async def listen_until(listen, redis, subscriptions):
+    task = asyncio.create_task(listen(redis))
+    for _ in range(100):
+        if len(redis.subscriptions) >= subscriptions and not redis.messages:
+            break
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+def test_generations_by_kind():
+    bus = InvalidationBus()
+
+    bus.invalidate("model", "a", publish=False)
+    assert bus.generation("model") == 1
+    assert bus.generation("group") == 0
+    assert bus.generation("model", "group") == 1
+
+    bus.invalidate("group", publish=False)
+    assert bus.generation("model", "group") == 2
+
+    # Clearing everything changes the generation of every kind
+    bus.clear()
+    assert bus.generation("model") == 2
+    assert bus.generation("group") == 2
+    assert bus.generation("user") == 1
+
+
+def test_invalidate_entries():
+    bus = InvalidationBus()
+    loads = []
+
+    def load(value):
+        def load():
+            loads.append(value)
+            return value
+
+        return load
+
+    assert bus.get("tool", "a", load("a")) == "a"
+    assert bus.get("tool", "b", load("b")) == "b"
+    assert bus.get("function", "a", load("f")) == "f"
+    assert bus.get("tool", "a", load("x")) == "a"
+    assert loads == ["a", "b", "f"]
+
+    bus.invalidate("tool", "a", publish=False)
+    assert bus.get("tool", "a", load("a2")) == "a2"
+    assert bus.get("tool", "b", load("x")) == "b"
+
+    bus.invalidate("tool", publish=False)
+    assert bus.get("tool", "b", load("b2")) == "b2"
+    assert bus.get("function", "a", load("x")) == "f"
+
+
+def test_stale_load_is_not_kept():
+    bus = InvalidationBus()
+
+    def load():
+        bus.invalidate("tool", "a", publish=False)
+        return "stale"
+
+    assert bus.get("tool", "a", load) == "stale"
+    assert bus.get("tool", "a", lambda: "fresh") == "fresh"
+
+
+def test_handlers():
+    bus = InvalidationBus()
+    calls = []
+    bus.add_handler("group", lambda id: calls.append(("group", id)))
+    bus.add_handler("user", lambda id: calls.append(("user", id)))
+
+    bus.invalidate("group", "g", publish=False)
+    bus.invalidate("model", "m", publish=False)
+    assert calls == [("group", "g")]
+
+    bus.clear()
+    assert calls == [("group", "g"), ("group", None), ("user", None)]
+
+
+def test_handle_messages_of_other_workers():
+    bus = InvalidationBus()
+
+    bus._handle(json.dumps({"kind": "model", "id": "a", "origin": bus._origin}))
+    assert bus.generation("model") == 0
+
+    bus._handle(json.dumps({"kind": "model", "id": "a", "origin": "other"}))
+    assert bus.generation("model") == 1
+
+
+@pytest.mark.asyncio
+async def test_listen_subscribes_again(no_backoff):
+    bus = InvalidationBus()
+    bus.get("tool", "a", lambda: "a")
+    other = json.dumps({"kind": "group", "id": "g", "origin": "other"})
+    redis = FakeRedis([other], [other])
+
+    await listen_until(bus.listen, redis, 3)
+
+    assert redis.subscriptions == [INVALIDATION_CHANNEL] * 3
+    assert bus.generation("group") == 3 + 2
+    # Every subscription may have missed invalidations, the entries are dropped
+    assert bus.get("tool", "a", lambda: "a2") == "a2"
+
+
+@pytest.mark.asyncio
+async def test_listen_handles_bad_messages(no_backoff):
+    bus = InvalidationBus()
+    other = json.dumps({"kind": "group", "id": "g", "origin": "other"})
+    redis = FakeRedis(["not json", other])
+
+    await listen_until(bus.listen, redis, 2)
+
+    assert bus.generation("group") == 2 + 1
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from open_webui.utils import model_discovery
+from open_webui.utils.model_discovery import ModelDiscovery
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(model_discovery.time, "time", lambda: now[0])
+    monkeypatch.setattr(model_discovery, "MODELS_DISCOVERY_INTERVAL", 60.0)
+    return now
+
+
+def get_fetch(responses):
+    calls = []
+
+    async def fetch():
+        calls.append(len(calls))
+        response = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    return fetch, calls
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(now):
+    discovery = ModelDiscovery()
+    fetch, calls = get_fetch([{"models": ["a"]}, {"models": ["b"]}])
+
+    assert await discovery.get(None, "http://a", None, fetch) == {"models": ["a"]}
+    assert await discovery.get(None, "http://a", None, fetch) == {"models": ["a"]}
+    assert len(calls) == 1
+
+    # Once due, the stale list is served while it is fetched in the background
+    now[0] += 61
+    assert await discovery.get(None, "http://a", None, fetch) == {"models": ["a"]}
+    await asyncio.sleep(0)
+    assert len(calls) == 2
+    assert await discovery.get(None, "http://a", None, fetch) == {"models": ["b"]}
+
+
+@pytest.mark.asyncio
+async def test_returns_copies(now):
+    discovery = ModelDiscovery()
+    fetch, _ = get_fetch([{"models": [{"model": "a"}]}])
+
+    response = await discovery.get(None, "http://a", None, fetch)
+    response["models"][0]["model"] = "prefix.a"
+
+    assert await discovery.get(None, "http://a", None, fetch) == {
+        "models": [{"model": "a"}]
+    }
+
+
+@pytest.mark.asyncio
+async def test_failing_connection_backs_off(now):
+    discovery = ModelDiscovery()
+    fetch, calls = get_fetch([{"models": ["a"]}, None, ConnectionError("down")])
+
+    await discovery.get(None, "http://a", None, fetch)
+
+    # Failures keep the last good list and back off
+    now[0] += 61
+    await discovery.get(None, "http://a", None, fetch)
+    await asyncio.sleep(0)
+    assert len(calls) == 2
+    (status,) = discovery.get_status()
+    assert status["failures"] == 1
+    assert status["next_at"] == now[0] + 120
+
+    now[0] += 60
+    assert await discovery.get(None, "http://a", None, fetch) == {"models": ["a"]}
+    await asyncio.sleep(0)
+    assert len(calls) == 2
+
+    now[0] += 61
+    assert await discovery.get(None, "http://a", None, fetch) == {"models": ["a"]}
+    await asyncio.sleep(0)
+    assert len(calls) == 3
+    assert discovery.get_status()[0]["failures"] == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_listing(now):
+    discovery = ModelDiscovery()
+    calls = []
+
+    async def fetch():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return {"models": ["a"]}
+
+    responses = await asyncio.gather(
+        *[discovery.get(None, "http://a", None, fetch) for _ in range(5)]
+    )
+
+    # A single fetch of the connection for all of the waiting requests
+    assert len(calls) == 1
+    assert responses == [{"models": ["a"]}] * 5
+
+
+def get_request():
+    config = SimpleNamespace(
+        ENABLE_OLLAMA_API=True,
+        OLLAMA_BASE_URLS=["http://a", "http://b"],
+        OLLAMA_API_CONFIGS={},
+    )
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(config=config)))
+
+
+@pytest.mark.asyncio
+async def test_ollama_loaded_models(monkeypatch):
+    from open_webui.routers import ollama
+    from open_webui.utils.balancer import UpstreamBalancer
+
+    upstream = UpstreamBalancer()
+    monkeypatch.setattr(ollama, "OLLAMA_BALANCER", upstream)
+    monkeypatch.setattr(
+        ollama, "OLLAMA_LOADED_MODELS", {"data": None, "fetched_at": 0.0, "task": None}
+    )
+    monkeypatch.setattr(ollama, "OLLAMA_LOADED_MODELS_TTL", 5.0)
+
+    loaded = {"http://a": ["m:latest"], "http://b": []}
+    calls = []
+
+    async def send_get_request(url, key=None, user=None):
+        calls.append(url)
+        node = url.rsplit("/api", 1)[0]
+        return {"models": [{"model": model} for model in loaded[node]]}
+
+    monkeypatch.setattr(ollama, "send_get_request", send_get_request)
+    request = get_request()
+
+    await ollama.get_recent_loaded_models(request, None)
+    assert upstream.choose(["http://a", "http://b"], "m:latest") == "http://a"
+
+    # Reused for the TTL, not for a discovery interval
+    loaded = {"http://a": [], "http://b": ["m:latest"]}
+    await ollama.get_recent_loaded_models(request, None)
+    assert len(calls) == 2
+
+    ollama.OLLAMA_LOADED_MODELS["fetched_at"] = time.time() - 5
+    response = await ollama.get_recent_loaded_models(request, None)
+    assert len(calls) == 4
+    assert response["models"] == [{"model": "m:latest", "urls": [1]}]
+    assert upstream.choose(["http://a", "http://b"], "m:latest") == "http://b"
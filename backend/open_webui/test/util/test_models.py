@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from open_webui.models.models import ModelMeta, ModelModel, ModelParams
+from open_webui.utils import models as utils_models
+
+
+def get_request():
+    config = SimpleNamespace(
+        ENABLE_EVALUATION_ARENA_MODELS=False,
+        EVALUATION_ARENA_MODELS=[],
+        ENABLE_BASE_MODELS_CACHE=True,
+        MODEL_ORDER_LIST=[],
+    )
+    state = SimpleNamespace(config=config, MODELS={}, BASE_MODELS=None)
+    return SimpleNamespace(app=SimpleNamespace(state=state))
+
+
+def get_model_info(id, name, base_model_id=None):
+    return ModelModel(
+        id=id,
+        user_id="user",
+        base_model_id=base_model_id,
+        name=name,
+        params=ModelParams(),
+        meta=ModelMeta(),
+        is_active=True,
+        updated_at=0,
+        created_at=0,
+    )
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    catalog = utils_models.ModelCatalog()
+    monkeypatch.setattr(utils_models, "MODEL_CATALOG", catalog)
+    functions = MagicMock()
+    functions.get_global_action_functions.return_value = []
+    functions.get_global_filter_functions.return_value = []
+    functions.get_functions_by_type.return_value = []
+    monkeypatch.setattr(utils_models, "Functions", functions)
+    return catalog
+
+
+@pytest.mark.asyncio
+async def test_get_all_models_overrides_duplicates(catalog, monkeypatch):
+    base_models = [
+        {"id": "llama3:8b", "name": "llama3:8b", "owned_by": "ollama"},
+        {"id": "gpt", "name": "gpt", "owned_by": "openai"},
+        # The same model from a second connection
+        {"id": "gpt", "name": "gpt", "owned_by": "openai"},
+    ]
+    monkeypatch.setattr(
+        utils_models, "get_all_base_models", AsyncMock(return_value=base_models)
+    )
+    monkeypatch.setattr(
+        catalog,
+        "get_model_infos",
+        lambda: {
+            "gpt": get_model_info("gpt", "GPT"),
+            "llama3": get_model_info("llama3", "Llama"),
+            "assistant": get_model_info("assistant", "Assistant", "gpt"),
+        },
+    )
+
+    models = await utils_models.get_all_models(get_request())
+
+    assert [(model["id"], model["name"]) for model in models] == [
+        ("llama3:8b", "Llama"),
+        ("gpt", "GPT"),
+        ("gpt", "GPT"),
+        ("assistant", "Assistant"),
+    ]
+    assert models[3]["owned_by"] == "openai"
+    assert models[3]["preset"] is True
+
+
+@pytest.mark.asyncio
+async def test_get_all_models_returns_copies(catalog, monkeypatch):
+    get_all_base_models = AsyncMock(
+        return_value=[{"id": "gpt", "name": "gpt", "owned_by": "openai"}]
+    )
+    monkeypatch.setattr(utils_models, "get_all_base_models", get_all_base_models)
+    monkeypatch.setattr(catalog, "get_model_infos", lambda: {})
+    request = get_request()
+
+    models = await utils_models.get_all_models(request)
+    models[0]["name"] = "changed"
+    models[0]["tags"].append({"name": "changed"})
+    request.app.state.MODELS["gpt"]["info"] = {}
+
+    models = await utils_models.get_all_models(request)
+
+    # The catalog is built once and isn't changed through what it returned
+    get_all_base_models.assert_called_once()
+    assert catalog.version == 1
+    assert models[0]["name"] == "gpt"
+    assert models[0]["tags"] == []
+    assert "info" not in request.app.state.MODELS["gpt"]
+    assert catalog.models[0]["name"] == "gpt"
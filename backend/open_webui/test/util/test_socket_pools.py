@@ -0,0 +1,145 @@
+import pytest
+
+from open_webui.socket.utils import SessionPool, UsagePool, UserPool
+
+
+class FakeRedis:
+    """The commands of the pools on dicts and sets, decoding the responses"""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = 0
+
+    def _run(self, command, *args):
+        data = self.data
+        key = args[0]
+        if command == "hset":
+            data.setdefault(key, {})[args[1]] = str(args[2])
+        elif command == "hget":
+            return data.get(key, {}).get(args[1])
+        elif command == "hmget":
+            return [data.get(key, {}).get(field) for field in args[1]]
+        elif command == "hdel":
+            return sum(
+                data.get(key, {}).pop(field, None) is not None for field in args[1:]
+            )
+        elif command == "hgetall":
+            return dict(data.get(key, {}))
+        elif command == "sadd":
+            data.setdefault(key, set()).update(args[1:])
+        elif command == "srem":
+            data.get(key, set()).difference_update(args[1:])
+        elif command == "scard":
+            return len(data.get(key, set()))
+        elif command == "smembers":
+            return set(data.get(key, set()))
+
+    def pipeline(self, transaction=True):
+        redis = self
+        commands = []
+
+        class Pipeline:
+            def __getattr__(self, command):
+                return lambda *args: commands.append((command, args))
+
+            async def execute(self):
+                redis.calls += 1
+                return [redis._run(command, *args) for command, args in commands]
+
+        return Pipeline()
+
+    def __getattr__(self, command):
+        async def run(*args):
+            self.calls += 1
+            return self._run(command, *args)
+
+        return run
+
+
+class FakeSyncRedis:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def scard(self, key):
+        return self.redis._run("scard", key)
+
+
+@pytest.fixture(params=["local", "redis"])
+def redis(request):
+    return FakeRedis() if request.param == "redis" else None
+
+
+@pytest.mark.asyncio
+async def test_session_pool(redis):
+    pool = SessionPool(redis=redis, redis_key="sessions")
+
+    await pool.set("s1", {"id": "u1"})
+    await pool.set("s2", {"id": "u2"})
+    assert await pool.get("s1") == {"id": "u1"}
+    assert await pool.get_many(["s2", "s3", "s1"]) == [
+        {"id": "u2"},
+        None,
+        {"id": "u1"},
+    ]
+
+    assert await pool.delete("s1") == {"id": "u1"}
+    assert await pool.delete("s1") is None
+    assert await pool.get("s1") is None
+
+
+@pytest.mark.asyncio
+async def test_session_pool_local_cache():
+    redis = FakeRedis()
+    pool = SessionPool(redis=redis, redis_key="sessions", cache_ttl=60)
+
+    await pool.set("s1", {"id": "u1"})
+    calls = redis.calls
+    assert await pool.get("s1") == {"id": "u1"}
+    assert redis.calls == calls
+
+    # Other workers read the session from Redis once
+    other = SessionPool(redis=redis, redis_key="sessions", cache_ttl=60)
+    assert await other.get("s1") == {"id": "u1"}
+    assert await other.get("s1") == {"id": "u1"}
+    assert redis.calls == calls + 1
+
+    await pool.delete("s1")
+    assert await pool.get("s1") is None
+
+
+@pytest.mark.asyncio
+async def test_user_pool(redis):
+    pool = UserPool(
+        redis=redis,
+        redis_key_prefix="users",
+        sync_redis=FakeSyncRedis(redis) if redis else None,
+    )
+
+    await pool.add("u1", "s1")
+    await pool.add("u1", "s2")
+    await pool.add("u2", "s3")
+    assert await pool.get_session_ids("u1") == {"s1", "s2"}
+    assert sorted(await pool.get_user_ids()) == ["u1", "u2"]
+    assert pool.count() == 2
+
+    await pool.remove("u1", "s1")
+    assert await pool.contains("u1")
+    await pool.remove("u1", "s2")
+    assert not await pool.contains("u1")
+    assert await pool.get_user_ids() == ["u2"]
+    assert pool.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_usage_pool(redis):
+    pool = UsagePool(redis=redis, redis_key_prefix="usage")
+
+    await pool.update("m1", "s1", 100)
+    await pool.update("m1", "s2", 200)
+    await pool.update("m2", "s1", 100)
+    assert sorted(await pool.get_model_ids()) == ["m1", "m2"]
+
+    await pool.remove_expired(150)
+    assert await pool.get_model_ids() == ["m1"]
+    if redis:
+        assert redis.data["usage:model:m1"] == {"s2": "200"}
@@ -1,10 +1,82 @@
-from typing import Optional, Set, Union, List, Dict, Any
+from typing import Optional, Set, Union, List, Dict, Any, Callable
+from collections import OrderedDict
 from open_webui.models.users import Users, UserModel
-from open_webui.models.groups import Groups
+from open_webui.models.groups import Groups, GroupModel
 
 
 from open_webui.config import DEFAULT_USER_PERMISSIONS
+from open_webui.env import PRINCIPAL_CACHE_TTL
+from open_webui.utils.invalidation import INVALIDATION_BUS
 import json
+import threading
+import time
+
+# Process wide counters, exported through the OpenTelemetry metrics setup
+PRINCIPAL_CACHE_STATS = {
+    "hits": 0,
+    "misses": 0,
+}
+
+
+def get_principal_cache_stats() -> dict:
+    return {**PRINCIPAL_CACHE_STATS}
+
+
+class PrincipalCache:
+    """
+    Groups and merged permissions of users, read many times by the access checks
+    of a single request. Entries last PRINCIPAL_CACHE_TTL seconds and are dropped
+    by any change of the groups, in this worker and, through the invalidation
+    bus, in all the other workers.
+    """
+
+    MAX_SIZE = 10000
+
+    def __init__(self):
+        # key -> (expires_at, generation of the groups, value), least recent first
+        self._entries: OrderedDict[tuple, tuple[float, int, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, load: Callable[[], Any]) -> Any:
+        generation = INVALIDATION_BUS.generation("group")
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now and entry[1] == generation:
+                self._entries.move_to_end(key)
+                PRINCIPAL_CACHE_STATS["hits"] += 1
+                return entry[2]
+            PRINCIPAL_CACHE_STATS["misses"] += 1
+
+        value = load()
+        with self._lock:
+            # A change during the load leaves the entry stale for the next read
+            self._entries[key] = (now + PRINCIPAL_CACHE_TTL, generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.MAX_SIZE:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+PRINCIPAL_CACHE = PrincipalCache()
+
+
+def get_user_groups(user_id: str) -> list[GroupModel]:
+    """The groups of a user, shared with the other readers so not to be modified"""
+    return PRINCIPAL_CACHE.get(
+        ("groups", user_id), lambda: Groups.get_groups_by_member_id(user_id)
+    )
+
+
+def get_user_group_ids(user_id: str) -> Set[str]:
+    return PRINCIPAL_CACHE.get(
+        ("group_ids", user_id),
+        lambda: frozenset(group.id for group in get_user_groups(user_id)),
+    )
 
 
 def fill_missing_permissions(
@@ -34,6 +106,20 @@ def get_permissions(
     If a permission is defined in multiple groups, the most permissive value is used (True > False).
     Permissions are nested in a dict with the permission key as the key and a boolean as the value.
     """
+    default_permissions_json = json.dumps(default_permissions, sort_keys=True)
+    permissions = PRINCIPAL_CACHE.get(
+        ("permissions", user_id, default_permissions_json),
+        lambda: get_merged_permissions(user_id, default_permissions),
+    )
+    # Deep copy for the caller to own the result
+    return json.loads(json.dumps(permissions))
+
+
+def get_merged_permissions(
+    user_id: str,
+    default_permissions: Dict[str, Any],
+) -> Dict[str, Any]:
+    """The permissions of the groups of a user merged over the default permissions"""
 
     def combine_permissions(
         permissions: Dict[str, Any], group_permissions: Dict[str, Any]
@@ -53,7 +139,7 @@ def get_permissions(
                     )  # Use the most permissive value (True > False)
         return permissions
 
-    user_groups = Groups.get_groups_by_member_id(user_id)
+    user_groups = get_user_groups(user_id)
 
     # Deep copy default permissions to avoid modifying the original dict
     permissions = json.loads(json.dumps(default_permissions))
@@ -92,7 +178,7 @@ def has_permission(
     permission_hierarchy = permission_key.split(".")
 
     # Retrieve user group permissions
-    user_groups = Groups.get_groups_by_member_id(user_id)
+    user_groups = get_user_groups(user_id)
 
     for group in user_groups:
         if get_permission(group.permissions or {}, permission_hierarchy):
@@ -119,8 +205,7 @@ def has_access(
             return True
 
     if user_group_ids is None:
-        user_groups = Groups.get_groups_by_member_id(user_id)
-        user_group_ids = {group.id for group in user_groups}
+        user_group_ids = get_user_group_ids(user_id)
 
     permission_access = access_control.get(type, {})
     permitted_group_ids = permission_access.get("group_ids", [])
@@ -6,6 +6,10 @@ import hmac
 import hashlib
 import requests
 import os
+import threading
+import time
+import asyncio
+from collections import OrderedDict
 
 
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
@@ -21,7 +25,7 @@ from typing import Optional, Union, List, Dict
 
 from opentelemetry import trace
 
-from open_webui.models.users import Users
+from open_webui.models.users import Users, UserModel
 
 from open_webui.constants import ERROR_MESSAGES
 
@@ -34,7 +38,11 @@ from open_webui.env import (
     STATIC_DIR,
     SRC_LOG_LEVELS,
     WEBUI_AUTH_TRUSTED_EMAIL_HEADER,
+    AUTH_USER_CACHE_TTL,
+    DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL,
+    DATABASE_USER_ACTIVE_STATUS_FLUSH_INTERVAL,
 )
+from open_webui.utils.invalidation import INVALIDATION_BUS
 
 from fastapi import BackgroundTasks, Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
@@ -154,6 +162,148 @@ def get_license_data(app, key):
     return False
 
 
+class AuthUserCache:
+    """
+    Users authenticated by a token or an API key, by hash of the credential, so
+    authenticating a request doesn't query the database. Entries last
+    AUTH_USER_CACHE_TTL seconds, no longer than the token, and are dropped by
+    any change of their user (role, email, API key, settings...) in this worker
+    and, through the invalidation bus, in all the other workers.
+    """
+
+    MAX_SIZE = 10000
+
+    def __init__(self):
+        # credential hash -> (expires_at, user), least recent first
+        self._entries: OrderedDict[str, tuple[float, UserModel]] = OrderedDict()
+        # user id -> credential hashes of the user
+        self._keys: dict[str, set[str]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, credential: str, load) -> Optional[UserModel]:
+        """
+        The user of a credential, loaded by load() on a miss, which returns the
+        user and the time the credential expires at, if any
+        """
+        if not AUTH_USER_CACHE_TTL or AUTH_USER_CACHE_TTL <= 0:
+            return load()[0]
+
+        key = hashlib.sha256(credential.encode()).hexdigest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                # Callers may modify the user they are given
+                return entry[1].model_copy(deep=True)
+            generation = self._generation
+
+        user, expires_at = load()
+        if user is None:
+            return None
+
+        expires_at = min(now + AUTH_USER_CACHE_TTL, expires_at or float("inf"))
+        with self._lock:
+            # Don't keep a user an invalidation during the load made stale
+            if generation == self._generation:
+                self._pop(key)
+                self._entries[key] = (expires_at, user.model_copy(deep=True))
+                self._keys.setdefault(user.id, set()).add(key)
+                while len(self._entries) > self.MAX_SIZE:
+                    self._pop(next(iter(self._entries)))
+        return user
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys.get(entry[1].id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys[entry[1].id]
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop the entries of a user, or of all the users when user_id is None"""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+                self._keys.clear()
+            else:
+                for key in self._keys.pop(user_id, set()):
+                    self._entries.pop(key, None)
+
+
+AUTH_USER_CACHE = AuthUserCache()
+INVALIDATION_BUS.add_handler("user", AUTH_USER_CACHE.invalidate)
+
+
+class LastActiveBuffer:
+    """
+    Last active times of the users, recorded on every authenticated request and
+    written every DATABASE_USER_ACTIVE_STATUS_FLUSH_INTERVAL seconds in a single
+    batch, instead of a write per request. A user is recorded at most once per
+    DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL seconds, when set.
+    """
+
+    def __init__(self):
+        # user id -> last active time not written yet
+        self._pending: dict[str, int] = {}
+        # user id -> last time recorded, for DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL
+        self._recorded_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, user_id: str):
+        now = time.time()
+        with self._lock:
+            if (
+                DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL
+                and now - self._recorded_at.get(user_id, 0)
+                < DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL
+            ):
+                return
+            self._recorded_at[user_id] = now
+            self._pending[user_id] = int(now)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL:
+                now = time.time()
+                self._recorded_at = {
+                    user_id: recorded_at
+                    for user_id, recorded_at in self._recorded_at.items()
+                    if now - recorded_at < DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL
+                }
+            else:
+                self._recorded_at.clear()
+
+        if not pending:
+            return
+
+        try:
+            Users.update_users_last_active(pending)
+        except Exception as e:
+            log.warning(f"Error writing the last active time of users: {e}")
+            with self._lock:
+                # Retried with the next batch, unless recorded again since
+                for user_id, last_active_at in pending.items():
+                    self._pending.setdefault(user_id, last_active_at)
+
+    async def run(self):
+        """Write the recorded last active times periodically, and on shutdown"""
+        try:
+            while True:
+                await asyncio.sleep(DATABASE_USER_ACTIVE_STATUS_FLUSH_INTERVAL)
+                await asyncio.to_thread(self.flush)
+        finally:
+            self.flush()
+
+
+LAST_ACTIVE_BUFFER = LastActiveBuffer()
+
+
 bearer_security = HTTPBearer(auto_error=False)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -272,7 +422,9 @@ def get_current_user(
             )
 
         if data is not None and "id" in data:
-            user = Users.get_user_by_id(data["id"])
+            user = AUTH_USER_CACHE.get(
+                token, lambda: (Users.get_user_by_id(data["id"]), data.get("exp"))
+            )
             if user is None:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -297,12 +449,8 @@ def get_current_user(
                     current_span.set_attribute("client.user.role", user.role)
                     current_span.set_attribute("client.auth.type", "jwt")
 
-                # Refresh the user's last active timestamp asynchronously
-                # to prevent blocking the request
-                if background_tasks:
-                    background_tasks.add_task(
-                        Users.update_user_last_active_by_id, user.id
-                    )
+                # Written with the next batch, not to block the request
+                LAST_ACTIVE_BUFFER.record(user.id)
             return user
         else:
             raise HTTPException(
@@ -325,7 +473,9 @@ def get_current_user(
 
 
 def get_current_user_by_api_key(api_key: str):
-    user = Users.get_user_by_api_key(api_key)
+    user = AUTH_USER_CACHE.get(
+        api_key, lambda: (Users.get_user_by_api_key(api_key), None)
+    )
 
     if user is None:
         raise HTTPException(
@@ -341,7 +491,7 @@ def get_current_user_by_api_key(api_key: str):
             current_span.set_attribute("client.user.role", user.role)
             current_span.set_attribute("client.auth.type", "api_key")
 
-        Users.update_user_last_active_by_id(user.id)
+        LAST_ACTIVE_BUFFER.record(user.id)
 
     return user
 
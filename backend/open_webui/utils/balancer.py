@@ -0,0 +1,149 @@
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+# Weight of the latest response time in the moving average of a node
+EWMA_ALPHA = 0.3
+
+# Response time assumed for the nodes no response was timed for yet
+DEFAULT_LATENCY = 1.0
+
+# Cost multiplier of the nodes a model is not loaded on, for loading it
+COLD_MODEL_PENALTY = 4.0
+
+# Seconds a model is assumed to stay loaded on a node that served it,
+# the default keep_alive of Ollama
+MODEL_AFFINITY_TTL = 300
+
+
+@dataclass
+class NodeState:
+    outstanding: int = 0
+    latency: Optional[float] = None
+    failures: int = 0
+    open_until: float = 0.0
+
+
+class UpstreamBalancer:
+    """
+    Picks the node to send the request for a model to, among the nodes
+    serving it. Each node costs its moving average response time times its
+    requests in flight, more when the model is not loaded on it. Nodes are
+    skipped for cooldown seconds after failure_threshold failures in a row
+    (circuit breaking), then get a single trial request.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._nodes: dict[str, NodeState] = {}
+        # model -> {node: time until which the model is loaded on it}
+        self._loaded: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _node(self, node: str) -> NodeState:
+        state = self._nodes.get(node)
+        if state is None:
+            state = self._nodes[node] = NodeState()
+        return state
+
+    def choose(
+        self, nodes: list[str], model: Optional[str] = None, exclude=()
+    ) -> Optional[str]:
+        """The node of the lowest cost, None when all of them are excluded"""
+        candidates = [node for node in dict.fromkeys(nodes) if node not in exclude]
+        if not candidates:
+            return None
+
+        now = time.time()
+        with self._lock:
+            # With every node open, one of them still gets the request
+            available = [
+                node for node in candidates if self._node(node).open_until <= now
+            ] or candidates
+
+            latencies = [
+                self._nodes[node].latency
+                for node in available
+                if self._nodes[node].latency is not None
+            ]
+            default_latency = (
+                sum(latencies) / len(latencies) if latencies else DEFAULT_LATENCY
+            )
+            loaded = self._loaded.get(model, {})
+
+            def cost(node: str) -> float:
+                state = self._nodes[node]
+                latency = (
+                    state.latency if state.latency is not None else default_latency
+                )
+                cost = latency * (state.outstanding + 1)
+                if loaded.get(node, 0) <= now:
+                    cost *= COLD_MODEL_PENALTY
+                return cost
+
+            # Ties go to a random node instead of always the first one
+            random.shuffle(available)
+            node = min(available, key=cost)
+
+            state = self._nodes[node]
+            if state.open_until > now:
+                log.warning(f"All the nodes of {model} are unavailable, trying {node}")
+            elif state.failures >= self.failure_threshold:
+                # Half-open, the next request decides if it closes again
+                state.open_until = now + self.cooldown
+            return node
+
+    def acquire(self, node: str) -> float:
+        """Count a request sent to a node, returns its start time"""
+        with self._lock:
+            self._node(node).outstanding += 1
+        return time.monotonic()
+
+    def record(self, node: str, start: float, ok: bool, model: Optional[str] = None):
+        """Record the response of a node, or its failure to respond"""
+        with self._lock:
+            state = self._node(node)
+            if ok:
+                elapsed = time.monotonic() - start
+                state.latency = (
+                    elapsed
+                    if state.latency is None
+                    else EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * state.latency
+                )
+                state.failures = 0
+                state.open_until = 0.0
+                if model:
+                    self._loaded.setdefault(model, {})[node] = (
+                        time.time() + MODEL_AFFINITY_TTL
+                    )
+            else:
+                state.failures += 1
+                if state.failures >= self.failure_threshold:
+                    if state.failures == self.failure_threshold:
+                        log.warning(
+                            f"{node} failed {state.failures} times in a row, "
+                            f"skipping it for {self.cooldown}s"
+                        )
+                    state.open_until = time.time() + self.cooldown
+
+    def release(self, node: str):
+        """Uncount a request once its response is over"""
+        with self._lock:
+            state = self._node(node)
+            state.outstanding = max(state.outstanding - 1, 0)
+
+    def set_loaded(self, loaded: dict[str, dict[str, float]]):
+        """Replace the nodes the models are loaded on, e.g. from /api/ps"""
+        with self._lock:
+            self._loaded = {model: dict(nodes) for model, nodes in loaded.items()}
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+
+from open_webui.internal.db import run_in_db_executor
+from open_webui.models.chats import Chats
+from open_webui.env import (
+    CHAT_REALTIME_SAVE_INTERVAL,
+    CHAT_REALTIME_SAVE_MAX_BYTES,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+# Process wide counters, exported through the OpenTelemetry metrics setup
+CHAT_SAVE_BUFFER_STATS = {
+    "updates": 0,
+    "flushes": 0,
+    "flushes_by_reason": {},
+    "errors": 0,
+    "dropped": 0,
+    "lag_seconds_total": 0.0,
+    "lag_seconds_max": 0.0,
+    "write_seconds_total": 0.0,
+}
+
+
+def get_chat_save_buffer_stats() -> dict:
+    return {
+        **CHAT_SAVE_BUFFER_STATS,
+        "flushes_by_reason": {**CHAT_SAVE_BUFFER_STATS["flushes_by_reason"]},
+    }
+
+
+class ChatMessageSaveBuffer:
+    """
+    Write-behind buffer for the realtime saves of a single streamed message.
+
+    Updates only record how to build the latest message data, the data is built
+    and written to the database when CHAT_REALTIME_SAVE_INTERVAL has elapsed since
+    the last write, when CHAT_REALTIME_SAVE_MAX_BYTES of new content is pending,
+    or when `flush` is called at a boundary (tool calls, end of the stream).
+    Writes run in a worker thread so the event loop is never blocked by the
+    database, and a process crash loses at most one interval of content.
+    """
+
+    # Consecutive failed writes of the same data after which it is dropped
+    MAX_WRITE_ATTEMPTS = 3
+
+    def __init__(
+        self,
+        chat_id: str,
+        message_id: str,
+        interval: float = CHAT_REALTIME_SAVE_INTERVAL,
+        max_bytes: int = CHAT_REALTIME_SAVE_MAX_BYTES,
+    ):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.interval = interval
+        self.max_bytes = max_bytes
+
+        self._get_data: Optional[Callable[[], dict]] = None
+        self._pending_bytes = 0
+        self._pending_since: Optional[float] = None
+        self._last_write = time.monotonic()
+        self._failures = 0
+
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, get_data: Callable[[], dict], size: int = 0):
+        self._get_data = get_data
+        self._pending_bytes += size
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+
+        CHAT_SAVE_BUFFER_STATS["updates"] += 1
+
+        if self._pending_bytes >= self.max_bytes:
+            self._wakeup.set()
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self, reason: str = "boundary"):
+        await self._write(reason)
+
+    async def close(self):
+        await self._write("end")
+
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self):
+        while self._get_data is not None:
+            timeout = self.interval - (time.monotonic() - self._last_write)
+            if timeout > 0 and self._pending_bytes < self.max_bytes:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+
+            await self._write(
+                "bytes" if self._pending_bytes >= self.max_bytes else "interval"
+            )
+
+    async def _write(self, reason: str):
+        async with self._lock:
+            if self._get_data is None:
+                return
+
+            get_data = self._get_data
+            pending_since = self._pending_since
+
+            self._get_data = None
+            self._pending_bytes = 0
+            self._pending_since = None
+
+            # Build the data on the event loop, the source it reads from is mutated there
+            data = get_data()
+
+            start = time.monotonic()
+            try:
+                await run_in_db_executor(
+                    Chats.upsert_message_to_chat_by_id_and_message_id,
+                    self.chat_id,
+                    self.message_id,
+                    data,
+                )
+            except Exception as e:
+                log.exception(f"Error saving message {self.message_id}: {e}")
+                CHAT_SAVE_BUFFER_STATS["errors"] += 1
+
+                self._failures += 1
+                if self._failures >= self.MAX_WRITE_ATTEMPTS:
+                    log.error(
+                        f"Dropping the pending save of message {self.message_id} "
+                        f"after {self._failures} failed writes"
+                    )
+                    CHAT_SAVE_BUFFER_STATS["dropped"] += 1
+                    self._failures = 0
+                # Keep the data for the next write unless newer data arrived meanwhile
+                elif self._get_data is None:
+                    self._get_data = get_data
+                    self._pending_since = pending_since
+                return
+            finally:
+                self._last_write = time.monotonic()
+
+            self._failures = 0
+            lag = self._last_write - (pending_since or start)
+
+            CHAT_SAVE_BUFFER_STATS["flushes"] += 1
+            CHAT_SAVE_BUFFER_STATS["flushes_by_reason"][reason] = (
+                CHAT_SAVE_BUFFER_STATS["flushes_by_reason"].get(reason, 0) + 1
+            )
+            CHAT_SAVE_BUFFER_STATS["write_seconds_total"] += self._last_write - start
+            CHAT_SAVE_BUFFER_STATS["lag_seconds_total"] += lag
+            CHAT_SAVE_BUFFER_STATS["lag_seconds_max"] = max(
+                CHAT_SAVE_BUFFER_STATS["lag_seconds_max"], lag
+            )
+
+
+def apply_chat_message_events(chat_id: str, message_id: str, events: list[dict]):
+    """
+    Apply chat events to a message with a single read and write of the message,
+    status events are appended to its status history as they come.
+    """
+    message = None
+    update = {}
+
+    for event in events:
+        event_type = event.get("type")
+        data = event.get("data", {})
+
+        if event_type == "status":
+            Chats.add_message_status_to_chat_by_id_and_message_id(
+                chat_id, message_id, data
+            )
+            continue
+
+        if message is None:
+            # A missing message is treated as empty, the rest of the batch still applies
+            message = Chats.get_message_by_id_and_message_id(chat_id, message_id) or {}
+
+        current = {**message, **update}
+        if event_type == "message":
+            if current:
+                update["content"] = current.get("content", "") + data.get("content", "")
+        elif event_type == "replace":
+            update["content"] = data.get("content", "")
+        elif event_type in ["embeds", "files"]:
+            update[event_type] = [
+                *data.get(event_type, []),
+                *current.get(event_type, []),
+            ]
+        elif event_type in ["source", "citation"]:
+            update["sources"] = [*current.get("sources", []), data]
+
+    if update:
+        Chats.upsert_message_to_chat_by_id_and_message_id(chat_id, message_id, update)
+
+
+class ChatMessageEventWriter:
+    """
+    Persists the chat events sent through the event emitter from the database
+    executor. Events of a message are applied in order, the ones arriving while a
+    write of the message is in flight are folded into the next write.
+    """
+
+    def __init__(self):
+        self._pending: dict[tuple[str, str], list] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def write(self, chat_id: str, message_id: str, event: dict):
+        """Wait until the event is persisted"""
+        key = (chat_id, message_id)
+        future = asyncio.get_running_loop().create_future()
+
+        if key in self._pending:
+            self._pending[key].append((event, future))
+        else:
+            self._pending[key] = [(event, future)]
+
+            task = asyncio.create_task(self._run(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        await future
+
+    async def _run(self, key: tuple[str, str]):
+        while self._pending[key]:
+            batch, self._pending[key] = self._pending[key], []
+
+            try:
+                await run_in_db_executor(
+                    apply_chat_message_events,
+                    *key,
+                    [event for event, _ in batch],
+                )
+                error = None
+            except Exception as e:
+                log.exception(f"Error saving events of message {key[1]}: {e}")
+                error = e
+
+            for _, future in batch:
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+
+        del self._pending[key]
+
+
+CHAT_MESSAGE_EVENT_WRITER = ChatMessageEventWriter()
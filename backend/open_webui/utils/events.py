@@ -0,0 +1,119 @@
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from open_webui.env import (
+    REDIS_URL,
+    REDIS_CLUSTER,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    SRC_LOG_LEVELS,
+)
+from open_webui.utils.redis import (
+    get_redis_connection,
+    get_sentinels_from_env,
+    listen_channel,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+EVENT_BUS_CHANNEL = f"{REDIS_KEY_PREFIX}:events"
+
+
+class EventBus:
+    """
+    Events of the work done in the background, by topic, e.g. "file:{id}" for
+    the processing of a file. Events are published from any thread, delivered
+    to the subscribers of the process and, through Redis pub/sub, to the
+    subscribers of all the other processes.
+    """
+
+    def __init__(self):
+        # topic -> subscriber queues with their event loop, None for all topics
+        self._subscribers: dict[
+            Optional[str], set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]
+        ] = {}
+        self._lock = threading.Lock()
+        self._origin = str(uuid.uuid4())
+        self._redis = None
+
+    @contextmanager
+    def subscribe(self, topic: Optional[str] = None):
+        """A queue of the (topic, event) published on a topic, or on all of them"""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers[topic].discard(subscriber)
+                if not self._subscribers[topic]:
+                    del self._subscribers[topic]
+
+    def publish(self, topic: str, event: dict):
+        self._dispatch(topic, event)
+        self._publish(topic, event)
+
+    def _dispatch(self, topic: str, event: dict):
+        with self._lock:
+            subscribers = [
+                *self._subscribers.get(topic, ()),
+                *self._subscribers.get(None, ()),
+            ]
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (topic, event))
+            except RuntimeError:
+                # The loop of the subscriber is closed
+                pass
+
+    def _publish(self, topic: str, event: dict):
+        if not REDIS_URL:
+            return
+
+        try:
+            if self._redis is None:
+                self._redis = get_redis_connection(
+                    redis_url=REDIS_URL,
+                    redis_sentinels=get_sentinels_from_env(
+                        REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                    ),
+                    redis_cluster=REDIS_CLUSTER,
+                )
+            self._redis.publish(
+                EVENT_BUS_CHANNEL,
+                json.dumps({"topic": topic, "event": event, "origin": self._origin}),
+            )
+        except Exception as e:
+            log.warning(f"Error publishing event on {topic}: {e}")
+
+    def _handle(self, message: str):
+        data = json.loads(message)
+        if data.get("origin") != self._origin:
+            self._dispatch(data["topic"], data["event"])
+
+    def _resync(self):
+        # Events published while not subscribed are lost, the subscribers of a
+        # topic are told to read its state again
+        with self._lock:
+            topics = [topic for topic in self._subscribers if topic is not None]
+        for topic in topics:
+            self._dispatch(topic, {"type": "resync"})
+
+    async def listen(self, redis):
+        """Deliver the events published by the other processes"""
+        await listen_channel(
+            redis, EVENT_BUS_CHANNEL, self._handle, on_subscribe=self._resync
+        )
+
+
+EVENT_BUS = EventBus()
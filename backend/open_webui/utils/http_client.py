@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from open_webui.env import (
+    AIOHTTP_CLIENT_DNS_CACHE_TTL,
+    AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT,
+    AIOHTTP_CLIENT_POOL_SIZE,
+    AIOHTTP_CLIENT_TIMEOUT,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+def create_session(
+    timeout: Optional[aiohttp.ClientTimeout] = None,
+) -> aiohttp.ClientSession:
+    """
+    A session keeping its connections open for reuse, for the upstream APIs.
+    Cookies of the responses are not kept, the session is shared by all users.
+    """
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=AIOHTTP_CLIENT_POOL_SIZE,
+            keepalive_timeout=AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=AIOHTTP_CLIENT_DNS_CACHE_TTL,
+        ),
+        cookie_jar=aiohttp.DummyCookieJar(),
+        timeout=timeout or aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
+        trust_env=True,
+    )
+
+
+class UpstreamSessions:
+    """
+    One pooled session per upstream origin (scheme, host and port), so the
+    requests of every chat reuse the open connections instead of paying a new
+    TCP and TLS handshake, and a slow upstream can't take the connections of
+    the others. Sessions are bound to the event loop they were created on.
+    """
+
+    def __init__(self):
+        self._sessions: dict[
+            tuple[asyncio.AbstractEventLoop, str], aiohttp.ClientSession
+        ] = {}
+
+    def get(self, url: str) -> aiohttp.ClientSession:
+        parts = urlsplit(url)
+        key = (asyncio.get_running_loop(), f"{parts.scheme}://{parts.netloc}")
+
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = self._sessions[key] = create_session()
+        return session
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        sessions = [
+            self._sessions.pop(key) for key in list(self._sessions) if key[0] is loop
+        ]
+        for session in sessions:
+            try:
+                await session.close()
+            except Exception as e:
+                log.warning(f"Error closing upstream session: {e}")
+
+
+UPSTREAM_SESSIONS = UpstreamSessions()
+
+
+async def cleanup_response(response: Optional[aiohttp.ClientResponse]):
+    """Release the connection of a response to its pool once it was read"""
+    if response:
+        response.release()
@@ -0,0 +1,135 @@
+import json
+import logging
+import threading
+import uuid
+from typing import Any, Callable, Optional
+
+from open_webui.env import (
+    REDIS_URL,
+    REDIS_CLUSTER,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    SRC_LOG_LEVELS,
+)
+from open_webui.utils.redis import (
+    get_redis_connection,
+    get_sentinels_from_env,
+    listen_channel,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+INVALIDATION_CHANNEL = f"{REDIS_KEY_PREFIX}:cache:invalidate"
+
+
+class InvalidationBus:
+    """
+    Invalidations of the cached database rows by kind ("function", "tool",
+    "model", "group", "user"...) and id, applied in the worker that changed a row
+    and, through Redis pub/sub, in all the other workers.
+
+    The caches derived from the rows of some kinds compare the generation of
+    those kinds, which is incremented on each of their invalidations, and
+    handlers can be added to drop the entries of a kind in other caches. The
+    rows of the functions and tools, read on the hot paths of every chat
+    request, are cached by the bus itself.
+    """
+
+    def __init__(self):
+        self._entries: dict[tuple[str, str], Any] = {}
+        # kind -> invalidations of the kind
+        self._generations: dict[str, int] = {}
+        # Invalidations of every kind at once, after missed messages
+        self._clears = 0
+        self._lock = threading.Lock()
+        self._origin = str(uuid.uuid4())
+        self._redis = None
+        # kind -> handlers of the invalidations of the rows cached elsewhere
+        self._handlers: dict[str, list[Callable[[Optional[str]], None]]] = {}
+
+    def generation(self, *kinds: str) -> int:
+        """Incremented on every invalidation of any of the kinds"""
+        return self._clears + sum(self._generations.get(kind, 0) for kind in kinds)
+
+    def get(self, kind: str, id: str, load: Callable[[], Any]) -> Any:
+        key = (kind, id)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            generation = self.generation(kind)
+
+        value = load()
+        if value is not None:
+            with self._lock:
+                # Don't keep a value an invalidation during the load made stale
+                if generation == self.generation(kind):
+                    self._entries[key] = value
+        return value
+
+    def add_handler(self, kind: str, handler: Callable[[Optional[str]], None]):
+        """Call handler(id) on every invalidation of the kind, id None for all"""
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def invalidate(self, kind: str, id: Optional[str] = None, publish: bool = True):
+        """Drop the entry of a row, or of all the rows of the kind when id is None"""
+        with self._lock:
+            self._generations[kind] = self._generations.get(kind, 0) + 1
+            if id is None:
+                for key in [key for key in self._entries if key[0] == kind]:
+                    del self._entries[key]
+            else:
+                self._entries.pop((kind, id), None)
+
+        for handler in self._handlers.get(kind, []):
+            handler(id)
+
+        if publish:
+            self._publish({"kind": kind, "id": id})
+
+    def clear(self):
+        """Invalidate the rows of every kind"""
+        with self._lock:
+            self._clears += 1
+            self._entries.clear()
+
+        for handlers in list(self._handlers.values()):
+            for handler in handlers:
+                handler(None)
+
+    def _publish(self, message: dict):
+        if not REDIS_URL:
+            return
+
+        try:
+            if self._redis is None:
+                self._redis = get_redis_connection(
+                    redis_url=REDIS_URL,
+                    redis_sentinels=get_sentinels_from_env(
+                        REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                    ),
+                    redis_cluster=REDIS_CLUSTER,
+                )
+            self._redis.publish(
+                INVALIDATION_CHANNEL, json.dumps({**message, "origin": self._origin})
+            )
+        except Exception as e:
+            log.warning(f"Error publishing cache invalidation: {e}")
+
+    def _handle(self, message: str):
+        data = json.loads(message)
+        if data.get("origin") != self._origin:
+            self.invalidate(data["kind"], data.get("id"), publish=False)
+
+    async def listen(self, redis):
+        """Apply the invalidations published by the other workers"""
+        # Changes made while not subscribed may have been missed, so every
+        # subscription starts by invalidating everything
+        await listen_channel(
+            redis, INVALIDATION_CHANNEL, self._handle, on_subscribe=self.clear
+        )
+
+
+INVALIDATION_BUS = InvalidationBus()
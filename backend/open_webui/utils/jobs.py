@@ -0,0 +1,658 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from fastapi import Request
+from pydantic import BaseModel
+from starlette.datastructures import Headers
+
+from open_webui.env import (
+    JOB_LEASE_TIMEOUT,
+    JOB_MAX_RETRIES,
+    JOB_QUEUE_BACKEND,
+    JOB_RESULT_TTL,
+    JOB_RETRY_DELAY,
+    JOB_WORKER_CONCURRENCY,
+    REDIS_CLUSTER,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    REDIS_URL,
+    SRC_LOG_LEVELS,
+)
+from open_webui.utils.events import EVENT_BUS
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+JOB_PRIORITY_LOW = 0
+JOB_PRIORITY_NORMAL = 5
+JOB_PRIORITY_HIGH = 10
+
+# Jobs in these states will still run, a failed attempt is retried
+ACTIVE_JOB_STATUSES = ("queued", "running", "retrying")
+
+# Returned by a handler that found nothing to do, counted apart in its batch
+JOB_SKIPPED = "skipped"
+
+
+class JobModel(BaseModel):
+    id: str
+    type: str
+    payload: dict = {}
+    item_id: Optional[str] = None
+    priority: int = JOB_PRIORITY_NORMAL
+    batch_id: Optional[str] = None
+
+    status: str = "queued"  # queued, running, retrying, completed, failed
+    attempts: int = 0
+    max_retries: int = JOB_MAX_RETRIES
+    error: Optional[str] = None
+
+    created_at: int  # timestamp in epoch
+    updated_at: int  # timestamp in epoch
+
+
+# job type -> (handler, on_failed)
+JOB_HANDLERS: dict[str, tuple[Callable, Optional[Callable]]] = {}
+
+
+def register_job_handler(
+    job_type: str, handler: Callable, on_failed: Optional[Callable] = None
+):
+    """
+    handler(request, job) runs a job in a worker thread and raises to have it
+    retried, or returns JOB_SKIPPED when there was nothing to do.
+    on_failed(request, job) runs once its last attempt failed.
+    """
+    JOB_HANDLERS[job_type] = (handler, on_failed)
+
+
+def new_job(
+    job_type: str,
+    payload: dict,
+    item_id: Optional[str] = None,
+    priority: int = JOB_PRIORITY_NORMAL,
+    max_retries: int = JOB_MAX_RETRIES,
+    batch_id: Optional[str] = None,
+) -> JobModel:
+    now = int(time.time())
+    return JobModel(
+        id=str(uuid.uuid4()),
+        type=job_type,
+        payload=payload,
+        item_id=item_id,
+        priority=priority,
+        max_retries=max_retries,
+        batch_id=batch_id,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def get_job_status(job: JobModel) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_retries": job.max_retries,
+    }
+
+
+def new_batch(name: str) -> dict:
+    now = int(time.time())
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "total": 0,
+        "completed": 0,
+        "skipped": 0,
+        "failed": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def publish_job_status(job: JobModel):
+    """Publish a change of the status of a job on the topic of its item"""
+    if job.item_id:
+        EVENT_BUS.publish(
+            job.item_id,
+            {
+                "type": "job",
+                "user_id": job.payload.get("user_id"),
+                "job": get_job_status(job),
+            },
+        )
+
+
+class LocalJobQueue:
+    """Jobs kept in memory, run by the workers of the process that queued them"""
+
+    def __init__(self):
+        self._jobs: dict[str, JobModel] = {}
+        self._item_jobs: dict[str, str] = {}
+        self._batches: dict[str, dict] = {}
+        # name -> id of the last batch created with the name
+        self._batch_names: dict[str, str] = {}
+        # (-priority, sequence, job_id), the highest priority first then in order
+        self._queue: list[tuple[int, int, str]] = []
+        # (run_at, job_id) of the jobs waiting for a retry
+        self._delayed: list[tuple[float, str]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def enqueue(self, job_type: str, payload: dict, **kwargs) -> JobModel:
+        job = new_job(job_type, payload, **kwargs)
+        with self._condition:
+            self._prune()
+            self._jobs[job.id] = job
+            if job.item_id:
+                self._item_jobs[job.item_id] = job.id
+            self._count(job.batch_id, "total")
+            self._push(job)
+
+        publish_job_status(job)
+        return job.model_copy()
+
+    def _push(self, job: JobModel):
+        heapq.heappush(self._queue, (-job.priority, next(self._sequence), job.id))
+        self._condition.notify()
+
+    def _prune(self):
+        expires_before = int(time.time()) - JOB_RESULT_TTL
+        for job in [
+            job
+            for job in self._jobs.values()
+            if job.status not in ACTIVE_JOB_STATUSES and job.updated_at < expires_before
+        ]:
+            del self._jobs[job.id]
+            if job.item_id and self._item_jobs.get(job.item_id) == job.id:
+                del self._item_jobs[job.item_id]
+
+        for batch in [
+            batch
+            for batch in self._batches.values()
+            if batch["updated_at"] < expires_before
+        ]:
+            del self._batches[batch["id"]]
+            if self._batch_names.get(batch["name"]) == batch["id"]:
+                del self._batch_names[batch["name"]]
+
+    def dequeue(self, timeout: float) -> Optional[JobModel]:
+        with self._condition:
+            if not self._queue:
+                self._condition.wait(timeout)
+            if not self._queue:
+                return None
+
+            _, _, job_id = heapq.heappop(self._queue)
+            job = self._jobs[job_id]
+            job.status = "running"
+            job.attempts += 1
+            job.updated_at = int(time.time())
+            return job.model_copy()
+
+    def get_job(self, job_id: str) -> Optional[JobModel]:
+        with self._condition:
+            job = self._jobs.get(job_id)
+            return job.model_copy() if job else None
+
+    def get_item_job(self, item_id: str) -> Optional[JobModel]:
+        """The last job queued for an item, e.g. "file:{id}" """
+        with self._condition:
+            job = self._jobs.get(self._item_jobs.get(item_id, ""))
+            return job.model_copy() if job else None
+
+    def create_batch(self, name: str) -> str:
+        """A batch counting the outcomes of the jobs queued with its id"""
+        batch = new_batch(name)
+        with self._condition:
+            self._prune()
+            self._batches[batch["id"]] = batch
+            self._batch_names[name] = batch["id"]
+        return batch["id"]
+
+    def get_batch(self, name: str) -> Optional[dict]:
+        """The counters of the last batch created with a name"""
+        with self._condition:
+            batch = self._batches.get(self._batch_names.get(name, ""))
+            return {**batch} if batch else None
+
+    def _count(self, batch_id: Optional[str], counter: str):
+        batch = self._batches.get(batch_id) if batch_id else None
+        if batch:
+            batch[counter] += 1
+            batch["updated_at"] = int(time.time())
+
+    def _update(self, job_id: str, **fields):
+        job = self._jobs.get(job_id)
+        if job:
+            for key, value in fields.items():
+                setattr(job, key, value)
+            job.updated_at = int(time.time())
+
+    def complete(self, job_id: str, skipped: bool = False):
+        with self._condition:
+            self._update(job_id, status="completed", error=None)
+            job = self._jobs.get(job_id)
+            if job:
+                self._count(job.batch_id, "skipped" if skipped else "completed")
+
+    def fail(self, job_id: str, error: str):
+        with self._condition:
+            self._update(job_id, status="failed", error=error)
+            job = self._jobs.get(job_id)
+            if job:
+                self._count(job.batch_id, "failed")
+
+    def retry(self, job_id: str, error: str, delay: float):
+        with self._condition:
+            self._update(job_id, status="retrying", error=error)
+            heapq.heappush(self._delayed, (time.time() + delay, job_id))
+
+    def renew(self, job_ids: list[str]):
+        pass
+
+    def maintain(self) -> list[JobModel]:
+        """Queue the retries that are due"""
+        with self._condition:
+            now = time.time()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, job_id = heapq.heappop(self._delayed)
+                job = self._jobs.get(job_id)
+                if job:
+                    self._update(job_id, status="queued")
+                    self._push(job)
+        return []
+
+
+class RedisJobQueue:
+    """
+    Jobs kept in Redis, run by the workers of any process. A job is a hash and
+    the queue a sorted set ordered by priority then time, running jobs are
+    leased to a worker and queued again when their lease expires.
+    """
+
+    def __init__(self, redis, redis_key_prefix: str = f"{REDIS_KEY_PREFIX}:jobs"):
+        self._redis = redis
+        self._redis_key_prefix = redis_key_prefix
+        self._queue_key = f"{redis_key_prefix}:queue"
+        self._running_key = f"{redis_key_prefix}:running"
+        self._delayed_key = f"{redis_key_prefix}:delayed"
+
+    def _get_job_key(self, job_id: str) -> str:
+        return f"{self._redis_key_prefix}:job:{job_id}"
+
+    def _get_item_key(self, item_id: str) -> str:
+        return f"{self._redis_key_prefix}:item:{item_id}"
+
+    def _get_batch_key(self, batch_id: str) -> str:
+        return f"{self._redis_key_prefix}:batch:{batch_id}"
+
+    def _get_batch_name_key(self, name: str) -> str:
+        return f"{self._redis_key_prefix}:batch_name:{name}"
+
+    @staticmethod
+    def _get_score(job: JobModel) -> float:
+        # Higher priorities first, then in the order the jobs were queued
+        return (JOB_PRIORITY_HIGH - job.priority) * 1e13 + time.time() * 1000
+
+    @staticmethod
+    def _load(data: dict) -> Optional[JobModel]:
+        if not data.get("job"):
+            return None
+        return JobModel.model_validate_json(data["job"]).model_copy(
+            update={
+                "status": data.get("status", "queued"),
+                "attempts": int(data.get("attempts", 0)),
+                "error": data.get("error") or None,
+                "updated_at": int(data.get("updated_at", 0)),
+            }
+        )
+
+    def enqueue(self, job_type: str, payload: dict, **kwargs) -> JobModel:
+        job = new_job(job_type, payload, **kwargs)
+
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hset(
+            self._get_job_key(job.id),
+            mapping={
+                "job": job.model_dump_json(),
+                "status": job.status,
+                "attempts": job.attempts,
+                "updated_at": job.updated_at,
+            },
+        )
+        if job.item_id:
+            pipe.set(self._get_item_key(job.item_id), job.id)
+        if job.batch_id:
+            self._count(pipe, job.batch_id, "total")
+        pipe.zadd(self._queue_key, {job.id: self._get_score(job)})
+        pipe.execute()
+
+        publish_job_status(job)
+        return job
+
+    def dequeue(self, timeout: float) -> Optional[JobModel]:
+        result = self._redis.bzpopmin(self._queue_key, timeout=timeout)
+        if not result:
+            return None
+        job_id = result[1]
+
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zadd(self._running_key, {job_id: time.time() + JOB_LEASE_TIMEOUT})
+        pipe.hset(
+            self._get_job_key(job_id),
+            mapping={"status": "running", "updated_at": int(time.time())},
+        )
+        pipe.hincrby(self._get_job_key(job_id), "attempts", 1)
+        pipe.hgetall(self._get_job_key(job_id))
+        job = self._load(pipe.execute()[-1])
+
+        if job is None:
+            # The job expired while it was queued
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.zrem(self._running_key, job_id)
+            pipe.delete(self._get_job_key(job_id))
+            pipe.execute()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[JobModel]:
+        return self._load(self._redis.hgetall(self._get_job_key(job_id)))
+
+    def get_item_job(self, item_id: str) -> Optional[JobModel]:
+        """The last job queued for an item, e.g. "file:{id}" """
+        job_id = self._redis.get(self._get_item_key(item_id))
+        return self.get_job(job_id) if job_id else None
+
+    def create_batch(self, name: str) -> str:
+        """A batch counting the outcomes of the jobs queued with its id"""
+        batch = new_batch(name)
+
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hset(self._get_batch_key(batch["id"]), mapping=batch)
+        pipe.expire(self._get_batch_key(batch["id"]), JOB_RESULT_TTL)
+        pipe.set(self._get_batch_name_key(name), batch["id"], ex=JOB_RESULT_TTL)
+        pipe.execute()
+        return batch["id"]
+
+    def get_batch(self, name: str) -> Optional[dict]:
+        """The counters of the last batch created with a name"""
+        batch_id = self._redis.get(self._get_batch_name_key(name))
+        data = self._redis.hgetall(self._get_batch_key(batch_id)) if batch_id else {}
+        if not data:
+            return None
+        return {
+            key: value if key in ("id", "name") else int(value)
+            for key, value in data.items()
+        }
+
+    def _count(self, pipe, batch_id: str, counter: str):
+        pipe.hincrby(self._get_batch_key(batch_id), counter, 1)
+        pipe.hset(self._get_batch_key(batch_id), "updated_at", int(time.time()))
+        pipe.expire(self._get_batch_key(batch_id), JOB_RESULT_TTL)
+
+    def _finish(
+        self,
+        job_id: str,
+        status: str,
+        error: Optional[str],
+        counter: Optional[str] = None,
+    ):
+        job = self.get_job(job_id)
+
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zrem(self._running_key, job_id)
+        pipe.hset(
+            self._get_job_key(job_id),
+            mapping={
+                "status": status,
+                "error": error or "",
+                "updated_at": int(time.time()),
+            },
+        )
+        pipe.expire(self._get_job_key(job_id), JOB_RESULT_TTL)
+        if job and job.item_id:
+            pipe.expire(self._get_item_key(job.item_id), JOB_RESULT_TTL)
+        if job and job.batch_id and counter:
+            self._count(pipe, job.batch_id, counter)
+        pipe.execute()
+
+    def complete(self, job_id: str, skipped: bool = False):
+        self._finish(job_id, "completed", None, "skipped" if skipped else "completed")
+
+    def fail(self, job_id: str, error: str):
+        self._finish(job_id, "failed", error, "failed")
+
+    def retry(self, job_id: str, error: str, delay: float):
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zrem(self._running_key, job_id)
+        pipe.hset(
+            self._get_job_key(job_id),
+            mapping={
+                "status": "retrying",
+                "error": error,
+                "updated_at": int(time.time()),
+            },
+        )
+        pipe.zadd(self._delayed_key, {job_id: time.time() + delay})
+        pipe.execute()
+
+    def renew(self, job_ids: list[str]):
+        """Extend the leases of the jobs a worker is running"""
+        if job_ids:
+            expires_at = time.time() + JOB_LEASE_TIMEOUT
+            self._redis.zadd(
+                self._running_key,
+                {job_id: expires_at for job_id in job_ids},
+                xx=True,
+            )
+
+    def _requeue(self, job_id: str) -> Optional[JobModel]:
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hset(
+            self._get_job_key(job_id),
+            mapping={"status": "queued", "updated_at": int(time.time())},
+        )
+        pipe.zadd(self._queue_key, {job_id: self._get_score(job)})
+        pipe.execute()
+        return job
+
+    def maintain(self) -> list[JobModel]:
+        """
+        Queue the retries that are due and the jobs of the workers that stopped
+        while running them. Returns the jobs failed by a lost lease on their
+        last attempt.
+        """
+        now = time.time()
+        failed_jobs = []
+
+        for job_id in self._redis.zrangebyscore(self._delayed_key, "-inf", now):
+            # Only the worker removing the entry queues the job
+            if self._redis.zrem(self._delayed_key, job_id):
+                self._requeue(job_id)
+
+        for job_id in self._redis.zrangebyscore(self._running_key, "-inf", now):
+            if not self._redis.zrem(self._running_key, job_id):
+                continue
+
+            job = self.get_job(job_id)
+            if job is None:
+                continue
+
+            log.warning(f"Job {job.id} ({job.type}) lost its worker")
+            if job.attempts > job.max_retries:
+                error = "The worker running the job stopped"
+                self.fail(job.id, error)
+                failed_jobs.append(job.model_copy(update={"error": error}))
+            else:
+                self._requeue(job.id)
+
+        return failed_jobs
+
+
+def get_job_queue():
+    if JOB_QUEUE_BACKEND == "redis":
+        if REDIS_URL:
+            return RedisJobQueue(
+                get_redis_connection(
+                    redis_url=REDIS_URL,
+                    redis_sentinels=get_sentinels_from_env(
+                        REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                    ),
+                    redis_cluster=REDIS_CLUSTER,
+                    decode_responses=True,
+                )
+            )
+        log.warning("JOB_QUEUE_BACKEND is redis but REDIS_URL is not set")
+    return LocalJobQueue()
+
+
+JOB_QUEUE = get_job_queue()
+
+
+def get_internal_request(app) -> Request:
+    """A request bound to the app, for the code run outside of a request"""
+    return Request(
+        {
+            "type": "http",
+            "asgi.version": "3.0",
+            "asgi.spec_version": "2.0",
+            "method": "GET",
+            "path": "/internal",
+            "query_string": b"",
+            "headers": Headers({}).raw,
+            "client": ("127.0.0.1", 12345),
+            "server": ("127.0.0.1", 80),
+            "scheme": "http",
+            "app": app,
+        }
+    )
+
+
+class JobWorker:
+    """
+    Threads running the queued jobs, in the web processes or in dedicated
+    `open-webui worker` processes.
+    """
+
+    def __init__(self, queue, request: Request, concurrency: int = None):
+        self._queue = queue
+        self._request = request
+        self._concurrency = concurrency or JOB_WORKER_CONCURRENCY
+
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._running_job_ids: set[str] = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        for idx in range(self._concurrency):
+            thread = threading.Thread(
+                target=self._run_jobs, name=f"job-worker-{idx}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        thread = threading.Thread(
+            target=self._maintain, name="job-worker-maintenance", daemon=True
+        )
+        thread.start()
+        self._threads.append(thread)
+
+        log.info(f"Started job worker with {self._concurrency} threads")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop taking jobs, the running ones are waited for up to timeout seconds"""
+        self._stop.set()
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for thread in self._threads:
+            thread.join(
+                max(deadline - time.monotonic(), 0) if deadline is not None else None
+            )
+        self._threads = []
+
+    def _run_jobs(self):
+        while not self._stop.is_set():
+            try:
+                job = self._queue.dequeue(timeout=1)
+            except Exception as e:
+                log.exception(f"Error taking a job from the queue: {e}")
+                self._stop.wait(1)
+                continue
+
+            if job is not None:
+                self._run_job(job)
+
+    def _run_job(self, job: JobModel):
+        handler, on_failed = JOB_HANDLERS.get(job.type, (None, None))
+        if handler is None:
+            log.error(f"No handler for job {job.id} of type {job.type}")
+            self._queue.fail(job.id, f"Unknown job type: {job.type}")
+            return
+
+        with self._lock:
+            self._running_job_ids.add(job.id)
+        publish_job_status(job)
+
+        try:
+            log.debug(f"Running job {job.id} ({job.type}), attempt {job.attempts}")
+            result = handler(self._request, job)
+            self._queue.complete(job.id, skipped=result == JOB_SKIPPED)
+            publish_job_status(job.model_copy(update={"status": "completed"}))
+        except Exception as e:
+            error = str(e.detail) if hasattr(e, "detail") else str(e)
+            if job.attempts <= job.max_retries:
+                delay = JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+                log.warning(
+                    f"Job {job.id} ({job.type}) failed, retrying in {delay}s: {error}"
+                )
+                self._queue.retry(job.id, error, delay)
+                publish_job_status(job.model_copy(update={"status": "retrying"}))
+            else:
+                log.error(f"Job {job.id} ({job.type}) failed: {error}")
+                job = job.model_copy(update={"status": "failed", "error": error})
+                # Before the job is seen as failed, which ends the status streams
+                self._on_failed(job, on_failed)
+                self._queue.fail(job.id, error)
+                publish_job_status(job)
+        finally:
+            with self._lock:
+                self._running_job_ids.discard(job.id)
+
+    def _on_failed(self, job: JobModel, on_failed: Optional[Callable]):
+        if on_failed is None:
+            return
+        try:
+            on_failed(self._request, job)
+        except Exception as e:
+            log.exception(f"Error handling the failure of job {job.id}: {e}")
+
+    def _maintain(self):
+        last_renewal = 0
+        while not self._stop.wait(1):
+            try:
+                if time.monotonic() - last_renewal > JOB_LEASE_TIMEOUT / 3:
+                    with self._lock:
+                        job_ids = list(self._running_job_ids)
+                    self._queue.renew(job_ids)
+                    last_renewal = time.monotonic()
+
+                for job in self._queue.maintain():
+                    _, on_failed = JOB_HANDLERS.get(job.type, (None, None))
+                    self._on_failed(job, on_failed)
+                    publish_job_status(job.model_copy(update={"status": "failed"}))
+            except Exception as e:
+                log.exception(f"Error maintaining the job queue: {e}")
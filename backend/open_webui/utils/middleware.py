@@ -10,7 +10,6 @@ from aiocache import cached
 from typing import Any, Optional
 import random
 import json
-import html
 import inspect
 import re
 import ast
@@ -25,6 +24,7 @@ from starlette.responses import Response, StreamingResponse, JSONResponse
 
 
 from open_webui.models.oauth_sessions import OAuthSessions
+from open_webui.internal.db import run_in_db_executor
 from open_webui.models.chats import Chats
 from open_webui.models.folders import Folders
 from open_webui.models.users import Users
@@ -54,6 +54,8 @@ from open_webui.routers.pipelines import (
 from open_webui.routers.memories import query_memory, QueryMemoryForm
 
 from open_webui.utils.webhook import post_webhook
+from open_webui.utils.chat_save import ChatMessageSaveBuffer
+from open_webui.utils.content_blocks import ContentBlockSerializer
 from open_webui.utils.files import (
     get_audio_url_from_base64,
     get_file_url_from_base64,
@@ -1053,9 +1055,13 @@ async def process_chat_payload(request, form_data, user, metadata, model):
     # Check if the request has chat_id and is inside of a folder
     chat_id = metadata.get("chat_id", None)
     if chat_id and user:
-        chat = Chats.get_chat_by_id_and_user_id(chat_id, user.id)
+        chat = await run_in_db_executor(
+            Chats.get_chat_by_id_and_user_id, chat_id, user.id
+        )
         if chat and chat.folder_id:
-            folder = Folders.get_folder_by_id_and_user_id(chat.folder_id, user.id)
+            folder = await run_in_db_executor(
+                Folders.get_folder_by_id_and_user_id, chat.folder_id, user.id
+            )
 
             if folder and folder.data:
                 if "system_prompt" in folder.data:
@@ -1454,7 +1460,9 @@ async def process_chat_response(
     request, response, form_data, user, metadata, model, events, tasks
 ):
     async def background_tasks_handler():
-        messages_map = Chats.get_messages_map_by_chat_id(metadata["chat_id"])
+        messages_map = await run_in_db_executor(
+            Chats.get_messages_map_by_chat_id, metadata["chat_id"]
+        )
         message = messages_map.get(metadata["message_id"]) if messages_map else None
 
         if message:
@@ -1527,7 +1535,8 @@ async def process_chat_response(
                                 "follow_ups", []
                             )
 
-                            Chats.upsert_message_to_chat_by_id_and_message_id(
+                            await run_in_db_executor(
+                                Chats.upsert_message_to_chat_by_id_and_message_id,
                                 metadata["chat_id"],
                                 metadata["message_id"],
                                 {
@@ -1589,7 +1598,11 @@ async def process_chat_response(
                             if not title:
                                 title = messages[0].get("content", user_message)
 
-                            Chats.update_chat_title_by_id(metadata["chat_id"], title)
+                            await run_in_db_executor(
+                                Chats.update_chat_title_by_id,
+                                metadata["chat_id"],
+                                title,
+                            )
 
                             await event_emitter(
                                 {
@@ -1600,7 +1613,9 @@ async def process_chat_response(
                     elif len(messages) == 2:
                         title = messages[0].get("content", user_message)
 
-                        Chats.update_chat_title_by_id(metadata["chat_id"], title)
+                        await run_in_db_executor(
+                            Chats.update_chat_title_by_id, metadata["chat_id"], title
+                        )
 
                         await event_emitter(
                             {
@@ -1636,8 +1651,11 @@ async def process_chat_response(
 
                         try:
                             tags = json.loads(tags_string).get("tags", [])
-                            Chats.update_chat_tags_by_id(
-                                metadata["chat_id"], tags, user
+                            await run_in_db_executor(
+                                Chats.update_chat_tags_by_id,
+                                metadata["chat_id"],
+                                tags,
+                                user,
                             )
 
                             await event_emitter(
@@ -1691,7 +1709,8 @@ async def process_chat_response(
                         else:
                             error = str(error)
 
-                        Chats.upsert_message_to_chat_by_id_and_message_id(
+                        await run_in_db_executor(
+                            Chats.upsert_message_to_chat_by_id_and_message_id,
                             metadata["chat_id"],
                             metadata["message_id"],
                             {
@@ -1707,7 +1726,8 @@ async def process_chat_response(
                             )
 
                     if "selected_model_id" in response_data:
-                        Chats.upsert_message_to_chat_by_id_and_message_id(
+                        await run_in_db_executor(
+                            Chats.upsert_message_to_chat_by_id_and_message_id,
                             metadata["chat_id"],
                             metadata["message_id"],
                             {
@@ -1727,7 +1747,9 @@ async def process_chat_response(
                                 }
                             )
 
-                            title = Chats.get_chat_title_by_id(metadata["chat_id"])
+                            title = await run_in_db_executor(
+                                Chats.get_chat_title_by_id, metadata["chat_id"]
+                            )
 
                             await event_emitter(
                                 {
@@ -1741,7 +1763,8 @@ async def process_chat_response(
                             )
 
                             # Save message in the database
-                            Chats.upsert_message_to_chat_by_id_and_message_id(
+                            await run_in_db_executor(
+                                Chats.upsert_message_to_chat_by_id_and_message_id,
                                 metadata["chat_id"],
                                 metadata["message_id"],
                                 {
@@ -1751,8 +1774,10 @@ async def process_chat_response(
                             )
 
                             # Send a webhook notification if the user is not active
-                            if not get_active_status_by_user_id(user.id):
-                                webhook_url = Users.get_user_webhook_url_by_id(user.id)
+                            if not await get_active_status_by_user_id(user.id):
+                                webhook_url = await run_in_db_executor(
+                                    Users.get_user_webhook_url_by_id, user.id
+                                )
                                 if webhook_url:
                                     await post_webhook(
                                         request.app.state.WEBUI_NAME,
@@ -1849,156 +1874,26 @@ async def process_chat_response(
         task_id = str(uuid4())  # Create a unique task ID.
         model_id = form_data.get("model", "")
 
-        def split_content_and_whitespace(content):
-            content_stripped = content.rstrip()
-            original_whitespace = (
-                content[len(content_stripped) :]
-                if len(content) > len(content_stripped)
-                else ""
-            )
-            return content_stripped, original_whitespace
-
-        def is_opening_code_block(content):
-            backtick_segments = content.split("```")
-            # Even number of segments means the last backticks are opening a new block
-            return len(backtick_segments) > 1 and len(backtick_segments) % 2 == 0
-
         # Handle as a background task
         async def response_handler(response, events):
-            def serialize_content_blocks(content_blocks, raw=False):
-                content = ""
-
-                for block in content_blocks:
-                    if block["type"] == "text":
-                        block_content = block["content"].strip()
-                        if block_content:
-                            content = f"{content}{block_content}\n"
-                    elif block["type"] == "tool_calls":
-                        attributes = block.get("attributes", {})
-
-                        tool_calls = block.get("content", [])
-                        results = block.get("results", [])
-
-                        if content and not content.endswith("\n"):
-                            content += "\n"
-
-                        if results:
-
-                            tool_calls_display_content = ""
-                            for tool_call in tool_calls:
-
-                                tool_call_id = tool_call.get("id", "")
-                                tool_name = tool_call.get("function", {}).get(
-                                    "name", ""
-                                )
-                                tool_arguments = tool_call.get("function", {}).get(
-                                    "arguments", ""
-                                )
-
-                                tool_result = None
-                                tool_result_files = None
-                                for result in results:
-                                    if tool_call_id == result.get("tool_call_id", ""):
-                                        tool_result = result.get("content", None)
-                                        tool_result_files = result.get("files", None)
-                                        break
-
-                                if tool_result is not None:
-                                    tool_result_embeds = result.get("embeds", "")
-                                    tool_calls_display_content = f'{tool_calls_display_content}<details type="tool_calls" done="true" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}" result="{html.escape(json.dumps(tool_result, ensure_ascii=False))}" files="{html.escape(json.dumps(tool_result_files)) if tool_result_files else ""}" embeds="{html.escape(json.dumps(tool_result_embeds))}">\n<summary>Tool Executed</summary>\n</details>\n'
-                                else:
-                                    tool_calls_display_content = f'{tool_calls_display_content}<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>\n'
-
-                            if not raw:
-                                content = f"{content}{tool_calls_display_content}"
-                        else:
-                            tool_calls_display_content = ""
-
-                            for tool_call in tool_calls:
-                                tool_call_id = tool_call.get("id", "")
-                                tool_name = tool_call.get("function", {}).get(
-                                    "name", ""
-                                )
-                                tool_arguments = tool_call.get("function", {}).get(
-                                    "arguments", ""
-                                )
-
-                                tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>\n'
-
-                            if not raw:
-                                content = f"{content}{tool_calls_display_content}"
-
-                    elif block["type"] == "reasoning":
-                        reasoning_display_content = "\n".join(
-                            (f"> {line}" if not line.startswith(">") else line)
-                            for line in block["content"].splitlines()
-                        )
-
-                        reasoning_duration = block.get("duration", None)
-
-                        start_tag = block.get("start_tag", "")
-                        end_tag = block.get("end_tag", "")
-
-                        if content and not content.endswith("\n"):
-                            content += "\n"
-
-                        if reasoning_duration is not None:
-                            if raw:
-                                content = (
-                                    f'{content}{start_tag}{block["content"]}{end_tag}\n'
-                                )
-                            else:
-                                content = f'{content}<details type="reasoning" done="true" duration="{reasoning_duration}">\n<summary>Thought for {reasoning_duration} seconds</summary>\n{reasoning_display_content}\n</details>\n'
-                        else:
-                            if raw:
-                                content = (
-                                    f'{content}{start_tag}{block["content"]}{end_tag}\n'
-                                )
-                            else:
-                                content = f'{content}<details type="reasoning" done="false">\n<summary>Thinking…</summary>\n{reasoning_display_content}\n</details>\n'
-
-                    elif block["type"] == "code_interpreter":
-                        attributes = block.get("attributes", {})
-                        output = block.get("output", None)
-                        lang = attributes.get("lang", "")
-
-                        content_stripped, original_whitespace = (
-                            split_content_and_whitespace(content)
-                        )
-                        if is_opening_code_block(content_stripped):
-                            # Remove trailing backticks that would open a new block
-                            content = (
-                                content_stripped.rstrip("`").rstrip()
-                                + original_whitespace
-                            )
-                        else:
-                            # Keep content as is - either closing backticks or no backticks
-                            content = content_stripped + original_whitespace
-
-                        if content and not content.endswith("\n"):
-                            content += "\n"
-
-                        if output:
-                            output = html.escape(json.dumps(output))
-
-                            if raw:
-                                content = f'{content}<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n```output\n{output}\n```\n'
-                            else:
-                                content = f'{content}<details type="code_interpreter" done="true" output="{output}">\n<summary>Analyzed</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
-                        else:
-                            if raw:
-                                content = f'{content}<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n'
-                            else:
-                                content = f'{content}<details type="code_interpreter" done="false">\n<summary>Analyzing...</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
+            # Rendered content of closed blocks is cached, only the open block is rendered per delta
+            content_block_serializers = {
+                False: ContentBlockSerializer(),
+                True: ContentBlockSerializer(raw=True),
+            }
 
-                    else:
-                        block_content = str(block["content"]).strip()
-                        if block_content:
-                            content = f"{content}{block['type']}: {block_content}\n"
+            def serialize_content_blocks(content_blocks, raw=False):
+                return content_block_serializers[raw](content_blocks)
 
-                return content.strip()
+            # The segments between tool calls are rendered with their own
+            # serializers, so the cache of the streamed message is kept
+            message_serializers = {
+                False: ContentBlockSerializer(),
+                True: ContentBlockSerializer(raw=True),
+            }
 
             def convert_content_blocks_to_messages(content_blocks, raw=False):
+                serialize = message_serializers[raw]
                 messages = []
 
                 temp_blocks = []
@@ -2007,7 +1902,7 @@ async def process_chat_response(
                         messages.append(
                             {
                                 "role": "assistant",
-                                "content": serialize_content_blocks(temp_blocks, raw),
+                                "content": serialize(temp_blocks),
                                 "tool_calls": block.get("content"),
                             }
                         )
@@ -2027,7 +1922,7 @@ async def process_chat_response(
                         temp_blocks.append(block)
 
                 if temp_blocks:
-                    content = serialize_content_blocks(temp_blocks, raw)
+                    content = serialize(temp_blocks)
                     if content:
                         messages.append(
                             {
@@ -2214,8 +2109,10 @@ async def process_chat_response(
 
                 return content, content_blocks, end_flag
 
-            message = Chats.get_message_by_id_and_message_id(
-                metadata["chat_id"], metadata["message_id"]
+            message = await run_in_db_executor(
+                Chats.get_message_by_id_and_message_id,
+                metadata["chat_id"],
+                metadata["message_id"],
             )
 
             tool_calls = []
@@ -2260,6 +2157,12 @@ async def process_chat_response(
                 else:
                     reasoning_tags = DEFAULT_REASONING_TAGS
 
+            chat_save_buffer = (
+                ChatMessageSaveBuffer(metadata["chat_id"], metadata["message_id"])
+                if ENABLE_REALTIME_CHAT_SAVE
+                else None
+            )
+
             try:
                 for event in events:
                     await event_emitter(
@@ -2270,7 +2173,8 @@ async def process_chat_response(
                     )
 
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    await run_in_db_executor(
+                        Chats.upsert_message_to_chat_by_id_and_message_id,
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
@@ -2340,7 +2244,8 @@ async def process_chat_response(
 
                                 if "selected_model_id" in data:
                                     model_id = data["selected_model_id"]
-                                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                                    await run_in_db_executor(
+                                        Chats.upsert_message_to_chat_by_id_and_message_id,
                                         metadata["chat_id"],
                                         metadata["message_id"],
                                         {
@@ -2546,16 +2451,15 @@ async def process_chat_response(
                                             if end:
                                                 break
 
-                                        if ENABLE_REALTIME_CHAT_SAVE:
-                                            # Save message in the database
-                                            Chats.upsert_message_to_chat_by_id_and_message_id(
-                                                metadata["chat_id"],
-                                                metadata["message_id"],
-                                                {
+                                        if chat_save_buffer:
+                                            # Save message in the database, coalesced and written behind the stream
+                                            chat_save_buffer.update(
+                                                lambda: {
                                                     "content": serialize_content_blocks(
                                                         content_blocks
                                                     ),
                                                 },
+                                                len(value.encode("utf-8")),
                                             )
                                         else:
                                             data = {
@@ -2620,6 +2524,11 @@ async def process_chat_response(
 
                 await stream_body_handler(response, form_data)
 
+                if chat_save_buffer:
+                    await chat_save_buffer.flush(
+                        "tool_call" if tool_calls else "boundary"
+                    )
+
                 tool_call_retries = 0
 
                 while (
@@ -2782,6 +2691,14 @@ async def process_chat_response(
                         }
                     )
 
+                    if chat_save_buffer:
+                        chat_save_buffer.update(
+                            lambda: {
+                                "content": serialize_content_blocks(content_blocks),
+                            }
+                        )
+                        await chat_save_buffer.flush("tool_call")
+
                     try:
                         new_form_data = {
                             "model": model_id,
@@ -2958,6 +2875,14 @@ async def process_chat_response(
                             }
                         )
 
+                        if chat_save_buffer:
+                            chat_save_buffer.update(
+                                lambda: {
+                                    "content": serialize_content_blocks(content_blocks),
+                                }
+                            )
+                            await chat_save_buffer.flush("code_interpreter")
+
                         try:
                             new_form_data = {
                                 "model": model_id,
@@ -2987,16 +2912,21 @@ async def process_chat_response(
                             log.debug(e)
                             break
 
-                title = Chats.get_chat_title_by_id(metadata["chat_id"])
+                title = await run_in_db_executor(
+                    Chats.get_chat_title_by_id, metadata["chat_id"]
+                )
                 data = {
                     "done": True,
                     "content": serialize_content_blocks(content_blocks),
                     "title": title,
                 }
 
-                if not ENABLE_REALTIME_CHAT_SAVE:
+                if chat_save_buffer:
+                    await chat_save_buffer.close()
+                else:
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    await run_in_db_executor(
+                        Chats.upsert_message_to_chat_by_id_and_message_id,
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
@@ -3005,8 +2935,10 @@ async def process_chat_response(
                     )
 
                 # Send a webhook notification if the user is not active
-                if not get_active_status_by_user_id(user.id):
-                    webhook_url = Users.get_user_webhook_url_by_id(user.id)
+                if not await get_active_status_by_user_id(user.id):
+                    webhook_url = await run_in_db_executor(
+                        Users.get_user_webhook_url_by_id, user.id
+                    )
                     if webhook_url:
                         await post_webhook(
                             request.app.state.WEBUI_NAME,
@@ -3032,9 +2964,12 @@ async def process_chat_response(
                 log.warning("Task was cancelled!")
                 await event_emitter({"type": "chat:tasks:cancel"})
 
-                if not ENABLE_REALTIME_CHAT_SAVE:
+                if chat_save_buffer:
+                    await chat_save_buffer.close()
+                else:
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    await run_in_db_executor(
+                        Chats.upsert_message_to_chat_by_id_and_message_id,
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
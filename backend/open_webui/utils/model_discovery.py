@@ -0,0 +1,208 @@
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional
+
+from open_webui.env import (
+    AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST,
+    MODELS_DISCOVERY_INTERVAL,
+    REDIS_KEY_PREFIX,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+# Longest wait between the attempts on a failing connection, in intervals
+MAX_BACKOFF_INTERVALS = 10
+
+# Connections no request asked for in that many intervals stop being polled
+IDLE_INTERVALS = 10
+
+
+class ModelDiscovery:
+    """
+    The model lists of the Ollama and OpenAI connections, served from the
+    last good response while they are fetched again in the background
+    (stale-while-revalidate). Each connection is polled every
+    MODELS_DISCOVERY_INTERVAL seconds, backing off while it fails, so a slow
+    or dead connection only delays the first listing after startup. With
+    Redis, a single worker polls a connection at a time and the others pick
+    its response up from Redis.
+    """
+
+    def __init__(self):
+        # connection id -> state of the connection
+        self._entries: dict[str, dict] = {}
+        self._origin = str(uuid.uuid4())
+
+    def _get_entry(self, url: str, key: Optional[str]) -> dict:
+        id = hashlib.sha256(f"{url}\n{key or ''}".encode()).hexdigest()
+        entry = self._entries.get(id)
+        if entry is None:
+            entry = self._entries[id] = {
+                "id": id,
+                "url": url,
+                "fetch": None,
+                "data": None,
+                "fetched_at": None,
+                "error": None,
+                "failures": 0,
+                "next_at": 0.0,
+                "accessed_at": 0.0,
+                "task": None,
+            }
+        return entry
+
+    async def get(
+        self,
+        redis,
+        url: str,
+        key: Optional[str],
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        The last good response of fetch() for a connection, waiting for it
+        only when there is none yet
+        """
+        entry = self._get_entry(url, key)
+        entry["fetch"] = fetch
+        entry["accessed_at"] = time.time()
+
+        if entry["data"] is None:
+            if entry["failures"] and time.time() < entry["next_at"]:
+                # Failing, retried in the background
+                return None
+            response = await self._refresh(redis, entry)
+            if entry["data"] is None:
+                return response
+        elif time.time() >= entry["next_at"]:
+            self._refresh(redis, entry)
+
+        # Callers add the prefix ids and tags of the connection to the models
+        return copy.deepcopy(entry["data"])
+
+    def _refresh(self, redis, entry: dict) -> asyncio.Future:
+        if entry["task"] is None or entry["task"].done():
+            entry["task"] = asyncio.ensure_future(self._revalidate(redis, entry))
+        return asyncio.shield(entry["task"])
+
+    async def _revalidate(self, redis, entry: dict) -> Any:
+        redis_key = f"{REDIS_KEY_PREFIX}:models:discovery:{entry['id']}"
+        try:
+            if redis is not None and await self._load_shared(redis, redis_key, entry):
+                return entry["data"]
+
+            # Another worker is polling the connection, its response is shared
+            if (
+                redis is not None
+                and entry["data"] is not None
+                and not await redis.set(
+                    f"{redis_key}:lock",
+                    self._origin,
+                    nx=True,
+                    ex=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST or 30,
+                )
+            ):
+                entry["next_at"] = time.time() + MODELS_DISCOVERY_INTERVAL / 2
+                return entry["data"]
+
+            response = await entry["fetch"]()
+            now = time.time()
+            if response is None or (isinstance(response, dict) and "error" in response):
+                entry["failures"] += 1
+                entry["error"] = (
+                    str(response["error"]) if response else "Connection error"
+                )
+                entry["next_at"] = now + MODELS_DISCOVERY_INTERVAL * min(
+                    2 ** entry["failures"], MAX_BACKOFF_INTERVALS
+                )
+                log.warning(
+                    f"Failed to list the models of {entry['url']} "
+                    f"({entry['failures']} times in a row): {entry['error']}"
+                )
+                return response
+
+            entry.update(
+                data=response,
+                fetched_at=now,
+                error=None,
+                failures=0,
+                next_at=now + MODELS_DISCOVERY_INTERVAL,
+            )
+            if redis is not None:
+                await redis.set(
+                    redis_key,
+                    json.dumps({"data": response, "fetched_at": now}),
+                    ex=int(MODELS_DISCOVERY_INTERVAL * IDLE_INTERVALS),
+                )
+            return response
+        except Exception as e:
+            log.exception(f"Error listing the models of {entry['url']}: {e}")
+            entry["failures"] += 1
+            entry["error"] = str(e)
+            entry["next_at"] = time.time() + MODELS_DISCOVERY_INTERVAL
+            return None
+
+    async def _load_shared(self, redis, redis_key: str, entry: dict) -> bool:
+        """Take the response another worker fetched, True when it is fresh"""
+        value = await redis.get(redis_key)
+        if value is None:
+            return False
+
+        shared = json.loads(value)
+        if entry["fetched_at"] is None or shared["fetched_at"] > entry["fetched_at"]:
+            entry.update(
+                data=shared["data"],
+                fetched_at=shared["fetched_at"],
+                error=None,
+                failures=0,
+            )
+
+        next_at = entry["fetched_at"] + MODELS_DISCOVERY_INTERVAL
+        if next_at <= time.time():
+            return False
+
+        entry["next_at"] = next_at
+        return True
+
+    async def run(self, app):
+        """Poll the connections that are due, in the background"""
+        while True:
+            await asyncio.sleep(max(min(MODELS_DISCOVERY_INTERVAL / 4, 5), 0.1))
+
+            now = time.time()
+            for id, entry in list(self._entries.items()):
+                if (
+                    now - entry["accessed_at"]
+                    > MODELS_DISCOVERY_INTERVAL * IDLE_INTERVALS
+                ):
+                    # The connection was removed or is no longer listed
+                    del self._entries[id]
+                elif entry["fetch"] is not None and now >= entry["next_at"]:
+                    self._refresh(getattr(app.state, "redis", None), entry)
+
+    def get_status(self) -> list[dict]:
+        """Freshness and error state of the connections"""
+        now = time.time()
+        return [
+            {
+                "url": entry["url"],
+                "fetched_at": entry["fetched_at"],
+                "age": (
+                    round(now - entry["fetched_at"], 1) if entry["fetched_at"] else None
+                ),
+                "error": entry["error"],
+                "failures": entry["failures"],
+                "next_at": entry["next_at"],
+            }
+            for entry in self._entries.values()
+        ]
+
+
+MODEL_DISCOVERY = ModelDiscovery()
@@ -1,7 +1,9 @@
+import copy
 import time
 import logging
 import asyncio
 import sys
+from typing import Optional
 
 from aiocache import cached
 from fastapi import Request
@@ -11,14 +13,15 @@ from open_webui.functions import get_function_models
 
 
 from open_webui.models.functions import Functions
-from open_webui.models.models import Models
+from open_webui.models.models import ModelModel, Models
 
 
 from open_webui.utils.plugin import (
     load_function_module_by_id,
     get_function_module_from_cache,
 )
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import get_user_group_ids, has_access
+from open_webui.utils.invalidation import INVALIDATION_BUS
 
 
 from open_webui.config import (
@@ -77,138 +80,213 @@ async def get_all_base_models(request: Request, user: UserModel = None):
     return function_models + openai_models + ollama_models
 
 
-async def get_all_models(request, refresh: bool = False, user: UserModel = None):
-    if (
-        request.app.state.MODELS
-        and request.app.state.BASE_MODELS
-        and (request.app.state.config.ENABLE_BASE_MODELS_CACHE and not refresh)
-    ):
-        base_models = request.app.state.BASE_MODELS
+def get_arena_models(request) -> list[dict]:
+    if len(request.app.state.config.EVALUATION_ARENA_MODELS) > 0:
+        arena_models = request.app.state.config.EVALUATION_ARENA_MODELS
     else:
-        base_models = await get_all_base_models(request, user=user)
-        request.app.state.BASE_MODELS = base_models
+        # Add default arena model
+        arena_models = [DEFAULT_ARENA_MODEL]
 
-    # deep copy the base models to avoid modifying the original list
-    models = [model.copy() for model in base_models]
+    return [
+        {
+            "id": model["id"],
+            "name": model["name"],
+            "info": {
+                "meta": model["meta"],
+            },
+            "object": "model",
+            "created": int(time.time()),
+            "owned_by": "arena",
+            "arena": True,
+        }
+        for model in arena_models
+    ]
 
-    # If there are no models, return an empty list
-    if len(models) == 0:
-        return []
 
-    # Add arena models
-    if request.app.state.config.ENABLE_EVALUATION_ARENA_MODELS:
-        arena_models = []
-        if len(request.app.state.config.EVALUATION_ARENA_MODELS) > 0:
-            arena_models = [
-                {
-                    "id": model["id"],
-                    "name": model["name"],
-                    "info": {
-                        "meta": model["meta"],
-                    },
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "arena",
-                    "arena": True,
-                }
-                for model in request.app.state.config.EVALUATION_ARENA_MODELS
-            ]
-        else:
-            # Add default arena model
-            arena_models = [
-                {
-                    "id": DEFAULT_ARENA_MODEL["id"],
-                    "name": DEFAULT_ARENA_MODEL["name"],
-                    "info": {
-                        "meta": DEFAULT_ARENA_MODEL["meta"],
-                    },
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "arena",
-                    "arena": True,
-                }
-            ]
-        models = models + arena_models
+# Process action_ids to get the actions
+def get_action_items_from_module(function, module):
+    actions = []
+    if hasattr(module, "actions"):
+        actions = module.actions
+        return [
+            {
+                "id": f"{function.id}.{action['id']}",
+                "name": action.get("name", f"{function.name} ({action['id']})"),
+                "description": function.meta.description,
+                "icon": action.get(
+                    "icon_url",
+                    function.meta.manifest.get("icon_url", None)
+                    or getattr(module, "icon_url", None)
+                    or getattr(module, "icon", None),
+                ),
+            }
+            for action in actions
+        ]
+    else:
+        return [
+            {
+                "id": function.id,
+                "name": function.name,
+                "description": function.meta.description,
+                "icon": function.meta.manifest.get("icon_url", None)
+                or getattr(module, "icon_url", None)
+                or getattr(module, "icon", None),
+            }
+        ]
 
-    global_action_ids = [
-        function.id for function in Functions.get_global_action_functions()
-    ]
-    enabled_action_ids = [
-        function.id
-        for function in Functions.get_functions_by_type("action", active_only=True)
-    ]
 
-    global_filter_ids = [
-        function.id for function in Functions.get_global_filter_functions()
-    ]
-    enabled_filter_ids = [
-        function.id
-        for function in Functions.get_functions_by_type("filter", active_only=True)
+# Process filter_ids to get the filters
+def get_filter_items_from_module(function, module):
+    return [
+        {
+            "id": function.id,
+            "name": function.name,
+            "description": function.meta.description,
+            "icon": function.meta.manifest.get("icon_url", None)
+            or getattr(module, "icon_url", None)
+            or getattr(module, "icon", None),
+            "has_user_valves": hasattr(module, "UserValves"),
+        }
     ]
 
-    custom_models = Models.get_all_models()
-    for custom_model in custom_models:
-        if custom_model.base_model_id is None:
-            # Applied directly to a base model
-            for model in models:
-                if custom_model.id == model["id"] or (
-                    model.get("owned_by") == "ollama"
-                    and custom_model.id
-                    == model["id"].split(":")[
-                        0
-                    ]  # Ollama may return model ids in different formats (e.g., 'llama3' vs. 'llama3:7b')
-                ):
+
+def get_model_tags(model) -> list[dict]:
+    try:
+        model_tags = [
+            tag.get("name")
+            for tag in model.get("info", {}).get("meta", {}).get("tags", [])
+        ]
+        tags = [tag.get("name") for tag in model.get("tags", [])]
+
+        tags = list(set(model_tags + tags))
+        return [{"name": tag} for tag in tags]
+    except Exception as e:
+        log.debug(f"Error processing model tags: {e}")
+        return []
+
+
+class ModelCatalog:
+    """
+    The models served to the users: the base models and the arena models, with
+    the model rows applied to them as presets or overrides and the actions and
+    filters of the functions.
+
+    The catalog is only rebuilt when the base models, the arena models, or a
+    model or function row changed, and the filtered views of the users are kept
+    until the next rebuild.
+    """
+
+    MAX_VIEWS = 1000
+
+    def __init__(self):
+        self.models: list[dict] = []
+        self.version = 0
+
+        self._sources = None
+        self._model_infos: dict[str, ModelModel] = {}
+        self._model_infos_generation = None
+        self._views = {}
+        self._views_version = None
+
+    def get_model_infos(self) -> dict[str, ModelModel]:
+        """The model rows by id, reloaded after any of them changed"""
+        generation = INVALIDATION_BUS.generation("model")
+        if generation != self._model_infos_generation:
+            self._model_infos = {model.id: model for model in Models.get_all_models()}
+            self._model_infos_generation = generation
+        return self._model_infos
+
+    def update(self, request, base_models: list[dict]) -> list[dict]:
+        config = request.app.state.config
+        sources = (
+            base_models,
+            config.ENABLE_EVALUATION_ARENA_MODELS,
+            config.EVALUATION_ARENA_MODELS,
+            # Read before the rows are loaded, so a change during the build
+            # triggers another one
+            INVALIDATION_BUS.generation("model", "function"),
+        )
+        if sources != self._sources:
+            self._build(request, base_models)
+            self._sources = sources
+        return self.models
+
+    def _build(self, request, base_models: list[dict]):
+        # copy the base models to avoid modifying the original list
+        models = [model.copy() for model in base_models]
+
+        # Add arena models
+        if request.app.state.config.ENABLE_EVALUATION_ARENA_MODELS:
+            models = models + get_arena_models(request)
+
+        # Connections may serve models with the same id, overrides apply to all
+        models_by_id = {}
+        # Ollama may return model ids in different formats (e.g., 'llama3' vs. 'llama3:7b')
+        ollama_models_by_base_id = {}
+        # First model of each id and base id, for the presets to inherit from
+        base_models_by_id = {}
+
+        def add_to_indexes(model):
+            models_by_id.setdefault(model["id"], []).append(model)
+            base_models_by_id.setdefault(model["id"], model)
+            base_models_by_id.setdefault(model["id"].split(":")[0], model)
+
+        for model in models:
+            add_to_indexes(model)
+            if model.get("owned_by") == "ollama":
+                ollama_models_by_base_id.setdefault(
+                    model["id"].split(":")[0], []
+                ).append(model)
+
+        inactive_model_ids = set()
+        model_infos = self.get_model_infos()
+        for custom_model in model_infos.values():
+            if custom_model.base_model_id is None:
+                # Applied directly to a base model
+                matched_models = models_by_id.get(custom_model.id, []) + [
+                    model
+                    for model in ollama_models_by_base_id.get(custom_model.id, [])
+                    if model["id"] != custom_model.id
+                ]
+
+                for model in matched_models:
                     if custom_model.is_active:
                         model["name"] = custom_model.name
                         model["info"] = custom_model.model_dump()
 
                         # Set action_ids and filter_ids
-                        action_ids = []
-                        filter_ids = []
-
-                        if "info" in model and "meta" in model["info"]:
-                            action_ids.extend(
-                                model["info"]["meta"].get("actionIds", [])
-                            )
-                            filter_ids.extend(
-                                model["info"]["meta"].get("filterIds", [])
-                            )
-
-                        model["action_ids"] = action_ids
-                        model["filter_ids"] = filter_ids
+                        meta = model["info"].get("meta") or {}
+                        model["action_ids"] = list(meta.get("actionIds", []))
+                        model["filter_ids"] = list(meta.get("filterIds", []))
                     else:
-                        models.remove(model)
+                        inactive_model_ids.add(model["id"])
 
-        elif custom_model.is_active and (
-            custom_model.id not in [model["id"] for model in models]
-        ):
-            owned_by = "openai"
-            pipe = None
+            elif custom_model.is_active and (
+                custom_model.id not in models_by_id
+                or custom_model.id in inactive_model_ids
+            ):
+                owned_by = "openai"
+                pipe = None
 
-            action_ids = []
-            filter_ids = []
+                action_ids = []
+                filter_ids = []
 
-            for model in models:
-                if (
-                    custom_model.base_model_id == model["id"]
-                    or custom_model.base_model_id == model["id"].split(":")[0]
-                ):
-                    owned_by = model.get("owned_by", "unknown owner")
-                    if "pipe" in model:
-                        pipe = model["pipe"]
-                    break
+                base_model = base_models_by_id.get(custom_model.base_model_id)
+                if base_model is not None:
+                    owned_by = base_model.get("owned_by", "unknown owner")
+                    if "pipe" in base_model:
+                        pipe = base_model["pipe"]
 
-            if custom_model.meta:
-                meta = custom_model.meta.model_dump()
+                if custom_model.meta:
+                    meta = custom_model.meta.model_dump()
 
-                if "actionIds" in meta:
-                    action_ids.extend(meta["actionIds"])
+                    if "actionIds" in meta:
+                        action_ids.extend(meta["actionIds"])
 
-                if "filterIds" in meta:
-                    filter_ids.extend(meta["filterIds"])
+                    if "filterIds" in meta:
+                        filter_ids.extend(meta["filterIds"])
 
-            models.append(
-                {
+                model = {
                     "id": f"{custom_model.id}",
                     "name": custom_model.name,
                     "object": "model",
@@ -220,96 +298,155 @@ async def get_all_models(request, refresh: bool = False, user: UserModel = None)
                     "action_ids": action_ids,
                     "filter_ids": filter_ids,
                 }
-            )
-
-    # Process action_ids to get the actions
-    def get_action_items_from_module(function, module):
-        actions = []
-        if hasattr(module, "actions"):
-            actions = module.actions
-            return [
-                {
-                    "id": f"{function.id}.{action['id']}",
-                    "name": action.get("name", f"{function.name} ({action['id']})"),
-                    "description": function.meta.description,
-                    "icon": action.get(
-                        "icon_url",
-                        function.meta.manifest.get("icon_url", None)
-                        or getattr(module, "icon_url", None)
-                        or getattr(module, "icon", None),
-                    ),
-                }
-                for action in actions
-            ]
-        else:
-            return [
-                {
-                    "id": function.id,
-                    "name": function.name,
-                    "description": function.meta.description,
-                    "icon": function.meta.manifest.get("icon_url", None)
-                    or getattr(module, "icon_url", None)
-                    or getattr(module, "icon", None),
-                }
+                models.append(model)
+                add_to_indexes(model)
+
+        if inactive_model_ids:
+            models = [
+                model
+                for model in models
+                if model["id"] not in inactive_model_ids or model.get("preset")
             ]
 
-    # Process filter_ids to get the filters
-    def get_filter_items_from_module(function, module):
-        return [
-            {
-                "id": function.id,
-                "name": function.name,
-                "description": function.meta.description,
-                "icon": function.meta.manifest.get("icon_url", None)
-                or getattr(module, "icon_url", None)
-                or getattr(module, "icon", None),
-                "has_user_valves": hasattr(module, "UserValves"),
-            }
+        global_action_ids = [
+            function.id for function in Functions.get_global_action_functions()
         ]
+        enabled_action_ids = {
+            function.id
+            for function in Functions.get_functions_by_type("action", active_only=True)
+        }
 
-    def get_function_module_by_id(function_id):
-        function_module, _, _ = get_function_module_from_cache(request, function_id)
-        return function_module
-
-    for model in models:
-        action_ids = [
-            action_id
-            for action_id in list(set(model.pop("action_ids", []) + global_action_ids))
-            if action_id in enabled_action_ids
-        ]
-        filter_ids = [
-            filter_id
-            for filter_id in list(set(model.pop("filter_ids", []) + global_filter_ids))
-            if filter_id in enabled_filter_ids
+        global_filter_ids = [
+            function.id for function in Functions.get_global_filter_functions()
         ]
+        enabled_filter_ids = {
+            function.id
+            for function in Functions.get_functions_by_type("filter", active_only=True)
+        }
 
-        model["actions"] = []
-        for action_id in action_ids:
-            action_function = Functions.get_function_by_id(action_id)
-            if action_function is None:
-                raise Exception(f"Action not found: {action_id}")
+        # Items of each function, shared by all the models using it
+        action_items = {}
+        filter_items = {}
 
-            function_module = get_function_module_by_id(action_id)
-            model["actions"].extend(
-                get_action_items_from_module(action_function, function_module)
-            )
+        def get_action_items(action_id):
+            if action_id not in action_items:
+                action_function = Functions.get_function_by_id(action_id)
+                if action_function is None:
+                    raise Exception(f"Action not found: {action_id}")
 
-        model["filters"] = []
-        for filter_id in filter_ids:
-            filter_function = Functions.get_function_by_id(filter_id)
-            if filter_function is None:
-                raise Exception(f"Filter not found: {filter_id}")
+                function_module, _, _ = get_function_module_from_cache(
+                    request, action_id
+                )
+                action_items[action_id] = get_action_items_from_module(
+                    action_function, function_module
+                )
+            return action_items[action_id]
 
-            function_module = get_function_module_by_id(filter_id)
+        def get_filter_items(filter_id):
+            if filter_id not in filter_items:
+                filter_function = Functions.get_function_by_id(filter_id)
+                if filter_function is None:
+                    raise Exception(f"Filter not found: {filter_id}")
 
-            if getattr(function_module, "toggle", None):
-                model["filters"].extend(
+                function_module, _, _ = get_function_module_from_cache(
+                    request, filter_id
+                )
+                filter_items[filter_id] = (
                     get_filter_items_from_module(filter_function, function_module)
+                    if getattr(function_module, "toggle", None)
+                    else []
                 )
+            return filter_items[filter_id]
 
+        for model in models:
+            action_ids = [
+                action_id
+                for action_id in list(
+                    set(model.pop("action_ids", []) + global_action_ids)
+                )
+                if action_id in enabled_action_ids
+            ]
+            filter_ids = [
+                filter_id
+                for filter_id in list(
+                    set(model.pop("filter_ids", []) + global_filter_ids)
+                )
+                if filter_id in enabled_filter_ids
+            ]
+
+            model["actions"] = []
+            for action_id in action_ids:
+                model["actions"].extend(get_action_items(action_id))
+
+            model["filters"] = []
+            for filter_id in filter_ids:
+                model["filters"].extend(get_filter_items(filter_id))
+
+            model["tags"] = get_model_tags(model)
+
+        self.models = models
+        self.version += 1
+
+        log.debug(f"ModelCatalog rebuilt with {len(models)} models")
+
+    def get_view(self, key, build) -> list[dict]:
+        """A list derived from the models, built once per key and catalog version"""
+        if self._views_version != self.version:
+            self._views = {}
+            self._views_version = self.version
+
+        view = self._views.get(key)
+        if view is None:
+            if len(self._views) >= self.MAX_VIEWS:
+                self._views = {}
+
+            view = build()
+            self._views[key] = view
+        return view
+
+
+MODEL_CATALOG = ModelCatalog()
+
+
+async def update_model_catalog(
+    request, refresh: bool = False, user: UserModel = None
+) -> list[dict]:
+    """
+    Bring the model catalog up to date and return its models. They are shared by
+    all the requests and must not be changed, get_all_models returns copies.
+    """
+    if (
+        request.app.state.MODELS
+        and request.app.state.BASE_MODELS
+        and (request.app.state.config.ENABLE_BASE_MODELS_CACHE and not refresh)
+    ):
+        base_models = request.app.state.BASE_MODELS
+    else:
+        base_models = await get_all_base_models(request, user=user)
+        request.app.state.BASE_MODELS = base_models
+
+    # If there are no models, return an empty list
+    if len(base_models) == 0:
+        return []
+
+    version = MODEL_CATALOG.version
+    models = MODEL_CATALOG.update(request, base_models)
+    if MODEL_CATALOG.version != version or not request.app.state.MODELS:
+        # Looked up by the request handlers, which may change them
+        request.app.state.MODELS = {
+            model["id"]: model for model in copy.deepcopy(models)
+        }
+    return models
+
+
+async def get_all_models(request, refresh: bool = False, user: UserModel = None):
+    models = copy.deepcopy(
+        await update_model_catalog(request, refresh=refresh, user=user)
+    )
     log.debug(f"get_all_models() returned {len(models)} models")
 
-    request.app.state.MODELS = {model["id"]: model for model in models}
+    if models:
+        request.app.state.MODELS = {model["id"]: model for model in models}
     return models
 
 
@@ -324,7 +461,7 @@ def check_model_access(user, model):
         ):
             raise Exception("Model not found")
     else:
-        model_info = Models.get_model_by_id(model.get("id"))
+        model_info = MODEL_CATALOG.get_model_infos().get(model.get("id"))
         if not model_info:
             raise Exception("Model not found")
         elif not (
@@ -336,12 +473,20 @@ def check_model_access(user, model):
             raise Exception("Model not found")
 
 
-def get_filtered_models(models, user):
-    # Filter out models that the user does not have access to
-    if (
+def has_model_access_control(user) -> bool:
+    return (
         user.role == "user"
         or (user.role == "admin" and not BYPASS_ADMIN_ACCESS_CONTROL)
-    ) and not BYPASS_MODEL_ACCESS_CONTROL:
+    ) and not BYPASS_MODEL_ACCESS_CONTROL
+
+
+def get_filtered_models(models, user, user_group_ids: Optional[set[str]] = None):
+    # Filter out models that the user does not have access to
+    if has_model_access_control(user):
+        if user_group_ids is None:
+            user_group_ids = get_user_group_ids(user.id)
+        model_infos = MODEL_CATALOG.get_model_infos()
+
         filtered_models = []
         for model in models:
             if model.get("arena"):
@@ -351,11 +496,12 @@ def get_filtered_models(models, user):
                     access_control=model.get("info", {})
                     .get("meta", {})
                     .get("access_control", {}),
+                    user_group_ids=user_group_ids,
                 ):
                     filtered_models.append(model)
                 continue
 
-            model_info = Models.get_model_by_id(model["id"])
+            model_info = model_infos.get(model["id"])
             if model_info:
                 if (
                     (user.role == "admin" and BYPASS_ADMIN_ACCESS_CONTROL)
@@ -364,6 +510,7 @@ def get_filtered_models(models, user):
                         user.id,
                         type="read",
                         access_control=model_info.access_control,
+                        user_group_ids=user_group_ids,
                     )
                 ):
                     filtered_models.append(model)
@@ -371,3 +518,45 @@ def get_filtered_models(models, user):
         return filtered_models
     else:
         return models
+
+
+def get_user_models(request, user) -> list[dict]:
+    """
+    The models listed to the user, in the configured order, from the catalog
+    built by get_all_models.
+    """
+    model_order_list = request.app.state.config.MODEL_ORDER_LIST or []
+
+    user_group_ids = None
+    if has_model_access_control(user):
+        user_group_ids = get_user_group_ids(user.id)
+        key = (user.id, user.role, frozenset(user_group_ids))
+    else:
+        # Every user without access control sees all the models
+        key = None
+
+    def build():
+        models = [
+            model
+            for model in MODEL_CATALOG.models
+            # Filter out filter pipelines
+            if not (
+                "pipeline" in model and model["pipeline"].get("type", None) == "filter"
+            )
+        ]
+
+        if model_order_list:
+            model_order_dict = {
+                model_id: i for i, model_id in enumerate(model_order_list)
+            }
+            # Sort models by order list priority, with fallback for those not in the list
+            models.sort(
+                key=lambda model: (
+                    model_order_dict.get(model.get("id", ""), float("inf")),
+                    (model.get("name", "") or ""),
+                )
+            )
+
+        return get_filtered_models(models, user, user_group_ids)
+
+    return MODEL_CATALOG.get_view((tuple(model_order_list), key), build)
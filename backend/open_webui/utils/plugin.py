@@ -168,18 +168,13 @@ def load_function_module_by_id(function_id: str, content: str | None = None):
 
 def get_tool_module_from_cache(request, tool_id, load_from_db=True):
     if load_from_db:
-        # Always load from the database by default
+        # Always check the latest content by default, the tool row is cached until
+        # it changes so this doesn't read the database
         tool = Tools.get_tool_by_id(tool_id)
         if not tool:
             raise Exception(f"Tool not found: {tool_id}")
         content = tool.content
 
-        new_content = replace_imports(content)
-        if new_content != content:
-            content = new_content
-            # Update the tool content in the database
-            Tools.update_tool_by_id(tool_id, {"content": content})
-
         if (
             hasattr(request.app.state, "TOOL_CONTENTS")
             and tool_id in request.app.state.TOOL_CONTENTS
@@ -187,8 +182,16 @@ def get_tool_module_from_cache(request, tool_id, load_from_db=True):
             hasattr(request.app.state, "TOOLS") and tool_id in request.app.state.TOOLS
         ):
             if request.app.state.TOOL_CONTENTS[tool_id] == content:
+                # Keep the cached row's string, the next comparison is by identity
+                request.app.state.TOOL_CONTENTS[tool_id] = content
                 return request.app.state.TOOLS[tool_id], None
 
+        new_content = replace_imports(content)
+        if new_content != content:
+            content = new_content
+            # Update the tool content in the database
+            Tools.update_tool_by_id(tool_id, {"content": content})
+
         tool_module, frontmatter = load_tool_module_by_id(tool_id, content)
     else:
         if hasattr(request.app.state, "TOOLS") and tool_id in request.app.state.TOOLS:
@@ -210,21 +213,16 @@ def get_tool_module_from_cache(request, tool_id, load_from_db=True):
 
 def get_function_module_from_cache(request, function_id, load_from_db=True):
     if load_from_db:
-        # Always load from the database by default
+        # Always check the latest content by default
         # This is useful for hooks like "inlet" or "outlet" where the content might change
-        # and we want to ensure the latest content is used.
+        # and we want to ensure the latest content is used. The function row is cached
+        # until it changes, so this doesn't read the database.
 
         function = Functions.get_function_by_id(function_id)
         if not function:
             raise Exception(f"Function not found: {function_id}")
         content = function.content
 
-        new_content = replace_imports(content)
-        if new_content != content:
-            content = new_content
-            # Update the function content in the database
-            Functions.update_function_by_id(function_id, {"content": content})
-
         if (
             hasattr(request.app.state, "FUNCTION_CONTENTS")
             and function_id in request.app.state.FUNCTION_CONTENTS
@@ -233,8 +231,16 @@ def get_function_module_from_cache(request, function_id, load_from_db=True):
             and function_id in request.app.state.FUNCTIONS
         ):
             if request.app.state.FUNCTION_CONTENTS[function_id] == content:
+                # Keep the cached row's string, the next comparison is by identity
+                request.app.state.FUNCTION_CONTENTS[function_id] = content
                 return request.app.state.FUNCTIONS[function_id], None, None
 
+        new_content = replace_imports(content)
+        if new_content != content:
+            content = new_content
+            # Update the function content in the database
+            Functions.update_function_by_id(function_id, {"content": content})
+
         function_module, function_type, frontmatter = load_function_module_by_id(
             function_id, content
         )
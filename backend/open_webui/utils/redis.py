@@ -1,3 +1,4 @@
+import asyncio
 import inspect
 from urllib.parse import urlparse
 
@@ -12,6 +13,9 @@ log = logging.getLogger(__name__)
 
 _CONNECTION_CACHE = {}
 
+# Longest wait in seconds before subscribing to a channel again after an error
+PUBSUB_MAX_RETRY_INTERVAL = 30
+
 
 class SentinelRedisProxy:
     def __init__(self, sentinel, service, *, async_mode: bool = True, **kw):
@@ -207,3 +211,46 @@ def get_sentinel_url_from_env(redis_url, sentinel_hosts_env, sentinel_port_env):
         f"{host}:{sentinel_port_env}" for host in sentinel_hosts_env.split(",")
     )
     return f"redis+sentinel://{auth_part}{hosts_part}/{redis_config['db']}/{redis_config['service']}"
+
+
+async def listen_channel(redis, channel: str, handle, on_subscribe=None):
+    """
+    Call handle(data) with the messages published on a channel until cancelled,
+    subscribing again with a backoff when the subscription is lost.
+    on_subscribe() is called after every subscription, for the listener to make
+    up for the messages it may have missed in between.
+    """
+    retry_interval = 1
+    try:
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(channel)
+                if on_subscribe is not None:
+                    on_subscribe()
+                retry_interval = 1
+
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        handle(message["data"])
+                    except Exception as e:
+                        log.exception(f"Error handling a message on {channel}: {e}")
+
+                log.warning(f"Subscription to {channel} ended")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"Subscription to {channel} lost: {e}")
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+            log.info(f"Subscribing to {channel} again in {retry_interval}s")
+            await asyncio.sleep(retry_interval)
+            retry_interval = min(retry_interval * 2, PUBSUB_MAX_RETRY_INTERVAL)
+    finally:
+        log.info(f"Stopped listening to {channel}")
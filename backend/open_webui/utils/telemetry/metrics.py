@@ -45,8 +45,12 @@ from open_webui.env import (
     OTEL_METRICS_OTLP_SPAN_EXPORTER,
     OTEL_METRICS_EXPORTER_OTLP_INSECURE,
 )
-from open_webui.socket.main import get_active_user_ids
+from open_webui.socket.main import get_active_user_count
 from open_webui.models.users import Users
+from open_webui.utils.chat_save import get_chat_save_buffer_stats
+from open_webui.retrieval.embeddings import get_embedding_request_stats
+from open_webui.retrieval.embedding_cache import get_embedding_cache_stats
+from open_webui.utils.access_control import get_principal_cache_stats
 
 _EXPORT_INTERVAL_MILLIS = 10_000  # 10 seconds
 
@@ -99,6 +103,30 @@ def _build_meter_provider(resource: Resource) -> MeterProvider:
         View(
             instrument_name="webui.users.active",
         ),
+        View(
+            instrument_name="webui.chat.save_buffer.updates",
+        ),
+        View(
+            instrument_name="webui.chat.save_buffer.flushes",
+        ),
+        View(
+            instrument_name="webui.chat.save_buffer.lag",
+        ),
+        View(
+            instrument_name="webui.rag.embedding.batches",
+        ),
+        View(
+            instrument_name="webui.rag.embedding.retries",
+        ),
+        View(
+            instrument_name="webui.rag.embedding.latency",
+        ),
+        View(
+            instrument_name="webui.rag.embedding_cache.hits",
+        ),
+        View(
+            instrument_name="webui.rag.embedding_cache.misses",
+        ),
     ]
 
     provider = MeterProvider(
@@ -132,7 +160,7 @@ def setup_metrics(app: FastAPI, resource: Resource) -> None:
     ) -> Sequence[metrics.Observation]:
         return [
             metrics.Observation(
-                value=len(get_active_user_ids()),
+                value=get_active_user_count(),
             )
         ]
 
@@ -159,6 +187,171 @@ def setup_metrics(app: FastAPI, resource: Resource) -> None:
         callbacks=[observe_active_users],
     )
 
+    def observe_chat_save_buffer_updates(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        return [
+            metrics.Observation(
+                value=get_chat_save_buffer_stats()["updates"],
+            )
+        ]
+
+    def observe_chat_save_buffer_flushes(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        return [
+            metrics.Observation(value=count, attributes={"reason": reason})
+            for reason, count in get_chat_save_buffer_stats()[
+                "flushes_by_reason"
+            ].items()
+        ]
+
+    def observe_chat_save_buffer_lag(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        stats = get_chat_save_buffer_stats()
+        return [
+            metrics.Observation(
+                value=stats["lag_seconds_max"] * 1000.0,
+                attributes={"stat": "max"},
+            ),
+            metrics.Observation(
+                value=(
+                    stats["lag_seconds_total"] / stats["flushes"] * 1000.0
+                    if stats["flushes"]
+                    else 0.0
+                ),
+                attributes={"stat": "avg"},
+            ),
+        ]
+
+    meter.create_observable_counter(
+        name="webui.chat.save_buffer.updates",
+        description="Realtime chat save updates received by the write-behind buffer",
+        unit="1",
+        callbacks=[observe_chat_save_buffer_updates],
+    )
+
+    meter.create_observable_counter(
+        name="webui.chat.save_buffer.flushes",
+        description="Realtime chat save writes performed by the write-behind buffer",
+        unit="1",
+        callbacks=[observe_chat_save_buffer_flushes],
+    )
+
+    meter.create_observable_gauge(
+        name="webui.chat.save_buffer.lag",
+        description="Delay between a buffered chat update and its database write",
+        unit="ms",
+        callbacks=[observe_chat_save_buffer_lag],
+    )
+
+    def observe_embedding_batches(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        return [
+            metrics.Observation(value=count, attributes={"status": status})
+            for status, count in get_embedding_request_stats()[
+                "batches_by_status"
+            ].items()
+        ]
+
+    def observe_embedding_retries(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        return [
+            metrics.Observation(
+                value=get_embedding_request_stats()["retries"],
+            )
+        ]
+
+    def observe_embedding_latency(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        stats = get_embedding_request_stats()
+        return [
+            metrics.Observation(
+                value=stats["latency_seconds_max"] * 1000.0,
+                attributes={"stat": "max"},
+            ),
+            metrics.Observation(
+                value=(
+                    stats["latency_seconds_total"] / stats["batches"] * 1000.0
+                    if stats["batches"]
+                    else 0.0
+                ),
+                attributes={"stat": "avg"},
+            ),
+        ]
+
+    meter.create_observable_counter(
+        name="webui.rag.embedding.batches",
+        description="Embedding batches sent to the embedding API",
+        unit="1",
+        callbacks=[observe_embedding_batches],
+    )
+
+    meter.create_observable_counter(
+        name="webui.rag.embedding.retries",
+        description="Retried embedding requests",
+        unit="1",
+        callbacks=[observe_embedding_retries],
+    )
+
+    meter.create_observable_gauge(
+        name="webui.rag.embedding.latency",
+        description="Latency of an embedding batch including retries",
+        unit="ms",
+        callbacks=[observe_embedding_latency],
+    )
+
+    def observe_embedding_cache_hits(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        return [
+            metrics.Observation(value=count, attributes={"tier": tier})
+            for tier, count in get_embedding_cache_stats()["hits_by_tier"].items()
+        ]
+
+    def observe_embedding_cache_misses(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        return [
+            metrics.Observation(
+                value=get_embedding_cache_stats()["misses"],
+            )
+        ]
+
+    meter.create_observable_counter(
+        name="webui.rag.embedding_cache.hits",
+        description="Embeddings served from the embedding cache",
+        unit="1",
+        callbacks=[observe_embedding_cache_hits],
+    )
+
+    meter.create_observable_counter(
+        name="webui.rag.embedding_cache.misses",
+        description="Embeddings not found in the embedding cache",
+        unit="1",
+        callbacks=[observe_embedding_cache_misses],
+    )
+
+    def observe_principal_cache(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        stats = get_principal_cache_stats()
+        return [
+            metrics.Observation(value=stats["hits"], attributes={"result": "hit"}),
+            metrics.Observation(value=stats["misses"], attributes={"result": "miss"}),
+        ]
+
+    meter.create_observable_counter(
+        name="webui.access.principal_cache.lookups",
+        description="Lookups of the groups and permissions of users, hits avoided a database query",
+        unit="1",
+        callbacks=[observe_principal_cache],
+    )
+
     # FastAPI middleware
     @app.middleware("http")
     async def _metrics_middleware(request: Request, call_next):